@@ -0,0 +1,52 @@
+"""
+Appels concurrents et cache des réponses des API externes
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Hashable
+
+from cachetools import TTLCache
+from prometheus_client import Counter
+
+from apis.config.current import get_config
+
+MAX_WORKERS = 16
+"""Nombre maximal d'appels simultanés aux API externes, toutes requêtes confondues"""
+
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="apis_externes")
+
+_CACHE_REQUESTS = Counter(
+    "apis_externes_cache_requests_total",
+    "Réponses des API externes servies par le cache (hit) ou non (miss)",
+    ["cache", "result"],
+)
+
+
+class ResponseCache:
+    """Cache à durée de vie des réponses d'une API externe, partagé entre les threads de requête"""
+
+    def __init__(self, name: str):
+        cache_config = get_config().cache_config
+        self._name = name
+        self._enabled = cache_config.apis_externes_enabled
+        self._cache = TTLCache(maxsize=cache_config.apis_externes_size, ttl=cache_config.apis_externes_ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        if not self._enabled:
+            return None
+        with self._lock:
+            value = self._cache.get(key)
+        _CACHE_REQUESTS.labels(cache=self._name, result="miss" if value is None else "hit").inc()
+        return value
+
+    def set(self, key: Hashable, value):
+        if not self._enabled:
+            return
+        with self._lock:
+            self._cache[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
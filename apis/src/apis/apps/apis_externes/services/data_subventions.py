@@ -2,6 +2,7 @@ from dataclasses import dataclass
 import logging
 from services.apis_externes.clients.data_subventions.factory import make_app_api_subventions_client
 from services.apis_externes.clients.data_subventions import Subvention, RepresentantLegal
+from apis.apps.apis_externes.services.concurrency import ResponseCache, executor
 from apis.config.current import get_config
 
 logger = logging.getLogger(__name__)
@@ -9,6 +10,8 @@ logger = logging.getLogger(__name__)
 ds_config = get_config().api_data_subventions
 data_subventions_client = make_app_api_subventions_client(ds_config)
 
+subvention_cache = ResponseCache("api_data_subventions")
+
 
 @dataclass
 class InfoApiSubvention:
@@ -19,7 +22,13 @@ class InfoApiSubvention:
 
 
 def subvention(siret: str):
-    subventions = data_subventions_client.get_subventions_pour_etablissement(siret)
-    contacts = data_subventions_client.get_representants_legaux_pour_etablissement(siret)
+    cached = subvention_cache.get(siret)
+    if cached is not None:
+        return cached
+
+    subventions_f = executor.submit(data_subventions_client.get_subventions_pour_etablissement, siret)
+    contacts_f = executor.submit(data_subventions_client.get_representants_legaux_pour_etablissement, siret)
 
-    return InfoApiSubvention(subventions=subventions, contacts=contacts)
+    info = InfoApiSubvention(subventions=subventions_f.result(), contacts=contacts_f.result())
+    subvention_cache.set(siret, info)
+    return info
@@ -4,6 +4,7 @@ from services.apis_externes.models.InfoApiEntreprise import InfoApiEntreprise
 from services.apis_externes.clients.entreprise.factory import make_api_entreprise
 
 
+from apis.apps.apis_externes.services.concurrency import ResponseCache, executor
 from apis.config.current import get_config
 
 logger = logging.getLogger(__name__)
@@ -14,50 +15,76 @@ api_entreprise = make_api_entreprise(api_entreprise_info)
 api_entreprise_info_batch = get_config().api_entreprise_batch
 api_entreprise_batch = make_api_entreprise(api_entreprise_info_batch)
 
+entreprise_cache = ResponseCache("api_entreprise")
+
 
 def _siren(siret: str):
     return siret[0:9]
 
 
+def _call_or_indispo(call, *args):
+    """Appel d'un endpoint optionnel: renvoie (réponse, indisponible)"""
+    try:
+        return call(*args), False
+    except ApiEntrepriseClientError as e:
+        logger.exception(e)
+        return None, True
+
+
 def retrieve_entreprise_info(siret, use_batch=False) -> InfoApiEntreprise:
     _api = api_entreprise_batch if use_batch else api_entreprise
 
     assert _api is not None
-    donnees_etablissement = _api.donnees_etablissement(siret)
 
+    if use_batch:
+        # Pas de cache: utilisé par le healthcheck pour vérifier l'API
+        return _build_info(donnees_etablissement=_api.donnees_etablissement(siret))
+
+    cached = entreprise_cache.get(siret)
+    if cached is not None:
+        return cached
+
+    siren = _siren(siret)
+    donnees_etablissement_f = executor.submit(_api.donnees_etablissement, siret)
+    tva_f = executor.submit(_call_or_indispo, _api.numero_tva_intercommunautaire, siren)
+    rge_f = executor.submit(_call_or_indispo, _api.certifications_rge, siret)
+    qualibat_f = executor.submit(_call_or_indispo, _api.certification_qualibat, siret)
+
+    tva, tva_indispo = tva_f.result()
+    rge, rge_indispo = rge_f.result()
+    qualibat, qualibat_indispo = qualibat_f.result()
+
+    info = _build_info(
+        donnees_etablissement=donnees_etablissement_f.result(),
+        tva=tva,
+        tva_indispo=tva_indispo,
+        rge=rge,
+        rge_indispo=rge_indispo,
+        qualibat=qualibat,
+        qualibat_indispo=qualibat_indispo,
+    )
+
+    # Une réponse partielle n'est pas mise en cache pour ne pas prolonger l'indisponibilité
+    if not (tva_indispo or rge_indispo or qualibat_indispo):
+        entreprise_cache.set(siret, info)
+    return info
+
+
+def _build_info(
+    donnees_etablissement,
+    tva=None,
+    tva_indispo=False,
+    rge: list | None = None,
+    rge_indispo=False,
+    qualibat=None,
+    qualibat_indispo=False,
+) -> InfoApiEntreprise:
     #
     # XXX: Verrue dû à notre compte API entreprise avec droits insuffisants
     # ca = self._api.chiffre_d_affaires(siret)
     ca: list = []
     ca_indispo = False
 
-    tva = None
-    tva_indispo = False
-    rge = []
-    rge_indispo = False
-    qualibat = None
-    qualibat_indispo = False
-
-    if not use_batch:
-        siren = _siren(siret)
-
-        try:
-            tva = _api.numero_tva_intercommunautaire(siren)
-        except ApiEntrepriseClientError as e:
-            tva_indispo = True
-            logger.exception(e)
-        try:
-            rge = _api.certifications_rge(siret)
-        except ApiEntrepriseClientError as e:
-            rge_indispo = True
-            logger.exception(e)
-
-        try:
-            qualibat = _api.certification_qualibat(siret)
-        except ApiEntrepriseClientError as e:
-            qualibat_indispo = True
-            logger.exception(e)
-
     return InfoApiEntreprise(
         donnees_etablissement=donnees_etablissement,
         tva_indispo=tva_indispo,
@@ -65,7 +92,7 @@ def retrieve_entreprise_info(siret, use_batch=False) -> InfoApiEntreprise:
         chiffre_d_affaires_indispo=ca_indispo,
         chiffre_d_affaires=ca,
         certifications_rge_indispo=rge_indispo,
-        certifications_rge=rge,
+        certifications_rge=rge or [],
         certification_qualibat_indispo=qualibat_indispo,
         certification_qualibat=qualibat,
     )
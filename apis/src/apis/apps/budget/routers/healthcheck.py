@@ -40,7 +40,7 @@ def healthcheck(
     )
 
     with SummaryOfTimePerfCounter.cm("hc_search_lignes_budgetaires"):
-        raw, total, grouped, has_next = get_lignes(session, params)
+        raw, total, grouped, has_next, _ = get_lignes(session, params)
 
     with SummaryOfTimePerfCounter.cm("hc_serialize_lignes_budgetaires"):
         data = LignesFinancieres(total=total, lignes=raw)
@@ -10,6 +10,7 @@ from fastapi import APIRouter, Depends
 from fastapi.responses import FileResponse
 from models.entities.audit.ExportFinancialTask import ExportFinancialTask
 from services.audits.export_financial_task import ExportFinancialTaskService
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from models.connected_user import ConnectedUser
@@ -24,7 +25,7 @@ from apis.apps.budget.routers.api_models import Groupings, LigneFinanciere, Lign
 from apis.apps.budget.routers.shared import enforce_query_params_with_connected_user_rights
 from apis.apps.budget.services.exports import do_export as service_do_export
 from apis.apps.budget.services.get_data import get_annees_budget, get_ligne, get_lignes
-from apis.database import get_session_main, get_session_audit
+from apis.database import get_async_session_main, get_session_main, get_session_audit
 from apis.exception_handlers import error_responses
 from apis.security.keycloak_token_validator import KeycloakTokenValidator
 from apis.services.model.pydantic_annotation import make_pydantic_annotation_from_marshmallow_lignes
@@ -54,17 +55,27 @@ class LigneResponse(APISuccess[LigneFinanciere]):
     response_model=LignesResponse,
     responses=error_responses(),
 )
-def get_lignes_financieres(
+async def get_lignes_financieres(
     params: BudgetQueryParams = Depends(),
-    session: Session = Depends(get_session_main),
+    session: AsyncSession = Depends(get_async_session_main),
     user: ConnectedUser = Depends(keycloak_validator.afn_get_connected_user()),
     force_no_cache: bool = False,
 ):
     user_param_source_region = params.source_region
     params = enforce_query_params_with_connected_user_rights(params, user)
 
+    # La réponse est construite dans run_sync: la validation pydantic lit les lignes chargées
+    return await session.run_sync(_lignes_financieres_response, params, user_param_source_region, force_no_cache)
+
+
+def _lignes_financieres_response(
+    session: Session,
+    params: BudgetQueryParams,
+    user_param_source_region: str | None,
+    force_no_cache: bool,
+):
     message = "Liste des données financières"
-    data, total, grouped, has_next = get_lignes(
+    data, total, grouped, has_next, next_cursor = get_lignes(
         session,
         params,
         additionnal_source_region=user_param_source_region,
@@ -93,6 +104,7 @@ def get_lignes_financieres(
         data=data,
         has_next=has_next,
         current_page=params.page,
+        next_cursor=next_cursor,
     )
 
 
@@ -102,10 +114,10 @@ def get_lignes_financieres(
     response_model=LigneResponse,
     responses=error_responses(),
 )
-def get_lignes_financieres_by_source(
+async def get_lignes_financieres_by_source(
     id: int,
     params: SourcesQueryParams = Depends(),
-    session: Session = Depends(get_session_main),
+    session: AsyncSession = Depends(get_async_session_main),
     user: ConnectedUser = Depends(keycloak_validator.afn_get_connected_user()),
 ):
     if not params.source:
@@ -116,6 +128,10 @@ def get_lignes_financieres_by_source(
 
     params = enforce_query_params_with_connected_user_rights(params, user)
 
+    return await session.run_sync(_ligne_financiere_response, params, id)
+
+
+def _ligne_financiere_response(session: Session, params: SourcesQueryParams, id: int):
     ligne = get_ligne(session, params, id)
     if ligne is None:
         return APIError(
@@ -67,7 +67,7 @@ def get_lignes(
     total_retriever = GetTotalOfLignes(builder, force_no_cache=force_no_cache)
     total = total_retriever.retrieve_total(params, additionnal_source_region)
 
-    return data, total, grouped, has_next
+    return data, total, grouped, has_next, builder.next_cursor
 
 
 def get_annees_budget(db: Session, params: SourcesQueryParams):
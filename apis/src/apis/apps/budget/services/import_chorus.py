@@ -1,6 +1,10 @@
+import codecs
+import hashlib
 import logging
 import os
 import csv
+from contextlib import ExitStack, contextmanager
+from typing import BinaryIO, Iterator
 from uuid import uuid4
 from models.exceptions import BadRequestError, ServerError
 from apis.config.current import get_config
@@ -16,6 +20,88 @@ from services.antivirus import AntivirusService, AntivirusError, VirusFoundError
 logger = logging.getLogger(__name__)
 
 
+INGEST_BLOCK_SIZE = 8 * 1024 * 1024
+"""Taille des blocs lus lors de l'ingestion d'un fichier uploadé"""
+
+NB_SAMPLE_LINES = 10
+"""Nombre de lignes utilisées pour valider la structure CSV"""
+
+
+class CsvContentValidator:
+    """
+    Valide au fil de l'eau que le contenu est bien un CSV et non un autre type de fichier.
+
+    Le contenu est décodé en UTF-8 strict au fur et à mesure (les fichiers binaires échouent),
+    les premières lignes sont conservées pour valider la structure CSV à la fin du flux.
+    """
+
+    def __init__(self, nb_sample_lines: int = NB_SAMPLE_LINES):
+        self._decoder = codecs.getincrementaldecoder("utf-8")("strict")
+        self._nb_sample_lines = nb_sample_lines
+        self._sample = ""
+        self._sample_complete = False
+
+    def feed(self, block: bytes) -> None:
+        self._add(self._decode(block))
+
+    def close(self) -> None:
+        """
+        Termine le flux et valide la structure CSV des premières lignes.
+
+        Raises:
+            BadRequestError: Si le fichier n'est pas un CSV valide
+        """
+        self._add(self._decode(b"", final=True))
+        # Même découpage en lignes qu'un fichier ouvert en mode texte (newlines universels)
+        sample = self._sample.replace("\r\n", "\n").replace("\r", "\n")
+        _validate_csv_sample(sample.splitlines(keepends=True)[: self._nb_sample_lines])
+
+    def _decode(self, block: bytes, final: bool = False) -> str:
+        try:
+            return self._decoder.decode(block, final)
+        except UnicodeDecodeError:
+            raise BadRequestError(api_message="Le fichier n'est pas un CSV")
+
+    def _add(self, text: str) -> None:
+        if self._sample_complete:
+            return
+        self._sample += text
+        self._sample_complete = self._sample.count("\n") >= self._nb_sample_lines
+
+
+def _validate_csv_sample(sample_lines: list[str]) -> None:
+    if not sample_lines:
+        raise BadRequestError(api_message="Le fichier CSV est vide")
+
+    # Essayer de parser avec le module csv
+    sample = "".join(sample_lines)
+    try:
+        # Détecter le dialecte CSV
+        sniffer = csv.Sniffer()
+        dialect = sniffer.sniff(sample, delimiters=",;\t")
+
+        # Essayer de parser les lignes
+        reader = csv.reader(sample_lines, dialect=dialect)
+        rows = list(reader)
+
+        if not rows:
+            raise BadRequestError(api_message="Le fichier CSV ne contient aucune donnée valide")
+
+        # Vérifier qu'il y a au moins une colonne
+        if rows and len(rows[0]) == 0:
+            raise BadRequestError(api_message="Le fichier CSV ne contient aucune colonne")
+
+        logger.info(f"Fichier CSV validé : {len(rows)} lignes lues, {len(rows[0]) if rows else 0} colonnes détectées")
+
+    except csv.Error as e:
+        logger.error(f"Erreur lors de la lecture du fichier CSV : {e}", exc_info=e)
+        raise BadRequestError(api_message="Le fichier ne peut pas être lu comme un CSV valide")
+
+
+def _read_blocks(f: BinaryIO) -> Iterator[bytes]:
+    return iter(lambda: f.read(INGEST_BLOCK_SIZE), b"")
+
+
 def validate_csv_file_content(file_path: str) -> None:
     """
     Valide que le fichier est vraiment un CSV et non un autre type de fichier.
@@ -30,46 +116,21 @@ def validate_csv_file_content(file_path: str) -> None:
     Raises:
         BadRequestError: Si le fichier n'est pas un CSV valide
     """
-    try:
-        # Lire le fichier en UTF-8 strict (les fichiers binaires vont échouer ici)
-        with open(file_path, "r", encoding="utf-8") as f:
-            # Lire les 10 premières lignes pour valider la structure CSV
-            sample_lines = [line for i, line in enumerate(f) if i < 10]
-
-            if not sample_lines:
-                raise BadRequestError(api_message="Le fichier CSV est vide")
+    with _csv_validation_errors():
+        validator = CsvContentValidator()
+        with open(file_path, "rb") as f:
+            for block in _read_blocks(f):
+                validator.feed(block)
+        validator.close()
 
-            # Essayer de parser avec le module csv
-            sample = "".join(sample_lines)
-            try:
-                # Détecter le dialecte CSV
-                sniffer = csv.Sniffer()
-                dialect = sniffer.sniff(sample, delimiters=",;\t")
-
-                # Essayer de parser les lignes
-                reader = csv.reader(sample_lines, dialect=dialect)
-                rows = list(reader)
-
-                if not rows:
-                    raise BadRequestError(api_message="Le fichier CSV ne contient aucune donnée valide")
-
-                # Vérifier qu'il y a au moins une colonne
-                if rows and len(rows[0]) == 0:
-                    raise BadRequestError(api_message="Le fichier CSV ne contient aucune colonne")
-
-                logger.info(
-                    f"Fichier CSV validé : {len(rows)} lignes lues, {len(rows[0]) if rows else 0} colonnes détectées"
-                )
-
-            except csv.Error as e:
-                logger.error(f"Erreur lors de la lecture du fichier CSV : {e}", exc_info=e)
-                raise BadRequestError(api_message="Le fichier ne peut pas être lu comme un CSV valide")
 
+@contextmanager
+def _csv_validation_errors() -> Iterator[None]:
+    try:
+        yield
     except BadRequestError:
         # Relancer les BadRequestError sans les wrapper
         raise
-    except UnicodeDecodeError:
-        raise BadRequestError(api_message="Le fichier n'est pas un CSV")
     except Exception as e:
         logger.error(f"Erreur lors de la validation du fichier CSV : {e}", exc_info=e)
         raise BadRequestError(api_message=f"Erreur lors de la validation du fichier : {str(e)}")
@@ -161,49 +222,81 @@ def validate_metadata(metadata: dict):
     logger.debug("Metadata validation passed")
 
 
-def deal_with_viruses(file_path: str):
-    """
-    Scanne le fichier pour détecter les virus et tente de l'effacer s'il y a un problème.
-
-    Raises:
-        BadRequestError: Si un virus est trouvé ou si le scan échoue.
-    """
+def _get_antivirus_service() -> AntivirusService | None:
+    """Retourne le service antivirus, ou None s'il n'est pas activé dans la configuration"""
     config_value = get_config()
 
     if not config_value.antivirus or not config_value.antivirus.enabled:
         logger.warning("Antivirus is not enabled in config, skipping virus scan")
-        return
+        return None
 
-    timeout = config_value.antivirus.timeout
-    av_service = AntivirusService(
+    return AntivirusService(
         host=config_value.antivirus.host,
         port=config_value.antivirus.port,
-        timeout=timeout,
+        timeout=config_value.antivirus.timeout,
         max_file_size_bytes=config_value.antivirus.max_file_size_bytes,
     )
 
+
+def _reject_file(file_path: str, e: AntivirusError):
+    """Efface le fichier refusé par l'antivirus et lève l'erreur destinée à l'utilisateur"""
+    if isinstance(e, VirusFoundError):
+        api_message = "Virus found in uploaded file."
+        logger.error(f"Virus found in file {file_path}. Deleting file.")
+    else:
+        api_message = "Antivirus scan failed."
+        logger.error(f"Failed to scan for viruses in {file_path}. Deleting file.")
+
+    try:
+        os.remove(file_path)
+        logger.info(f"Deleted file {file_path} due to antivirus error")
+    except Exception as delete_error:
+        logger.error(f"Failed to delete file {file_path}: {delete_error}", exc_info=delete_error)
+    raise BadRequestError(api_message=f"{api_message} File has been deleted.")
+
+
+def ingest_uploaded_file(file_path: str) -> str:
+    """
+    Lit une seule fois le fichier uploadé, par gros blocs, et alimente en parallèle
+    la validation CSV, le hash SHA256 et le scan antivirus (INSTREAM clamd).
+
+    La validation CSV est prioritaire : un fichier qui n'est pas un CSV est refusé sans verdict antivirus.
+    Le scan reste obligatoire avant tout enregistrement (fail closed).
+
+    Returns:
+        Le hash SHA256 du fichier, en hexadécimal
+
+    Raises:
+        BadRequestError: Si le fichier n'est pas un CSV valide, si un virus est trouvé ou si le scan échoue.
+    """
+    av_service = _get_antivirus_service()
+    context = {"filename": os.path.basename(file_path)}
+
+    validator = CsvContentValidator()
+    sha256 = hashlib.sha256()
     try:
-        av_service.scan_file(
-            file_path=file_path,
-            context={
-                "filename": os.path.basename(file_path),
-            },
-        )
-        logger.info("No virus found in file")
+        with ExitStack() as stack:
+            f = stack.enter_context(open(file_path, "rb"))
+            av_stream = None
+            if av_service is not None:
+                av_stream = stack.enter_context(av_service.instream(os.fstat(f.fileno()).st_size, context=context))
+
+            for block in _read_blocks(f):
+                with _csv_validation_errors():
+                    validator.feed(block)
+                sha256.update(block)
+                if av_stream is not None:
+                    av_stream.send(block)
+
+            with _csv_validation_errors():
+                validator.close()
+            if av_stream is not None:
+                av_stream.verdict()
+                logger.info("No virus found in file")
     except AntivirusError as e:
-        if isinstance(e, VirusFoundError):
-            api_message = "Virus found in uploaded file."
-            logger.error(f"Virus found in file {file_path}. Deleting file.")
-        else:
-            api_message = "Antivirus scan failed."
-            logger.error(f"Failed to scan for viruses in {file_path}. Deleting file.")
+        _reject_file(file_path, e)
 
-        try:
-            os.remove(file_path)
-            logger.info(f"Deleted file {file_path} due to antivirus error")
-        except Exception as delete_error:
-            logger.error(f"Failed to delete file {file_path}: {delete_error}", exc_info=delete_error)
-        raise BadRequestError(api_message=f"{api_message} File has been deleted.")
+    return sha256.hexdigest()
 
 
 def upload_complete(db: Session, user: ConnectedUser, file_path: str, metadata: dict):
@@ -218,17 +311,15 @@ def upload_complete(db: Session, user: ConnectedUser, file_path: str, metadata:
     # Valider les metadata
     validate_metadata(metadata)
 
-    # Valider le contenu du fichier (vérifier que c'est bien un CSV)
-    logger.info(f"Validating CSV file content: {file_path}")
-    validate_csv_file_content(file_path)
-
     # Extraire les informations des metadata
     session_token = metadata.get("session_token")
     upload_type = metadata.get("uploadType")
     indice = int(metadata.get("indice"))
 
-    # Scan antivirus — obligatoire avant tout enregistrement (fail closed)
-    deal_with_viruses(file_path=file_path)
+    # Une seule lecture du fichier : validation CSV, hash et scan antivirus.
+    # Le scan est obligatoire avant tout enregistrement (fail closed)
+    logger.info(f"Ingesting uploaded file: {file_path}")
+    file_hash = ingest_uploaded_file(file_path)
 
     # Enregistrer le fichier dans la session d'upload
     session_service = _get_upload_session_service()
@@ -238,6 +329,7 @@ def upload_complete(db: Session, user: ConnectedUser, file_path: str, metadata:
                 file_path=file_path,
                 upload_type=upload_type,
                 indice=indice,
+                file_hash=file_hash,
             )
         except ValueError as e:
             logger.error(f"Failed to register file in session: {e}", exc_info=e)
@@ -1,6 +1,7 @@
 from http import HTTPStatus
-from io import BytesIO
+from typing import BinaryIO
 from fastapi import APIRouter, File, Form, UploadFile, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 import pandas as pd
 import json
 import logging
@@ -23,6 +24,14 @@ from apis.config.current import get_config
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+
+def _read_csv_header(csv_file: BinaryIO) -> list[str]:
+    """Lit les noms des colonnes du CSV et replace le fichier au début"""
+    columns = pd.read_csv(csv_file, nrows=0).columns
+    csv_file.seek(0)
+    return list(columns)
+
+
 keycloak_validator = KeycloakTokenValidator.get_application_instance()
 
 
@@ -161,15 +170,12 @@ async def import_table_data(
         f"Import de l'utilisateur '{user.email}' demandé pour la table '{table_id}' avec {len(columns_schema)} colonnes"
     )
 
-    # Lire le CSV
-    contents = file.file.read()
-    data = BytesIO(contents)
-    df = pd.read_csv(data)
+    # Lire uniquement l'entête du CSV, les données sont lues par morceaux pendant l'import
+    csv_columns = set(await run_in_threadpool(_read_csv_header, file.file))
 
-    logger.info(f"CSV lu: {len(df)} lignes, {len(df.columns)} colonnes")
+    logger.info(f"CSV reçu: {len(csv_columns)} colonnes")
 
     # Valider que les colonnes du schéma existent dans le CSV
-    csv_columns = set(df.columns)
     schema_columns = {col.id for col in columns_schema}
 
     missing_columns = schema_columns - csv_columns
@@ -179,23 +185,21 @@ async def import_table_data(
             api_message=f"Colonnes manquantes dans le CSV: {', '.join(missing_columns)}",
         )
 
-    # Filtrer le DataFrame pour ne garder que les colonnes du schéma
-    df_filtered = df[[col.id for col in columns_schema]]
-
     import_service = ImportService(session)
 
-    rows_imported = import_service.import_table(
+    # L'import est bloquant (pandas + session synchrone): il ne doit pas bloquer la boucle d'évènements
+    rows_imported = await run_in_threadpool(
+        import_service.import_csv,
         table_id=table_id,
-        dataframe=df_filtered,
+        csv_file=file.file,
         columns_schema=columns_schema,
         schema_name=get_config().to_superset_config.db_schema_export,
     )
 
-    data.close()
     file.file.close()
     return PublishResponse(
         success=True,
         message=f"Import réussi de {rows_imported} lignes",
         table_id=table_id,
-        rows_imported=len(df_filtered),
+        rows_imported=rows_imported,
     )
@@ -3,8 +3,9 @@ Service pour gérer l'import de données CSV vers la base de données.
 """
 
 import logging
-from typing import List
+from typing import BinaryIO, Iterable, List
 import pandas as pd
+import psycopg
 from sqlalchemy import exc
 from sqlalchemy import text
 from sqlalchemy.orm import Session
@@ -16,6 +17,19 @@ from apis.apps.grist_to_superset.exceptions.import_data_exceptions import DataIn
 
 logger = logging.getLogger(__name__)
 
+IMPORT_CHUNK_SIZE = 50_000
+"""Nombre de lignes du CSV lues et chargées à la fois"""
+
+_MAX_IDENTIFIER_LENGTH = 63
+"""Longueur maximale d'un identifiant PostgreSQL, au delà il est tronqué"""
+
+_TEXT_TYPES = (ColumnType.TEXT, ColumnType.ANY, ColumnType.CHOICE, ColumnType.CHOICELIST)
+
+
+def _identifier(name: str, suffix: str) -> str:
+    """Identifiant `name` + `suffix` tronqué sur `name`, pour ne jamais dépasser la longueur maximale"""
+    return name[: _MAX_IDENTIFIER_LENGTH - len(suffix)] + suffix
+
 
 class ImportService:
     """Service pour gérer l'import de données depuis Grist vers la base de données."""
@@ -35,14 +49,65 @@ class ImportService:
         """
         Importe les données d'un DataFrame dans la base de données.
 
+        Args:
+            table_id: Identifiant de la table cible
+            dataframe: DataFrame pandas contenant les données à importer
+            columns_schema: Liste des colonnes avec leurs types
+
+        Returns:
+            int: Nombre de lignes importées
+
+        Raises:
+            DatabaseError: En cas d'erreur lors de l'import
+        """
+        return self.import_chunks(table_id, [dataframe], columns_schema, schema_name)
+
+    def import_csv(
+        self,
+        table_id: str,
+        csv_file: BinaryIO,
+        columns_schema: List[ColumnIn],
+        schema_name: str,
+        chunksize: int = IMPORT_CHUNK_SIZE,
+    ) -> int:
+        """
+        Importe un fichier CSV lu par morceaux de `chunksize` lignes : la mémoire utilisée
+        ne dépend pas de la taille du fichier.
+
+        Les colonnes texte sont lues telles quelles, sans inférence de type par morceau.
+
+        Args:
+            table_id: Identifiant de la table cible
+            csv_file: Fichier CSV, seules les colonnes du schéma sont lues
+            columns_schema: Liste des colonnes avec leurs types
+
+        Returns:
+            int: Nombre de lignes importées
+        """
+        reader = pd.read_csv(
+            csv_file,
+            usecols=[col.id for col in columns_schema],
+            dtype={col.id: str for col in columns_schema if col.type in _TEXT_TYPES},
+            chunksize=chunksize,
+        )
+        with reader:
+            return self.import_chunks(table_id, reader, columns_schema, schema_name)
+
+    def import_chunks(
+        self, table_id: str, chunks: Iterable[pd.DataFrame], columns_schema: List[ColumnIn], schema_name: str
+    ) -> int:
+        """
+        Importe les données, fournies par morceaux, dans la base de données.
+
         Cette méthode orchestre tout le processus d'import :
         1. Création du schéma si nécessaire
-        2. Création de la table
-        3. Insertion des données
+        2. Création d'une table de chargement, sans clé primaire
+        3. Chargement des données par COPY, puis création de la clé primaire
+        4. Remplacement de la table par la table de chargement, en une transaction
 
         Args:
             table_id: Identifiant de la table cible
-            dataframe: DataFrame pandas contenant les données à importer
+            chunks: Morceaux successifs des données à importer
             columns_schema: Liste des colonnes avec leurs types
 
         Returns:
@@ -52,22 +117,29 @@ class ImportService:
             DatabaseError: En cas d'erreur lors de l'import
         """
         logger.info(f"Début de l'import pour la table '{table_id}'")
+        staging_name = _identifier(table_id, "__new")
 
         # 1. Créer le schéma s'il n'existe pas
         self._create_schema_if_not_exists(schema_name)
 
-        if self.table_exists(schema_name=schema_name, table_name=table_id):
-            logger.info(f"La table '{schema_name}.{table_id}' existe déjà. Suppression avant réimport.")
-            self.delete_table(schema_name=schema_name, table_name=table_id)
+        # 2. Créer la table de chargement, en supprimant celle d'un éventuel import interrompu
+        self.delete_table(schema_name=schema_name, table_name=staging_name)
+        self._create_table_if_not_exists(
+            schema_name=schema_name, table_name=staging_name, columns_schema=columns_schema, with_primary_key=False
+        )
 
-        # 2. Créer la table
-        self._create_table_if_not_exists(schema_name=schema_name, table_name=table_id, columns_schema=columns_schema)
-        logger.debug("Commit après création du schéma et de la table")
+        # 3. Charger les données, la clé primaire est construite une fois la table remplie
+        try:
+            rows_imported = self._insert_data(
+                schema_name=schema_name, table_name=staging_name, chunks=chunks, columns_schema=columns_schema
+            )
+            self._add_primary_key(schema_name=schema_name, table_name=staging_name, columns_schema=columns_schema)
+        except Exception:
+            self.delete_table(schema_name=schema_name, table_name=staging_name)
+            raise
 
-        # 3. Insérer les données
-        rows_imported = self._insert_data(
-            schema_name=schema_name, table_name=table_id, dataframe=dataframe, columns_schema=columns_schema
-        )
+        # 4. Remplacer la table
+        self._swap_tables(schema_name=schema_name, table_name=table_id, staging_name=staging_name)
 
         logger.info(f"Import terminé: {rows_imported} lignes importées dans '{table_id}'")
         return rows_imported
@@ -86,7 +158,9 @@ class ImportService:
         self.session.execute(query)
         logger.info(f"Schéma '{schema_name}' vérifié/créé")
 
-    def _create_table_if_not_exists(self, schema_name: str, table_name: str, columns_schema: List[ColumnIn]) -> None:
+    def _create_table_if_not_exists(
+        self, schema_name: str, table_name: str, columns_schema: List[ColumnIn], with_primary_key: bool = True
+    ) -> None:
         """
         Crée une table dans la base de données si elle n'existe pas.
 
@@ -94,6 +168,7 @@ class ImportService:
             schema_name: Nom du schéma contenant la table
             table_name: Nom de la table à créer
             columns_schema: Liste des colonnes avec leurs types
+            with_primary_key: Crée la clé primaire avec la table (sinon voir _add_primary_key)
 
         Example:
             columns = [
@@ -104,20 +179,17 @@ class ImportService:
         """
         # Construire les définitions de colonnes
         column_definitions = []
-        primary_keys = []
 
         for col in columns_schema:
             sql_type = self._map_column_type_to_sql(col.type)
             column_def = f'"{col.id}" {sql_type}'
 
-            if col.is_index:
-                primary_keys.append(f'"{col.id}"')
-
             column_definitions.append(column_def)
 
         # Ajouter la contrainte de clé primaire si nécessaire
-        if primary_keys:
-            column_definitions.append(f"PRIMARY KEY ({', '.join(primary_keys)})")
+        primary_key = self._primary_key_sql(table_name, columns_schema)
+        if with_primary_key and primary_key:
+            column_definitions.append(primary_key)
 
         # Créer la requête SQL
         columns_sql = ",\n    ".join(column_definitions)
@@ -131,32 +203,108 @@ class ImportService:
         self.session.commit()
         logger.info(f"Table '{schema_name}.{table_name}' vérifiée/créée avec {len(columns_schema)} colonnes")
 
+    def _primary_key_sql(self, table_name: str, columns_schema: List[ColumnIn]) -> str | None:
+        primary_keys = [f'"{col.id}"' for col in columns_schema if col.is_index]
+        if not primary_keys:
+            return None
+        return f'CONSTRAINT "{_identifier(table_name, "_pkey")}" PRIMARY KEY ({", ".join(primary_keys)})'
+
+    def _add_primary_key(self, schema_name: str, table_name: str, columns_schema: List[ColumnIn]) -> None:
+        """
+        Ajoute la clé primaire à une table déjà remplie : construire l'index en une fois
+        est bien plus rapide que de le maintenir pendant le chargement.
+
+        Raises:
+            DataInsertIndexException: Si les valeurs de l'index ne sont pas uniques
+        """
+        primary_key = self._primary_key_sql(table_name, columns_schema)
+        if primary_key is None:
+            return
+
+        try:
+            self.session.execute(text(f'ALTER TABLE {schema_name}."{table_name}" ADD {primary_key}'))
+            self.session.commit()
+            logger.info(f"Clé primaire créée sur '{schema_name}.{table_name}'")
+        except exc.IntegrityError as i:
+            self.session.rollback()
+            logger.error(f"Erreur integrite : {str(i)}")
+            raise self._integrity_exception(columns_schema) from i
+
+    def _integrity_exception(self, columns_schema: List[ColumnIn]) -> Exception:
+        index_col = next((col.id for col in columns_schema if col.is_index), None)
+        if index_col:
+            return DataInsertIndexException(
+                f"L'index '{index_col}' ne contient pas des valeurs uniques. "
+                "Merci de sélectionner un index qui contient uniquement des valeurs uniques."
+            )
+        else:
+            return DataInsertException(
+                "Erreur d'intégrité lors de l'insertion des données. "
+                "Il est recommandé de définir un index avec des valeurs uniques pour éviter les doublons."
+            )
+
     def _insert_data(
-        self, schema_name: str, table_name: str, dataframe: pd.DataFrame, columns_schema: List[ColumnIn]
+        self, schema_name: str, table_name: str, chunks: Iterable[pd.DataFrame], columns_schema: List[ColumnIn]
     ) -> int:
         """
-        Insère les données d'un DataFrame dans une table.
+        Charge les données dans une table avec COPY FROM STDIN, morceau par morceau.
 
         Args:
             schema_name: Nom du schéma contenant la table
             table_name: Nom de la table cible
-            dataframe: DataFrame contenant les données à insérer
+            chunks: Morceaux successifs des données à insérer
             columns_schema: Liste des colonnes avec leurs types
 
         Returns:
             int: Nombre de lignes insérées
 
         Example:
-            rows = await service._insert_data("grist_data", "users", df, columns)
+            rows = service._insert_data("grist_data", "users", [df], columns)
         """
-        if dataframe.empty:
-            logger.warning("DataFrame vide, aucune donnée à insérer")
-            return 0
-
         column_names = [col.id for col in columns_schema]
-        df_to_insert = dataframe[column_names].copy()
+        columns_sql = ", ".join(f'"{name}"' for name in column_names)
+        copy_sql = f'COPY {schema_name}."{table_name}" ({columns_sql}) FROM STDIN WITH (FORMAT csv)'
+
+        rows_inserted = 0
+        try:
+            cursor = self.session.connection().connection.cursor()
+            with cursor.copy(copy_sql) as copy:
+                for chunk in chunks:
+                    if chunk.empty:
+                        continue
+                    df_to_insert = self._convert_columns(chunk[column_names].copy(), columns_schema)
+                    # Les valeurs manquantes sont écrites vides, c'est-à-dire NULL pour COPY
+                    copy.write(df_to_insert.to_csv(header=False, index=False))
+                    rows_inserted += len(df_to_insert)
+                    logger.debug(f"{rows_inserted} lignes chargées dans '{schema_name}.{table_name}'")
+            self.session.commit()
+
+            if rows_inserted == 0:
+                logger.warning("DataFrame vide, aucune donnée à insérer")
+            logger.info(f"{rows_inserted} lignes insérées dans '{schema_name}.{table_name}'")
+
+            return rows_inserted
+
+        except (exc.IntegrityError, psycopg.IntegrityError) as i:
+            self.session.rollback()
+            logger.error(f"Erreur integrite : {str(i)}")
+            raise self._integrity_exception(columns_schema) from i
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Erreur lors de l'insertion: {str(e)}")
+            raise DataInsertException() from e
+
+    def _convert_columns(self, df_to_insert: pd.DataFrame, columns_schema: List[ColumnIn]) -> pd.DataFrame:
+        """
+        Convertit les colonnes de type DATE et DATETIME depuis timestamp Unix.
+
+        Args:
+            df_to_insert: Morceau des données à insérer
+            columns_schema: Liste des colonnes avec leurs types
 
-        # Convertir les colonnes de type DATE et DATETIME depuis timestamp Unix
+        Returns:
+            pd.DataFrame: Le morceau avec les colonnes converties
+        """
         date_cols = [col for col in columns_schema if col.type in (ColumnType.DATE, ColumnType.DATETIME)]
 
         for col in date_cols:
@@ -180,39 +328,70 @@ class ImportService:
             elif col.type == ColumnType.DATE:
                 df_to_insert[col.id] = df_to_insert[col.id].dt.date
 
-        try:
-            df_to_insert.to_sql(
-                name=table_name,
-                con=self.session.get_bind(),
-                schema=schema_name,
-                if_exists="append",
-                index=False,
-                method="multi",
-                chunksize=1000,
-            )
-            self.session.commit()
-            logger.info(f"{len(df_to_insert)} lignes insérées dans '{schema_name}.{table_name}'")
+        return df_to_insert
 
-            return len(df_to_insert)
+    def _swap_tables(self, schema_name: str, table_name: str, staging_name: str) -> None:
+        """
+        Remplace la table par la table de chargement, par renommages dans une seule transaction :
+        les lecteurs voient l'ancienne table complète, puis la nouvelle, sans interruption.
 
-        except exc.IntegrityError as i:
-            self.session.rollback()
-            logger.error(f"Erreur integrite : {str(i)}")
-            index_col = next((col.id for col in columns_schema if col.is_index), None)
-            if index_col:
-                raise DataInsertIndexException(
-                    f"L'index '{index_col}' ne contient pas des valeurs uniques. "
-                    "Merci de sélectionner un index qui contient uniquement des valeurs uniques."
-                ) from i
-            else:
-                raise DataInsertException(
-                    "Erreur d'intégrité lors de l'insertion des données. "
-                    "Il est recommandé de définir un index avec des valeurs uniques pour éviter les doublons."
-                ) from i
-        except Exception as e:
-            self.session.rollback()
-            logger.error(f"Erreur lors de l'insertion: {str(e)}")
-            raise DataInsertException() from e
+        Les vues qui dépendent de la table sont recréées sur la nouvelle table.
+
+        Args:
+            schema_name: Nom du schéma
+            table_name: Nom de la table à remplacer
+            staging_name: Nom de la table de chargement
+        """
+        old_name = _identifier(table_name, "__old")
+        # Reste d'un remplacement interrompu
+        self.delete_table(schema_name=schema_name, table_name=old_name)
+
+        # Les définitions sont lues avant les renommages, elles désignent donc la table par son nom définitif
+        views = self._dependent_views(schema_name, table_name)
+
+        self._rename_table(schema_name, table_name, old_name)
+        self._rename_table(schema_name, staging_name, table_name)
+
+        for view_name, definition in views:
+            try:
+                with self.session.begin_nested():
+                    # Pas de text() : la définition peut contenir des ":" pris pour des paramètres
+                    self.session.connection().exec_driver_sql(f"CREATE OR REPLACE VIEW {view_name} AS {definition}")
+                logger.info(f"Vue {view_name} recréée sur '{schema_name}.{table_name}'")
+            except exc.DBAPIError as e:
+                # Colonnes incompatibles avec la nouvelle table : la vue est supprimée avec l'ancienne table
+                logger.warning(f"Impossible de recréer la vue {view_name}, elle sera supprimée: {e}")
+
+        self.session.execute(text(f'DROP TABLE IF EXISTS {schema_name}."{old_name}" CASCADE'))
+        self.session.commit()
+        logger.info(f"Table '{schema_name}.\"{table_name}\"' remplacée par '{staging_name}'")
+
+    def _rename_table(self, schema_name: str, table_name: str, new_name: str) -> None:
+        """Renomme une table et sa clé primaire, si elle existe"""
+        self.session.execute(text(f'ALTER TABLE IF EXISTS {schema_name}."{table_name}" RENAME TO "{new_name}"'))
+        self.session.execute(
+            text(
+                f'ALTER INDEX IF EXISTS {schema_name}."{_identifier(table_name, "_pkey")}" '
+                f'RENAME TO "{_identifier(new_name, "_pkey")}"'
+            )
+        )
+
+    def _dependent_views(self, schema_name: str, table_name: str) -> list[tuple[str, str]]:
+        """Vues (nom qualifié, définition) qui lisent directement la table"""
+        query = text("""
+            SELECT DISTINCT format('%I.%I', n.nspname, v.relname), pg_get_viewdef(v.oid)
+            FROM pg_depend d
+            JOIN pg_rewrite r ON r.oid = d.objid
+            JOIN pg_class v ON v.oid = r.ev_class
+            JOIN pg_namespace n ON n.oid = v.relnamespace
+            WHERE d.classid = 'pg_rewrite'::regclass
+            AND d.refclassid = 'pg_class'::regclass
+            AND d.refobjid = to_regclass(:table)
+            AND v.oid <> d.refobjid
+            AND v.relkind = 'v'
+        """)
+        result = self.session.execute(query, {"table": f'{schema_name}."{table_name}"'})
+        return [(view_name, definition) for view_name, definition in result.all()]
 
     def _map_column_type_to_sql(self, column_type: ColumnType) -> str:
         """
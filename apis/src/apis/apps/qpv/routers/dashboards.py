@@ -1,7 +1,7 @@
 from http import HTTPStatus
 import logging
 from typing import TypeVar
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends
 
 from models.connected_user import ConnectedUser
@@ -10,7 +10,7 @@ from services.qpv.query_params import QpvQueryParams
 
 from apis.apps.qpv.models.dashboard_data import DashboardData
 from apis.apps.qpv.services.get_data import get_dashboard_data
-from apis.database import get_session_main
+from apis.database import get_async_session_main
 from apis.exception_handlers import error_responses
 from apis.security.keycloak_token_validator import KeycloakTokenValidator
 from apis.shared.models import APISuccess
@@ -41,7 +41,7 @@ class DashboardResponse(APISuccess[DashboardData]):
 )
 async def get_dashboard(
     params: QpvQueryParams = Depends(),
-    session: Session = Depends(get_session_main),
+    session: AsyncSession = Depends(get_async_session_main),
     user: ConnectedUser = Depends(keycloak_validator.afn_get_connected_user()),
 ):
     params = handle_region_user(params, user)
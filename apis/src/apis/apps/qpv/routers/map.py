@@ -5,11 +5,11 @@ from typing import TypeVar
 from apis.apps.qpv.models.map_data import MapData
 from services.shared.source_query_params import SourcesQueryParams
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from services.qpv.query_params import QpvQueryParams
 from apis.apps.qpv.services.get_data import get_map_data
-from apis.database import get_session_main
+from apis.database import get_async_session_main
 from models.connected_user import ConnectedUser
 from apis.exception_handlers import error_responses
 from apis.security.keycloak_token_validator import KeycloakTokenValidator
@@ -40,7 +40,7 @@ class MapResponse(APISuccess[MapData]):
 )
 async def get_map(
     params: QpvQueryParams = Depends(),
-    session: Session = Depends(get_session_main),
+    session: AsyncSession = Depends(get_async_session_main),
     user: ConnectedUser = Depends(keycloak_validator.afn_get_connected_user()),
 ):
     params = handle_region_user(params, user)
@@ -1,4 +1,3 @@
-import asyncio
 from apis.apps.qpv.models.chart_data import ChartData
 from apis.apps.qpv.models.dashboard_data import DashboardData
 from apis.apps.qpv.models.map_data import MapData, QpvData
@@ -9,7 +8,8 @@ from services.qpv.query_builder import QpvQueryBuilder
 from services.qpv.query_params import QpvQueryParams
 from services.shared.source_query_builder import SourcesQueryBuilder
 from services.shared.source_query_params import SourcesQueryParams
-from sqlalchemy import distinct, func, select
+from sqlalchemy import distinct, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from services.regions import get_request_regions, sanitize_source_region_for_bdd_request
@@ -115,9 +115,16 @@ def get_annees_qpv(db: Session, params: SourcesQueryParams):
     return [item["annee"] for item in data]
 
 
+async def get_map_data(
+    db: AsyncSession,
+    params: QpvQueryParams,
+) -> MapData:
+    return await db.run_sync(_compute_map_data, params)
+
+
 @gauge_of_currently_executing()
 @summary_of_time()
-async def get_map_data(
+def _compute_map_data(
     db: Session,
     params: QpvQueryParams,
 ) -> MapData:
@@ -134,111 +141,78 @@ async def get_map_data(
     return MapData(data=[QpvData(qpv=r.code_qpv, montant=float(r.total or 0)) for r in rows])
 
 
-@gauge_of_currently_executing()
-@summary_of_time()
 async def get_dashboard_data(
-    db: Session,
+    db: AsyncSession,
     params: QpvQueryParams,
 ) -> DashboardData:
-    query_builder = _get_query_builder(db, params)
-    results = await asyncio.gather(
-        _get_big_numbers(query_builder),
-        _get_pie_chart_themes(query_builder),
-        _get_pie_chart_types_porteur(query_builder),
-        _get_bar_chart_financeurs(query_builder),
-        _get_line_chart_annees(query_builder),
-    )
-    return DashboardData(
-        total_financements=results[0]["total_financements"],
-        total_actions=results[0]["total_actions"],
-        total_porteurs=results[0]["total_porteurs"],
-        pie_chart_themes=results[1],
-        pie_chart_types_porteurs=results[2],
-        bar_chart_financeurs=results[3],
-        line_chart_annees=results[4],
-    )
+    return await db.run_sync(_compute_dashboard_data, params)
 
 
-async def _get_big_numbers(query_builder: QpvQueryBuilder):
-    # Total des montants
-    query_total_financements = query_builder.with_selection(
-        select(func.coalesce(func.sum(FlattenFinancialLinesDataQPV.montant_ae), 0.0))
-    )
-    total_financements = query_total_financements.select_one()
-    # Nombres d'AE
-    query_total_actions = query_builder.with_selection(
-        select(func.coalesce(func.count(func.distinct(FlattenFinancialLinesDataQPV.id)), 0.0))
-    )
-    total_actions = query_total_actions.select_one()
-    # Nombre de bénéficiaires
-    query_total_porteurs = query_builder.with_selection(
-        select(func.coalesce(func.count(func.distinct(FlattenFinancialLinesDataQPV.beneficiaire_code)), 0.0))
-    )
-    total_porteurs = query_total_porteurs.select_one()
-
-    return {
-        "total_financements": total_financements,
-        "total_actions": total_actions,
-        "total_porteurs": total_porteurs,
-    }
-
-
-async def _get_pie_chart_themes(query_builder: QpvQueryBuilder):
-    qb = query_builder.with_selection(
-        [
-            FlattenFinancialLinesDataQPV.programme_theme.label("theme"),
-            func.coalesce(func.sum(FlattenFinancialLinesDataQPV.montant_ae), 0.0).label("total"),
-        ]
-    )
-    qb._query = qb._query.group_by(None).group_by(FlattenFinancialLinesDataQPV.programme_theme)
-    rows = qb._session.execute(qb._query).all()
-    return ChartData(labels=[str(r.theme) for r in rows], values=[float(r.total or 0) for r in rows])
+_DASHBOARD_DIMENSIONS = {
+    "theme": FlattenFinancialLinesDataQPV.programme_theme,
+    "type_porteur": FlattenFinancialLinesDataQPV.beneficiaire_categorieJuridique_type,
+    "financeur": FlattenFinancialLinesDataQPV.centreCouts_description,
+    "annee": FlattenFinancialLinesDataQPV.annee,
+}
 
 
-async def _get_pie_chart_types_porteur(query_builder: QpvQueryBuilder):
-    qb = query_builder.with_selection(
-        [
-            FlattenFinancialLinesDataQPV.beneficiaire_categorieJuridique_type.label("type_porteur"),
-            func.coalesce(func.sum(FlattenFinancialLinesDataQPV.montant_ae), 0.0).label("total"),
-        ]
-    )
-    qb._query = qb._query.group_by(None).group_by(FlattenFinancialLinesDataQPV.beneficiaire_categorieJuridique_type)
-    rows = qb._session.execute(qb._query).all()
-    return ChartData(labels=[str(r.type_porteur) for r in rows], values=[float(r.total or 0) for r in rows])
-
+def _grouping_id_of(dimension: str | None) -> int:
+    """
+    Valeur de GROUPING(theme, type_porteur, financeur, annee) pour le grouping set d'une dimension.
+    Un bit à 1 par colonne agrégée, la première colonne étant le bit de poids fort.
+    """
+    names = list(_DASHBOARD_DIMENSIONS)
+    all_grouped = (1 << len(names)) - 1
+    if dimension is None:
+        return all_grouped
+    return all_grouped & ~(1 << (len(names) - 1 - names.index(dimension)))
 
-async def _get_bar_chart_financeurs(query_builder: QpvQueryBuilder):
-    qb = query_builder.with_selection(
-        [
-            FlattenFinancialLinesDataQPV.centreCouts_description.label("financeur"),
-            func.coalesce(func.sum(FlattenFinancialLinesDataQPV.montant_ae), 0.0).label("total"),
-        ]
-    )
-    qb._query = qb._query.group_by(None).group_by(FlattenFinancialLinesDataQPV.centreCouts_description)
-    rows = qb._session.execute(qb._query).all()
-    return ChartData(labels=[str(r.financeur) for r in rows], values=[float(r.total or 0) for r in rows])
 
+@gauge_of_currently_executing()
+@summary_of_time()
+def _compute_dashboard_data(
+    db: Session,
+    params: QpvQueryParams,
+) -> DashboardData:
+    """
+    Calcule les chiffres clés et tous les graphiques en un seul parcours de la vue, via des GROUPING SETS:
+    un grouping set vide pour les chiffres clés, un par dimension pour les graphiques.
+    """
+    query_builder = _get_query_builder(db, params)
 
-async def _get_line_chart_annees(query_builder: QpvQueryBuilder):
+    dimensions = list(_DASHBOARD_DIMENSIONS.values())
     qb = query_builder.with_selection(
         [
-            FlattenFinancialLinesDataQPV.annee.label("annee"),
+            func.grouping(*dimensions).label("grouping_id"),
+            *[col.label(name) for name, col in _DASHBOARD_DIMENSIONS.items()],
             func.coalesce(func.sum(FlattenFinancialLinesDataQPV.montant_ae), 0.0).label("total"),
+            func.count(func.distinct(FlattenFinancialLinesDataQPV.id)).label("nb_actions"),
+            func.count(func.distinct(FlattenFinancialLinesDataQPV.beneficiaire_code)).label("nb_porteurs"),
         ]
     )
-    qb._query = qb._query.group_by(None).group_by(FlattenFinancialLinesDataQPV.annee)
-    rows = qb._session.execute(qb._query).all()
-    return ChartData(labels=[str(r.annee) for r in rows], values=[float(r.total or 0) for r in rows])
-
+    query = qb._query.group_by(None).group_by(func.grouping_sets(tuple_(), *[tuple_(col) for col in dimensions]))
+    query = query.order_by(None)
+    rows = qb._session.execute(query).all()
+
+    rows_by_set: dict[int, list] = {}
+    for row in rows:
+        rows_by_set.setdefault(row.grouping_id, []).append(row)
+
+    def _chart(dimension: str, rows: list, label=str) -> ChartData:
+        return ChartData(
+            labels=[label(getattr(r, dimension)) for r in rows],
+            values=[float(r.total or 0) for r in rows],
+        )
 
-async def _get_line_chart_annees(query_builder: QpvQueryBuilder):
-    qb = query_builder.with_selection(
-        [
-            FlattenFinancialLinesDataQPV.annee.label("annee"),
-            func.coalesce(func.sum(FlattenFinancialLinesDataQPV.montant_ae), 0.0).label("total"),
-        ]
+    big_numbers = rows_by_set.get(_grouping_id_of(None), [])
+    # Années croissantes, l'année non renseignée en dernier comme le ORDER BY de Postgres
+    annees = sorted(rows_by_set.get(_grouping_id_of("annee"), []), key=lambda r: (r.annee is None, r.annee))
+    return DashboardData(
+        total_financements=big_numbers[0].total if big_numbers else 0.0,
+        total_actions=big_numbers[0].nb_actions if big_numbers else 0,
+        total_porteurs=big_numbers[0].nb_porteurs if big_numbers else 0,
+        pie_chart_themes=_chart("theme", rows_by_set.get(_grouping_id_of("theme"), [])),
+        pie_chart_types_porteurs=_chart("type_porteur", rows_by_set.get(_grouping_id_of("type_porteur"), [])),
+        bar_chart_financeurs=_chart("financeur", rows_by_set.get(_grouping_id_of("financeur"), [])),
+        line_chart_annees=_chart("annee", annees, label=lambda annee: str(annee if annee is None else int(annee))),
     )
-    qb._query = qb._query.group_by(None).group_by(FlattenFinancialLinesDataQPV.annee)
-    qb._query = qb._query.order_by(None).order_by(FlattenFinancialLinesDataQPV.annee)
-    rows = qb._session.execute(qb._query).all()
-    return ChartData(labels=[str(int(r.annee)) for r in rows], values=[float(r.total or 0) for r in rows])
@@ -4,7 +4,8 @@ from typing import Annotated
 from apis.services.model.pydantic_annotation import make_pydantic_annotation_from_marshmallow
 from services.shared.v3_query_params import V3QueryParams
 from fastapi import Depends
-from requests import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
 from models.entities.refs.Qpv import Qpv as QpvFlask
 from models.schemas.refs import QpvSchema
@@ -13,7 +14,7 @@ from apis.apps.referentiels.services.get_data import get_all_data
 from apis.apps.referentiels.services.referentiels_router_factory import (
     create_referentiel_router,
 )
-from apis.database import get_session_main
+from apis.database import get_async_session_main
 from models.connected_user import ConnectedUser
 from apis.exception_handlers import error_responses
 from apis.security.keycloak_token_validator import KeycloakTokenValidator
@@ -33,23 +34,28 @@ keycloak_validator = KeycloakTokenValidator.get_application_instance()
 router = create_referentiel_router(Qpv, QpvSchema, QpvResponse, keycloak_validator, logger, "qpv")
 
 
+def _find_all_by_annee_decoupage(session: Session, params: V3QueryParams, annee: int):
+    data, has_next = get_all_data(Qpv, session, params, [Qpv.annee_decoupage == annee])
+    return QpvSchema(only=params.colonnes or QpvSchema._declared_fields.keys(), many=True).dump(data), has_next
+
+
 @router.get(
     "/decoupage/{annee}",
     summary="Find all QPV by annee",
     response_model=QpvResponse,
     responses=error_responses(),
 )
-def find_all_by_annee_decoupage(
+async def find_all_by_annee_decoupage(
     annee: str,
     params: V3QueryParams = Depends(),
-    session: Session = Depends(get_session_main),
+    session: AsyncSession = Depends(get_async_session_main),
     user: ConnectedUser = Depends(keycloak_validator.afn_get_connected_user()),
 ):
     if annee != "2015" and annee != "2024":
         raise ValueError("L'année de découpage renseignée est erronée.")
 
     logger.debug(f"[QPV] Récupération des qpv de l'année de découpage {annee}")
-    data, has_next = get_all_data(Qpv, session, params, [Qpv.annee_decoupage == int(annee)])
+    data, has_next = await session.run_sync(_find_all_by_annee_decoupage, params, int(annee))
     if len(data) == 0:
         return APISuccess(
             code=HTTPStatus.NO_CONTENT,
@@ -60,7 +66,7 @@ def find_all_by_annee_decoupage(
     return APISuccess(
         code=HTTPStatus.OK,
         message=f"Liste des QPV de l'année de découpage {annee}",
-        data=QpvSchema(only=params.colonnes or QpvSchema._declared_fields.keys(), many=True).dump(data),
+        data=data,
         current_page=params.page,
         has_next=has_next,
     )
@@ -3,11 +3,12 @@ from logging import Logger
 from services.shared.v3_query_params import V3QueryParams
 from fastapi import APIRouter, Depends
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, DeclarativeBase
 from typing import Type
 
 from apis.apps.referentiels.services.get_data import get_all_data, get_one_data
-from apis.database import get_session_main
+from apis.database import get_async_session_main
 from models.connected_user import ConnectedUser
 from apis.exception_handlers import error_responses
 from apis.security.keycloak_token_validator import KeycloakTokenValidator
@@ -26,20 +27,31 @@ def create_referentiel_router(
 ) -> APIRouter:
     router = APIRouter(prefix=f"/{model_name}", tags=[f"{model_name.capitalize()}"])
 
+    def _dump(data, params: V3QueryParams):
+        return schema(only=params.colonnes or schema._declared_fields.keys(), many=True).dump(data)
+
+    def _list_all(session: Session, params: V3QueryParams):
+        data, has_next = get_all_data(model, session, params)
+        return _dump(data, params), has_next
+
+    def _get_by_code(session: Session, params: V3QueryParams, code: str):
+        data = get_one_data(model, session, params, [getattr(model, code_column) == code])
+        return None if data is None else _dump([data], params)
+
     @router.get(
         "",
         summary=f"Liste de tous les {model_name}",
         response_model=success_response,
         responses=error_responses(),
     )
-    def list_all(
+    async def list_all(
         params: V3QueryParams = Depends(),
-        session: Session = Depends(get_session_main),
+        session: AsyncSession = Depends(get_async_session_main),
         user: ConnectedUser = Depends(keycloak_validator.afn_get_connected_user()),
     ):
         logger.debug(f"[{model_name.upper()}] Récupération des {model_name}")
 
-        data, has_next = get_all_data(model, session, params)
+        data, has_next = await session.run_sync(_list_all, params)
         if len(data) == 0:
             return APISuccess(
                 code=HTTPStatus.NO_CONTENT,
@@ -50,7 +62,7 @@ def create_referentiel_router(
         return APISuccess(
             code=HTTPStatus.OK,
             message=f"Liste des {model_name}",
-            data=schema(only=params.colonnes or schema._declared_fields.keys(), many=True).dump(data),
+            data=data,
             has_next=has_next,
             current_page=params.page,
         )
@@ -61,27 +73,26 @@ def create_referentiel_router(
         response_model=success_response,
         responses=error_responses(),
     )
-    def get_by_code(
+    async def get_by_code(
         code: str,
         params: V3QueryParams = Depends(),
-        session: Session = Depends(get_session_main),
+        session: AsyncSession = Depends(get_async_session_main),
         user: ConnectedUser = Depends(keycloak_validator.afn_get_connected_user()),
     ):
         logger.debug(f"[{model_name.upper()}] Récupération de {model_name} par {code_column} : {code}")
 
-        data = get_one_data(model, session, params, [getattr(model, code_column) == code])
+        data = await session.run_sync(_get_by_code, params, code)
         if data is None:
             return APISuccess(
                 code=HTTPStatus.NO_CONTENT,
                 message="Aucun résultat ne correspond à vos critères de recherche",
                 data=[],
             )
-        data = [data]
 
         return APISuccess(
             code=HTTPStatus.OK,
             message=f"{model_name.capitalize()}[code={code}]",
-            data=schema(only=params.colonnes or schema._declared_fields.keys(), many=True).dump(data),
+            data=data,
         )
 
     return router
@@ -19,6 +19,18 @@ class KeycloakOpenIdConfig(BaseModel):
         default=None,
         description="For tests only - give a test user to authenticate with",
     )
+    token_cache_size: int = Field(
+        default=10_000,
+        description="Nombre maximal de tokens vérifiés gardés en cache (jusqu'à leur expiration)",
+    )
+    jwks_refresh_interval: float = Field(
+        default=3600,
+        description="Âge (secondes) au delà duquel le JWKS est rafraîchi en arrière plan",
+    )
+    jwks_min_refetch_interval: float = Field(
+        default=30,
+        description="Délai minimal (secondes) entre deux récupérations du JWKS sur un kid inconnu",
+    )
 
 class ToSupersetConfig(BaseModel):
     url_superset: str # l'url public du superset
@@ -38,6 +50,43 @@ class CacheConfig(BaseModel):
         default=10_000,
         description="Taille du cache pour les totaux des lignes budgetaires"
     )
+    apis_externes_enabled: bool = Field(
+        default=True,
+        description="Le caching des réponses API entreprise et data subventions par SIRET"
+    )
+    apis_externes_size: int = Field(
+        default=10_000,
+        description="Nombre maximal de SIRET en cache pour chaque API externe"
+    )
+    apis_externes_ttl: int = Field(
+        default=3600,
+        description="Durée de vie (secondes) des réponses des API externes en cache"
+    )
+
+class DatabasePoolConfig(BaseModel):
+    pool_size: int = Field(default=5, description="Nombre de connexions gardées ouvertes dans le pool")
+    max_overflow: int = Field(default=10, description="Connexions supplémentaires ouvertes au delà de pool_size en cas de pic")
+    pool_timeout: float = Field(default=30, description="Attente maximale (secondes) d'une connexion libre avant erreur")
+    pool_recycle: int = Field(
+        default=1800,
+        description="Âge (secondes) au delà duquel une connexion est recyclée, -1 pour ne jamais recycler",
+    )
+    pool_pre_ping: bool = Field(
+        default=True,
+        description="Vérifie la connexion à chaque emprunt (un aller-retour serveur par checkout)",
+    )
+    prepare_threshold: int | None = Field(
+        default=5,
+        description="Nombre d'exécutions d'une requête avant sa préparation côté serveur (psycopg). "
+        "None désactive les prepared statements (ex: derrière pgbouncer en mode transaction)",
+    )
+
+
+class DatabasePoolsConfig(BaseModel):
+    main: DatabasePoolConfig = Field(default_factory=DatabasePoolConfig)
+    audit: DatabasePoolConfig = Field(default_factory=DatabasePoolConfig)
+    settings: DatabasePoolConfig = Field(default_factory=DatabasePoolConfig)
+
 
 class UploadConfig(BaseModel):
     tus_folder: str = Field(required=True, description="Chemin du dossier de sauvegarde des fichiers uploadés")
@@ -59,6 +108,9 @@ class Config(BaseModel):
     sqlalchemy_database_uri_settings: str
     """Base de données settings (schéma pour préférences utilisateurs, etc.)"""
 
+    database_pools: DatabasePoolsConfig = Field(default_factory=DatabasePoolsConfig)
+    """Dimensionnement des pools de connexions, par base"""
+
     dossier_des_exports: Path
     """Chemin vers le répertoire qui contient les exports utilisateurs."""
 
@@ -1,55 +1,112 @@
 from contextlib import contextmanager
 import logging
+import time
 
 from functools import lru_cache
 from typing import Literal
-from sqlalchemy import create_engine
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from apis.config.current import get_config
 from services.utilities import sqlalchemy_pretty_printer
 from services.utilities.observability import cache_stats
 
 
-def make_main_engine():
-    db_url = get_config().sqlalchemy_database_uri
-    engine = create_engine(db_url, pool_pre_ping=True, pool_recycle=30, echo=get_config().print_sql)
+EngineName = Literal["audit", "main", "settings"]
+
+_POOL_CHECKED_OUT = Gauge("apis_db_pool_checked_out", "Connexions actuellement empruntées au pool", ["engine", "mode"])
+_POOL_OVERFLOW = Gauge("apis_db_pool_overflow", "Connexions ouvertes au delà de pool_size", ["engine", "mode"])
+_POOL_CHECKOUT_WAIT = Histogram(
+    "apis_db_pool_checkout_wait_seconds", "Temps d'obtention d'une connexion du pool", ["engine", "mode"]
+)
+
+
+def _database_uri(engine_name: EngineName) -> str:
+    config = get_config()
+    uris = {
+        "main": config.sqlalchemy_database_uri,
+        "audit": config.sqlalchemy_database_uri_audit,
+        "settings": config.sqlalchemy_database_uri_settings,
+    }
+    return uris[engine_name]
+
+
+def _instrumented_pool_class(pool_class: type[QueuePool], engine_name: EngineName, mode: str) -> type[QueuePool]:
+    """Pool qui mesure le temps d'attente d'une connexion (connexion libre, nouvelle connexion ou saturation)"""
+    checkout_wait = _POOL_CHECKOUT_WAIT.labels(engine=engine_name, mode=mode)
+
+    class _InstrumentedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                checkout_wait.observe(time.perf_counter() - start)
+
+    return _InstrumentedPool
+
+
+def _engine_options(engine_name: EngineName, pool_class: type[QueuePool], mode: str) -> dict:
+    config = get_config()
+    pool = getattr(config.database_pools, engine_name)
+    return {
+        "poolclass": _instrumented_pool_class(pool_class, engine_name, mode),
+        "pool_size": pool.pool_size,
+        "max_overflow": pool.max_overflow,
+        "pool_timeout": pool.pool_timeout,
+        "pool_recycle": pool.pool_recycle,
+        "pool_pre_ping": pool.pool_pre_ping,
+        # psycopg prépare côté serveur les requêtes exécutées plus de `prepare_threshold` fois sur une connexion
+        "connect_args": {"prepare_threshold": pool.prepare_threshold},
+        "echo": config.print_sql,
+    }
+
+
+def _expose_pool_metrics(engine: Engine | AsyncEngine, engine_name: EngineName, mode: str):
+    # engine.pool est lu à chaque collecte: le pool peut être recréé après une invalidation
+    _POOL_CHECKED_OUT.labels(engine=engine_name, mode=mode).set_function(lambda: engine.pool.checkedout())
+    _POOL_OVERFLOW.labels(engine=engine_name, mode=mode).set_function(lambda: max(engine.pool.overflow(), 0))
+
+
+def make_engine(engine_name: EngineName) -> Engine:
+    engine = create_engine(_database_uri(engine_name), **_engine_options(engine_name, QueuePool, "sync"))
+    _expose_pool_metrics(engine, engine_name, "sync")
     return engine
 
 
+def make_main_engine():
+    return make_engine("main")
+
+
 def make_audit_engine():
-    db_url = get_config().sqlalchemy_database_uri_audit
-    engine = create_engine(db_url, pool_pre_ping=True, pool_recycle=30, echo=get_config().print_sql)
-    return engine
+    return make_engine("audit")
 
 
 def make_settings_engine():
-    db_url = get_config().sqlalchemy_database_uri_settings
-    engine = create_engine(db_url, pool_pre_ping=True, pool_recycle=30, echo=get_config().print_sql)
-    return engine
+    return make_engine("settings")
 
 
-EngineName = Literal["audit", "main", "settings"]
+def make_async_engine(engine_name: EngineName) -> AsyncEngine:
+    """
+    Engine asynchrone, le driver psycopg supporte les modes synchrone et asynchrone avec la même URL.
+    """
+    options = _engine_options(engine_name, AsyncAdaptedQueuePool, "async")
+    engine = create_async_engine(_database_uri(engine_name), **options)
+    _expose_pool_metrics(engine, engine_name, "async")
+    return engine
 
 
 @cache_stats()
 @lru_cache
 def get_sesion_maker(engine_name: EngineName):
-    main_engine = make_main_engine()
-    audit_engine = make_audit_engine()
-    settings_engine = make_settings_engine()
-
-    engines = {
-        "main": main_engine,
-        "audit": audit_engine,
-        "settings": settings_engine,
-    }
-
     if get_config().print_sql:
         _format = "%(asctime)s.%(msecs)03d : %(levelname)s : %(message)s"
         logging.basicConfig(format=_format, datefmt="%Y-%m-%d %H:%M:%S", level=logging.INFO, force=True)
         sqlalchemy_pretty_printer.setup(format=_format)
-    selected_engine = engines[engine_name]
+    selected_engine = make_engine(engine_name)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=selected_engine)
     return SessionLocal
 
@@ -81,6 +138,31 @@ def get_session_settings():
         session.close()
 
 
+@lru_cache
+def get_async_sesion_maker(engine_name: EngineName) -> async_sessionmaker[AsyncSession]:
+    engine = make_async_engine(engine_name)
+    return async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_session_main():
+    """
+    Session asynchrone: les accès base ne bloquent pas la boucle d'évènements.
+    Le code de requêtage synchrone s'exécute via `await session.run_sync(fn, ...)`.
+    """
+    async with get_async_sesion_maker("main")() as session:
+        yield session
+
+
+async def get_async_session_audit():
+    async with get_async_sesion_maker("audit")() as session:
+        yield session
+
+
+async def get_async_session_settings():
+    async with get_async_sesion_maker("settings")() as session:
+        yield session
+
+
 @contextmanager
 def session_audit_scope():
     session_maker = get_sesion_maker("audit")
@@ -1,6 +1,14 @@
-from authlib.jose import jwt, JsonWebKey
+import asyncio
+import hashlib
+import time
+from typing import NamedTuple
+
+from authlib.jose import jwt, JsonWebKey, KeySet
+from authlib.jose.util import extract_header
+from cachetools import TLRUCache
 import logging
 from fastapi import Depends
+from prometheus_client import Counter, Gauge
 import requests
 
 from fastapi.security import OAuth2PasswordBearer
@@ -12,6 +20,17 @@ from apis.shared.exceptions import InvalidTokenError
 
 _instance = None
 
+_TOKEN_CACHE_REQUESTS = Counter(
+    "apis_token_cache_requests_total", "Validations de token servies par le cache (hit) ou non (miss)", ["result"]
+)
+_TOKEN_CACHE_SIZE = Gauge("apis_token_cache_size", "Nombre de tokens vérifiés en cache")
+_JWKS_FETCHES = Counter("apis_jwks_fetches_total", "Récupérations du JWKS keycloak", ["reason", "result"])
+
+
+class _VerifiedToken(NamedTuple):
+    claims: dict
+    exp: float
+
 
 class KeycloakTokenValidator:
     @staticmethod
@@ -28,33 +47,102 @@ class KeycloakTokenValidator:
         self.jwks_url = f"{self.issuer}/protocol/openid-connect/certs"
         self.oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{self.issuer}/protocol/openid-connect/token")
         self.algorithms = ["RS256"]
-        self._jwk_set = None
+
+        self._jwks_refresh_interval = config.keycloak_openid.jwks_refresh_interval
+        self._jwks_min_refetch_interval = config.keycloak_openid.jwks_min_refetch_interval
+        self._jwk_set: KeySet | None = None
+        self._jwk_set_fetched_at = 0.0
+        self._jwk_set_lock = asyncio.Lock()
+        self._background_refresh: asyncio.Task | None = None
+
+        # Les claims vérifiés expirent avec le token
+        self._verified_tokens: TLRUCache = TLRUCache(
+            maxsize=config.keycloak_openid.token_cache_size,
+            ttu=lambda _key, verified, _now: verified.exp,
+            timer=time.time,
+        )
 
         self._logger = logging.getLogger(f"{__name__}.{self.__class__.__name__}")
 
-    def _get_jwk_set(self):
+    def _fetch_jwk_set(self) -> KeySet:
+        response = requests.get(self.jwks_url, timeout=10)
+        response.raise_for_status()
+        return JsonWebKey.import_key_set(response.json())
+
+    async def _refresh_jwk_set(self, reason: str, fetched_before: float | None = None) -> KeySet:
+        """
+        Récupère le JWKS hors de la boucle d'évènements.
+        Une seule récupération à la fois: les appelants concurrents réutilisent le résultat
+        si le JWKS a été rafraîchi depuis `fetched_before`.
+        """
+        async with self._jwk_set_lock:
+            if fetched_before is not None and self._jwk_set_fetched_at > fetched_before:
+                return self._jwk_set
+            try:
+                self._jwk_set = await asyncio.to_thread(self._fetch_jwk_set)
+            except Exception:
+                _JWKS_FETCHES.labels(reason=reason, result="error").inc()
+                raise
+            self._jwk_set_fetched_at = time.monotonic()
+            _JWKS_FETCHES.labels(reason=reason, result="ok").inc()
+            return self._jwk_set
+
+    async def _background_refresh_jwk_set(self):
+        try:
+            await self._refresh_jwk_set("interval", fetched_before=self._jwk_set_fetched_at)
+        except Exception as e:
+            self._logger.warning(f"Échec du rafraîchissement du JWKS, la version courante est conservée: {e}")
+
+    async def _get_jwk_set(self, kid: str | None) -> KeySet:
         if self._jwk_set is None:
-            response = requests.get(self.jwks_url)
-            response.raise_for_status()
-            self._jwk_set = JsonWebKey.import_key_set(response.json())
+            return await self._refresh_jwk_set("initial", fetched_before=0.0)
+
+        age = time.monotonic() - self._jwk_set_fetched_at
+        try:
+            self._jwk_set.find_by_kid(kid)
+        except ValueError:
+            # Clé inconnue (rotation côté keycloak): on refetch, au plus une fois par intervalle
+            if age >= self._jwks_min_refetch_interval:
+                self._logger.info(f"Clé '{kid}' absente du JWKS, nouvelle récupération")
+                return await self._refresh_jwk_set("unknown_kid", fetched_before=self._jwk_set_fetched_at)
+            return self._jwk_set
+
+        if age >= self._jwks_refresh_interval and (self._background_refresh is None or self._background_refresh.done()):
+            # Le JWKS courant reste servi pendant le rafraîchissement
+            self._background_refresh = asyncio.create_task(self._background_refresh_jwk_set())
         return self._jwk_set
 
+    def _decode(self, token: str, jwk_set: KeySet) -> dict:
+        claims = jwt.decode(
+            token,
+            key=jwk_set,
+            claims_options={
+                "iss": {"essential": True, "value": self.issuer},
+                "exp": {"essential": True},
+            },
+        )
+        claims.validate(leeway=30)
+        return dict(claims)
+
     async def validate_token(self, token: str) -> ConnectedUser:
+        key = hashlib.sha256(token.encode()).digest()
+        verified = self._verified_tokens.get(key)
+        if verified is not None:
+            _TOKEN_CACHE_REQUESTS.labels(result="hit").inc()
+            return ConnectedUser(dict(verified.claims))
+        _TOKEN_CACHE_REQUESTS.labels(result="miss").inc()
+
         try:
-            jwk_set = self._get_jwk_set()
-            claims = jwt.decode(
-                token,
-                key=jwk_set,
-                claims_options={
-                    "iss": {"essential": True, "value": self.issuer},
-                    "exp": {"essential": True},
-                },
-            )
-            claims.validate(leeway=30)
+            kid = extract_header(token.split(".")[0].encode(), ValueError).get("kid")
+            jwk_set = await self._get_jwk_set(kid)
+            claims = self._decode(token, jwk_set)
         except Exception as e:
             _ex = InvalidTokenError(api_message="Token validation failed")
             raise _ex from e
 
+        self._verified_tokens[key] = _VerifiedToken(claims, float(claims["exp"]))
+        _TOKEN_CACHE_SIZE.set(self._verified_tokens.currsize)
+
         connected_user = ConnectedUser(dict(claims))
         return connected_user
 
@@ -24,6 +24,8 @@ def _ts_default_factory():
 class PaginationMeta(BaseModel):
     current_page: int
     has_next: bool
+    next_cursor: Optional[str] = Field(default=None, exclude_if=lambda v: v is None)
+    """Curseur à fournir pour obtenir la page suivante (pagination par clé)"""
 
 
 class APIResponse(BaseModel):
@@ -78,6 +80,7 @@ class APISuccess(APIResponse, Generic[T]):
     message: Optional[str] = None
     current_page: Optional[int] = Field(default=None, exclude=True, frozen=True)
     has_next: Optional[bool] = Field(default=None, exclude=True, frozen=True)
+    next_cursor: Optional[str] = Field(default=None, exclude=True, frozen=True)
 
     model_config = _model_config
 
@@ -86,7 +89,7 @@ class APISuccess(APIResponse, Generic[T]):
     def pagination(self) -> Optional[PaginationMeta]:
         pm = None
         if self.current_page is not None and self.has_next is not None:
-            pm = PaginationMeta(current_page=self.current_page, has_next=self.has_next)
+            pm = PaginationMeta(current_page=self.current_page, has_next=self.has_next, next_cursor=self.next_cursor)
         return pm
 
     def model_post_init(self, ctx: Any) -> None:
@@ -0,0 +1,78 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from apis.apps.apis_externes.services import data_subventions, entreprise
+from services.apis_externes.clients.entreprise import ApiEntrepriseClientError
+
+SIRET = "18310021300028"
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    entreprise.entreprise_cache.clear()
+    data_subventions.subvention_cache.clear()
+    yield
+    entreprise.entreprise_cache.clear()
+    data_subventions.subvention_cache.clear()
+
+
+def _api_entreprise(nb_calls: int):
+    """Client dont chaque appel attend que les `nb_calls` appels soient en cours"""
+    barrier = threading.Barrier(nb_calls, timeout=5)
+
+    def _call(result):
+        def _wrapped(*args):
+            barrier.wait()
+            return result
+
+        return _wrapped
+
+    api = MagicMock()
+    api.donnees_etablissement.side_effect = _call(MagicMock(siret=SIRET))
+    api.numero_tva_intercommunautaire.side_effect = _call("tva")
+    api.certifications_rge.side_effect = _call(["rge"])
+    api.certification_qualibat.side_effect = _call("qualibat")
+    return api
+
+
+def test_retrieve_entreprise_info_calls_are_concurrent_and_cached():
+    api = _api_entreprise(nb_calls=4)
+
+    with patch.object(entreprise, "api_entreprise", api):
+        info = entreprise.retrieve_entreprise_info(SIRET)
+        cached = entreprise.retrieve_entreprise_info(SIRET)
+
+    assert (info.tva, info.certifications_rge, info.certification_qualibat) == ("tva", ["rge"], "qualibat")
+    assert cached is info
+    api.donnees_etablissement.assert_called_once_with(SIRET)
+    api.numero_tva_intercommunautaire.assert_called_once_with(SIRET[:9])
+
+
+def test_retrieve_entreprise_info_partial_response_is_not_cached():
+    api = MagicMock()
+    api.certifications_rge.side_effect = ApiEntrepriseClientError()
+
+    with patch.object(entreprise, "api_entreprise", api):
+        info = entreprise.retrieve_entreprise_info(SIRET)
+        entreprise.retrieve_entreprise_info(SIRET)
+
+    assert info.certifications_rge_indispo
+    assert info.certifications_rge == []
+    assert not info.tva_indispo
+    assert api.donnees_etablissement.call_count == 2
+
+
+def test_subvention_calls_are_concurrent_and_cached():
+    barrier = threading.Barrier(2, timeout=5)
+    client = MagicMock()
+    client.get_subventions_pour_etablissement.side_effect = lambda siret: barrier.wait() and []
+    client.get_representants_legaux_pour_etablissement.side_effect = lambda siret: barrier.wait() and []
+
+    with patch.object(data_subventions, "data_subventions_client", client):
+        info = data_subventions.subvention(SIRET)
+        cached = data_subventions.subvention(SIRET)
+
+    assert cached is info
+    client.get_subventions_pour_etablissement.assert_called_once_with(SIRET)
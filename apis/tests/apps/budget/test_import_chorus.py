@@ -1,15 +1,21 @@
 """Tests unitaires du TUS (Tus Upload Server) pour l'import Chorus avec priorité sur les droits."""
 
+import hashlib
 import os
 import tempfile
 from types import SimpleNamespace
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 import pytest
 
 from apis.apps.budget.routers.import_chorus import initialize_session, pre_create_hook
-from apis.apps.budget.services.import_chorus import initialize_upload_session, validate_csv_file_content
+from apis.apps.budget.services.import_chorus import (
+    ingest_uploaded_file,
+    initialize_upload_session,
+    validate_csv_file_content,
+)
 from models.exceptions import BadRequestError
+from services.antivirus import VirusFoundError
 from services.audits.upload_session import InitializeSessionRequest
 
 
@@ -299,3 +305,59 @@ class TestInitializeSessionService:
         finally:
             # Cleanup
             os.unlink(temp_path)
+
+
+class TestIngestUploadedFile:
+    """Tests de l'ingestion en une lecture : validation CSV, hash et scan antivirus."""
+
+    @pytest.fixture
+    def av_service(self):
+        av_service = MagicMock()
+        with patch("apis.apps.budget.services.import_chorus._get_antivirus_service", return_value=av_service):
+            yield av_service
+
+    @pytest.fixture
+    def csv_file(self, tmp_path):
+        content = "col1;col2\n" + "".join(f"val{i};é{i}\n" for i in range(10_000))
+        file_path = tmp_path / "upload.csv"
+        file_path.write_text(content, encoding="utf-8")
+        return file_path
+
+    def test_ingest_feeds_hash_and_antivirus_in_one_pass(self, av_service, csv_file):
+        with patch("apis.apps.budget.services.import_chorus.INGEST_BLOCK_SIZE", 1024):
+            file_hash = ingest_uploaded_file(str(csv_file))
+
+        content = csv_file.read_bytes()
+        assert file_hash == hashlib.sha256(content).hexdigest()
+
+        av_stream = av_service.instream.return_value.__enter__.return_value
+        sent = b"".join(call.args[0] for call in av_stream.send.call_args_list)
+        assert sent == content
+        assert av_stream.send.call_count > 1
+        av_stream.verdict.assert_called_once()
+
+    def test_ingest_rejects_binary_file_without_verdict(self, av_service, tmp_path):
+        file_path = tmp_path / "image.png"
+        file_path.write_bytes(b"\x89PNG\r\n\x1a\nSome PNG content")
+
+        with pytest.raises(BadRequestError) as exc_info:
+            ingest_uploaded_file(str(file_path))
+
+        assert exc_info.value.api_message == "Le fichier n'est pas un CSV"
+        av_service.instream.return_value.__enter__.return_value.verdict.assert_not_called()
+
+    def test_ingest_deletes_infected_file(self, av_service, csv_file):
+        av_stream = av_service.instream.return_value.__enter__.return_value
+        av_stream.verdict.side_effect = VirusFoundError(virus_name="Eicar-Signature")
+
+        with pytest.raises(BadRequestError) as exc_info:
+            ingest_uploaded_file(str(csv_file))
+
+        assert "Virus found" in exc_info.value.api_message
+        assert not csv_file.exists()
+
+    def test_ingest_without_antivirus(self, csv_file):
+        with patch("apis.apps.budget.services.import_chorus._get_antivirus_service", return_value=None):
+            file_hash = ingest_uploaded_file(str(csv_file))
+
+        assert file_hash == hashlib.sha256(csv_file.read_bytes()).hexdigest()
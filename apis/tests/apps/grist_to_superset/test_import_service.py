@@ -0,0 +1,75 @@
+import io
+from unittest.mock import MagicMock
+
+from models.value_objects.to_superset import ColumnIn, ColumnType
+from apis.apps.grist_to_superset.services.import_data_from_grist import ImportService
+
+COLUMNS = [
+    ColumnIn(id="code", type=ColumnType.TEXT, is_index=True),
+    ColumnIn(id="montant", type=ColumnType.NUMERIC, is_index=False),
+    ColumnIn(id="date", type=ColumnType.DATE, is_index=False),
+]
+
+CSV_CONTENT = """code,montant,ignoree,date
+00123,10.5,x,1704067200
+00456,,y,
+00789,3,z,1704153600
+"""
+
+
+def _service():
+    session = MagicMock()
+    copy = session.connection.return_value.connection.cursor.return_value.copy.return_value.__enter__.return_value
+    return ImportService(session), session, copy
+
+
+def _executed_sql(session) -> list[str]:
+    return [str(call.args[0]) for call in session.execute.call_args_list]
+
+
+def test_import_csv_copies_chunks_into_staging_table():
+    service, session, copy = _service()
+
+    rows = service.import_csv("ma_table", io.BytesIO(CSV_CONTENT.encode()), COLUMNS, "grist_data", chunksize=2)
+
+    assert rows == 3
+    assert copy.write.call_count == 2
+    copy_sql = session.connection.return_value.connection.cursor.return_value.copy.call_args.args[0]
+    assert copy_sql == 'COPY grist_data."ma_table__new" ("code", "montant", "date") FROM STDIN WITH (FORMAT csv)'
+    payload = "".join(call.args[0] for call in copy.write.call_args_list)
+    # Les colonnes texte gardent leur valeur d'origine, les valeurs manquantes sont NULL
+    assert payload == "00123,10.5,2024-01-01\n00456,,\n00789,3,2024-01-02\n"
+
+
+def test_import_csv_builds_primary_key_after_load_and_swaps_by_rename():
+    service, session, copy = _service()
+    session.execute.return_value.all.return_value = [("grist_data.ma_vue", " SELECT code FROM grist_data.ma_table;")]
+
+    service.import_csv("ma_table", io.BytesIO(CSV_CONTENT.encode()), COLUMNS, "grist_data")
+
+    executed = _executed_sql(session)
+    create = next(sql for sql in executed if "CREATE TABLE" in sql)
+    assert "PRIMARY KEY" not in create
+    add_pk = executed.index(
+        'ALTER TABLE grist_data."ma_table__new" ADD CONSTRAINT "ma_table__new_pkey" PRIMARY KEY ("code")'
+    )
+    rename_old = executed.index('ALTER TABLE IF EXISTS grist_data."ma_table" RENAME TO "ma_table__old"')
+    rename_new = executed.index('ALTER TABLE IF EXISTS grist_data."ma_table__new" RENAME TO "ma_table"')
+    drop_old = len(executed) - 1
+    assert executed[drop_old] == 'DROP TABLE IF EXISTS grist_data."ma_table__old" CASCADE'
+    assert add_pk < rename_old < rename_new < drop_old
+    assert 'ALTER INDEX IF EXISTS grist_data."ma_table__new_pkey" RENAME TO "ma_table_pkey"' in executed
+    # La vue dépendante est recréée sur la nouvelle table
+    session.connection.return_value.exec_driver_sql.assert_called_once_with(
+        "CREATE OR REPLACE VIEW grist_data.ma_vue AS  SELECT code FROM grist_data.ma_table;"
+    )
+
+
+def test_staging_name_never_collides_with_long_table_name():
+    service, session, _ = _service()
+    table_id = "t" * 63
+
+    service.import_table(table_id, MagicMock(empty=True), COLUMNS, "grist_data")
+
+    create = next(sql for sql in _executed_sql(session) if "CREATE TABLE" in sql)
+    assert f'"{"t" * 58}__new"' in create
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from apis.apps.qpv.services.get_data import _compute_dashboard_data, _grouping_id_of
+
+
+def _row(grouping_id, total, theme=None, type_porteur=None, financeur=None, annee=None, nb_actions=0, nb_porteurs=0):
+    return SimpleNamespace(
+        grouping_id=grouping_id,
+        theme=theme,
+        type_porteur=type_porteur,
+        financeur=financeur,
+        annee=annee,
+        total=total,
+        nb_actions=nb_actions,
+        nb_porteurs=nb_porteurs,
+    )
+
+
+def test_grouping_ids_are_distinct():
+    ids = [_grouping_id_of(d) for d in (None, "theme", "type_porteur", "financeur", "annee")]
+    assert len(set(ids)) == len(ids)
+
+
+def test_dashboard_dispatches_grouping_sets_rows():
+    rows = [
+        _row(_grouping_id_of("annee"), 30.0, annee=2024),
+        _row(_grouping_id_of(None), 100.0, nb_actions=4, nb_porteurs=2),
+        _row(_grouping_id_of("theme"), 100.0, theme="Ville"),
+        _row(_grouping_id_of("type_porteur"), 60.0, type_porteur="Association"),
+        _row(_grouping_id_of("type_porteur"), 40.0, type_porteur="Commune"),
+        _row(_grouping_id_of("financeur"), 100.0, financeur="Préfecture"),
+        _row(_grouping_id_of("annee"), 70.0, annee=2023),
+    ]
+    builder = MagicMock()
+    builder.with_selection.return_value._session.execute.return_value.all.return_value = rows
+
+    with patch("apis.apps.qpv.services.get_data._get_query_builder", return_value=builder):
+        data = _compute_dashboard_data(MagicMock(), MagicMock())
+
+    # Une seule requête pour tout le tableau de bord
+    builder.with_selection.return_value._session.execute.assert_called_once()
+    assert (data.total_financements, data.total_actions, data.total_porteurs) == (100.0, 4, 2)
+    assert data.pie_chart_themes.labels == ["Ville"]
+    assert data.pie_chart_types_porteurs.labels == ["Association", "Commune"]
+    assert data.pie_chart_types_porteurs.values == [60.0, 40.0]
+    assert data.bar_chart_financeurs.values == [100.0]
+    assert data.line_chart_annees.labels == ["2023", "2024"]
+    assert data.line_chart_annees.values == [70.0, 30.0]
+
+
+def test_dashboard_annee_non_renseignee_en_dernier():
+    rows = [
+        _row(_grouping_id_of("annee"), 5.0, annee=None),
+        _row(_grouping_id_of("annee"), 30.0, annee=2024),
+        _row(_grouping_id_of("annee"), 70.0, annee=2023),
+    ]
+    builder = MagicMock()
+    builder.with_selection.return_value._session.execute.return_value.all.return_value = rows
+
+    with patch("apis.apps.qpv.services.get_data._get_query_builder", return_value=builder):
+        data = _compute_dashboard_data(MagicMock(), MagicMock())
+
+    assert data.line_chart_annees.labels == ["2023", "2024", "None"]
+    assert data.line_chart_annees.values == [70.0, 30.0, 5.0]
@@ -0,0 +1,94 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from authlib.jose import JsonWebKey, KeySet, jwt
+
+from apis.config.Config import KeycloakOpenIdConfig
+from apis.security.keycloak_token_validator import KeycloakTokenValidator
+from apis.shared.exceptions import InvalidTokenError
+
+ISSUER = "http://keycloak/realms/test"
+
+
+def _validator(**kwargs) -> KeycloakTokenValidator:
+    keycloak_openid = KeycloakOpenIdConfig(
+        url="http://keycloak", realm="test", client_id="client", secret_key="secret", **kwargs
+    )
+    return KeycloakTokenValidator(SimpleNamespace(keycloak_openid=keycloak_openid))
+
+
+def _key(kid: str):
+    return JsonWebKey.generate_key("RSA", 2048, options={"kid": kid}, is_private=True)
+
+
+def _key_set(*keys) -> KeySet:
+    return JsonWebKey.import_key_set({"keys": [key.as_dict(is_private=False) for key in keys]})
+
+
+def _token(key, exp_in: int = 300) -> str:
+    payload = {"iss": ISSUER, "exp": int(time.time()) + exp_in, "email": "test@example.com"}
+    return jwt.encode({"alg": "RS256", "kid": key.kid}, payload, key).decode()
+
+
+@pytest.mark.asyncio
+async def test_verified_token_is_served_from_cache():
+    key = _key("k1")
+    validator = _validator()
+    token = _token(key)
+
+    with (
+        patch.object(validator, "_fetch_jwk_set", return_value=_key_set(key)) as fetch,
+        patch.object(validator, "_decode", wraps=validator._decode) as decode,
+    ):
+        first = await validator.validate_token(token)
+        second = await validator.validate_token(token)
+
+    assert first.email == second.email == "test@example.com"
+    fetch.assert_called_once()
+    decode.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_token_cache_expires_at_token_exp():
+    key = _key("k1")
+    validator = _validator()
+    # Expiré mais accepté grâce à la tolérance de validation
+    token = _token(key, exp_in=-10)
+
+    with (
+        patch.object(validator, "_fetch_jwk_set", return_value=_key_set(key)),
+        patch.object(validator, "_decode", wraps=validator._decode) as decode,
+    ):
+        await validator.validate_token(token)
+        await validator.validate_token(token)
+
+    assert decode.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_refetches_jwks():
+    old_key, new_key = _key("k1"), _key("k2")
+    validator = _validator(jwks_min_refetch_interval=0)
+
+    with patch.object(validator, "_fetch_jwk_set", side_effect=[_key_set(old_key), _key_set(old_key, new_key)]):
+        await validator.validate_token(_token(old_key))
+        # Rotation des clés côté keycloak
+        user = await validator.validate_token(_token(new_key))
+
+    assert user.email == "test@example.com"
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_refetch_is_rate_limited():
+    old_key, new_key = _key("k1"), _key("k2")
+    validator = _validator(jwks_min_refetch_interval=3600)
+
+    with patch.object(validator, "_fetch_jwk_set", return_value=_key_set(old_key)) as fetch:
+        await validator.validate_token(_token(old_key))
+        for _ in range(3):
+            with pytest.raises(InvalidTokenError):
+                await validator.validate_token(_token(new_key))
+
+    fetch.assert_called_once()
@@ -67,3 +67,10 @@ def test_api_success_pagination():
     #
     serialized = model.model_dump()
     assert serialized["pagination"] == {"current_page": 0, "has_next": True}
+
+
+def test_api_success_pagination_next_cursor():
+    model = APISuccess(code=200, current_page=1, has_next=True, next_cursor="abc")
+
+    serialized = model.model_dump()
+    assert serialized["pagination"] == {"current_page": 1, "has_next": True, "next_cursor": "abc"}
@@ -0,0 +1,31 @@
+import sqlite3
+
+from prometheus_client import REGISTRY
+from sqlalchemy.pool import QueuePool
+
+from apis.config.current import get_config
+from apis.database import _engine_options, _instrumented_pool_class
+
+
+def test_engine_options_from_config():
+    pool_config = get_config().database_pools.main
+
+    options = _engine_options("main", QueuePool, "sync")
+
+    assert options["pool_size"] == pool_config.pool_size
+    assert options["max_overflow"] == pool_config.max_overflow
+    assert options["pool_recycle"] == pool_config.pool_recycle
+    assert options["pool_pre_ping"] == pool_config.pool_pre_ping
+    assert options["connect_args"] == {"prepare_threshold": pool_config.prepare_threshold}
+    assert issubclass(options["poolclass"], QueuePool)
+
+
+def test_instrumented_pool_observes_checkout_wait():
+    labels = {"engine": "settings", "mode": "test"}
+    before = REGISTRY.get_sample_value("apis_db_pool_checkout_wait_seconds_count", labels) or 0
+    pool = _instrumented_pool_class(QueuePool, "settings", "test")(lambda: sqlite3.connect(":memory:"), pool_size=1)
+
+    pool.connect().close()
+    pool.connect().close()
+
+    assert REGISTRY.get_sample_value("apis_db_pool_checkout_wait_seconds_count", labels) == before + 2
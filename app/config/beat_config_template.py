@@ -19,4 +19,16 @@ CELERYBEAT_SCHEDULE = {
         "schedule": crontab(hour=0, minute=0, day_of_month=1),
         "args": ("https://www.data.gouv.fr/api/1/datasets/r/8b6f422b-cbdf-459a-9a16-d6be4b92d91a",),
     },
+    # Le mode incrémental ne réévalue pas les lignes dont seuls les référentiels ont changé
+    # (communes PVD / ACV, programmes, thèmes): une passe complète quotidienne les couvre
+    "tags-auto-complet": {
+        "task": "update_all_tags",
+        "schedule": crontab(hour=3, minute=30),
+        "kwargs": {"incremental": False},
+    },
+    "tags-auto-incremental": {
+        "task": "update_all_tags",
+        "schedule": crontab(minute=0),
+        "kwargs": {"incremental": True},
+    },
 }
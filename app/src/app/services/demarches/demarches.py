@@ -1,12 +1,13 @@
 import json
 import logging
 import string
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List
+from typing import Iterator, List
 
 from flask import current_app
-from sqlalchemy import update, exc
+from sqlalchemy import delete, update, exc
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app import db
 from app.clients.demarche_simplifie import get_or_make_api_demarche_simplifie
@@ -19,6 +20,9 @@ from models.entities.demarches.ValeurDonnee import ValeurDonnee
 
 logger = logging.getLogger(__name__)
 
+SYNC_OVERLAP = timedelta(minutes=5)
+"""Recouvrement de la fenêtre de synchronisation incrémentale (dérive d'horloge avec l'API DS)"""
+
 
 class DemarcheExistsException(Exception):
     def __init__(self):
@@ -111,6 +115,24 @@ class DemarcheService:
         stmt = db.select(Demarche).where(Demarche.date_fermeture == None, Demarche.token != None)  # noqa: E711
         return db.session.execute(stmt).scalars().all()
 
+    @staticmethod
+    def get_demarche_values(demarche_dict: dict) -> dict:
+        """
+        Colonnes d'une Demarche à partir de la réponse de l'API DS
+        :param demarche_dict: Réponse de la requête getDemarche
+        :return: dict
+        """
+        demarche = demarche_dict["data"]["demarche"]
+        return {
+            "title": demarche["title"],
+            "state": demarche["state"],
+            "centre_couts": demarche["chorusConfiguration"]["centreDeCout"],
+            "domaine_fonctionnel": demarche["chorusConfiguration"]["domaineFonctionnel"],
+            "referentiel_programmation": demarche["chorusConfiguration"]["referentielDeProgrammation"],
+            "date_creation": demarche["dateCreation"],
+            "date_fermeture": demarche["dateFermeture"],
+        }
+
     @staticmethod
     def save(demarche_number: int, demarche_dict: dict, token_id: int) -> Demarche:
         """
@@ -122,15 +144,7 @@ class DemarcheService:
         try:
             demarche_data = {
                 "number": demarche_number,
-                "title": demarche_dict["data"]["demarche"]["title"],
-                "state": demarche_dict["data"]["demarche"]["state"],
-                "centre_couts": demarche_dict["data"]["demarche"]["chorusConfiguration"]["centreDeCout"],
-                "domaine_fonctionnel": demarche_dict["data"]["demarche"]["chorusConfiguration"]["domaineFonctionnel"],
-                "referentiel_programmation": demarche_dict["data"]["demarche"]["chorusConfiguration"][
-                    "referentielDeProgrammation"
-                ],
-                "date_creation": demarche_dict["data"]["demarche"]["dateCreation"],
-                "date_fermeture": demarche_dict["data"]["demarche"]["dateFermeture"],
+                **DemarcheService.get_demarche_values(demarche_dict),
                 "date_import": datetime.now(),
                 "token_id": token_id,
             }
@@ -194,56 +208,118 @@ class DemarcheService:
             DemarcheService.delete(demarche)
             logging.info("[API DEMARCHES] La démarche existait déjà en BDD, maintenant supprimée pour réintégration")
 
-        demarche_dict = DemarcheService.query_demarche(uuid_utilisateur, token_id, demarche_number)
-
-        # Sauvegarde de la démarche
-        demarche: Demarche = DemarcheService.save(demarche_number, demarche_dict, token_id)
-        logging.info(f"[API DEMARCHES] Sauvegarde de la démarche {demarche_number}")
-
-        # Sauvegarde des dossiers de la démarche
-        DemarcheService.save_dossiers(
-            demarche,
-            demarche_dict["data"]["demarche"]["dossiers"]["nodes"],
-            demarche_dict["data"]["demarche"]["revisions"],
-        )
+        demarche = None
+        for page in DemarcheService.query_demarche_pages(uuid_utilisateur, token_id, demarche_number):
+            if demarche is None:
+                # Sauvegarde de la démarche
+                demarche = DemarcheService.save(demarche_number, page, token_id)
+                logging.info(f"[API DEMARCHES] Sauvegarde de la démarche {demarche_number}")
+
+            # Sauvegarde des dossiers de la démarche, au fil des pages
+            DemarcheService.save_dossiers(
+                demarche,
+                page["data"]["demarche"]["dossiers"]["nodes"],
+                page["data"]["demarche"]["revisions"],
+            )
         logging.info("[API DEMARCHES] Sauvegarde des dossiers en BDD")
         commit_session()
         return demarche
 
     @staticmethod
-    def query_demarche(uuid_utilisateur: string, token_id: int, demarche_number: int) -> dict:
+    def synchroniser_demarche(uuid_utilisateur: string, token_id: int, demarche: Demarche) -> tuple[set[int], set[int]]:
         """
-        Requête de la démarche via API DS et de tous ses dossiers
+        Synchronisation incrémentale d'une démarche déjà intégrée: seuls les dossiers modifiés
+        depuis le dernier import sont récupérés (filtre updatedSince de l'API DS) et mis à jour, page par page.
+        :param uuid_utilisateur: ID user Keycloak
+        :param token_id: Token DS pour rappatrier la démarche
+        :param demarche: Démarche à synchroniser
+        :return: numéros des dossiers acceptés modifiés, numéros des dossiers qui ne sont plus acceptés
+        """
+        date_synchronisation = datetime.now()
+        # date_import est une date locale naïve, l'API DS attend une date ISO8601 avec fuseau
+        updated_since = (demarche.date_import - SYNC_OVERLAP).astimezone().isoformat()
+
+        dossiers_modifies: set[int] = set()
+        dossiers_retires: set[int] = set()
+        demarche_values = None
+        for page in DemarcheService.query_demarche_pages(
+            uuid_utilisateur, token_id, demarche.number, state=None, updated_since=updated_since
+        ):
+            if demarche_values is None:
+                demarche_values = DemarcheService.get_demarche_values(page)
+
+            dossiers_dict = page["data"]["demarche"]["dossiers"]["nodes"]
+            acceptes = [d for d in dossiers_dict if d["state"] == "accepte"]
+            dossiers_retires.update(d["number"] for d in dossiers_dict if d["state"] != "accepte")
+            dossiers_modifies.update(d["number"] for d in acceptes)
+
+            DemarcheService.upsert_dossiers(demarche, acceptes, page["data"]["demarche"]["revisions"])
+            commit_session()
+
+        if demarche_values is not None:
+            stmt = (
+                update(Demarche)
+                .where(Demarche.number == demarche.number)
+                .values(**demarche_values, date_import=date_synchronisation)
+            )
+            db.session.execute(stmt)
+            commit_session()
+
+        logging.info(
+            f"[API DEMARCHES] Démarche {demarche.number} synchronisée : "
+            f"{len(dossiers_modifies)} dossiers modifiés, {len(dossiers_retires)} dossiers non acceptés"
+        )
+        return dossiers_modifies, dossiers_retires
+
+    @staticmethod
+    def query_demarche_pages(
+        uuid_utilisateur: string,
+        token_id: int,
+        demarche_number: int,
+        state: str | None = "accepte",
+        updated_since: str | None = None,
+    ) -> Iterator[dict]:
+        """
+        Requête de la démarche via API DS, une page de dossiers à la fois
         :param uuid_utilisateur: ID user Keycloak
         :param token_id: Token DS pour rappatrier la démarche
         :param demarche_number: ID de la démmarche à intégrer
-        :return: dict
+        :param state: Statut des dossiers à récupérer (None pour tous les statuts)
+        :param updated_since: Ne récupère que les dossiers modifiés depuis cette date (ISO8601)
+        :return: Iterator[dict]
         """
         # Récupération des données de la démarche via l'API Démarches Simplifiées
         query = DemarcheService.get_query_from_file("get_demarche.gql")
         token = TokenService.find_by_uuid_utilisateur_and_token_id(uuid_utilisateur, token_id).get_token(
             current_app.config["FERNET_SECRET_KEY"]
         )
-        demarche_dict = DemarcheService.query(token, query, demarche_number, None)
-
-        page_info_dict = demarche_dict["data"]["demarche"]["dossiers"]["pageInfo"]
-        while page_info_dict["hasNextPage"] is True:
-            new_demarche_dict = DemarcheService.query(token, query, demarche_number, page_info_dict["endCursor"])
-            dossiers: list[dict] = demarche_dict["data"]["demarche"]["dossiers"]["nodes"]
-            dossiers += new_demarche_dict["data"]["demarche"]["dossiers"]["nodes"]
-            page_info_dict = new_demarche_dict["data"]["demarche"]["dossiers"]["pageInfo"]
 
-        logging.info("[API DEMARCHES] Récupération de la Démarche")
-        return demarche_dict
+        after = None
+        while True:
+            page = DemarcheService.query(token, query, demarche_number, after, state, updated_since)
+            yield page
+            page_info_dict = page["data"]["demarche"]["dossiers"]["pageInfo"]
+            if page_info_dict["hasNextPage"] is not True:
+                return
+            after = page_info_dict["endCursor"]
 
     @staticmethod
-    def query(token: string, query: string, demarche_number: int, after: string) -> dict:
+    def query(
+        token: string,
+        query: string,
+        demarche_number: int,
+        after: string,
+        state: str | None = "accepte",
+        updated_since: str | None = None,
+    ) -> dict:
         """
         Requête de la démarche via API DS et de tous ses dossiers
         :param token: Token DS pour rappatrier la démarche
         :param query: Requête GraphQL
         :param demarche_number: ID de la démmarche à intégrer
         :param after: ID de la démmarche à intégrer
+        :param state: Statut des dossiers à récupérer (None pour tous les statuts)
+        :param updated_since: Ne récupère que les dossiers modifiés depuis cette date (ISO8601)
         :return: dict
         """
         data = {
@@ -253,34 +329,48 @@ class DemarcheService:
                 "demarcheNumber": demarche_number,
                 "includeRevision": True,
                 "after": after if after is not None else "",
+                "state": state,
+                "updatedSince": updated_since,
             },
         }
         return get_or_make_api_demarche_simplifie(token).do_post(json.dumps(data))
 
     @staticmethod
-    def save_dossiers(demarche: Demarche, dossiers_dict: list[dict], revisions_dict: list[dict]) -> None:
+    def get_dossiers_and_valeurs(
+        demarche: Demarche, dossiers_dict: list[dict], revisions_dict: list[dict]
+    ) -> tuple[list[dict], list[dict]]:
         """
-        Intégration des dossiers d'une démarche
+        Lignes à insérer pour les dossiers d'une démarche et les valeurs de leurs champs
         :param demarche: Démarche associée aux dossiers
         :param dossiers_dict: Liste des dossiers
         :param revisions_dict: Liste des révisions
-        :return: none
+        :return: dossiers, valeurs
         """
-        # Insertion des dossiers et des valeurs des champs du dossier
         dossiers: list[dict] = []
         valeurs: list[dict] = []
         for dossier_dict in dossiers_dict:
             donnees: dict = DossierService.get_donnees(dossier_dict, demarche.number, revisions_dict)
 
-            # Sauvegarde du dossier
             dossier_dict_db: dict = DossierService.create_dossier(demarche.number, dossier_dict)
             dossiers.append(dossier_dict_db)
 
-            for champ in dossier_dict["champs"]:
-                valeurs.append(ValeurService.create_valeur_donnee(dossier_dict_db["number"], donnees, champ))
+            for champ in dossier_dict["champs"] + dossier_dict["annotations"]:
+                valeur = ValeurService.create_valeur_donnee(dossier_dict_db["number"], donnees, champ)
+                if valeur is not None:
+                    valeurs.append(valeur)
+        return dossiers, valeurs
 
-            for annot in dossier_dict["annotations"]:
-                valeurs.append(ValeurService.create_valeur_donnee(dossier_dict_db["number"], donnees, annot))
+    @staticmethod
+    def save_dossiers(demarche: Demarche, dossiers_dict: list[dict], revisions_dict: list[dict]) -> None:
+        """
+        Intégration des dossiers d'une démarche
+        :param demarche: Démarche associée aux dossiers
+        :param dossiers_dict: Liste des dossiers
+        :param revisions_dict: Liste des révisions
+        :return: none
+        """
+        # Insertion des dossiers et des valeurs des champs du dossier
+        dossiers, valeurs = DemarcheService.get_dossiers_and_valeurs(demarche, dossiers_dict, revisions_dict)
 
         if len(dossiers) > 0:
             db.session.bulk_insert_mappings(Dossier, dossiers, render_nulls=True)
@@ -288,6 +378,44 @@ class DemarcheService:
         if len(valeurs) > 0:
             db.session.bulk_insert_mappings(ValeurDonnee, valeurs, render_nulls=True)
 
+    @staticmethod
+    def upsert_dossiers(demarche: Demarche, dossiers_dict: list[dict], revisions_dict: list[dict]) -> None:
+        """
+        Mise à jour des dossiers d'une démarche: les dossiers sont insérés ou mis à jour,
+        les valeurs de leurs champs remplacées
+        :param demarche: Démarche associée aux dossiers
+        :param dossiers_dict: Liste des dossiers
+        :param revisions_dict: Liste des révisions
+        :return: none
+        """
+        dossiers, valeurs = DemarcheService.get_dossiers_and_valeurs(demarche, dossiers_dict, revisions_dict)
+        if len(dossiers) == 0:
+            return
+
+        stmt = pg_insert(Dossier).values(dossiers)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Dossier.number],
+            set_={key: stmt.excluded[key] for key in dossiers[0] if key != "number"},
+        )
+        db.session.execute(stmt)
+
+        numbers = [dossier["number"] for dossier in dossiers]
+        db.session.execute(delete(ValeurDonnee).where(ValeurDonnee.dossier_number.in_(numbers)))
+        if len(valeurs) > 0:
+            db.session.bulk_insert_mappings(ValeurDonnee, valeurs, render_nulls=True)
+
+    @staticmethod
+    def delete_dossiers(numbers: set[int]) -> None:
+        """
+        Supprime des dossiers (et en cascade leurs valeurs et réconciliations)
+        :param numbers: Numéros des dossiers à supprimer
+        :return: None
+        """
+        if len(numbers) == 0:
+            return
+        db.session.execute(delete(Dossier).where(Dossier.number.in_(numbers)))
+        db.session.commit()
+
     @staticmethod
     def get_query_from_file(query_filename: str):
         p = Path(__file__).resolve().parent / "queries" / query_filename
@@ -13,8 +13,10 @@ class DossierService:
         return db.session.execute(stmt).scalar_one_or_none()
 
     @staticmethod
-    def find_by_demarche(demarche_number: int, statut: str) -> list[Dossier]:
+    def find_by_demarche(demarche_number: int, statut: str, numbers: set[int] | None = None) -> list[Dossier]:
         stmt = db.select(Dossier).where(Dossier.demarche_number == demarche_number, Dossier.state == statut)
+        if numbers is not None:
+            stmt = stmt.where(Dossier.number.in_(numbers))
         return db.session.execute(stmt).all()
 
     @staticmethod
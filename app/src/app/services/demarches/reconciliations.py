@@ -25,12 +25,14 @@ logger = logging.getLogger(__name__)
 
 class ReconciliationService:
     @staticmethod
-    def find_by_demarche_number(demarche_number: int) -> list[Reconciliation]:
+    def find_by_demarche_number(demarche_number: int, dossier_numbers: set[int] | None = None) -> list[Reconciliation]:
         stmt = (
             db.select(Reconciliation)
             .join(Dossier, Dossier.number == Reconciliation.dossier_number)
             .where(Dossier.demarche_number == demarche_number)
         )
+        if dossier_numbers is not None:
+            stmt = stmt.where(Reconciliation.dossier_number.in_(dossier_numbers))
         return db.session.execute(stmt).scalars().all()
 
     @staticmethod
@@ -45,8 +47,8 @@ class ReconciliationService:
         return reconciliation
 
     @staticmethod
-    def clear_reconciliations(demarche_number: int):
-        reconciliations = ReconciliationService.find_by_demarche_number(demarche_number)
+    def clear_reconciliations(demarche_number: int, dossier_numbers: set[int] | None = None):
+        reconciliations = ReconciliationService.find_by_demarche_number(demarche_number, dossier_numbers)
         ReconciliationService.clear_previous_tags_reconcilie_ds(reconciliations)
 
         id_reconciliations = [reconciliation.id for reconciliation in reconciliations]
@@ -54,17 +56,20 @@ class ReconciliationService:
         db.session.commit()
 
     @staticmethod
-    def do_reconciliation(demarche_number: int, champs_reconciliation: dict, cadre: dict):
+    def do_reconciliation(
+        demarche_number: int, champs_reconciliation: dict, cadre: dict, dossier_numbers: set[int] | None = None
+    ):
         """
         Effectue la réconciliation entre les dossiers de la démarche et les lignes chorus
         :param: Numéro de la démarche
         :param: Paramètres pour la reconciliation
+        :param: Numéros des dossiers à réconcilier (par défaut tous les dossiers de la démarche)
         """
-        ReconciliationService.clear_reconciliations(demarche_number)
+        ReconciliationService.clear_reconciliations(demarche_number, dossier_numbers)
 
         DemarcheService.update_reconciliation(demarche_number, champs_reconciliation)
 
-        dossiers = DossierService.find_by_demarche(demarche_number, "accepte")
+        dossiers = DossierService.find_by_demarche(demarche_number, "accepte", dossier_numbers)
         date_reconciliation = datetime.now()
         reconciliations = []
         for dossier_row in dossiers:
@@ -1,15 +1,17 @@
 import logging
 import dataclasses
-from more_itertools import ichunked
+import time
+from datetime import datetime
 from app import db
-from models.entities.common.Tags import TagAssociation, Tags
+from models.entities.common.Tags import TagAssociation
 from models.entities.financial.FinancialData import FinancialData
 from models.entities.financial.FinancialAe import FinancialAe as Ae
 from models.entities.financial.FinancialCp import FinancialCp as Cp
 from models.entities.financial.Ademe import Ademe
 from models.value_objects.tags import TagVO
 from models.entities.common.Tags import Tags as DbTag
-from sqlalchemy import Column, delete, and_, select, insert, join
+from sqlalchemy import Column, ColumnElement, Integer, case, delete, and_, exists, func, literal, select, true
+from sqlalchemy.dialects.postgresql import array, insert as pg_insert
 
 logger = logging.getLogger(__name__)
 
@@ -62,15 +64,105 @@ def _select_financial_entity_ids_having_tags(tag_id: int, financial_entity_type:
     return stmt
 
 
-def _new_tag_association(financial_entity_type: type[FinancialData], id: int, tag: Tags):
-    """Crée une association de tag pour une entité de donnée financière"""
-    association = TagAssociation()
-    association.tag_id = tag.id
+@dataclasses.dataclass
+class TagRule:
+    """
+    Règle d'application automatique d'un tag: une condition par type d'entité financière éligible
+    """
+
+    tag: DbTag
+    conditions: dict[type[FinancialData], ColumnElement[bool]]
+
+    def restricted_to(self, financial_entity_type: type[FinancialData], whereclause: ColumnElement[bool]) -> "TagRule":
+        """Retourne la règle restreinte aux entités d'un type qui vérifient whereclause"""
+        conditions = {}
+        if financial_entity_type in self.conditions:
+            conditions[financial_entity_type] = self.conditions[financial_entity_type] & whereclause
+        return TagRule(self.tag, conditions)
+
+
+@dataclasses.dataclass
+class ApplyTagRulesForAutomation:
+    """
+    Applique un ensemble de règles de tags auto en une passe SQL par type d'entité financière.
+
+    Chaque ligne de la table est évaluée une seule fois contre toutes les règles, les associations manquantes
+    sont insérées par un `INSERT ... SELECT ... ON CONFLICT DO NOTHING` sans remonter d'ids côté python.
+    """
+
+    rules: list[TagRule]
+
+    def apply(self, since: datetime | None = None) -> dict[int, int]:
+        """
+        Applique les règles et commit.
+        :param since: si renseigné, seules les entités modifiées depuis cette date sont évaluées (mode incrémental)
+        :return: le nombre d'associations créées par id de tag
+        """
+        created: dict[int, int] = {rule.tag.id: 0 for rule in self.rules}  # type: ignore
+
+        entity_types = [Ae, Cp, Ademe]
+        for entity_type in entity_types:
+            rules = [rule for rule in self.rules if entity_type in rule.conditions]
+            if len(rules) == 0:
+                continue
+
+            # Toutes les règles sont évaluées par la même requête, seule la durée de la passe est mesurable
+            start = time.perf_counter()
+            counts = self._apply_entity(entity_type, rules, since)
+            elapsed = time.perf_counter() - start
+
+            for rule in rules:
+                nb = counts.get(rule.tag.id, 0)  # type: ignore
+                created[rule.tag.id] += nb  # type: ignore
+                logger.info(f"[TAGS][{rule.tag.type}] {nb} associations créées sur {entity_type.__tablename__}")
+            logger.info(
+                f"[TAGS] Passe {entity_type.__tablename__}: {len(rules)} règles évaluées, "
+                f"{sum(counts.values())} associations créées en {elapsed:.2f}s"
+            )
+
+        db.session.commit()
+        return created
 
-    fk_column = _tag_association_column_corresponding_to_financial_entity_type(financial_entity_type)
-    setattr(association, fk_column.key, id)
+    @staticmethod
+    def _apply_entity(
+        financial_entity_type: type[FinancialData], rules: list[TagRule], since: datetime | None
+    ) -> dict[int, int]:
+        ta_column = _tag_association_column_corresponding_to_financial_entity_type(financial_entity_type)
 
-    return association
+        # Pour chaque ligne, la liste des tags dont la règle est vérifiée
+        candidates = (
+            func.unnest(
+                array(
+                    [case((rule.conditions[financial_entity_type], literal(rule.tag.id))) for rule in rules],
+                    type_=Integer,
+                )
+            )
+            .table_valued("tag_id")
+            .render_derived()
+            .lateral()
+        )
+        already_associated = exists().where(
+            TagAssociation.tag_id == candidates.c.tag_id, ta_column == financial_entity_type.id
+        )
+        stmt_select = (
+            select(financial_entity_type.id, candidates.c.tag_id, true())
+            .select_from(financial_entity_type)
+            .join(candidates, true())
+            .where(candidates.c.tag_id.is_not(None))
+            .where(~already_associated)
+        )
+        if since is not None:
+            stmt_select = stmt_select.where(financial_entity_type.updated_at >= since)
+
+        inserted = (
+            pg_insert(TagAssociation)
+            .from_select([ta_column, TagAssociation.tag_id, TagAssociation.auto_applied], stmt_select)
+            .on_conflict_do_nothing()
+            .returning(TagAssociation.tag_id)
+            .cte("inserted")
+        )
+        stmt = select(inserted.c.tag_id, func.count()).group_by(inserted.c.tag_id)
+        return {tag_id: nb for tag_id, nb in db.session.execute(stmt).all()}
 
 
 @dataclasses.dataclass
@@ -85,50 +177,9 @@ class ApplyTagForAutomation:
         :param entity_type: le type d'entité financière
         :return:
         """
-        # Selectionne les entités financières éligibles au tag auto qui n'ont pas d'association existantes
-        ta_column = _tag_association_column_corresponding_to_financial_entity_type(financial_entity_type)
-        stmt_entity_ids = (
-            db.select(financial_entity_type.id)
-            .select_from(
-                join(
-                    financial_entity_type,
-                    TagAssociation,
-                    (financial_entity_type.id == ta_column) & (TagAssociation.tag_id == self.tag.id),
-                    isouter=True,
-                )
-            )
-            .where(whereclause)
-            .where(TagAssociation.id.is_(None))
-        )
-
-        #
-        entity_ids = [row[0] for row in db.session.execute(stmt_entity_ids).all()]
-
-        if len(entity_ids) == 0:
-            logger.info(f"[TAGS][{self.tag.type}] Aucune nouvelle association détecté")
-            return self
-
-        chunks = ichunked(entity_ids, 10_000)
-        for chunk in chunks:
-            # on vérifie que la liste des lignes à ajouter est non vide. Sinon pas besoin d'insert de nouvelle Assocations
-            insert_to_commit = []
-            for entity_id in chunk:
-                association = _new_tag_association(financial_entity_type, entity_id, self.tag)
-                association.auto_applied = True  # type: ignore
-
-                insert_to_commit.append(
-                    {
-                        TagAssociation.financial_ae.name: association.financial_ae,
-                        TagAssociation.financial_cp.name: association.financial_cp,
-                        TagAssociation.ademe.name: association.ademe,
-                        TagAssociation.tag_id.name: association.tag_id,
-                        TagAssociation.auto_applied.name: association.auto_applied,
-                    }
-                )
-            db.session.execute(insert(TagAssociation), insert_to_commit)
-
-        db.session.commit()
-        logger.info(f"[TAGS][{self.tag.type}] Fin application auto du tags : {len(entity_ids)}")
+        rule = TagRule(self.tag, {financial_entity_type: whereclause})
+        created = ApplyTagRulesForAutomation([rule]).apply()
+        logger.info(f"[TAGS][{self.tag.type}] Fin application auto du tags : {created[self.tag.id]}")  # type: ignore
 
         return self
 
@@ -196,11 +247,19 @@ class ApplyManualTags:
 
         associations = []
         result = db.session.execute(list_ae_stmt)
-        rows = result.fetchall()
-        for row in rows:
-            ae = row[0]
+        ae_ids = [row[0].id for row in result.fetchall()]
+
+        # Les tags auto restent en place: un tag déjà porté par l'AE n'est pas réassocié (index unique)
+        existing_stmt = select(TagAssociation.financial_ae, TagAssociation.tag_id).where(
+            TagAssociation.financial_ae.in_(ae_ids)
+        )
+        existing = set(db.session.execute(existing_stmt).tuples())
+        for ae_id in ae_ids:
             for db_tag in self.tags:
-                association = TagAssociation(financial_ae=ae.id, tag=db_tag, auto_applied=False)
+                if (ae_id, db_tag.id) in existing:
+                    continue
+                existing.add((ae_id, db_tag.id))
+                association = TagAssociation(financial_ae=ae_id, tag=db_tag, auto_applied=False)
                 associations.append(association)
 
         len_associations = len(associations)
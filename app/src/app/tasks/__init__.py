@@ -1,10 +1,10 @@
 import logging
 import pika
-import time
-from functools import wraps
+from functools import partial, wraps
 from tenacity import retry, stop_after_attempt
 
 from app import celeryapp
+from app.utilities.backpressure import QueueBackpressure
 from celery import current_app as celery_current_app
 
 celery = celeryapp.celery
@@ -18,8 +18,12 @@ __all__ = (
 
 MAX_QUEUE_SIZE = "max_queue_size"
 TIMEOUT_QUEUE_RETRY = "timeout_queue_retry"
+QUEUE_DEPTH_REFRESH_INTERVAL = "queue_depth_refresh_interval"
+QUEUE_PUBLISH_RATE = "queue_publish_rate"
 DEFAULT_MAX_QUEUE_SIZE = 100000
 DEFAULT_TIMEOUT_QUEUE_RETRY = 60
+DEFAULT_QUEUE_DEPTH_REFRESH_INTERVAL = 1.0
+QUEUE_FULL_MAX_DELAY = 10
 
 
 def _get_celery_app():
@@ -64,10 +68,31 @@ def lazy_rabbit_connector():
 lazy_channel = lazy_rabbit_connector()
 
 
+_backpressures: dict[tuple[str, int], QueueBackpressure] = {}
+
+
+def _get_backpressure(queue_name: str, max_queue_size: int) -> QueueBackpressure:
+    key = (queue_name, max_queue_size)
+    if key not in _backpressures:
+        _backpressures[key] = QueueBackpressure(
+            queue_name,
+            probe=partial(_get_queue_depth, queue_name),
+            max_queue_size=max_queue_size,
+            refresh_interval=_get_celery_config_value(
+                QUEUE_DEPTH_REFRESH_INTERVAL, DEFAULT_QUEUE_DEPTH_REFRESH_INTERVAL
+            ),
+            rate=_get_celery_config_value(QUEUE_PUBLISH_RATE, None),
+            max_delay=QUEUE_FULL_MAX_DELAY,
+        )
+    return _backpressures[key]
+
+
 def limiter_queue(queue_name: str, max_queue_size: int | None = None, timeout_queue_retry: int | None = None):
     """
-    Vérifie que le nombre de message dans la file "queue_name" de rabbitmq n'atteint pas la taille max
-    Si taille max dépassé, attente de 10 seconde.
+    Vérifie que le nombre de message dans la file "queue_name" de rabbitmq n'atteint pas la taille max.
+    La profondeur de la file est relue au plus toutes les `queue_depth_refresh_interval` secondes et estimée
+    localement entre deux lectures. Si taille max dépassée, attente croissante jusqu'à 10 secondes entre deux lectures,
+    pendant au plus `timeout_queue_retry` périodes de 10 secondes.
     :return:
     """
 
@@ -85,22 +110,12 @@ def limiter_queue(queue_name: str, max_queue_size: int | None = None, timeout_qu
                 current_timeout_queue_retry = timeout_queue_retry
 
             if not celery_conf.task_always_eager:
-                num_retries = 0
-
-                while True:
-                    queue_info = _get_queue(queue_name)
-                    msg_count = queue_info.method.message_count
-
-                    if msg_count <= current_max_queue_size:
-                        break
-                    if num_retries >= current_timeout_queue_retry:
-                        raise LimitQueueException(
-                            f"Timeout exceeded while waiting for the queue '{queue_name}' to be available."
-                        )
-
-                    logger.warning("Limite de la file rabbitmq atteinte. On attend 10 secondes")
-                    time.sleep(10)
-                    num_retries += 1
+                backpressure = _get_backpressure(queue_name, current_max_queue_size)
+                if not backpressure.acquire(timeout=current_timeout_queue_retry * QUEUE_FULL_MAX_DELAY):
+                    logger.warning(f"Limite de la file rabbitmq '{queue_name}' atteinte")
+                    raise LimitQueueException(
+                        f"Timeout exceeded while waiting for the queue '{queue_name}' to be available."
+                    )
 
             return func(*args, **kwargs)
 
@@ -120,6 +135,11 @@ def _get_queue(queue_name: str):
     return queue
 
 
+def _get_queue_depth(queue_name: str) -> int | None:
+    queue = _get_queue(queue_name)
+    return queue.method.message_count if queue is not None else None
+
+
 from .demarches import *  # noqa: E402, F403
 from .files.file_task import *  # noqa: E402, F403
 from .financial.import_financial import *  # noqa: E402, F403
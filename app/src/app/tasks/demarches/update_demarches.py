@@ -21,7 +21,7 @@ def _send_subtask_update_demarche(uuid_user: str, token_id: int, demarche_number
 @celery.task(name="update_demarches", bind=True)
 def update_demarches(self):
     demarches = DemarcheService.find_to_update()
-    LOGGER.info(f"[UPDATE][DEMARCHES] Récupération de {len(demarches)} démarches à réintégrer")
+    LOGGER.info(f"[UPDATE][DEMARCHES] Récupération de {len(demarches)} démarches à synchroniser")
     for d in demarches:
         _send_subtask_update_demarche(d.token.uuid_utilisateur, d.token.id, d.number)
 
@@ -31,13 +31,23 @@ def update_demarche(self, uuid_user: str, token_id: int, demarche_number: int):
     demarche: Demarche = DemarcheService.find(demarche_number)
     rec: dict | None = demarche.reconciliation if demarche.reconciliation else None
     aff: dict | None = demarche.affichage if demarche.affichage else None
-    demarche = DemarcheService.integrer_demarche(uuid_user, token_id, demarche_number)
 
-    if rec is not None:
+    if demarche.date_import is None:
+        # Jamais importée: intégration complète
+        demarche = DemarcheService.integrer_demarche(uuid_user, token_id, demarche_number)
+        dossiers_modifies = None
+    else:
+        dossiers_modifies, dossiers_retires = DemarcheService.synchroniser_demarche(uuid_user, token_id, demarche)
+        # Les dossiers qui ne sont plus acceptés sont retirés, avec leurs réconciliations
+        if dossiers_retires:
+            ReconciliationService.clear_reconciliations(demarche_number, dossiers_retires)
+            DemarcheService.delete_dossiers(dossiers_retires)
+
+    if rec is not None and dossiers_modifies != set():
         champs_reconciliation, cadre = get_reconciliation_form_data(rec)
         LOGGER.info(f"[UPDATE][DEMARCHE] Champs reconciliation : {json.dumps(champs_reconciliation)}")
         LOGGER.info(f"[UPDATE][DEMARCHE] Champs cadre : {json.dumps(cadre)}")
-        ReconciliationService.do_reconciliation(demarche.number, champs_reconciliation, cadre)
+        ReconciliationService.do_reconciliation(demarche.number, champs_reconciliation, cadre, dossiers_modifies)
 
     if aff is not None:
         affichage = get_affichage_form_data(aff)
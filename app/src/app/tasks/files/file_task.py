@@ -1,9 +1,15 @@
 import csv
+import itertools
 import logging
+import math
 import os
 import json
 import shutil
+import tempfile
+import time
 import datetime
+from operator import itemgetter
+from typing import Iterator
 from models.entities.refs.Region import get_code_region_by_code_comp
 import pandas
 from celery import subtask, current_task
@@ -20,6 +26,7 @@ from app.services.financial_data import (
     delete_cp_annee_region,
 )
 from app.tasks.financial import LineImportTechInfo
+from app.utilities.external_sort import DEFAULT_RUN_SIZE, ExternalSorter
 from app.tasks.financial.import_financial import (
     _send_subtask_financial_ae,
     _send_subtask_financial_cp,
@@ -105,44 +112,68 @@ def delayed_inserts(self):
     db.session.commit()
 
 
-def _clean_up_ae_files(fichierAe: str, csv_options: str, pos_col_montant, pos_col_ej, pos_col_n_ej) -> str:
-    df = pandas.read_csv(fichierAe, **json.loads(csv_options))
+def _clean_up_ae_files(
+    fichierAe: str, csv_options: str, pos_col_montant, pos_col_ej, pos_col_n_ej, workdir: str
+) -> str:
+    """
+    Fusionne les lignes AE de même EJ / poste EJ (somme des montants, première valeur non vide pour
+    les autres colonnes) et supprime les lignes dont le montant fusionné est nul.
 
-    # Récupération des noms de colonnes via les positions (0-based)
-    col_name_montant = df.columns[pos_col_montant] if len(df.columns) > pos_col_montant else None
-    col_name_ej = df.columns[pos_col_ej] if len(df.columns) > pos_col_ej else None
-    col_name_n_ej = df.columns[pos_col_n_ej] if len(df.columns) > pos_col_n_ej else None
+    Le fichier est lu par chunk et les lignes passent par le tri externe pour regrouper les postes,
+    la mémoire consommée ne dépend donc pas de la taille du fichier.
+    Toutes les colonnes sont lues en texte pour que les valeurs ne dépendent pas du typage propre à chaque chunk.
+    """
+    max_lines = current_app.config.get("SPLIT_FILE_LINE", DEFAULT_MAX_ROW)
+    sorter = _make_sorter(workdir)
+    columns = None
+    chunks = pandas.read_csv(fichierAe, chunksize=max_lines, **{**json.loads(csv_options), "dtype": str})
+    for df in chunks:
+        if columns is None:
+            columns = df.columns.tolist()
+            # Récupération des noms de colonnes via les positions (0-based)
+            if len(columns) <= max(pos_col_montant, pos_col_ej, pos_col_n_ej):
+                raise ValueError(
+                    f"Colonnes manquantes: positions {pos_col_montant}, {pos_col_ej}, {pos_col_n_ej} "
+                    "non trouvées dans le CSV"
+                )
+            col_name_montant = columns[pos_col_montant]
+            keys = [columns[pos_col_ej], columns[pos_col_n_ej]]
 
-    if not all([col_name_montant, col_name_ej, col_name_n_ej]):
-        raise ValueError(
-            f"Colonnes manquantes: positions {pos_col_montant}, {pos_col_ej}, {pos_col_n_ej} non trouvées dans le CSV"
+        # 1. Clean de la colonne montant
+        df[col_name_montant] = (
+            df[col_name_montant].str.replace(",", ".", regex=False).str.replace(r"\s+", "", regex=True)
         )
+        df[col_name_montant] = pandas.to_numeric(df[col_name_montant], errors="coerce")
 
-    # 1. Clean de la colonne montant
-    df[col_name_montant] = df[col_name_montant].str.replace(",", ".", regex=False).str.replace(r"\s+", "", regex=True)
-    df[col_name_montant] = pandas.to_numeric(df[col_name_montant], errors="coerce")
-
-    # 2 . fusionner : faire la somme uniquement sur la colonne montant et conserver une des lignes
-    # (par exemple la première) pour les autres colonnes afin d'éviter la concaténation des strings
-    original_cols = df.columns.tolist()
-    keys = [col_name_ej, col_name_n_ej]
-    # construire le dictionnaire d'agrégation : sum pour la colonne montant, first pour les autres
-    agg_dict = {c: ("sum" if c == col_name_montant else "first") for c in df.columns if c not in keys}
-
-    df_ej_fusion = df.groupby(keys, as_index=False).agg(agg_dict)
-    # rétablir l'ordre original des colonnes quand c'est possible
-    ordered = [c for c in original_cols if c in df_ej_fusion.columns]
-    extras = [c for c in df_ej_fusion.columns if c not in ordered]
-    df_ej_fusion = df_ej_fusion[ordered + extras]
-
-    # 3. Filtrage des lignes avec montant != 0
-    df_montant_non_zero = df_ej_fusion[df_ej_fusion[col_name_montant] != 0]
+        # 2. Les lignes sans EJ ou sans poste EJ sont ignorées, comme par un groupby
+        df = df.dropna(subset=keys)
+        rows = df.astype(object).where(df.notna(), None).values.tolist()
+        for key, row in zip(df[keys].values.tolist(), rows):
+            sorter.add(json.dumps(key), row)
 
     name_file = current_app.config["UPLOAD_FOLDER"] + "/fusion_" + os.path.basename(fichierAe)
-    df_montant_non_zero.to_csv(name_file, index=False, sep=";", quoting=csv.QUOTE_ALL, encoding="utf-8")
+    with open(name_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=";", quoting=csv.QUOTE_ALL, lineterminator="\n")
+        writer.writerow(columns or [])
+        if columns is not None:
+            for _, group in itertools.groupby(sorter, key=itemgetter(0)):
+                # 3. Fusion des lignes du poste puis filtrage des lignes avec montant != 0
+                row = _merge_ae_rows([values for _, values in group], pos_col_montant)
+                if row[pos_col_montant] != 0:
+                    writer.writerow(row)
     return name_file
 
 
+def _merge_ae_rows(rows: list[list], pos_col_montant: int) -> list:
+    """
+    Fusionne les lignes d'un même poste EJ: somme de la colonne montant et,
+    pour les autres colonnes, première valeur non vide pour éviter la concaténation des strings.
+    """
+    merged = [next((row[i] for row in rows if row[i] is not None), None) for i in range(len(rows[0]))]
+    merged[pos_col_montant] = math.fsum(row[pos_col_montant] for row in rows if row[pos_col_montant] is not None)
+    return merged
+
+
 @celery.task(bind=True, name="read_csv_and_import_fichier_nat_ae_cp")
 def read_csv_and_import_fichier_nat_ae_cp(self, fichierAe: str, fichierCp: str, csv_options: str, annee: int):
     move_folder = os.path.join(current_app.config["UPLOAD_FOLDER"], "save", datetime.datetime.now().strftime("%Y%m%d"))
@@ -158,22 +189,24 @@ def read_csv_and_import_fichier_nat_ae_cp(self, fichierAe: str, fichierCp: str,
     except ValueError as e:
         raise ValueError(f"Colonne manquante dans get_columns_fichier_nat_ae: {e}")
 
-    fileCleanAe = _clean_up_ae_files(fichierAe, csv_options, pos_col_montant, pos_col_ej, pos_col_n_ej)
+    with tempfile.TemporaryDirectory(dir=current_app.config["UPLOAD_FOLDER"]) as workdir:
+        fileCleanAe = _clean_up_ae_files(fichierAe, csv_options, pos_col_montant, pos_col_ej, pos_col_n_ej, workdir)
 
-    # Parsing des fichiers
-    ae_list, cp_list = _parse_generic(
-        DataType.FINANCIAL_DATA_AE, fileCleanAe, None, annee, csv_options, move_folder, {}, {}, is_national=True
-    )
-    ae_list, cp_list = _parse_generic(
-        DataType.FINANCIAL_DATA_CP, fichierCp, None, annee, csv_options, move_folder, ae_list, cp_list, is_national=True
-    )
+        # Parsing des fichiers
+        ae_sorter, cp_sorter = _make_sorter(workdir), _make_sorter(workdir)
+        _parse_generic(
+            DataType.FINANCIAL_DATA_AE, fileCleanAe, None, annee, csv_options, move_folder, ae_sorter, is_national=True
+        )
+        _parse_generic(
+            DataType.FINANCIAL_DATA_CP, fichierCp, None, annee, csv_options, move_folder, cp_sorter, is_national=True
+        )
 
-    # Sauvegarde des fichiers complets
-    _move_file(fichierAe, current_app.config["UPLOAD_FOLDER"] + "/save/")
-    _move_file(fileCleanAe, current_app.config["UPLOAD_FOLDER"] + "/save/")
-    _move_file(fichierCp, current_app.config["UPLOAD_FOLDER"] + "/save/")
+        # Sauvegarde des fichiers complets
+        _move_file(fichierAe, current_app.config["UPLOAD_FOLDER"] + "/save/")
+        _move_file(fileCleanAe, current_app.config["UPLOAD_FOLDER"] + "/save/")
+        _move_file(fichierCp, current_app.config["UPLOAD_FOLDER"] + "/save/")
 
-    _process_batches(ae_list, cp_list, annee=annee)
+        _process_batches(ae_sorter, cp_sorter, workdir, annee=annee)
 
 
 @celery.task(bind=True, name="read_csv_and_import_ae_cp")
@@ -191,73 +224,117 @@ def read_csv_and_import_ae_cp(self, fichierAe: str, fichierCp: str, csv_options:
     except ValueError as e:
         raise ValueError(f"Colonne manquante dans get_columns_fichier_nat_ae: {e}")
 
-    fileCleanAe = _clean_up_ae_files(fichierAe, csv_options, pos_col_montant, pos_col_ej, pos_col_n_ej)
-
-    # Parsing des fichiers
-    ae_list, cp_list = _parse_generic(
-        DataType.FINANCIAL_DATA_AE,
-        fileCleanAe,
-        source_region,
-        annee,
-        json.dumps({"sep": ";", "quotechar": '"'}),
-        move_folder,
-        {},
-        {},
-        is_national=False,
-    )
-    ae_list, cp_list = _parse_generic(
-        DataType.FINANCIAL_DATA_CP,
-        fichierCp,
-        source_region,
-        annee,
-        csv_options,
-        move_folder,
-        ae_list,
-        cp_list,
-        is_national=False,
-    )
+    with tempfile.TemporaryDirectory(dir=current_app.config["UPLOAD_FOLDER"]) as workdir:
+        fileCleanAe = _clean_up_ae_files(fichierAe, csv_options, pos_col_montant, pos_col_ej, pos_col_n_ej, workdir)
+
+        # Parsing des fichiers
+        ae_sorter, cp_sorter = _make_sorter(workdir), _make_sorter(workdir)
+        _parse_generic(
+            DataType.FINANCIAL_DATA_AE,
+            fileCleanAe,
+            source_region,
+            annee,
+            json.dumps({"sep": ";", "quotechar": '"'}),
+            move_folder,
+            ae_sorter,
+            is_national=False,
+        )
+        _parse_generic(
+            DataType.FINANCIAL_DATA_CP,
+            fichierCp,
+            source_region,
+            annee,
+            csv_options,
+            move_folder,
+            cp_sorter,
+            is_national=False,
+        )
+
+        # Sauvegarde des fichiers complets
+        _move_file(fichierAe, current_app.config["UPLOAD_FOLDER"] + "/save/")
+        _move_file(fichierCp, current_app.config["UPLOAD_FOLDER"] + "/save/")
+        _move_file(fileCleanAe, current_app.config["UPLOAD_FOLDER"] + "/save/")
 
-    # Sauvegarde des fichiers complets
-    _move_file(fichierAe, current_app.config["UPLOAD_FOLDER"] + "/save/")
-    _move_file(fichierCp, current_app.config["UPLOAD_FOLDER"] + "/save/")
-    _move_file(fileCleanAe, current_app.config["UPLOAD_FOLDER"] + "/save/")
+        _process_batches(ae_sorter, cp_sorter, workdir, source_region, annee)
 
-    _process_batches(ae_list, cp_list, source_region, annee)
 
+def _make_sorter(workdir: str) -> ExternalSorter:
+    return ExternalSorter(workdir, run_size=current_app.config.get("IMPORT_SORT_RUN_SIZE", DEFAULT_RUN_SIZE))
 
-def _process_batches(ae_list, cp_list, source_region=None, annee=None):
-    index = 0
-    ae_batch = []
-    cp_lists = []
-    while ae_list:
-        _, struct = ae_list.popitem()
-        lines = struct["ae"]
-        for line in lines:
+
+def _process_batches(
+    ae_sorter: ExternalSorter, cp_sorter: ExternalSorter, workdir: str, source_region=None, annee=None
+):
+    """
+    Fusionne les AE et les CP triés par clé et envoie les lots au fil de l'eau.
+    Les AE sont envoyés avec les CP qui leur sont rattachés. Les CP sans AE sont mis de côté
+    sur disque et envoyés une fois tous les AE envoyés, comme ils peuvent être rattachés à un AE du fichier
+    (ie: même EJ / poste EJ sous une autre clé) lors de leur import.
+    """
+    request_obj = getattr(current_task, "request", None) if current_task is not None else None
+    task_id = getattr(request_obj, "id", None)
+
+    def _cp(lineno, data):
+        return {"data": data, "task": LineImportTechInfo(task_id, lineno)}
+
+    cp_sans_ae_sorter = _make_sorter(workdir)
+    ae_index = 0
+    ae_batch, cp_lists = [], []
+    for key, ae_lines, cp_lines in _join_ae_cp(ae_sorter, cp_sorter):
+        if not ae_lines:
+            for cp_line in cp_lines:
+                cp_sans_ae_sorter.add(key, cp_line)
+            continue
+
+        cps = [_cp(lineno, data) for lineno, data in cp_lines]
+        for line in ae_lines:
             ae_batch.append(line)
-            cp_lists.extend(struct["cp"])
+            cp_lists.extend(cps)
             if len(ae_batch) == get_batch_size():
-                _send_subtask_financial_ae(ae_batch, source_region, annee, index, cp_lists)
+                _send_subtask_financial_ae(ae_batch, source_region, annee, ae_index, cp_lists)
                 ae_batch, cp_lists = [], []
-                index += get_batch_size()
+                ae_index += get_batch_size()
 
     # Envoyer tout reste non envoyé
     if ae_batch:
-        _send_subtask_financial_ae(ae_batch, source_region, annee, index, cp_lists)
+        _send_subtask_financial_ae(ae_batch, source_region, annee, ae_index, cp_lists)
 
     # Import de tous les CP sans AE
-    index = 0
+    cp_index = 0
     cp_batch = []
-    while cp_list:
-        k, struct = cp_list.popitem()
-        cp_batch.append(struct)
+    for _, (lineno, data) in cp_sans_ae_sorter:
+        cp_batch.append(_cp(lineno, data))
         if len(cp_batch) == get_batch_size():
-            _send_subtask_financial_cp(cp_batch, source_region, annee, index)
+            _send_subtask_financial_cp(cp_batch, source_region, annee, cp_index)
             cp_batch = []
-            index += get_batch_size()
+            cp_index += get_batch_size()
 
     # Envoyer tout reste non envoyé
     if cp_batch:
-        _send_subtask_financial_cp(cp_batch, source_region, annee, index)
+        _send_subtask_financial_cp(cp_batch, source_region, annee, cp_index)
+
+
+def _join_ae_cp(ae_sorter: ExternalSorter, cp_sorter: ExternalSorter) -> Iterator[tuple[str, list, list]]:
+    """
+    Jointure par fusion des AE et des CP triés par clé.
+    Produit pour chaque clé le triplet (clé, lignes AE, lignes CP), l'une des deux listes pouvant être vide.
+    """
+    ae_groups = itertools.groupby(ae_sorter, key=itemgetter(0))
+    cp_groups = itertools.groupby(cp_sorter, key=itemgetter(0))
+    ae_key, ae_group = next(ae_groups, (None, None))
+    cp_key, cp_group = next(cp_groups, (None, None))
+
+    while ae_group is not None or cp_group is not None:
+        if cp_group is None or (ae_group is not None and ae_key < cp_key):
+            yield ae_key, [value for _, value in ae_group], []
+            ae_key, ae_group = next(ae_groups, (None, None))
+        elif ae_group is None or cp_key < ae_key:
+            yield cp_key, [], [value for _, value in cp_group]
+            cp_key, cp_group = next(cp_groups, (None, None))
+        else:
+            yield ae_key, [value for _, value in ae_group], [value for _, value in cp_group]
+            ae_key, ae_group = next(ae_groups, (None, None))
+            cp_key, cp_group = next(cp_groups, (None, None))
 
 
 def _parse_generic(
@@ -267,12 +344,11 @@ def _parse_generic(
     annee: int | None,
     csv_options: str,
     move_folder: str,
-    ae_list: dict,
-    cp_list: dict,
+    sorter: ExternalSorter,
     is_national: bool = False,
-) -> tuple[dict, dict]:
+):
     """
-    Split un fichier en plusieurs fichiers et autant de tâches qu'il y a de fichier.
+    Split un fichier en plusieurs fichiers et alimente le tri externe avec les lignes parsées (clé, ligne).
     Gère à la fois les fichiers régionaux et nationaux.
     """
     filename = os.path.splitext(os.path.basename(fichier))[0]
@@ -281,19 +357,20 @@ def _parse_generic(
 
     try:
         chunk_index = 1
+        nb_lines = 0
+        start = time.perf_counter()
         chunks = pandas.read_csv(fichier, chunksize=max_lines, **json.loads(csv_options))
         for df in chunks:
+            nb_lines += len(df.index)
             output_file = os.path.join(current_app.config["UPLOAD_FOLDER"], f"{filename}_{chunk_index}.csv")
             df.to_csv(output_file, index=False)
             logging.info(f"[IMPORT][SPLIT] Création du fichier {output_file} de {min(max_lines, len(df.index))} lignes")
 
             try:
                 if data_type == DataType.FINANCIAL_DATA_AE:
-                    ae_list = _parse_ae(output_file, ae_list, source_region, annee, is_national)
+                    _parse_ae(output_file, sorter, source_region, annee, is_national)
                 elif data_type == DataType.FINANCIAL_DATA_CP:
-                    ae_list, cp_list = _parse_cp(
-                        output_file, chunk_index, max_lines, ae_list, cp_list, source_region, annee, is_national
-                    )
+                    _parse_cp(output_file, chunk_index, max_lines, sorter, source_region, annee, is_national)
                 shutil.copy(output_file, move_folder)
             except Exception as e:
                 logging.exception(
@@ -302,136 +379,129 @@ def _parse_generic(
                 raise e
 
             chunk_index += 1
+
+        elapsed = time.perf_counter() - start
+        logging.info(
+            f"[IMPORT][PARSE][{data_type}] {nb_lines} lignes parsées en {elapsed:.2f}s "
+            f"({nb_lines / elapsed if elapsed > 0 else 0:.0f} lignes/s)"
+        )
     except Exception as e:
         logging.exception(f"[IMPORT][FINANCIAL][{data_type}] Error lors de l'import du fichier {fichier}: {e}")
         raise e
 
-    return ae_list, cp_list
 
-
-def _parse_ae(output_file: str, ae_list: dict, source_region: str | None, annee: int, is_national: bool) -> dict:
+def _parse_ae(output_file: str, sorter: ExternalSorter, source_region: str | None, annee: int, is_national: bool):
     if is_national:
-        return _parse_fichier_nat_ae(output_file, annee, ae_list)
+        _parse_fichier_nat_ae(output_file, annee, sorter)
     else:
-        return _parse_file_ae(output_file, source_region, annee, ae_list)
+        _parse_file_ae(output_file, source_region, annee, sorter)
 
 
 def _parse_cp(
     output_file: str,
     chunk_index: int,
     max_lines: int,
-    ae_list: dict,
-    cp_list: dict,
+    sorter: ExternalSorter,
     source_region: str | None,
     annee: int | None,
     is_national: bool,
-) -> tuple[dict, dict]:
+):
     if is_national:
-        return _parse_fichier_nat_cp(output_file, annee, chunk_index, max_lines, ae_list, cp_list)
+        _parse_fichier_nat_cp(output_file, annee, chunk_index, max_lines, sorter)
     else:
-        return _parse_file_cp(output_file, source_region, annee, chunk_index, max_lines, ae_list, cp_list)
+        _parse_file_cp(output_file, source_region, annee, chunk_index, max_lines, sorter)
 
 
-def _parse_fichier_nat_ae(output_file: str, annee: int, ae_list: dict) -> dict:
-    series = pandas.Series({f"{FinancialAe.annee.key}": annee})
+def _parse_fichier_nat_ae(output_file: str, annee: int, sorter: ExternalSorter):
     columns_names = FinancialAe.get_columns_fichier_nat_ae()
-    index_last_col = len(columns_names) - 1
     columns_types = FinancialAe.get_columns_type_fichier_nat_ae()
 
     data_chunk = get_data_chunk(output_file, columns_names, columns_types)
     for chunk in data_chunk:
-        for i, line in chunk.iterrows():
-            line["data_source"] = "NATION"
-            # clean la première et dernière ligne qui contient un "
-            line[columns_names[0]] = line[columns_names[0]].replace('"', "")
-            line[columns_names[index_last_col]] = line[columns_names[index_last_col]].replace('"', "")
-            line["source_region"] = get_code_region_by_code_comp(line["societe"])
-            key = f"national_{line['source_region']}_{annee}_{line[FinancialAe.n_ej.key]}_{line[FinancialAe.n_poste_ej.key]}"
-            ae = pandas.concat([line, series]).to_json()
-            if key not in ae_list:
-                ae_list[key] = {"ae": [], "cp": []}
-            ae_list[key]["ae"].append(ae)
-    return ae_list
-
-
-def _parse_fichier_nat_cp(
-    output_file: str, annee: int, chunk_index: int, max_lines: int, ae_list: dict, cp_list: dict
-) -> tuple[dict, dict]:
+        _prepare_chunk_nat(chunk, columns_names)
+        chunk[FinancialAe.annee.key] = annee
+        keys = _build_keys("national_" + chunk["source_region"].astype(str), annee, chunk)
+        for key, ae in zip(keys, _to_json_lines(chunk)):
+            sorter.add(key, ae)
+
+
+def _parse_fichier_nat_cp(output_file: str, annee: int, chunk_index: int, max_lines: int, sorter: ExternalSorter):
     columns_names = FinancialCp.get_columns_fichier_nat_cp()
-    index_last_col = len(columns_names) - 1
     columns_types = FinancialCp.get_columns_types_fichier_nat_cp()
 
-    request_obj = getattr(current_task, "request", None) if current_task is not None else None
-    task_id = getattr(request_obj, "id", None)
-
     data_chunk = get_data_chunk(output_file, columns_names, columns_types)
     for chunk in data_chunk:
-        for i, line in chunk.iterrows():
-            line["data_source"] = "NATION"
-            # clean la première et dernière ligne qui contient un "
-            line[columns_names[0]] = line[columns_names[0]].replace('"', "")
-            line[columns_names[index_last_col]] = line[columns_names[index_last_col]].replace('"', "")
-            line["source_region"] = get_code_region_by_code_comp(line["societe"])
-            key = f"national_{line['source_region']}_{annee}_{line[FinancialAe.n_ej.key]}_{line[FinancialAe.n_poste_ej.key]}"
-            if key in ae_list.keys():
-                ae_list[key]["cp"] += [
-                    {
-                        "data": line.to_json(),
-                        "task": LineImportTechInfo(task_id, (chunk_index - 1) * max_lines + i),
-                    },
-                ]
-            else:
-                cp_list[f"{(chunk_index - 1) * max_lines + i}"] = {
-                    "data": line.to_json(),
-                    "task": LineImportTechInfo(task_id, (chunk_index - 1) * max_lines + i),
-                }
-    return ae_list, cp_list
-
-
-def _parse_file_ae(output_file: str, source_region: str | None, annee: int, ae_list: dict) -> dict:
-    series = pandas.Series({f"{FinancialAe.annee.key}": annee, f"{FinancialAe.source_region.key}": source_region})
+        _prepare_chunk_nat(chunk, columns_names)
+        keys = _build_keys("national_" + chunk["source_region"].astype(str), annee, chunk)
+        _add_cp_lines(chunk, keys, chunk_index, max_lines, sorter)
+
+
+def _parse_file_ae(output_file: str, source_region: str | None, annee: int, sorter: ExternalSorter):
     columns_names = FinancialAe.get_columns_files_ae()
     columns_types = {"programme": str, "n_ej": str, "n_poste_ej": int, "fournisseur_titulaire": str, "siret": str}
 
     data_chunk = get_data_chunk(output_file, columns_names, columns_types)
     for chunk in data_chunk:
-        for i, line in chunk.iterrows():
-            line["data_source"] = "REGION"
-            key = f"regional_{source_region}_{annee}_{line[FinancialAe.n_ej.key]}_{line[FinancialAe.n_poste_ej.key]}"
-            ae = pandas.concat([line, series]).to_json()
-            if key not in ae_list:
-                ae_list[key] = {"ae": [], "cp": []}
-            ae_list[key]["ae"].append(ae)
-    return ae_list
+        chunk["data_source"] = "REGION"
+        chunk[FinancialAe.annee.key] = annee
+        chunk[FinancialAe.source_region.key] = source_region
+        keys = _build_keys(f"regional_{source_region}", annee, chunk)
+        for key, ae in zip(keys, _to_json_lines(chunk)):
+            sorter.add(key, ae)
 
 
 def _parse_file_cp(
-    output_file: str, source_region: str, annee: int, chunk_index: int, max_lines: int, ae_list: dict, cp_list: dict
-) -> tuple[dict, dict]:
+    output_file: str, source_region: str, annee: int, chunk_index: int, max_lines: int, sorter: ExternalSorter
+):
     columns_names = FinancialCp.get_columns_files_cp()
     columns_types = str
 
     data_chunk = get_data_chunk(output_file, columns_names, columns_types)
-
-    request_obj = getattr(current_task, "request", None) if current_task is not None else None
-    task_id = getattr(request_obj, "id", None)
     for chunk in data_chunk:
-        for i, line in chunk.iterrows():
-            line["data_source"] = "REGION"
-            key = f"regional_{source_region}_{annee}_{line[FinancialAe.n_ej.key]}_{line[FinancialAe.n_poste_ej.key]}"
-            if key in ae_list.keys():
-                ae_list[key]["cp"] += [
-                    {
-                        "data": line.to_json(),
-                        "task": LineImportTechInfo(task_id, (chunk_index - 1) * max_lines + i),
-                    },
-                ]
-            else:
-                cp_list[f"{(chunk_index - 1) * max_lines + i}"] = {
-                    "data": line.to_json(),
-                    "task": LineImportTechInfo(task_id, (chunk_index - 1) * max_lines + i),
-                }
-    return ae_list, cp_list
+        chunk["data_source"] = "REGION"
+        keys = _build_keys(f"regional_{source_region}", annee, chunk)
+        _add_cp_lines(chunk, keys, chunk_index, max_lines, sorter)
+
+
+def _prepare_chunk_nat(chunk: pandas.DataFrame, columns_names: list[str]):
+    """
+    Ajoute les colonnes calculées d'un chunk de fichier national (data_source, source_region)
+    et nettoie la première et la dernière colonne qui contiennent un "
+    """
+    chunk["data_source"] = "NATION"
+    for column in (columns_names[0], columns_names[-1]):
+        chunk[column] = chunk[column].str.replace('"', "", regex=False)
+    chunk["source_region"] = chunk["societe"].map(get_code_region_by_code_comp)
+
+
+def _build_keys(prefix: str | pandas.Series, annee: int | None, chunk: pandas.DataFrame) -> pandas.Series:
+    """
+    Calcule la clé de jointure AE <-> CP de chaque ligne du chunk.
+    ie: {prefix}_{annee}_{n_ej}_{n_poste_ej}
+    """
+    return (
+        prefix
+        + f"_{annee}_"
+        + chunk[FinancialAe.n_ej.key].astype(str)
+        + "_"
+        + chunk[FinancialAe.n_poste_ej.key].astype(str)
+    )
+
+
+def _to_json_lines(chunk: pandas.DataFrame) -> list[str]:
+    """Sérialise toutes les lignes du chunk en une seule passe. Une chaîne JSON par ligne."""
+    if chunk.empty:
+        return []
+    return chunk.to_json(orient="records", lines=True).rstrip("\n").split("\n")
+
+
+def _add_cp_lines(
+    chunk: pandas.DataFrame, keys: pandas.Series, chunk_index: int, max_lines: int, sorter: ExternalSorter
+):
+    """Ajoute les CP du chunk au tri externe avec leur numéro de ligne dans le fichier."""
+    offset = (chunk_index - 1) * max_lines
+    for key, i, data in zip(keys, chunk.index.tolist(), _to_json_lines(chunk)):
+        sorter.add(key, [offset + i, data])
 
 
 def get_data_chunk(output_file, columns_names, columns_types):
@@ -4,6 +4,7 @@ from api_entreprise import LimitHitError
 import sqlalchemy
 
 from app.tasks.financial import logger
+from app.tasks.financial.references import clear_references_cache
 
 
 class Reessayer(Exception):
@@ -99,6 +100,8 @@ def _map_exceptions(func):
         except sqlalchemy.exc.IntegrityError as e:
             msg = "IntegrityError. Cela peut être dû à un soucis de concourrence. On retente."
             logger.exception(f"[IMPORT] {msg}")
+            # Un référentiel a pu être supprimé depuis sa mise en cache
+            clear_references_cache()
             raise Reessayer.fromIntegrityError(e)
 
         except sqlalchemy.exc.OperationalError as e:
@@ -4,20 +4,16 @@ from celery import current_task, subtask
 from flask import current_app
 
 # from psycopg import IntegrityError
-from sqlalchemy import delete
+from sqlalchemy import delete, insert, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import selectinload
 from app import celeryapp, db
 from app.exceptions.exceptions import FinancialException
 import sqlalchemy.exc
 from models.entities.financial.Ademe import Ademe
 from models.entities.financial.FinancialAe import FinancialAe
 from models.entities.financial.FinancialCp import FinancialCp
-from models.entities.refs.CentreCouts import CentreCouts
-from models.entities.refs.CodeProgramme import CodeProgramme
-from models.entities.refs.DomaineFonctionnel import DomaineFonctionnel
-from models.entities.refs.FournisseurTitulaire import FournisseurTitulaire
-from models.entities.refs.GroupeMarchandise import GroupeMarchandise
-from models.entities.refs.LocalisationInterministerielle import LocalisationInterministerielle
-from models.entities.refs.ReferentielProgrammation import ReferentielProgrammation
+from models.entities.financial.MontantFinancialAe import MontantFinancialAe
 from app.services.siret import AppUpdateRefSiretService
 from app.tasks import limiter_queue
 
@@ -30,8 +26,10 @@ import os
 
 from app.tasks.financial import logger, LineImportTechInfo
 from app.tasks.financial.errors import _handle_exception_import
+from app.tasks.financial.references import insert_references
 
 
+from app.utilities.bulk import rows_of_entities
 from app.utilities.observability import gauge_of_currently_executing, summary_of_time, SummaryOfTimePerfCounter
 
 
@@ -75,52 +73,36 @@ def import_lines_financial_ae(
 
     with SummaryOfTimePerfCounter.cm("import_lines_financial_ae_add_entities"):
         try:
-            # Préparation des données pour insertion et mise à jour en bulk
-            new_aes = []
-            montant_aes = []
-            update_mappings = []
-
-            for line_data in line_data_list:
-                curr_ae = FinancialAe(**line_data)
-                existing_ae = (
-                    db.session.query(FinancialAe)
-                    .filter_by(
-                        n_ej=line_data[FinancialAe.n_ej.key],
-                        n_poste_ej=int(line_data[FinancialAe.n_poste_ej.key]),
-                        data_source=line_data[FinancialAe.data_source.key],
-                    )
-                    .one_or_none()
-                )
-
-                is_update = existing_ae is not None
-
-                _insert_references(curr_ae)
-
-                if is_update:
-                    # Préparer les données pour la mise à jour
-                    update_mapping = existing_ae.update_attribute(line_data)
-                    if update_mapping:
-                        update_mappings.append(update_mapping)
+            # Récupération en une seule requête des AEs déjà présentes en base
+            existing_aes = _get_existing_aes(line_data_list)
+            new_aes: dict[tuple, FinancialAe] = {}
+            new_aes_lines: dict[tuple, list[dict]] = {}
+
+            curr_aes = [FinancialAe(**line_data) for line_data in line_data_list]
+            insert_references(curr_aes)
+
+            for line_data, curr_ae in zip(line_data_list, curr_aes):
+                key = _ae_key(line_data)
+
+                if key in existing_aes:
+                    # MAJ suivie par la session, flushée en lot au commit
+                    existing_aes[key].update_attribute(line_data)
+                elif key in new_aes:
+                    # Doublon dans le lot : on applique la ligne sur l'AE en attente d'insertion
+                    new_aes_lines[key].append(dict(line_data))
+                    new_aes[key].update_attribute(line_data)
                 else:
-                    # Préparer une nouvelle instance pour l'insertion
-                    db.session.add(curr_ae)
-                    db.session.flush()
-                    new_aes.append(curr_ae)
+                    new_aes_lines[key] = [dict(line_data)]
+                    new_aes[key] = curr_ae
 
         except sqlalchemy.exc.OperationalError as o:
             logger.exception("[IMPORT][FINANCIAL][AE] Erreur sur le check des lignes")
             raise FinancialException(o) from o
 
     with SummaryOfTimePerfCounter.cm("import_lines_financial_ae_update_entities"):
-        # Mise à jour en bulk pour les instances existantes
-        if update_mappings:
-            logger.debug(f"Mise à jour en bulk de {len(update_mappings)} instances existantes de FinancialAe.")
-            db.session.bulk_update_mappings(FinancialAe, update_mappings)
-
-        # Insertion des montants associés
-        if montant_aes:
-            logger.debug(f"Insertion de {len(montant_aes)} montants associés à FinancialAe.")
-            db.session.bulk_save_objects(montant_aes)
+        if new_aes:
+            logger.debug(f"Insertion en bulk de {len(new_aes)} nouvelles instances de FinancialAe.")
+            _upsert_new_aes(new_aes, new_aes_lines)
 
         # Commit une seule fois après toutes les opérations
         _import_lines_financial_ae__before_commit_aes()
@@ -147,48 +129,72 @@ def import_lines_financial_ae(
                 _send_subtask_financial_cp(cp_batch, source_region, annee, index)
 
 
-def _insert_references(new_ae_or_cp: FinancialAe | FinancialCp):
-    # Start performance counter
-    with SummaryOfTimePerfCounter.cm("import_lines_insert_references"):
-        if hasattr(new_ae_or_cp, "fournisseur_titulaire"):
-            fournisseur_titulaire = new_ae_or_cp.fournisseur_titulaire
-        else:
-            fournisseur_titulaire = new_ae_or_cp.fournisseur_paye
-
-        # Mapping between reference types and their corresponding model classes and codes
-        reference_mapping = {
-            "programme": (CodeProgramme, new_ae_or_cp.programme),
-            "centre_couts": (CentreCouts, new_ae_or_cp.centre_couts),
-            "domaine_fonctionnel": (DomaineFonctionnel, new_ae_or_cp.domaine_fonctionnel),
-            "fournisseur_titulaire": (FournisseurTitulaire, fournisseur_titulaire),
-            "groupe_marchandise": (GroupeMarchandise, new_ae_or_cp.groupe_marchandise),
-            "localisation_interministerielle": (
-                LocalisationInterministerielle,
-                new_ae_or_cp.localisation_interministerielle,
-            ),
-            "referentiel_programmation": (ReferentielProgrammation, new_ae_or_cp.referentiel_programmation),
-        }
-
-        # Keep track of instances to bulk save
-        instances_to_save = []
+def _ae_key(line_data: dict) -> tuple[str, int, str]:
+    return (
+        str(line_data[FinancialAe.n_ej.key]),
+        int(line_data[FinancialAe.n_poste_ej.key]),
+        line_data[FinancialAe.data_source.key],
+    )
 
-        try:
-            # Check and add references if they don't exist
-            for _, (model, code) in reference_mapping.items():
-                if isinstance(model, CodeProgramme) and code.startswith("0"):
-                    code = code[1:]
-                if not db.session.query(model).filter_by(code=str(code)).one_or_none():
-                    instances_to_save.append(model(code=str(code)))
 
-            AppUpdateRefSiretService.create_for_app().check_siret(db.session, new_ae_or_cp.siret)
+def _get_existing_aes(line_data_list: list[dict]) -> dict[tuple, FinancialAe]:
+    """
+    Récupère en une requête les AEs existantes correspondant aux clés (n_ej, n_poste_ej, data_source) du lot
+    """
+    keys = {_ae_key(line_data) for line_data in line_data_list}
+    if not keys:
+        return {}
+
+    stmt = (
+        select(FinancialAe)
+        .where(tuple_(FinancialAe.n_ej, FinancialAe.n_poste_ej, FinancialAe.data_source).in_(keys))
+        .options(selectinload(FinancialAe.montant_ae))
+    )
+    return {(ae.n_ej, ae.n_poste_ej, ae.data_source): ae for ae in db.session.scalars(stmt)}
+
+
+def _upsert_new_aes(new_aes: dict[tuple, FinancialAe], new_aes_lines: dict[tuple, list[dict]]):
+    """
+    Insère les nouvelles AEs en une requête puis leurs montants.
+
+    Une AE insérée entre-temps par une autre tâche est mise à jour via update_attribute,
+    comme si elle avait été trouvée par _get_existing_aes.
+    """
+    table = FinancialAe.__table__
+    stmt = pg_insert(table).values(rows_of_entities(list(new_aes.values())))
+    stmt = stmt.on_conflict_do_update(
+        constraint="unique_ej_poste_ej_data_source",
+        # Mise à jour neutre : permet à RETURNING de renvoyer aussi les lignes en conflit
+        set_={table.c.n_ej: stmt.excluded.n_ej},
+    ).returning(
+        table.c.id,
+        table.c.n_ej,
+        table.c.n_poste_ej,
+        table.c.data_source,
+        literal_column("(xmax = 0)").label("inserted"),
+    )
+
+    montants = []
+    conflicts: dict[int, tuple] = {}
+    for id_ae, n_ej, n_poste_ej, data_source, inserted in db.session.execute(stmt):
+        key = (n_ej, n_poste_ej, data_source)
+        if inserted:
+            montants.extend(
+                {"id_financial_ae": id_ae, "montant": montant.montant, "annee": montant.annee}
+                for montant in new_aes[key].montant_ae
+            )
+        else:
+            conflicts[id_ae] = key
 
-            # Bulk save all new instances
-            if instances_to_save:
-                db.session.bulk_save_objects(instances_to_save)
+    if montants:
+        db.session.execute(insert(MontantFinancialAe), montants)
 
-        except Exception as e:
-            logger.exception("[IMPORT][REF] Error lors de l'insertion en bulk des références.")
-            raise e
+    if conflicts:
+        logger.info(f"[IMPORT][FINANCIAL][AE] {len(conflicts)} AE(s) insérée(s) en parallèle, mise à jour")
+        stmt = select(FinancialAe).where(FinancialAe.id.in_(conflicts)).options(selectinload(FinancialAe.montant_ae))
+        for ae in db.session.scalars(stmt):
+            for line_data in new_aes_lines[conflicts[ae.id]]:
+                ae.update_attribute(line_data)
 
 
 @celery.task(bind=True, name="import_lines_financial_cp")
@@ -226,14 +232,14 @@ def import_lines_financial_cp(self, cp_batch: list[dict], start_index: int, sour
             new_cp.file_import_lineno = tech_info.lineno
             new_cp.id_ae = _get_ae_for_cp(new_cp.n_ej, new_cp.n_poste_ej, new_cp.data_source)
 
-            with SummaryOfTimePerfCounter.cm("import_lines_financial_cp_insert_references"):
-                _insert_references(new_cp)
-
             new_cps.append(new_cp)
 
         if not new_cps:
             return
 
+        with SummaryOfTimePerfCounter.cm("import_lines_financial_cp_insert_references"):
+            insert_references(new_cps)
+
         db.session.bulk_save_objects(new_cps)
 
     with SummaryOfTimePerfCounter.cm("import_lines_financial_cp_commit"):
@@ -275,11 +281,17 @@ def import_file_ademe(self, fichier: str):
         _delete_ademe()
 
         i = 0
+        ademe_batch = []
         for chunk in data_ademe_chunk:
-            for _, ademe_data in chunk.iterrows():
+            for ademe_data in chunk.to_json(orient="records", lines=True).splitlines():
                 i += 1
-                tech_info = LineImportTechInfo(current_taskid, i)
-                _send_subtask_ademe(ademe_data.to_json(), tech_info)
+                ademe_batch.append({"data": ademe_data, "task": LineImportTechInfo(current_taskid, i)})
+                if len(ademe_batch) == get_batch_size():
+                    _send_subtask_ademe(ademe_batch)
+                    ademe_batch = []
+
+        if ademe_batch:
+            _send_subtask_ademe(ademe_batch)
 
         move_folder = os.path.join(move_folder, timestamp)
         if not os.path.exists(move_folder):
@@ -313,10 +325,10 @@ def import_line_ademe(self, line_ademe: str, tech_info_list: list):
         f"[IMPORT][ADEME] Tentative ligne Ademe reference decision {new_ademe.reference_decision}, beneficiaire {new_ademe.siret_beneficiaire}"
     )
 
-    # SIRET Attribuant
-    AppUpdateRefSiretService.create_for_app().check_siret(db.session, new_ademe.siret_attribuant)
-    # SIRET beneficiaire
-    AppUpdateRefSiretService.create_for_app().check_siret(db.session, new_ademe.siret_beneficiaire)
+    # SIRET attribuant et beneficiaire
+    AppUpdateRefSiretService.create_for_app().check_sirets(
+        db.session, [new_ademe.siret_attribuant, new_ademe.siret_beneficiaire]
+    )
 
     db.session.add(new_ademe)
     logger.info("[IMPORT][FINANCIAL] Ajout ligne financière")
@@ -325,14 +337,49 @@ def import_line_ademe(self, line_ademe: str, tech_info_list: list):
     logger.debug(f"[IMPORT][ADEME][LINE] Traitement de la ligne ademe: {tech_info_list}")
 
 
+@celery.task(bind=True, name="import_lines_ademe")
+@summary_of_time()
+@_handle_exception_import("ADEME")
+def import_lines_ademe(self, ademe_batch: list[dict]):
+    """
+    Importe un lot de lignes ADEME en une requête.
+    Une ligne déjà importée (même tâche d'import et même numéro de ligne) est ignorée.
+    """
+    new_ademes: list[Ademe] = []
+    for line in ademe_batch:
+        tech_info = LineImportTechInfo(*line["task"])
+        new_ademe = Ademe.from_datagouv_csv_line(json.loads(line["data"]))
+        new_ademe.file_import_taskid = tech_info.file_import_taskid
+        new_ademe.file_import_lineno = tech_info.lineno
+        new_ademes.append(new_ademe)
+
+    if not new_ademes:
+        return
+
+    # SIRET attribuant et beneficiaire, vérifiés une fois pour tout le lot
+    AppUpdateRefSiretService.create_for_app().check_sirets(
+        db.session, [siret for a in new_ademes for siret in (a.siret_attribuant, a.siret_beneficiaire)]
+    )
+
+    stmt = (
+        pg_insert(Ademe.__table__)
+        .values(rows_of_entities(new_ademes))
+        .on_conflict_do_nothing(constraint="uq_file_line_import_ademe")
+    )
+    result = db.session.execute(stmt)
+    db.session.commit()
+
+    logger.info(f"[IMPORT][ADEME] Ajout de {result.rowcount} lignes sur {len(new_ademes)}")
+
+
 @limiter_queue(queue_name="file")
 def _send_subtask_ademe_file(filepath: str):
     subtask("import_file_ademe").delay(filepath)
 
 
 @limiter_queue(queue_name="line")
-def _send_subtask_ademe(data_ademe: str, tech_info: LineImportTechInfo):
-    subtask("import_line_ademe").delay(data_ademe, tech_info)
+def _send_subtask_ademe(ademe_batch: list[dict]):
+    subtask("import_lines_ademe").delay(ademe_batch)
 
 
 @limiter_queue(queue_name="line")
@@ -7,11 +7,15 @@ import pandas
 from celery import subtask, current_task
 from flask import current_app
 
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
 from app import celeryapp, db
 from models.entities.financial.France2030 import France2030
 from app.services.siret import AppUpdateRefSiretService
 from app.tasks import logger, limiter_queue, LineImportTechInfo
 from app.tasks.financial.errors import _handle_exception_import
+from app.tasks.financial.import_financial import get_batch_size
+from app.utilities.bulk import rows_of_entities
 from app.utilities.siret import SiretParser
 
 celery = celeryapp.celery
@@ -39,16 +43,22 @@ def import_file_france_2030(self, fichier: str, annee: int):
                 "siret": str,
             },
         )
-        additionnal_line_info = pandas.Series({f"{France2030.annee.key}": annee})
+        france_2030_batch = []
         for chunk in chunked:
             # Gestion des valeurs numériques
             for field in ["montant_subvention", "montant_avance_remboursable", "montant_aide"]:
                 chunk[field] = pandas.to_numeric(chunk[field], errors="coerce").astype(float)
 
-            for i, row in chunk.iterrows():
-                tech_info = LineImportTechInfo(current_taskid, i)
-                line = pandas.concat([row, additionnal_line_info])
-                _send_subtask_france_2030(line.to_json(), tech_info)
+            chunk = chunk.assign(**{France2030.annee.key: annee})
+            lines = chunk.to_json(orient="records", lines=True).splitlines()
+            for i, line in zip(chunk.index, lines):
+                france_2030_batch.append({"data": line, "task": LineImportTechInfo(current_taskid, int(i))})
+                if len(france_2030_batch) == get_batch_size():
+                    _send_subtask_france_2030(france_2030_batch)
+                    france_2030_batch = []
+
+        if france_2030_batch:
+            _send_subtask_france_2030(france_2030_batch)
 
         move_folder = os.path.join(move_folder, timestamp)
         if not os.path.exists(move_folder):
@@ -64,19 +74,11 @@ def import_file_france_2030(self, fichier: str, annee: int):
 
 
 @limiter_queue(queue_name="line")
-def _send_subtask_france_2030(line, tech_info: LineImportTechInfo):
-    subtask("import_line_france_2030").delay(line, tech_info)
-
-
-@celery.task(bind=True, name="import_line_france_2030")
-@_handle_exception_import("FRANCE_2030")
-def import_line_france_2030(self, line: str, tech_info_list: list):
-    logger.debug(f"[IMPORT][FRANCE 2030][LINE] Traitement de la ligne ademe: {tech_info_list}")
-    logger.debug(f"[IMPORT][FRANCE 2030][LINE] Contenu de la ligne FRANCE_2030 : {line}")
-    logger.debug(f"[IMPORT][FRANCE 2030][LINE] Contenu du tech info      : {tech_info_list}")
+def _send_subtask_france_2030(france_2030_batch: list[dict]):
+    subtask("import_lines_france_2030").delay(france_2030_batch)
 
-    tech_info = LineImportTechInfo(*tech_info_list)
 
+def _france_2030_of_line(line: str) -> France2030:
     line_json = json.loads(line)
 
     # XXX: on ignore la nommenclature du flux d'import
@@ -88,14 +90,58 @@ def import_line_france_2030(self, line: str, tech_info_list: list):
         logger.warning("[IMPORT][FRANCE 2030][LINE] La ligne comporte un siret invalide. On l'ignore")
         line_json.pop("siret")
 
-    france_2030 = France2030(**line_json)
+    return France2030(**line_json)
+
+
+@celery.task(bind=True, name="import_lines_france_2030")
+@_handle_exception_import("FRANCE_2030")
+def import_lines_france_2030(self, france_2030_batch: list[dict]):
+    """
+    Importe un lot de lignes France 2030 en une requête.
+    Une ligne déjà importée (même tâche d'import et même numéro de ligne) est ignorée.
+    """
+    new_lines: list[France2030] = []
+    for line in france_2030_batch:
+        tech_info = LineImportTechInfo(*line["task"])
+        france_2030 = _france_2030_of_line(line["data"])
+        france_2030.file_import_taskid = tech_info.file_import_taskid
+        france_2030.file_import_lineno = tech_info.lineno
+        new_lines.append(france_2030)
+
+    if not new_lines:
+        return
+
+    # SIRET beneficiaires, vérifiés une fois pour tout le lot
+    AppUpdateRefSiretService.create_for_app().check_sirets(db.session, [line.siret for line in new_lines])
+
+    stmt = (
+        pg_insert(France2030.__table__)
+        .values(rows_of_entities(new_lines))
+        .on_conflict_do_nothing(constraint="uq_file_line_import_france_2030")
+    )
+    result = db.session.execute(stmt)
+    db.session.commit()
+
+    logger.info(f"[IMPORT][FRANCE 2030] Ajout de {result.rowcount} lignes sur {len(new_lines)}")
+
+
+@celery.task(bind=True, name="import_line_france_2030")
+@_handle_exception_import("FRANCE_2030")
+def import_line_france_2030(self, line: str, tech_info_list: list):
+    logger.debug(f"[IMPORT][FRANCE 2030][LINE] Traitement de la ligne ademe: {tech_info_list}")
+    logger.debug(f"[IMPORT][FRANCE 2030][LINE] Contenu de la ligne FRANCE_2030 : {line}")
+    logger.debug(f"[IMPORT][FRANCE 2030][LINE] Contenu du tech info      : {tech_info_list}")
+
+    tech_info = LineImportTechInfo(*tech_info_list)
+
+    france_2030 = _france_2030_of_line(line)
 
     france_2030.file_import_taskid = tech_info.file_import_taskid
     france_2030.file_import_lineno = tech_info.lineno
 
     logger.info(f"[IMPORT][FRANCE 2030][LINE] Tentative ligne France 2030 beneficiaire {france_2030.siret}")
     # SIRET beneficiaire
-    AppUpdateRefSiretService.create_for_app().check_siret(db.session, france_2030.siret)
+    AppUpdateRefSiretService.create_for_app().check_sirets(db.session, [france_2030.siret])
 
     db.session.add(france_2030)
     logger.info("[IMPORT][FRANCE 2030][LINE] Ajout ligne france 2030")
@@ -0,0 +1,132 @@
+"""
+Résolution des référentiels des lignes financières (AE, CP) lors des imports
+"""
+
+import threading
+from typing import Iterable
+
+from cachetools import TTLCache
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app import db
+from app.services.siret import AppUpdateRefSiretService
+from app.tasks.financial import logger
+from app.utilities.observability import SummaryOfTimePerfCounter, increment_counter
+from models.entities.financial.FinancialAe import FinancialAe
+from models.entities.financial.FinancialCp import FinancialCp
+from models.entities.refs.CentreCouts import CentreCouts
+from models.entities.refs.CodeProgramme import CodeProgramme
+from models.entities.refs.DomaineFonctionnel import DomaineFonctionnel
+from models.entities.refs.FournisseurTitulaire import FournisseurTitulaire
+from models.entities.refs.GroupeMarchandise import GroupeMarchandise
+from models.entities.refs.LocalisationInterministerielle import LocalisationInterministerielle
+from models.entities.refs.ReferentielProgrammation import ReferentielProgrammation
+from models.entities.refs.Siret import Siret
+
+_REFERENCE_MODELS = {
+    "programme": CodeProgramme,
+    "centre_couts": CentreCouts,
+    "domaine_fonctionnel": DomaineFonctionnel,
+    "fournisseur_titulaire": FournisseurTitulaire,
+    "groupe_marchandise": GroupeMarchandise,
+    "localisation_interministerielle": LocalisationInterministerielle,
+    "referentiel_programmation": ReferentielProgrammation,
+}
+
+_references_cache: TTLCache | None = None
+_references_cache_lock = threading.Lock()
+
+
+def get_references_cache() -> TTLCache | None:
+    """
+    Cache, propre au worker, des codes de référentiels connus en base.
+    Seuls les codes lus en base (donc déjà commités) y sont ajoutés.
+    Retourne None si le cache est désactivé (taille ou durée de vie à 0).
+    """
+    global _references_cache
+    maxsize = current_app.config.get("IMPORT_REFERENCES_CACHE_SIZE", 50000)
+    ttl = current_app.config.get("IMPORT_REFERENCES_CACHE_TTL", 600)
+    if maxsize <= 0 or ttl <= 0:
+        return None
+
+    with _references_cache_lock:
+        if _references_cache is None:
+            _references_cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        return _references_cache
+
+
+def clear_references_cache():
+    with _references_cache_lock:
+        if _references_cache is not None:
+            _references_cache.clear()
+
+
+def insert_references(entities: Iterable[FinancialAe | FinancialCp]):
+    """
+    Insère les codes de référentiels et les sirets manquants pour un lot de lignes financières.
+
+    Une requête `IN (...)` par référentiel pour les codes absents du cache,
+    puis un `INSERT ... ON CONFLICT DO NOTHING` par référentiel pour les codes manquants.
+    """
+    with SummaryOfTimePerfCounter.cm("import_lines_insert_references"):
+        codes_by_model, sirets = _collect_codes(entities)
+
+        try:
+            for model, codes in codes_by_model.items():
+                missing = _missing_codes(model, codes)
+                if missing:
+                    stmt = pg_insert(model).values([{"code": code} for code in sorted(missing)])
+                    db.session.execute(stmt.on_conflict_do_nothing(index_elements=[model.code]))
+
+            missing_sirets = _missing_codes(Siret, sirets)
+            if missing_sirets:
+                AppUpdateRefSiretService.create_for_app().check_sirets(db.session, missing_sirets)
+
+        except Exception as e:
+            logger.exception("[IMPORT][REF] Error lors de l'insertion en bulk des références.")
+            raise e
+
+
+def _collect_codes(entities: Iterable[FinancialAe | FinancialCp]) -> tuple[dict[type, set[str]], set[str]]:
+    codes_by_model: dict[type, set[str]] = {model: set() for model in _REFERENCE_MODELS.values()}
+    sirets: set[str] = set()
+
+    for entity in entities:
+        for attribute, model in _REFERENCE_MODELS.items():
+            if attribute == "fournisseur_titulaire" and not hasattr(entity, attribute):
+                code = entity.fournisseur_paye
+            else:
+                code = getattr(entity, attribute)
+            if code is not None:
+                codes_by_model[model].add(str(code))
+
+        if entity.siret is not None:
+            sirets.add(str(entity.siret))
+
+    return codes_by_model, sirets
+
+
+def _missing_codes(model, codes: set[str]) -> set[str]:
+    """Retourne les codes absents de la base. Les codes trouvés en base sont mis en cache."""
+    cache = get_references_cache()
+    table = model.__tablename__
+
+    if cache is None:
+        unknown = set(codes)
+    else:
+        with _references_cache_lock:
+            unknown = {code for code in codes if (table, code) not in cache}
+    increment_counter("import_lines_references_cache_hits", len(codes) - len(unknown))
+    increment_counter("import_lines_references_cache_misses", len(unknown))
+    if not unknown:
+        return set()
+
+    existing = set(db.session.scalars(select(model.code).where(model.code.in_(unknown))))
+    if cache is not None:
+        with _references_cache_lock:
+            for code in existing:
+                cache[(table, code)] = True
+
+    return unknown - existing
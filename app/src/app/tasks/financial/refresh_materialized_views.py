@@ -1,5 +1,6 @@
 from typing import List
 from celery import Celery
+from flask import current_app
 from app import celeryapp, db
 from models.entities.financial import Ademe, FinancialAe, FinancialCp
 from models.entities.refs import Siret
@@ -111,6 +112,29 @@ def _get_last_refresh_materialized_view_event(view: str) -> datetime | None:
     return last
 
 
+def _can_refresh_concurrently(view: str) -> bool:
+    """
+    Un refresh CONCURRENTLY ne bloque pas les lectures de la vue, mais nécessite
+    que la vue soit déjà peuplée et possède un index unique sans clause WHERE.
+    """
+    if not current_app.config.get("REFRESH_MATERIALIZED_VIEWS_CONCURRENTLY", True):
+        return False
+
+    stmt = text(
+        """
+        SELECT m.ispopulated AND EXISTS (
+            SELECT 1 FROM pg_index i
+            WHERE i.indrelid = format('%I.%I', m.schemaname, m.matviewname)::regclass
+              AND i.indisunique
+              AND i.indpred IS NULL
+        )
+        FROM pg_matviews m
+        WHERE m.matviewname = :view
+        """
+    )
+    return bool(db.session.execute(stmt, {"view": view}).scalar())
+
+
 def _do_maj_materialized_views(views: List[str]):
     result = {}
 
@@ -119,15 +143,16 @@ def _do_maj_materialized_views(views: List[str]):
         db.session.add(begin_evt)
         db.session.commit()
 
+        concurrently = _can_refresh_concurrently(view)
         start = time.time()
-        _logger.info(f"Refresh materialized view {view}")
-        db.session.execute(text(f"refresh materialized view {view};"))
+        _logger.info(f"Refresh materialized view {view} (concurrently: {concurrently})")
+        db.session.execute(text(f"refresh materialized view {'concurrently ' if concurrently else ''}{view};"))
         db.session.commit()
         elapsed = time.time() - start
         _logger.info(f"--- refreshed materialized view {view} in {elapsed} seconds")
-        result[view] = {"elapsed_seconds": elapsed}
+        result[view] = {"elapsed_seconds": elapsed, "concurrently": concurrently}
 
-        ended_evt = AuditRefreshMaterializedViewsEvents.create(RefreshMaterializedViewsEvent.ENDED, view)
+        ended_evt = AuditRefreshMaterializedViewsEvents.create(RefreshMaterializedViewsEvent.ENDED, view, duree=elapsed)
         db.session.add(ended_evt)
         db.session.commit()
 
@@ -7,6 +7,7 @@ from celery import current_app
 from app import celeryapp
 from app.services.import_refs import _get_instance_model_by_name, MissingCodeColumns
 from app.tasks import limiter_queue, LimitQueueException
+from app.tasks.financial.import_financial import get_batch_size
 
 LOGGER = logging.getLogger()
 
@@ -39,24 +40,29 @@ def import_refs_task(self, file: str, model_name: str, columns: List, is_csv=Tru
     # Renommer les colonnes
     df.columns = columns
 
-    # déterminiation de la task name
-    task_name = "import_line_one_ref_default"
-    if check_task_exists(f"import_line_one_ref_{model_name}"):
-        task_name = f"import_line_one_ref_{model_name}"
+    # si le code est nan ou none, on passe
+    lines = df[df.code.notna()].to_json(orient="records", lines=True).splitlines()
 
     try:
-        for index, row in df.iterrows():
-            if row.isna().code:  # si le code est nan ou none, on passe
-                continue
-            _send_subtask(task_name, model_name=model_name, data=row.to_json())
+        # Une task spécifique au référentiel importe les lignes une à une, sinon import par lots
+        task_name = f"import_line_one_ref_{model_name}"
+        if check_task_exists(task_name):
+            for data in lines:
+                _send_subtask(task_name, model_name=model_name, data=data)
+        else:
+            batch_size = get_batch_size()
+            for start in range(0, len(lines), batch_size):
+                _send_subtask(
+                    "import_lines_ref_default", model_name=model_name, lines=lines[start : start + batch_size]
+                )
     except LimitQueueException as e:
         LOGGER.exception("[IMPORT][REFS] Error limit queue exception", e)
         raise e
 
 
 @limiter_queue(queue_name="line")
-def _send_subtask(task_name, model_name, data):
-    subtask(task_name).delay(model_name=model_name, data=data)
+def _send_subtask(task_name, model_name, **kwargs):
+    subtask(task_name).delay(model_name=model_name, **kwargs)
 
 
 def check_task_exists(task_name):
@@ -3,8 +3,12 @@ import codecs
 import json
 import logging
 
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
 from app import db, celeryapp
 from app.services.import_refs import _get_instance_model_by_name
+from app.utilities.bulk import rows_of_entities
 
 LOGGER = logging.getLogger()
 
@@ -26,8 +30,7 @@ def import_line_one_ref_default(model_name: str, data: str):
 
     """
     model = _get_instance_model_by_name(model_name)
-    data = data.replace('\\"', r"'")
-    row = json.loads(codecs.decode(data, "unicode_escape"))
+    row = _parse_line(data)
 
     check_model = model(**row)
     instance = db.session.query(model).filter_by(code=check_model.code).one_or_none()
@@ -49,3 +52,43 @@ def import_line_one_ref_default(model_name: str, data: str):
         db.session.rollback()
         LOGGER.exception("[IMPORT][REF] Error sur ajout/maj ref %s dans %s ", model.__tablename__, row)
         raise e
+
+
+@celery.task(name="import_lines_ref_default")
+def import_lines_ref_default(model_name: str, lines: list[str]):
+    """
+    Importe un lot de lignes de référence dans une table de base de données, en une requête.
+    Les lignes sont insérées ou mises à jour selon leur code, la dernière ligne d'un code l'emporte dans le lot.
+
+        Args:
+            model_name  (str): Le nom de la classe modèle dans laquelle importer les références.
+            lines (list[str]): Les données des références au format JSON.
+    """
+    model = _get_instance_model_by_name(model_name)
+    rows = [_parse_line(data) for data in lines]
+
+    instances = list({instance.code: instance for instance in (model(**row) for row in rows)}.values())
+    if not instances:
+        return
+
+    table = model.__table__
+    values = rows_of_entities(instances)
+    stmt = pg_insert(table).values(values)
+    update_columns = {column: stmt.excluded[column] for column in values[0] if column != "code"}
+    if "updated_at" in table.c:
+        update_columns["updated_at"] = func.now()
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.code], set_=update_columns)
+
+    try:
+        db.session.execute(stmt)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        LOGGER.exception("[IMPORT][REF] Error sur ajout/maj de %s refs dans %s", len(instances), model.__tablename__)
+        raise e
+    LOGGER.info("[IMPORT][REF] Ajout/maj de %s refs dans %s", len(instances), model.__tablename__)
+
+
+def _parse_line(data: str) -> dict:
+    data = data.replace('\\"', r"'")
+    return json.loads(codecs.decode(data, "unicode_escape"))
@@ -1,6 +1,6 @@
 import json
 import logging
-from typing import NamedTuple
+from typing import Callable, NamedTuple
 
 from models.entities.financial.Ademe import Ademe
 from models.value_objects.tags import TagVO
@@ -8,12 +8,13 @@ from sqlalchemy import ColumnElement
 
 from app import celeryapp, db
 from models.value_objects.common import DataType
+from models.entities.common.Tags import Tags as DbTag
 from models.entities.financial.FinancialAe import FinancialAe as Ae
 from models.entities.financial.FinancialCp import FinancialCp as Cp
 from models.entities.refs.Commune import Commune
 from models.entities.refs.Siret import Siret
 from models.entities.refs.LocalisationInterministerielle import LocalisationInterministerielle
-from app.services.tags import select_tag, ApplyTagForAutomation
+from app.services.tags import select_tag, ApplyTagRulesForAutomation, TagRule
 from models.entities.refs.CodeProgramme import CodeProgramme
 from models.entities.refs.ReferentielProgrammation import ReferentielProgrammation
 
@@ -21,7 +22,7 @@ _celery = celeryapp.celery
 _logger = logging.getLogger()
 
 
-__all__ = ("apply_tags_fonds_vert", "apply_tags_relance", "apply_tags_detr", "apply_tags_cper_2015_20")
+__all__ = ("apply_tags_fonds_vert", "apply_tags_relance", "apply_tags_detr", "apply_tags_cper_2015_20", "TAG_RULES")
 
 
 class ContextApplyTags(NamedTuple):
@@ -45,19 +46,94 @@ class _ContextOps:
 
         return _ContextOps(_parsed)
 
-    @property
-    def conditions(self) -> ColumnElement[bool] | None:
+    def restrict(self, rule: TagRule) -> TagRule:
+        """Restreint la règle à l'entité désignée par le contexte"""
         if self.context is None:
-            return None
+            return rule
 
         if DataType(self.context.only) is DataType.FINANCIAL_DATA_AE and self.context.id is not None:
-            return Ae.id == self.context.id
+            return rule.restricted_to(Ae, Ae.id == self.context.id)
         if DataType(self.context.only) is DataType.FINANCIAL_DATA_CP and self.context.id is not None:
-            return Cp.id == self.context.id
+            return rule.restricted_to(Cp, Cp.id == self.context.id)
 
         raise RuntimeError("")
 
 
+#
+# Règles des tags auto: pour un tag, la condition d'éligibilité par type d'entité financière
+#
+def _communes_condition(commune_flag) -> ColumnElement[bool]:
+    """Condition sur les AE dont le siret ou la localisation interministérielle est dans une commune flaggée"""
+    codes_communes = db.select(Commune.code).where(commune_flag == True)  # noqa: E712
+    ids_communes = db.select(Commune.id).where(commune_flag == True)  # noqa: E712
+
+    siret_condition: ColumnElement[bool] = Ae.ref_siret.has(Siret.code_commune.in_(codes_communes))
+    loc_condition: ColumnElement[bool] = Ae.ref_localisation_interministerielle.has(
+        LocalisationInterministerielle.commune_id.in_(ids_communes)
+    )
+    return siret_condition | loc_condition
+
+
+def rule_fonds_vert(tag: DbTag) -> TagRule:
+    return TagRule(
+        tag,
+        {
+            Ae: Ae.programme == "380",
+            Ademe: Ademe.objet.ilike("fonds vert%") | Ademe.objet.like("FV%"),
+        },
+    )
+
+
+def rule_relance(tag: DbTag) -> TagRule:
+    programmes_relance = db.select(CodeProgramme.code).where(CodeProgramme.label_theme == "Plan de relance")
+    return TagRule(tag, {Ae: Ae.programme.in_(programmes_relance)})
+
+
+def rule_detr(tag: DbTag) -> TagRule:
+    ref_programmation_detr = db.select(ReferentielProgrammation.code).where(
+        ReferentielProgrammation.label.ilike("detr")
+    )
+    return TagRule(tag, {Ae: Ae.referentiel_programmation.in_(ref_programmation_detr)})
+
+
+def rule_cper_2015_20(tag: DbTag) -> TagRule:
+    return TagRule(tag, {Ae: (Ae.contrat_etat_region != "#") & (Ae.annee >= 2015) & (Ae.annee <= 2020)})
+
+
+def rule_cper_2021_27(tag: DbTag) -> TagRule:
+    return TagRule(tag, {Ae: (Ae.contrat_etat_region != "#") & (Ae.annee >= 2021) & (Ae.annee <= 2027)})
+
+
+def rule_pvd(tag: DbTag) -> TagRule:
+    return TagRule(tag, {Ae: _communes_condition(Commune.is_pvd)})
+
+
+def rule_acv(tag: DbTag) -> TagRule:
+    return TagRule(tag, {Ae: _communes_condition(Commune.is_acv)})
+
+
+def rule_cp_orphelin(tag: DbTag) -> TagRule:
+    return TagRule(tag, {Cp: Cp.id_ae.is_(None)})
+
+
+TAG_RULES: dict[str, Callable[[DbTag], TagRule]] = {
+    "apply_tags_fonds_vert": rule_fonds_vert,
+    "apply_tags_relance": rule_relance,
+    "apply_tags_detr": rule_detr,
+    "apply_tags_cper_2015_20": rule_cper_2015_20,
+    "apply_tags_cper_2021_27": rule_cper_2021_27,
+    "apply_tags_pvd": rule_pvd,
+    "apply_tags_cp_orphelin": rule_cp_orphelin,
+    "apply_tags_acv": rule_acv,
+}
+"""Règles des tags auto, indexées par le nom de la tâche qui applique le tag"""
+
+
+def _apply_rule(rule_name: str, tag: DbTag, context: dict | str | None):
+    rule = _ContextOps.ops(context).restrict(TAG_RULES[rule_name](tag))
+    ApplyTagRulesForAutomation([rule]).apply()
+
+
 @_celery.task(bind=True, name="apply_tags_fonds_vert")
 def apply_tags_fonds_vert(self, tag_type: str, _tag_value: str | None, context: dict | None):
     """
@@ -73,21 +149,7 @@ def apply_tags_fonds_vert(self, tag_type: str, _tag_value: str | None, context:
     tag = select_tag(TagVO.from_typevalue(tag_type))
     _logger.debug(f"[TAGS][Fond vert] Récupération du tag fond vert id : {tag.id}")
 
-    condition = Ae.programme == "380"
-    ctx_ops = _ContextOps.ops(context)
-    if ctx_ops.conditions is not None:
-        condition &= ctx_ops.conditions
-
-    apply_task = ApplyTagForAutomation(tag)
-    apply_task.apply_tags_ae(condition)
-
-    #
-    condition = Ademe.objet.ilike("fonds vert%") | Ademe.objet.like("FV%")
-    if ctx_ops.conditions is not None:
-        condition &= ctx_ops.conditions
-
-    apply_task = ApplyTagForAutomation(tag)
-    apply_task.apply_tags_ademe(condition)
+    _apply_rule("apply_tags_fonds_vert", tag, context)
 
 
 @_celery.task(bind=True, name="apply_tags_relance")
@@ -104,22 +166,7 @@ def apply_tags_relance(self, tag_type: str, _tag_value: str | None, context: dic
     tag = select_tag(TagVO.from_typevalue(tag_type))
     _logger.debug(f"[TAGS][{tag.type}] Récupération du tag relance id : {tag.id}")
 
-    stmt_programme_relance = (
-        db.select(CodeProgramme.code).where(CodeProgramme.label_theme == "Plan de relance").distinct()
-    )
-    list_programme = []
-    for programme in db.session.execute(stmt_programme_relance).fetchall():
-        list_programme.append(programme.code)
-    _logger.debug(f"[TAGS][{tag.type}] Récupération des programmes appartement au theme Relance")
-
-    condition = Ae.programme.in_(list_programme)
-
-    ctx_ops = _ContextOps.ops(context)
-    if ctx_ops.conditions is not None:
-        condition &= ctx_ops.conditions
-
-    apply_task = ApplyTagForAutomation(tag)
-    apply_task.apply_tags_ae(condition)
+    _apply_rule("apply_tags_relance", tag, context)
 
 
 @_celery.task(bind=True, name="apply_tags_detr")
@@ -136,22 +183,7 @@ def apply_tags_detr(self, tag_type: str, _tag_value: str | None, context: dict |
     tag = select_tag(TagVO.from_typevalue(tag_type))
     _logger.debug(f"[TAGS][{tag.type}] Récupération du tag DETR id : {tag.id}")
 
-    stmt_ref_programmation = (
-        db.select(ReferentielProgrammation.code).where(ReferentielProgrammation.label.ilike("detr")).distinct()
-    )
-    list_ref_programmation = []
-    for ref_progammation in db.session.execute(stmt_ref_programmation).fetchall():
-        list_ref_programmation.append(ref_progammation.code)
-
-    condition = Ae.referentiel_programmation.in_(list_ref_programmation)
-    _logger.debug(f"[TAGS][{tag.type}] Récupération des ref programmation DETR")
-
-    ctx_ops = _ContextOps.ops(context)
-    if ctx_ops.conditions is not None:
-        condition &= ctx_ops.conditions
-
-    apply_task = ApplyTagForAutomation(tag)
-    apply_task.apply_tags_ae(condition)
+    _apply_rule("apply_tags_detr", tag, context)
 
 
 @_celery.task(bind=True, name="apply_tags_cper_2015_20")
@@ -168,14 +200,7 @@ def apply_tags_cper_2015_20(self, tag_type: str, tag_value: str | None, context:
     tag = select_tag(TagVO.from_typevalue(tag_type, tag_value))
     _logger.debug(f"[TAGS][{tag.type}] Récupération du tag CPER id : {tag.id}")
 
-    condition = (Ae.contrat_etat_region != "#") & (Ae.annee >= 2015) & (Ae.annee <= 2020)
-
-    ctx_ops = _ContextOps.ops(context)
-    if ctx_ops.conditions is not None:
-        condition &= ctx_ops.conditions
-
-    apply_task = ApplyTagForAutomation(tag)
-    apply_task.apply_tags_ae(condition)
+    _apply_rule("apply_tags_cper_2015_20", tag, context)
 
 
 @_celery.task(bind=True, name="apply_tags_cper_2021_27")
@@ -192,14 +217,7 @@ def apply_tags_cper_2021_27(self, tag_type: str, tag_value: str | None, context:
     tag = select_tag(TagVO.from_typevalue(tag_type, tag_value))
     _logger.debug(f"[TAGS][{tag.type}] Récupération du tag CPER id : {tag.id}")
 
-    condition = (Ae.contrat_etat_region != "#") & (Ae.annee >= 2021) & (Ae.annee <= 2027)
-
-    ctx_ops = _ContextOps.ops(context)
-    if ctx_ops.conditions is not None:
-        condition &= ctx_ops.conditions
-
-    apply_task = ApplyTagForAutomation(tag)
-    apply_task.apply_tags_ae(condition)
+    _apply_rule("apply_tags_cper_2021_27", tag, context)
 
 
 @_celery.task(bind=True, name="apply_tags_pvd")
@@ -216,26 +234,7 @@ def apply_tags_pvd(self, tag_type: str, tag_value: str | None, context: str | No
     tag = select_tag(TagVO.from_typevalue(tag_type))
     _logger.debug(f"[TAGS][{tag.type}] Récupération du tag PVD id : {tag.id}")
 
-    # Récupération des codes des communes PVD
-    stmt_communes_pvd = db.select(Commune.id, Commune.code).where(Commune.is_pvd == True)  # noqa: E712
-    communes_pvd = db.session.execute(stmt_communes_pvd).fetchall()
-    _logger.debug(f"[TAGS][{tag.type}] Récupération des communes PVD")
-
-    # Création des conditions
-    siret_condition: ColumnElement[bool] = Ae.ref_siret.has(Siret.code_commune.in_([c.code for c in communes_pvd]))
-    loc_condition: ColumnElement[bool] = Ae.ref_localisation_interministerielle.has(
-        LocalisationInterministerielle.commune_id.in_([c.id for c in communes_pvd])
-    )
-
-    condition = siret_condition | loc_condition
-
-    ctx_ops = _ContextOps.ops(context)
-    if ctx_ops.conditions is not None:
-        condition &= ctx_ops.conditions
-
-    # Application du tag aux AE
-    apply_task = ApplyTagForAutomation(tag)
-    apply_task.apply_tags_ae(condition)
+    _apply_rule("apply_tags_pvd", tag, context)
 
 
 @_celery.task(bind=True, name="apply_tags_cp_orphelin")
@@ -252,14 +251,7 @@ def apply_tags_cp_orphelin(self, tag_type: str, tag_value: str | None, context:
     tag = select_tag(TagVO.from_typevalue(tag_type))
     _logger.debug(f"[TAGS][{tag.type}] Récupération du tag CP ORPHELIN id : {tag.id}")
 
-    condition = Cp.id_ae.is_(None)
-    ctx_ops = _ContextOps.ops(context)
-    if ctx_ops.conditions is not None:
-        condition &= ctx_ops.conditions
-
-    # Application du tag aux entités
-    apply_task = ApplyTagForAutomation(tag)
-    apply_task.apply_tags_cp(condition)
+    _apply_rule("apply_tags_cp_orphelin", tag, context)
 
 
 @_celery.task(bind=True, name="apply_tags_acv")
@@ -276,22 +268,4 @@ def apply_tags_acv(self, tag_type: str, tag_value: str | None, context: str | No
     tag = select_tag(TagVO.from_typevalue(tag_type))
     _logger.debug(f"[TAGS][{tag.type}] Récupération du tag ACV id : {tag.id}")
 
-    # Récupération des codes des communes ACV
-    stmt_communes_acv = db.select(Commune.id, Commune.code).where(Commune.is_acv == True)  # noqa: E712
-    communes_acv = db.session.execute(stmt_communes_acv).fetchall()
-    _logger.debug(f"[TAGS][{tag.type}] Récupération des communes ACV")
-
-    # Création des conditions
-    siret_condition: ColumnElement[bool] = Ae.ref_siret.has(Siret.code_commune.in_([c.code for c in communes_acv]))
-    loc_condition: ColumnElement[bool] = Ae.ref_localisation_interministerielle.has(
-        LocalisationInterministerielle.commune_id.in_([c.id for c in communes_acv])
-    )
-
-    condition = siret_condition | loc_condition
-    ctx_ops = _ContextOps.ops(context)
-    if ctx_ops.conditions is not None:
-        condition &= ctx_ops.conditions
-
-    # Application du tag aux AE
-    apply_task = ApplyTagForAutomation(tag)
-    apply_task.apply_tags_ae(condition)
+    _apply_rule("apply_tags_acv", tag, context)
@@ -1,11 +1,18 @@
-import json
 import logging
 import string
+import time
+from datetime import datetime, timedelta
 
-from celery import subtask
+from flask import current_app
+from sqlalchemy import desc, func
 
 from app import celeryapp, db
+from app.services.tags import ApplyTagRulesForAutomation, TagRule
+from app.tasks.tags.apply_tags import TAG_RULES
+from models.entities.audit.AuditApplyTagsAuto import AuditApplyTagsAuto
 from models.entities.common.Tags import Tags
+from models.entities.financial.FinancialAe import FinancialAe as Ae
+from models.entities.financial.FinancialCp import FinancialCp as Cp
 
 celery = celeryapp.celery
 LOGGER = logging.getLogger()
@@ -16,53 +23,85 @@ __all__ = (
     "update_all_tags_of_cp",
 )
 
+_translator = str.maketrans(string.whitespace + "-", "_" * len(string.whitespace + "-"))
+
+
+def _rule_name(tag: Tags) -> str:
+    type = tag.type.lower().translate(_translator)
+    value = tag.value.lower().translate(_translator) if tag.value is not None else None
+    return f"apply_tags_{type}" if value is None else f"apply_tags_{type}_{value}"
+
+
+def _enabled_rules() -> list[TagRule]:
+    """Construit les règles des tags dont l'application auto est activée"""
+    stmt = db.select(Tags).where(Tags.enable_rules_auto == True)  # noqa: E712
+    LOGGER.debug("[TAGS] Sélection des tags pour application auto")
+
+    rules = []
+    for tag in db.session.execute(stmt).scalars():
+        rule_name = _rule_name(tag)
+        LOGGER.debug(f"[TAGS] {tag.type} {tag.value} tag trouvé pour application auto ({rule_name})")
+        if rule_name not in TAG_RULES:
+            LOGGER.warning(f"[TAGS] Pas de règle d'application auto pour le tag {tag.type} {tag.value}")
+            continue
+        rules.append(TAG_RULES[rule_name](tag))
+    return rules
+
+
+def _incremental_since() -> datetime | None:
+    """
+    Date à partir de laquelle les lignes sont évaluées en mode incrémental: le début du dernier passage,
+    moins une marge couvrant les imports en cours à ce moment là.
+    Seul le updated_at des AE / CP est comparé: une modification des seuls référentiels (communes PVD / ACV,
+    programmes, thèmes) n'est pas prise en compte, elle l'est par la passe complète planifiée.
+    """
+    last = db.session.execute(db.select(AuditApplyTagsAuto).order_by(desc(AuditApplyTagsAuto.date)).limit(1)).scalar()
+    if last is None:
+        return None
+    overlap = current_app.config.get("TAGS_INCREMENTAL_OVERLAP_SECONDS", 3600)
+    return last.date - timedelta(seconds=overlap)
+
 
 @celery.task(bind=True, name="update_all_tags")
-def update_all_tags(self):
+def update_all_tags(self, incremental: bool = False):
     """
-    Parcours la liste des tags disponibles et lance leur application auto
+    Applique les règles de tous les tags auto, en une passe SQL par type d'entité financière
     :param self:
+    :param incremental: n'évalue que les lignes modifiées depuis le passage précédent.
+        Ne couvre pas les changements des référentiels, une passe complète doit rester planifiée.
     :return:
     """
-    LOGGER.info("[TAGS] Start Application des tags")
+    LOGGER.info(f"[TAGS] Start Application des tags (incremental: {incremental})")
 
-    stmt = db.select(Tags).where(Tags.enable_rules_auto == True)  # noqa: E712
-    LOGGER.debug("[TAGS] Sélection des tags pour application auto")
+    run_date = db.session.execute(db.select(func.now())).scalar_one()
+    since = _incremental_since() if incremental else None
+    if incremental and since is None:
+        LOGGER.info("[TAGS] Aucun passage précédent, toutes les lignes sont évaluées")
 
-    translator = str.maketrans(string.whitespace + "-", "_" * len(string.whitespace + "-"))
+    start = time.perf_counter()
+    created = ApplyTagRulesForAutomation(_enabled_rules()).apply(since=since)
+    duree = time.perf_counter() - start
 
-    for tag in db.session.execute(stmt).scalars():
-        LOGGER.debug(f"[TAGS] {tag.type} {tag.value} tag trouvé pour application auto")
-        type = tag.type.lower().translate(translator)
-        value = tag.value.lower().translate(translator) if tag.value is not None else None
-        subtask_name = f"apply_tags_{type}" if value is None else f"apply_tags_{type}_{value}"
-        LOGGER.debug(f"[TAGS ]envoi subtask {subtask_name}")
-        subtask(subtask_name).delay(tag.type, tag.value, None)
+    audit = AuditApplyTagsAuto(
+        date=run_date, incremental=since is not None, nb_associations=sum(created.values()), duree=duree
+    )
+    db.session.add(audit)
+    db.session.commit()
 
-    LOGGER.info("[TAGS] End Application des tags")
+    LOGGER.info(f"[TAGS] End Application des tags: {audit.nb_associations} associations créées en {duree:.2f}s")
 
 
 @celery.task(bind=True, name="update_all_tags_of_ae")
 def update_all_tags_of_ae(self, id_ae: int):
     """
-    Parcours la liste des tags disponibles et lance leur application auto
+    Applique les règles de tous les tags auto sur un AE
     :param self:
     :return:
     """
     LOGGER.info(f"[TAGS] Start - Application des tags pour l'AE {id_ae}")
 
-    stmt = db.select(Tags).where(Tags.enable_rules_auto == True)  # noqa: E712
-    LOGGER.debug("[TAGS] Sélection des tags pour application auto")
-
-    translator = str.maketrans(string.whitespace + "-", "_" * len(string.whitespace + "-"))
-
-    for tag in db.session.execute(stmt).scalars():
-        LOGGER.debug(f"[TAGS] {tag.type} {tag.value} tag trouvé pour application auto")
-        type = tag.type.lower().translate(translator)
-        value = tag.value.lower().translate(translator) if tag.value is not None else None
-        subtask_name = f"apply_tags_{type}" if value is None else f"apply_tags_{type}_{value}"
-        LOGGER.debug(f"[TAGS ] envoi subtask {subtask_name}")
-        subtask(subtask_name).delay(tag.type, tag.value, json.dumps({"only": "FINANCIAL_DATA_AE", "id": id_ae}))
+    rules = [rule.restricted_to(Ae, Ae.id == id_ae) for rule in _enabled_rules()]
+    ApplyTagRulesForAutomation(rules).apply()
 
     LOGGER.info(f"[TAGS] End - Application des tags pour l'AE {id_ae}")
 
@@ -70,23 +109,13 @@ def update_all_tags_of_ae(self, id_ae: int):
 @celery.task(bind=True, name="update_all_tags_of_cp")
 def update_all_tags_of_cp(self, id_cp: int):
     """
-    Parcours la liste des tags disponibles et lance leur application auto
+    Applique les règles de tous les tags auto sur un CP
     :param self:
     :return:
     """
     LOGGER.info(f"[TAGS] Start - Application des tags pour le CP {id_cp}")
 
-    stmt = db.select(Tags).where(Tags.enable_rules_auto == True)  # noqa: E712
-    LOGGER.debug("[TAGS] Sélection des tags pour application auto")
-
-    translator = str.maketrans(string.whitespace + "-", "_" * len(string.whitespace + "-"))
-
-    for tag in db.session.execute(stmt).scalars():
-        LOGGER.debug(f"[TAGS] {tag.type} {tag.value} tag trouvé pour application auto")
-        type = tag.type.lower().translate(translator)
-        value = tag.value.lower().translate(translator) if tag.value is not None else None
-        subtask_name = f"apply_tags_{type}" if value is None else f"apply_tags_{type}_{value}"
-        LOGGER.debug(f"[TAGS ] envoi subtask {subtask_name}")
-        subtask(subtask_name).delay(tag.type, tag.value, json.dumps({"only": "FINANCIAL_DATA_CP", "id": id_cp}))
+    rules = [rule.restricted_to(Cp, Cp.id == id_cp) for rule in _enabled_rules()]
+    ApplyTagRulesForAutomation(rules).apply()
 
     LOGGER.info(f"[TAGS] End - Application des tags pour le CP {id_cp}")
@@ -0,0 +1,117 @@
+"""
+Régulation de la publication de messages dans une file rabbitmq (backpressure)
+"""
+
+import threading
+import time
+from typing import Callable
+
+from prometheus_client import Counter, Gauge
+
+_PUBLISHED = Counter("limiter_queue_published_total", "Messages autorisés à la publication", ["queue"])
+_THROTTLE_SECONDS = Counter(
+    "limiter_queue_throttle_seconds_total", "Temps passé à attendre avant de publier un message", ["queue"]
+)
+_DEPTH_PROBES = Counter("limiter_queue_depth_probes_total", "Lectures de la profondeur de la file", ["queue"])
+_ESTIMATED_DEPTH = Gauge("limiter_queue_estimated_depth", "Profondeur estimée de la file", ["queue"])
+
+
+class QueueBackpressure:
+    """
+    Régule la publication de messages dans une file.
+
+    La profondeur de la file est lue (`probe`) au plus une fois par `refresh_interval` secondes.
+    Entre deux lectures, elle est estimée localement en ajoutant les messages publiés depuis la dernière lecture.
+    Quand la file est pleine, l'attente avant de relire la profondeur double à chaque tentative,
+    de `min_delay` à `max_delay` secondes. Si `rate` est renseigné, la publication est de plus cadencée
+    par un token bucket à `rate` messages par seconde.
+    """
+
+    def __init__(
+        self,
+        queue_name: str,
+        probe: Callable[[], int | None],
+        max_queue_size: int,
+        refresh_interval: float = 1.0,
+        rate: float | None = None,
+        min_delay: float = 0.5,
+        max_delay: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self._queue_name = queue_name
+        self._probe = probe
+        self._max_queue_size = max_queue_size
+        self._refresh_interval = refresh_interval
+        self._rate = rate
+        self._burst = max(1.0, rate) if rate else 0.0
+        self._min_delay = min_delay
+        self._max_delay = max_delay
+        self._clock = clock
+        self._sleep = sleep
+
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._published_since_probe = 0
+        self._probed_at: float | None = None
+        self._tokens = self._burst
+        self._refilled_at: float | None = None
+
+    def acquire(self, timeout: float) -> bool:
+        """
+        Attend que la publication d'un message soit possible et la comptabilise.
+        :param timeout: durée maximale d'attente (en secondes) tant que la file est pleine
+        :return: False si la file est restée pleine au-delà de `timeout`
+        """
+        with self._lock:
+            start = self._clock()
+            delay = self._min_delay
+
+            while self._current_depth() > self._max_queue_size:
+                waited = self._clock() - start
+                if waited >= timeout:
+                    self._throttled(waited)
+                    return False
+                self._sleep(min(delay, timeout - waited))
+                delay = min(delay * 2, self._max_delay)
+                self._probed_at = None
+
+            self._take_token()
+            self._throttled(self._clock() - start)
+
+            self._depth += 1
+            self._published_since_probe += 1
+            _PUBLISHED.labels(self._queue_name).inc()
+            _ESTIMATED_DEPTH.labels(self._queue_name).set(self._depth)
+            return True
+
+    def _current_depth(self) -> int:
+        now = self._clock()
+        stale = self._probed_at is None or now - self._probed_at >= self._refresh_interval
+        # L'estimation ne voit pas les messages consommés: on relit avant de bloquer sur une estimation
+        overestimated = self._depth > self._max_queue_size and self._published_since_probe > 0
+        if stale or overestimated:
+            self._depth = self._probe() or 0
+            self._published_since_probe = 0
+            self._probed_at = now
+            _DEPTH_PROBES.labels(self._queue_name).inc()
+            _ESTIMATED_DEPTH.labels(self._queue_name).set(self._depth)
+        return self._depth
+
+    def _take_token(self):
+        if not self._rate:
+            return
+        now = self._clock()
+        if self._refilled_at is not None:
+            self._tokens = min(self._burst, self._tokens + (now - self._refilled_at) * self._rate)
+        self._refilled_at = now
+
+        if self._tokens < 1:
+            self._sleep((1 - self._tokens) / self._rate)
+            self._tokens = 1.0
+            self._refilled_at = self._clock()
+        self._tokens -= 1
+
+    def _throttled(self, seconds: float):
+        if seconds > 0:
+            _THROTTLE_SECONDS.labels(self._queue_name).inc(seconds)
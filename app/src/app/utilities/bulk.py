@@ -0,0 +1,27 @@
+"""
+Outils pour l'insertion en lot d'entités
+"""
+
+from typing import Iterable, Sequence
+
+from sqlalchemy import inspect
+
+
+def rows_of_entities(entities: Sequence, exclude: Iterable[str] = ("id", "created_at", "updated_at")) -> list[dict]:
+    """
+    Valeurs des colonnes d'entités non persistées, indexées par nom de colonne, pour un INSERT multi-lignes.
+
+    Seules les colonnes renseignées sur au moins une des entités sont retenues,
+    les autres prennent leur valeur par défaut en base.
+    """
+    if not entities:
+        return []
+
+    exclude = set(exclude)
+    mapper = inspect(type(entities[0]))
+    attrs = [
+        attr
+        for attr in mapper.column_attrs
+        if attr.key not in exclude and any(attr.key in entity.__dict__ for entity in entities)
+    ]
+    return [{attr.columns[0].key: getattr(entity, attr.key) for attr in attrs} for entity in entities]
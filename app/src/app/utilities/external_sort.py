@@ -0,0 +1,94 @@
+"""
+Module de tri externe. ie. tri de volumes ne tenant pas en mémoire
+"""
+
+import heapq
+import json
+import os
+import tempfile
+from operator import itemgetter
+from typing import Any, Iterator
+
+DEFAULT_RUN_SIZE = 50000
+DEFAULT_MAX_FAN_IN = 64
+
+_sort_key = itemgetter(0, 1)
+
+
+class ExternalSorter:
+    """
+    Tri externe d'enregistrements (clé, valeur) par clé.
+
+    Les enregistrements sont accumulés en mémoire par paquets de `run_size`, chaque paquet
+    est trié puis déversé sur disque (un "run"). La lecture fusionne les runs (k-way merge),
+    la mémoire consommée ne dépend donc pas du nombre d'enregistrements.
+    L'ordre d'insertion est conservé entre enregistrements de même clé (tri stable).
+
+    Les valeurs doivent être sérialisables en JSON.
+    """
+
+    def __init__(self, workdir: str, run_size: int = DEFAULT_RUN_SIZE, max_fan_in: int = DEFAULT_MAX_FAN_IN):
+        if run_size < 1 or max_fan_in < 2:
+            raise ValueError("run_size doit être >= 1 et max_fan_in >= 2")
+
+        self._workdir = workdir
+        self._run_size = run_size
+        self._max_fan_in = max_fan_in
+        self._buffer: list[tuple[str, int, Any]] = []
+        self._runs: list[str] = []
+        self._seq = 0
+
+    def __len__(self):
+        return self._seq
+
+    def add(self, key: str, value: Any):
+        self._buffer.append((key, self._seq, value))
+        self._seq += 1
+        if len(self._buffer) >= self._run_size:
+            self._spill()
+
+    def __iter__(self) -> Iterator[tuple[str, Any]]:
+        """Itère sur les enregistrements (clé, valeur) triés par clé. À ne parcourir qu'une fois."""
+        if not self._runs:
+            # Tout tient dans un seul paquet, pas besoin de passer par le disque
+            self._buffer.sort(key=_sort_key)
+            records: Iterator = iter(self._buffer)
+        else:
+            self._spill()
+            while len(self._runs) > self._max_fan_in:
+                self._runs = [
+                    self._write_run(self._merge(self._runs[i : i + self._max_fan_in], remove=True))
+                    for i in range(0, len(self._runs), self._max_fan_in)
+                ]
+            records = self._merge(self._runs, remove=True)
+
+        for key, _, value in records:
+            yield key, value
+        self._buffer = []
+
+    def _spill(self):
+        if not self._buffer:
+            return
+        self._buffer.sort(key=_sort_key)
+        self._runs.append(self._write_run(self._buffer))
+        self._buffer = []
+
+    def _write_run(self, records) -> str:
+        fd, path = tempfile.mkstemp(dir=self._workdir, prefix="run_", suffix=".jsonl")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record))
+                f.write("\n")
+        return path
+
+    @staticmethod
+    def _read_run(path: str, remove: bool) -> Iterator[list]:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+        if remove:
+            os.remove(path)
+
+    @classmethod
+    def _merge(cls, runs: list[str], remove: bool) -> Iterator[list]:
+        return heapq.merge(*(cls._read_run(run, remove) for run in runs), key=_sort_key)
@@ -4,7 +4,7 @@ Module pour l'observabilité. ie. prometheus
 
 from contextlib import contextmanager
 from functools import wraps
-from prometheus_client import Gauge, Summary
+from prometheus_client import Counter, Gauge, Summary
 import time
 
 
@@ -40,6 +40,22 @@ def _get_gauge_of_currently_executing_or_default(name) -> Gauge:
     return __GAUGE_CACHE[name]
 
 
+__COUNTER_CACHE = {}
+
+
+def _get_counter_or_default(name) -> Counter:
+    if name not in __COUNTER_CACHE:
+        counter = Counter(name, f"Counter for {name}")
+        __COUNTER_CACHE[name] = counter
+    return __COUNTER_CACHE[name]
+
+
+def increment_counter(name: str, amount: float = 1):
+    """Incrémente la métrique prometheus de type compteur `name`"""
+    if amount:
+        _get_counter_or_default(sanitize_prom_metric_name(name)).inc(amount)
+
+
 def summary_of_time():
     """Expose une métrique prometheus concernant le temps d'execution de la fonction sous forme de summary"""
 
@@ -4,6 +4,7 @@ from unittest.mock import patch
 from pathlib import Path
 
 from app import db  # noqa: F401
+from app.tasks.financial.references import clear_references_cache
 
 from models.entities.common.Tags import Tags
 from models.entities.financial.Ademe import Ademe
@@ -62,3 +63,4 @@ def delete_references(session):
     session.execute(delete(Qpv))
 
     session.commit()
+    clear_references_cache()
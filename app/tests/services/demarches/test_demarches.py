@@ -2,16 +2,25 @@ from datetime import datetime
 import json
 import os
 from pathlib import Path
+from unittest.mock import patch
 import pytest
 
+from models.entities.common.Tags import TagAssociation, Tags
 from models.entities.demarches.Demarche import Demarche
 from models.entities.demarches.Donnee import Donnee
 from models.entities.demarches.Dossier import Dossier
+from models.entities.demarches.Reconciliation import Reconciliation
 
 from models.entities.demarches.Section import Section
+from models.entities.demarches.ValeurDonnee import ValeurDonnee
 from models.entities.demarches.Type import Type
 
 from app.services.demarches.demarches import DemarcheService, DemarcheExistsException
+from app.services.demarches.reconciliations import ReconciliationService
+from app.tasks.demarches.update_demarches import update_demarche
+from tests import delete_references
+from tests.tasks import build_financial_ae
+from tests.tasks.tags.test_tag_acv import add_references
 
 from .fixtures import init_tokens, fernet_key  # noqa: F401
 
@@ -160,3 +169,179 @@ def test_demarche_delete_success(init_demarche):
     demarche: Demarche = DemarcheService.find(49721)
     DemarcheService.delete(demarche)
     assert DemarcheService.exists(49721) is False
+
+
+def _dossier_ds(number: int, state: str, siret: str, valeur: str) -> dict:
+    return {
+        "number": number,
+        "state": state,
+        "dateDepot": "2021-10-19T10:06:26+02:00",
+        "dateDerniereModification": "2024-08-01T12:00:00+02:00",
+        "demarche": {"revision": {"id": "okokok"}},
+        "demandeur": {"siret": siret},
+        "champs": [{"id": "a", "label": "Email du référent", "__typename": "TextChamp", "stringValue": valeur}],
+        "annotations": [],
+    }
+
+
+def _page_ds(dossiers: list[dict]) -> dict:
+    return {
+        "data": {
+            "demarche": {
+                "title": "DETR 2022 - Finistère",
+                "state": "publiee",
+                "chorusConfiguration": {
+                    "centreDeCout": "PRFSG04029",
+                    "domaineFonctionnel": "0119-01-06",
+                    "referentielDeProgrammation": "0119010101A6",
+                },
+                "dateCreation": "2021-10-19T10:06:26+02:00",
+                "dateFermeture": None,
+                "revisions": [
+                    {
+                        "id": "okokok",
+                        "champDescriptors": [
+                            {"id": "a", "label": "Email du référent", "__typename": "EmailChampDescriptor"}
+                        ],
+                        "annotationDescriptors": [],
+                    }
+                ],
+                "dossiers": {
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                    "nodes": dossiers,
+                },
+            }
+        }
+    }
+
+
+def test_demarche_synchroniser_upserts_modified_dossiers(database, init_demarche):
+    page = _page_ds(
+        [
+            _dossier_ds(12345, "accepte", "11111111111111", "modifie@example.com"),
+            _dossier_ds(22222, "accepte", "22222222222222", "nouveau@example.com"),
+            _dossier_ds(67890, "refuse", "33333333333333", "refuse@example.com"),
+            _dossier_ds(33333, "refuse", "33333333333333", "refuse@example.com"),
+        ]
+    )
+    demarche = DemarcheService.find(49721)
+
+    with patch.object(DemarcheService, "query_demarche_pages", return_value=iter([page])) as query:
+        modifies, retires = DemarcheService.synchroniser_demarche("uuid", 101, demarche)
+
+    assert query.call_args.kwargs["updated_since"].startswith("2024-07-29T16:09:09")
+    assert (modifies, retires) == ({12345, 22222}, {67890, 33333})
+
+    dossiers = {d.number: d for d in database.session.execute(database.select(Dossier)).scalars()}
+    assert dossiers[12345].siret == "11111111111111"
+    assert 22222 in dossiers
+    # Les dossiers non acceptés ne sont ni insérés, ni supprimés: c'est la tâche update_demarche qui les retire
+    assert 33333 not in dossiers
+    assert dossiers[67890].state == "en_instruction"
+
+    valeurs = database.session.execute(
+        database.select(ValeurDonnee.valeur).where(ValeurDonnee.dossier_number == 12345)
+    ).scalars()
+    assert list(valeurs) == ["modifie@example.com"]
+
+    database.session.expire_all()
+    assert DemarcheService.find(49721).title == "DETR 2022 - Finistère"
+    assert DemarcheService.find(49721).date_import > datetime(2024, 7, 30)
+
+
+@pytest.fixture(scope="function")
+def dossier_reconcilie(database, init_demarche):
+    """Le dossier accepté 12345 est réconcilié avec une ligne financière, taggée reconcilie-ds"""
+    tag = Tags(
+        type="reconcilie-ds",
+        value=None,
+        description="Réconcilié avec un dossier DS",
+        display_name="Réconcilié DS",
+        enable_rules_auto=False,
+    )
+    database.session.add(tag)
+    ae = build_financial_ae(datetime.now())
+    add_references(ae, database.session, region="53")
+    database.session.add(ae)
+    database.session.flush()
+    database.session.add(
+        Reconciliation(dossier_number=12345, financial_ae_id=ae.id, date_reconciliation=datetime.now())
+    )
+    database.session.add(TagAssociation(tag_id=tag.id, financial_ae=ae.id, auto_applied=True))
+    DemarcheService.update_reconciliation(49721, {"champEJ": "a"})
+    database.session.commit()
+
+    yield ae
+
+    database.session.execute(database.delete(Reconciliation))
+    delete_references(database.session)
+
+
+def test_update_demarche_retire_dossier_plus_accepte(database, dossier_reconcilie):
+    page = _page_ds([_dossier_ds(12345, "refuse", "21290243100015", "refuse@example.com")])
+
+    with (
+        patch.object(DemarcheService, "query_demarche_pages", return_value=iter([page])) as query,
+        patch.object(ReconciliationService, "do_reconciliation") as do_reconciliation,
+    ):
+        update_demarche("uuid", 101, 49721)
+
+    assert query.call_args.kwargs["updated_since"] is not None
+    # Aucun dossier accepté modifié: la réconciliation n'est pas relancée
+    do_reconciliation.assert_not_called()
+
+    dossiers = database.session.execute(database.select(Dossier.number)).scalars().all()
+    assert sorted(dossiers) == [67890]
+    assert database.session.execute(database.select(Reconciliation)).scalars().all() == []
+    tags = database.session.execute(
+        database.select(TagAssociation).where(TagAssociation.financial_ae == dossier_reconcilie.id)
+    ).scalars()
+    assert list(tags) == []
+
+
+def test_update_demarche_reconcilie_dossiers_modifies(database, dossier_reconcilie):
+    page = _page_ds(
+        [
+            _dossier_ds(12345, "accepte", "21290243100015", "modifie@example.com"),
+            _dossier_ds(22222, "accepte", "22222222222222", "nouveau@example.com"),
+        ]
+    )
+
+    with (
+        patch.object(DemarcheService, "query_demarche_pages", return_value=iter([page])),
+        patch.object(ReconciliationService, "do_reconciliation") as do_reconciliation,
+    ):
+        update_demarche("uuid", 101, 49721)
+
+    do_reconciliation.assert_called_once_with(49721, {"champEJ": "a"}, {}, {12345, 22222})
+    dossiers = database.session.execute(database.select(Dossier.number)).scalars().all()
+    assert sorted(dossiers) == [12345, 22222, 67890]
+    # La réconciliation du dossier 12345 n'est pas touchée par la synchronisation
+    reconciliations = database.session.execute(database.select(Reconciliation.dossier_number)).scalars().all()
+    assert reconciliations == [12345]
+
+
+def test_update_demarche_jamais_importee_integre_toute_la_demarche(database, init_tokens, init_demarche):  # noqa: F811
+    database.session.execute(database.update(Demarche).where(Demarche.number == 49721).values(date_import=None))
+    database.session.commit()
+    DemarcheService.update_reconciliation(49721, {"champEJ": "a"})
+    page = _page_ds([_dossier_ds(22222, "accepte", "22222222222222", "nouveau@example.com")])
+
+    with (
+        patch.object(DemarcheService, "query_demarche_pages", return_value=iter([page])) as query,
+        patch.object(DemarcheService, "synchroniser_demarche") as synchroniser,
+        patch.object(ReconciliationService, "do_reconciliation") as do_reconciliation,
+    ):
+        update_demarche("uuid", 101, 49721)
+
+    synchroniser.assert_not_called()
+    assert "updated_since" not in query.call_args.kwargs
+    # Tous les dossiers de la démarche sont réconciliés
+    do_reconciliation.assert_called_once_with(49721, {"champEJ": "a"}, {}, None)
+
+    database.session.expire_all()
+    dossiers = database.session.execute(database.select(Dossier.number)).scalars().all()
+    assert dossiers == [22222]
+    demarche = DemarcheService.find(49721)
+    assert demarche.date_import is not None
+    assert demarche.token_id == 101
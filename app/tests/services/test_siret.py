@@ -0,0 +1,75 @@
+"""Tests unitaires de la vérification des sirets par lot (UpdateRefSiretService.check_sirets)."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from api_entreprise import LimitHitError
+from models.entities.refs.Commune import Commune
+from models.entities.refs.Siret import Siret
+from services.refs.siret import UpdateRefSiretService
+
+
+def _etablissement(code_commune: str):
+    etablissement = MagicMock()
+    etablissement.adresse.code_commune = code_commune
+    etablissement.unite_legale.personne_morale_attributs.raison_sociale = "RAISON SOCIALE"
+    return etablissement
+
+
+@pytest.fixture
+def api_entreprise():
+    api = MagicMock()
+    api.donnees_etablissement.side_effect = lambda code: _etablissement(f"commune_{code}")
+    return api
+
+
+@pytest.fixture
+def api_geo():
+    api = MagicMock()
+    api.get_info_commune.side_effect = lambda commune: {"nom": f"nom_{commune.code}"}
+    return api
+
+
+def test_check_sirets_only_fetch_unknown_sirets_once(api_entreprise, api_geo):
+    session = MagicMock()
+    # sirets existants, puis communes existantes
+    session.scalars.side_effect = [["11111111111111"], ["commune_22222222222222"]]
+
+    service = UpdateRefSiretService(api_entreprise, api_geo)
+    service.check_sirets(session, ["11111111111111", "22222222222222", None, "33333333333333", "22222222222222"])
+
+    assert sorted(c.args[0] for c in api_entreprise.donnees_etablissement.call_args_list) == [
+        "22222222222222",
+        "33333333333333",
+    ]
+    api_geo.get_info_commune.assert_called_once()
+
+    added = [entity for c in session.add_all.call_args_list for entity in c.args[0]]
+    communes = [e for e in added if isinstance(e, Commune)]
+    sirets = [e for e in added if isinstance(e, Siret)]
+    assert [c.code for c in communes] == ["commune_33333333333333"]
+    assert communes[0].label_commune == "nom_commune_33333333333333"
+    assert [s.code for s in sirets] == ["22222222222222", "33333333333333"]
+    assert all(s.denomination == "RAISON SOCIALE" for s in sirets)
+
+
+def test_check_sirets_all_known(api_entreprise, api_geo):
+    session = MagicMock()
+    session.scalars.return_value = ["11111111111111"]
+
+    UpdateRefSiretService(api_entreprise, api_geo).check_sirets(session, ["11111111111111", None])
+
+    api_entreprise.donnees_etablissement.assert_not_called()
+    session.add_all.assert_not_called()
+
+
+def test_check_sirets_limit_hit(api_entreprise, api_geo):
+    session = MagicMock()
+    session.scalars.return_value = []
+    api_entreprise.donnees_etablissement.side_effect = LimitHitError(10)
+
+    with pytest.raises(LimitHitError):
+        UpdateRefSiretService(api_entreprise, api_geo).check_sirets(session, ["11111111111111"])
+
+    session.add_all.assert_not_called()
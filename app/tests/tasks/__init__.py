@@ -79,3 +79,13 @@ def build_financial_cp(update_date: datetime):
     )
     cp.updated_at = update_date
     return cp
+
+
+def sent_ref_lines(mock_subtask, model_name: str) -> list[str]:
+    """Lignes de référentiel envoyées par lots à la sous-tâche (mockée) d'import"""
+    return [
+        line
+        for c in mock_subtask.return_value.delay.call_args_list
+        if c.kwargs.get("model_name") == model_name
+        for line in c.kwargs["lines"]
+    ]
@@ -95,3 +95,20 @@ def test_ok(insert_two_ae_for_manual_tag, tag, tag_prettyname):
     )
 
     assert len(tag_assocations) == 1
+
+
+def test_reimport_of_auto_tagged_ae(database, insert_two_ae_for_manual_tag, tag, tag_prettyname):
+    ae_2020, _ = insert_two_ae_for_manual_tag
+    database.session.add(TagAssociation(financial_ae=ae_2020.id, tag_id=tag.id, auto_applied=True))
+    database.session.commit()
+
+    # Le fichier exporté contient le tag auto de la ligne
+    result = put_tags_to_ae("1", "1", [tag_prettyname])
+
+    tag_assocations = (
+        db.session.execute(db.select(TagAssociation).where(TagAssociation.financial_ae == ae_2020.id))
+        .scalars()
+        .fetchall()
+    )
+    assert result.created == 0
+    assert [(a.tag_id, a.auto_applied) for a in tag_assocations] == [(tag.id, True)]
@@ -1,12 +1,17 @@
-from unittest.mock import patch, call
+import datetime
+
 import pytest
 
-from models.entities.common.Tags import Tags
+from models.entities.audit.AuditApplyTagsAuto import AuditApplyTagsAuto
+from models.entities.common.Tags import TagAssociation, Tags
+from models.entities.financial.FinancialAe import FinancialAe
+from tests import delete_references
+from tests.tasks.tags.test_tag_acv import add_references
 from . import *  # noqa: F403
-from app.tasks.tags.update_all_tags import update_all_tags
+from app.tasks.tags.update_all_tags import update_all_tags, update_all_tags_of_ae
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="function")
 def tags(database):
     database.session.add(Tags(**TAG_FOND_VERT))  # noqa: F405
     database.session.add(Tags(**TAG_RELANCE))  # noqa: F405
@@ -15,16 +20,98 @@ def tags(database):
     database.session.add(Tags(**TAG_PVD))  # noqa: F405
     database.session.commit()
     yield
+    database.session.execute(database.delete(TagAssociation))
     database.session.execute(database.delete(Tags))
+    database.session.execute(database.delete(AuditApplyTagsAuto))
     database.session.commit()
 
 
-@patch("app.tasks.tags.update_all_tags.subtask")
-def test_update_tags_enable_auto(mock_subtask, tags):
+def _ae(n_ej: str, programme: str, annee: int = 2020, contrat_etat_region: str = "#"):
+    return FinancialAe(
+        **{
+            "annee": annee,
+            "n_ej": n_ej,
+            "n_poste_ej": 1,
+            "programme": programme,
+            "domaine_fonctionnel": "0380-01-01",
+            "centre_couts": "BG00\\/DREETS0035",
+            "referentiel_programmation": "BG00\\/010300000108",
+            "fournisseur_titulaire": "1001465507",
+            "localisation_interministerielle": "N35",
+            "groupe_marchandise": "groupe",
+            "date_modification_ej": datetime.datetime.now(),
+            "compte_budgetaire": "co",
+            "contrat_etat_region": contrat_etat_region,
+            "siret": "851296632000171",
+            "data_source": "REGION",
+        }
+    )
+
+
+@pytest.fixture(scope="function")
+def aes(database, session):
+    ae_fonds_vert = _ae("1", "380")
+    ae_fonds_vert_cper = _ae("2", "380", annee=2022, contrat_etat_region="CPER")
+    ae_sans_tag = _ae("3", "200")
+    for ae in (ae_fonds_vert, ae_fonds_vert_cper, ae_sans_tag):
+        add_references(ae, session, region="53")
+    session.add_all([ae_fonds_vert, ae_fonds_vert_cper, ae_sans_tag])
+    session.commit()
+    yield ae_fonds_vert, ae_fonds_vert_cper, ae_sans_tag
+    delete_references(session)
+    session.execute(database.delete(FinancialAe))
+    session.commit()
+
+
+def _tags_of(database, ae: FinancialAe) -> set[str]:
+    stmt = (
+        database.select(Tags.type, Tags.value)
+        .join(TagAssociation, TagAssociation.tag_id == Tags.id)
+        .where(TagAssociation.financial_ae == ae.id, TagAssociation.auto_applied == True)  # noqa: E712
+    )
+    return {f"{type}:{value or ''}" for type, value in database.session.execute(stmt).all()}
+
+
+def test_update_tags_applies_all_rules_in_one_run(database, tags, aes):
+    ae_fonds_vert, ae_fonds_vert_cper, ae_sans_tag = aes
+
+    # DO
+    update_all_tags()
+
+    assert _tags_of(database, ae_fonds_vert) == {"fonds-vert:"}
+    assert _tags_of(database, ae_fonds_vert_cper) == {"fonds-vert:", "cper:2021-27"}
+    assert _tags_of(database, ae_sans_tag) == set()
+
+    audit = database.session.execute(database.select(AuditApplyTagsAuto)).scalar_one()
+    assert audit.incremental is False
+    assert audit.nb_associations == 3
+
+
+def test_update_tags_is_idempotent(database, tags, aes):
+    update_all_tags()
     # DO
     update_all_tags()
 
-    mock_subtask.assert_has_calls([call("apply_tags_fonds_vert"), call("apply_tags_cper_2021_27")], any_order=True)
-    # raises AssertionError si le tag test est appelé
-    with pytest.raises(AssertionError):
-        mock_subtask.assert_called_with("apply_tags_test")
+    nb_associations = database.session.execute(database.select(database.func.count(TagAssociation.id))).scalar_one()
+    assert nb_associations == 3
+
+
+def test_update_tags_incremental_only_evaluates_recent_lines(database, tags, aes):
+    ae_fonds_vert, _, _ = aes
+    database.session.add(AuditApplyTagsAuto(date=datetime.datetime(2100, 1, 1, tzinfo=datetime.timezone.utc)))
+    database.session.commit()
+
+    # DO
+    update_all_tags(incremental=True)
+
+    assert _tags_of(database, ae_fonds_vert) == set()
+
+
+def test_update_tags_of_ae(database, tags, aes):
+    ae_fonds_vert, ae_fonds_vert_cper, _ = aes
+
+    # DO
+    update_all_tags_of_ae(ae_fonds_vert.id)
+
+    assert _tags_of(database, ae_fonds_vert) == {"fonds-vert:"}
+    assert _tags_of(database, ae_fonds_vert_cper) == set()
@@ -0,0 +1,190 @@
+from unittest.mock import MagicMock, call, patch
+import json
+import os
+
+import pandas
+import pytest
+
+from app.tasks.files import file_task
+from app.tasks.financial import LineImportTechInfo
+from app.utilities.external_sort import ExternalSorter
+from models.entities.financial.FinancialAe import FinancialAe
+from models.entities.financial.FinancialCp import FinancialCp
+from models.entities.refs.Region import get_code_region_by_code_comp
+from tests import TESTS_PATH
+
+_chorus = TESTS_PATH / "data" / "chorus"
+_CSV_NAT = {"sep": '";"', "skiprows": 0, "dtype": "str", "engine": "python"}
+_CSV_REGION = {"sep": ",", "skiprows": 7}
+
+_AE_CSV = """prog,ej,poste,montant
+0101,EJ1,1,"10,5"
+0101,EJ2,1,5
+,EJ1,1,"1 000"
+0102,EJ2,1,-5
+0103,EJ3,2,
+0103,EJ3,2,"7,25"
+"""
+
+
+@pytest.fixture
+def upload_folder(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "UPLOAD_FOLDER", str(tmp_path))
+    return tmp_path
+
+
+def _clean_up(upload_folder, split_file_line: int, run_size: int, monkeypatch, app) -> str:
+    monkeypatch.setitem(app.config, "SPLIT_FILE_LINE", split_file_line)
+    monkeypatch.setitem(app.config, "IMPORT_SORT_RUN_SIZE", run_size)
+    fichier = upload_folder / "ae.csv"
+    fichier.write_text(_AE_CSV, encoding="utf-8")
+    workdir = upload_folder / "workdir"
+    workdir.mkdir(exist_ok=True)
+
+    name_file = file_task._clean_up_ae_files(str(fichier), json.dumps({"sep": ","}), 3, 1, 2, str(workdir))
+
+    assert os.listdir(workdir) == [], "Les runs du tri externe doivent être supprimés"
+    with open(name_file, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_clean_up_ae_files_fusionne_les_postes_sur_plusieurs_chunks(app, upload_folder, monkeypatch):
+    # Chunks de 2 lignes: les postes EJ1 / 1 et EJ2 / 1 sont répartis sur deux chunks
+    content = _clean_up(upload_folder, 2, 1, monkeypatch, app)
+
+    # Première valeur non vide pour le programme, somme des montants. EJ2 / 1 a un montant fusionné nul
+    assert content == '"prog";"ej";"poste";"montant"\n"0101";"EJ1";"1";"1010.5"\n"0103";"EJ3";"2";"7.25"\n'
+    assert content == _clean_up(upload_folder, 10000, 50000, monkeypatch, app)
+
+
+def test_clean_up_ae_files_colonnes_manquantes(app, upload_folder):
+    fichier = upload_folder / "ae.csv"
+    fichier.write_text(_AE_CSV, encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        file_task._clean_up_ae_files(str(fichier), json.dumps({"sep": ","}), 10, 1, 2, str(upload_folder))
+
+
+def _sorter(workdir, records) -> ExternalSorter:
+    sorter = ExternalSorter(str(workdir), run_size=2)
+    for key, value in records:
+        sorter.add(key, value)
+    return sorter
+
+
+def test_process_batches_envoie_les_cp_sans_ae_apres_les_ae(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "IMPORT_BATCH_SIZE", 2)
+    ae_sorter = _sorter(tmp_path, [("k2", "AE2"), ("k4", "AE4"), ("k6", "AE6")])
+    cp_sorter = _sorter(tmp_path, [("k1", [0, "CP1"]), ("k2", [1, "CP2"]), ("k3", [2, "CP3"]), ("k5", [3, "CP5"])])
+
+    send = MagicMock()
+    with (
+        patch.object(file_task, "_send_subtask_financial_ae", send.ae),
+        patch.object(file_task, "_send_subtask_financial_cp", send.cp),
+    ):
+        file_task._process_batches(ae_sorter, cp_sorter, str(tmp_path), "53", 2024)
+
+    def cp(lineno, data):
+        return {"data": data, "task": LineImportTechInfo(None, lineno)}
+
+    assert send.mock_calls == [
+        call.ae(["AE2", "AE4"], "53", 2024, 0, [cp(1, "CP2")]),
+        call.ae(["AE6"], "53", 2024, 2, []),
+        call.cp([cp(0, "CP1"), cp(2, "CP3")], "53", 2024, 0),
+        call.cp([cp(3, "CP5")], "53", 2024, 2),
+    ]
+    assert os.listdir(tmp_path) == []
+
+
+class _RecordingSorter:
+    def __init__(self):
+        self.records = []
+
+    def add(self, key, value):
+        self.records.append((key, value))
+
+
+def _split_file(tmp_path, fichier, csv_options: dict, national: bool) -> str:
+    """
+    Fichier découpé tel qu'écrit par _parse_generic, complété de lignes avec des cellules vides
+    et des codes numériques à zéros non significatifs
+    """
+    df = pandas.read_csv(fichier, **csv_options)
+    quote = '"' if national else ""
+    edge = df.iloc[[0]].astype(object)
+    edge.iloc[0, 0] = f"{quote}0101"  # programme
+    edge.iloc[0, 2] = None  # centre de coûts
+    edge.iloc[0, 4] = "0021031057"  # n_ej
+    edge.iloc[0, -1] = None  # dernière colonne
+    output_file = tmp_path / f"split_{os.path.basename(fichier)}"
+    pandas.concat([df, edge]).to_csv(output_file, index=False)
+    return str(output_file)
+
+
+def _key(prefix, annee, line) -> str:
+    return f"{prefix}_{annee}_{line[FinancialAe.n_ej.key]}_{line[FinancialAe.n_poste_ej.key]}"
+
+
+def _iterrows_nat(output_file, columns_names, columns_types, annee, ae: bool) -> list:
+    """Sérialisation ligne à ligne (iterrows + to_json) d'un fichier national"""
+    records = []
+    for chunk in file_task.get_data_chunk(output_file, columns_names, columns_types):
+        for i, line in chunk.iterrows():
+            line["data_source"] = "NATION"
+            line[columns_names[0]] = line[columns_names[0]].replace('"', "")
+            line[columns_names[-1]] = line[columns_names[-1]].replace('"', "")
+            line["source_region"] = get_code_region_by_code_comp(line["societe"])
+            key = _key(f"national_{line['source_region']}", annee, line)
+            if ae:
+                records.append((key, pandas.concat([line, pandas.Series({"annee": annee})]).to_json()))
+            else:
+                records.append((key, [i, line.to_json()]))
+    return records
+
+
+def _iterrows_region(output_file, columns_names, columns_types, source_region, annee, ae: bool) -> list:
+    """Sérialisation ligne à ligne (iterrows + to_json) d'un fichier régional"""
+    records = []
+    for chunk in file_task.get_data_chunk(output_file, columns_names, columns_types):
+        for i, line in chunk.iterrows():
+            line["data_source"] = "REGION"
+            key = _key(f"regional_{source_region}", annee, line)
+            if ae:
+                extra = pandas.Series({"annee": annee, "source_region": source_region})
+                records.append((key, pandas.concat([line, extra]).to_json()))
+            else:
+                records.append((key, [i, line.to_json()]))
+    return records
+
+
+def test_parse_fichier_nat_identique_a_la_serialisation_ligne_a_ligne(tmp_path):
+    ae_file = _split_file(tmp_path, _chorus / "national" / "aife_ae.csv", _CSV_NAT, national=True)
+    cp_file = _split_file(tmp_path, _chorus / "national" / "aife_cp.csv", _CSV_NAT, national=True)
+
+    ae_sorter, cp_sorter = _RecordingSorter(), _RecordingSorter()
+    file_task._parse_fichier_nat_ae(ae_file, 2025, ae_sorter)
+    file_task._parse_fichier_nat_cp(cp_file, 2025, 1, 1000, cp_sorter)
+
+    assert ae_sorter.records == _iterrows_nat(
+        ae_file, FinancialAe.get_columns_fichier_nat_ae(), FinancialAe.get_columns_type_fichier_nat_ae(), 2025, True
+    )
+    assert cp_sorter.records == _iterrows_nat(
+        cp_file, FinancialCp.get_columns_fichier_nat_cp(), FinancialCp.get_columns_types_fichier_nat_cp(), 2025, False
+    )
+    assert len(ae_sorter.records) == 3 and len(cp_sorter.records) == 3
+
+
+def test_parse_file_region_identique_a_la_serialisation_ligne_a_ligne(tmp_path):
+    ae_file = _split_file(tmp_path, _chorus / "chorus_ae.csv", _CSV_REGION, national=False)
+    cp_file = _split_file(tmp_path, _chorus / "financial_cp.csv", _CSV_REGION, national=False)
+
+    ae_sorter, cp_sorter = _RecordingSorter(), _RecordingSorter()
+    file_task._parse_file_ae(ae_file, "32", 2022, ae_sorter)
+    file_task._parse_file_cp(cp_file, "32", 2022, 1, 1000, cp_sorter)
+
+    ae_types = {"programme": str, "n_ej": str, "n_poste_ej": int, "fournisseur_titulaire": str, "siret": str}
+    assert ae_sorter.records == _iterrows_region(
+        ae_file, FinancialAe.get_columns_files_ae(), ae_types, "32", 2022, True
+    )
+    assert cp_sorter.records == _iterrows_region(cp_file, FinancialCp.get_columns_files_cp(), str, "32", 2022, False)
+    assert ae_sorter.records[-1][1].startswith('{"programme":"0101"')
@@ -1,9 +1,9 @@
 from datetime import date
-from unittest.mock import patch, call, ANY, MagicMock
+from unittest.mock import patch, ANY, MagicMock
 
 from models.entities.financial.Ademe import Ademe
 from models.entities.refs.Siret import Siret
-from app.tasks.financial.import_financial import import_line_ademe, import_file_ademe
+from app.tasks.financial.import_financial import import_line_ademe, import_lines_ademe, import_file_ademe
 from tests import TESTS_PATH
 from tests import delete_references
 
@@ -16,15 +16,11 @@ def test_import_file_ademe(mock_subtask: MagicMock):
     with patch("shutil.move", return_value=None):  # ne pas supprimer le fichier de tests :)
         import_file_ademe(_ademe / "ademe.csv")
 
-    mock_subtask.assert_has_calls(
-        [
-            call().delay(
-                '{"Nom de l attribuant":"ADEME","idAttribuant":"38529030900454","dateConvention":"2021-05-05","referenceDecision":"21BRD0090","nomBeneficiaire":"MEGO ! - MEGO","idBeneficiaire":"82815371800014","objet":"TREMPLIN pour la transition \\u00e9cologique des PME","montant":5000,"nature":"aide en num\\u00e9raire","conditionsVersement":"Echelonn\\u00e9","datesPeriodeVersement":"2021-05-11_2023-01-05","idRAE":null,"notificationUE":"NON","pourcentageSubvention":1.0}',
-                ANY,
-            ),
-            call("import_line_ademe"),
-        ],
-        any_order=True,
+    mock_subtask.assert_called_with("import_lines_ademe")
+    (ademe_batch,) = mock_subtask.return_value.delay.call_args.args
+    assert [line["task"][1] for line in ademe_batch] == [1, 2, 3]
+    assert ademe_batch[0]["data"] == (
+        '{"Nom de l attribuant":"ADEME","idAttribuant":"38529030900454","dateConvention":"2021-05-05","referenceDecision":"21BRD0090","nomBeneficiaire":"MEGO ! - MEGO","idBeneficiaire":"82815371800014","objet":"TREMPLIN pour la transition \\u00e9cologique des PME","montant":5000,"nature":"aide en num\\u00e9raire","conditionsVersement":"Echelonn\\u00e9","datesPeriodeVersement":"2021-05-11_2023-01-05","idRAE":null,"notificationUE":"NON","pourcentageSubvention":1.0}'
     )
 
 
@@ -51,3 +47,24 @@ def test_import_line_ademe(app, database, session):
     assert data.siret_attribuant == "38529030900454"
     assert data.dates_periode_versement == "2021-05-11_2023-01-05"
     delete_references(session)
+
+
+def test_import_lines_ademe_is_idempotent(app, database, session):
+    # GIVEN
+    data = '{"Nom de l attribuant":"ADEME","idAttribuant":"38529030900454","dateConvention":"2021-05-05","referenceDecision":"21BRD0091","nomBeneficiaire":"MEGO ! - MEGO","idBeneficiaire":"82815371800014","objet":"objet","montant":400.1,"nature":"aide","conditionsVersement":"Echelonn\u00e9","datesPeriodeVersement":"2021-05-11_2023-01-05","idRAE":null,"notificationUE":null,"pourcentageSubvention":1}'
+    ademe_batch = [{"data": data, "task": ("a task id", 1)}, {"data": data, "task": ("a task id", 2)}]
+    session.add(Siret(**{"code": "82815371800014"}))
+    session.add(Siret(**{"code": "38529030900454"}))
+    session.commit()
+
+    # DO
+    with patch("app.services.siret.AppUpdateRefSiretService.check_sirets") as check_sirets:
+        import_lines_ademe(ademe_batch)
+        import_lines_ademe(ademe_batch)  # redélivrance du message
+
+    # ASSERT
+    check_sirets.assert_called_with(ANY, ["38529030900454", "82815371800014", "38529030900454", "82815371800014"])
+    lines = session.execute(database.select(Ademe).where(Ademe.reference_decision == "21BRD0091")).scalars().all()
+    assert sorted(line.file_import_lineno for line in lines) == [1, 2]
+    assert all(line.notification_ue is False for line in lines)
+    delete_references(session)
@@ -40,8 +40,8 @@ def test_fusion_ae_nat(mock_subtask):
             # montant fusionné et suppression des montant à zero
             call().delay(
                 [
-                    '{"programme":"0102","domaine_fonctionnel":"0102-01","centre_couts":"EMPEF00075","referentiel_programmation":"010200000101","n_ej":"2104273645","date_replication":"25\\/01\\/2024","n_poste_ej":"4","date_modification_ej":"19\\/12\\/2024","fournisseur_titulaire":"0000000000","fournisseur_titulaire_label":"FOURNISSEUR_ANON","siret":"13000548100010","compte_code":"6512300000","compte_budgetaire":"61","groupe_marchandise":"07.02.05","contrat_etat_region":"","localisation_interministerielle":"N1175","montant":"138936678.56","centre_financier":"0102-CEFP-C001","tranche_fonctionnelle":"","axe_ministeriel_1":"Non affect\\u00e9","fonds":"","projet_analytique":"","axe_ministeriel_2":"","societe":"ADCE","data_source":"NATION","source_region":"00","annee":2025}',
                     '{"programme":"0102","domaine_fonctionnel":"0102-01","centre_couts":"EMPEF00075","referentiel_programmation":"010200000101","n_ej":"2104273645","date_replication":"25\\/01\\/2024","n_poste_ej":"1","date_modification_ej":"19\\/12\\/2024","fournisseur_titulaire":"0000000000","fournisseur_titulaire_label":"FOURNISSEUR_ANON","siret":"13000548100010","compte_code":"6512300000","compte_budgetaire":"61","groupe_marchandise":"07.02.05","contrat_etat_region":"","localisation_interministerielle":"N1175","montant":"1200.0","centre_financier":"0102-CEFP-C001","tranche_fonctionnelle":"","axe_ministeriel_1":"Non affect\\u00e9","fonds":"","projet_analytique":"","axe_ministeriel_2":"","societe":"ADCE","data_source":"NATION","source_region":"00","annee":2025}',
+                    '{"programme":"0102","domaine_fonctionnel":"0102-01","centre_couts":"EMPEF00075","referentiel_programmation":"010200000101","n_ej":"2104273645","date_replication":"25\\/01\\/2024","n_poste_ej":"4","date_modification_ej":"19\\/12\\/2024","fournisseur_titulaire":"0000000000","fournisseur_titulaire_label":"FOURNISSEUR_ANON","siret":"13000548100010","compte_code":"6512300000","compte_budgetaire":"61","groupe_marchandise":"07.02.05","contrat_etat_region":"","localisation_interministerielle":"N1175","montant":"138936678.56","centre_financier":"0102-CEFP-C001","tranche_fonctionnelle":"","axe_ministeriel_1":"Non affect\\u00e9","fonds":"","projet_analytique":"","axe_ministeriel_2":"","societe":"ADCE","data_source":"NATION","source_region":"00","annee":2025}',
                 ],
                 None,
                 2025,
@@ -50,14 +50,14 @@ def test_fusion_ae_nat(mock_subtask):
             ),
             call().delay(
                 [
-                    {
-                        "data": '{"programme":"0354","domaine_fonctionnel":"0354-02","centre_couts":"ADCSDAT075","referentiel_programmation":"035401010301","n_ej":"2104583353","n_poste_ej":"1","n_dp":"100379604","date_base_dp":"11\\/12\\/2024","date_derniere_operation_dp":"13\\/12\\/2024","fournisseur_paye":"1000972118","fournisseur_paye_label":"AGENCE NATIONALE DES TITRES","siret":"13000326200024","compte_code":"6541100000","compte_budgetaire":"64","groupe_marchandise":"12.01.01","contrat_etat_region":"","localisation_interministerielle":"N1175","montant":"9159575,18","exercice_comptable":"2024","n_poste_dp":"2","programme_doublon":"0354","tranche_fonctionnelle":"","fonds":"","projet_analytique":"","societe":"ADCE","type_piece":"RE","data_source":"NATION","source_region":"00"}',
-                        "task": LineImportTechInfo(file_import_taskid=None, lineno=1),
-                    },
                     {
                         "data": '{"programme":"0354","domaine_fonctionnel":"0354-02","centre_couts":"ADCSDAT075","referentiel_programmation":"035401010301","n_ej":"2104453606","n_poste_ej":"1","n_dp":"100241599","date_base_dp":"09\\/08\\/2024","date_derniere_operation_dp":"09\\/08\\/2024","fournisseur_paye":"1000972118","fournisseur_paye_label":"AGENCE NATIONALE DES TITRES","siret":"13000326200024","compte_code":"6541100000","compte_budgetaire":"64","groupe_marchandise":"12.01.01","contrat_etat_region":"","localisation_interministerielle":"N1175","montant":"12615940,52","exercice_comptable":"2024","n_poste_dp":"2","programme_doublon":"0354","tranche_fonctionnelle":"","fonds":"","projet_analytique":"","societe":"ADCE","type_piece":"RE","data_source":"NATION","source_region":"00"}',
                         "task": LineImportTechInfo(file_import_taskid=None, lineno=0),
                     },
+                    {
+                        "data": '{"programme":"0354","domaine_fonctionnel":"0354-02","centre_couts":"ADCSDAT075","referentiel_programmation":"035401010301","n_ej":"2104583353","n_poste_ej":"1","n_dp":"100379604","date_base_dp":"11\\/12\\/2024","date_derniere_operation_dp":"13\\/12\\/2024","fournisseur_paye":"1000972118","fournisseur_paye_label":"AGENCE NATIONALE DES TITRES","siret":"13000326200024","compte_code":"6541100000","compte_budgetaire":"64","groupe_marchandise":"12.01.01","contrat_etat_region":"","localisation_interministerielle":"N1175","montant":"9159575,18","exercice_comptable":"2024","n_poste_dp":"2","programme_doublon":"0354","tranche_fonctionnelle":"","fonds":"","projet_analytique":"","societe":"ADCE","type_piece":"RE","data_source":"NATION","source_region":"00"}',
+                        "task": LineImportTechInfo(file_import_taskid=None, lineno=1),
+                    },
                 ],
                 0,
                 None,
@@ -43,8 +43,8 @@ def test_split_csv_and_import_ae_and_cp(mock_subtask):
             # Appel pour les lignes AE fusionnées
             call().delay(  # l' EJ 2103105755 post 6 est fusionné en une ligne avec somme des montant
                 [
-                    '{"programme":"103","domaine_fonctionnel":"0103-01-01","centre_couts":"BG00\\/DREETS0035","referentiel_programmation":"BG00\\/010300000108","n_ej":"2103105755","date_replication":"10.01.2023","n_poste_ej":6,"date_modification_ej":"10.01.2023","fournisseur_titulaire":"1001465507","fournisseur_label":"ATLAS SOUTENIR LES COMPETENCES","siret":"85129663200017","compte_code":"PCE\\/6522800000","compte_budgetaire":"Transferts aux entre","groupe_marchandise":"09.02.01","contrat_etat_region":"#","contrat_etat_region_2":"Non affect\\u00e9","localisation_interministerielle":"N53","montant":30000.0,"data_source":"REGION","annee":2022,"source_region":"32"}',
                     '{"programme":"103","domaine_fonctionnel":"0103-01-01","centre_couts":"BG00\\/DREETS0035","referentiel_programmation":"BG00\\/010300000108","n_ej":"2103105755","date_replication":"10.01.2023","n_poste_ej":5,"date_modification_ej":"10.01.2023","fournisseur_titulaire":"1001465507","fournisseur_label":"ATLAS SOUTENIR LES COMPETENCES","siret":"85129663200017","compte_code":"PCE\\/6522800000","compte_budgetaire":"Transferts aux entre","groupe_marchandise":"09.02.01","contrat_etat_region":"#","contrat_etat_region_2":"Non affect\\u00e9","localisation_interministerielle":"N53","montant":22500.12,"data_source":"REGION","annee":2022,"source_region":"32"}',
+                    '{"programme":"103","domaine_fonctionnel":"0103-01-01","centre_couts":"BG00\\/DREETS0035","referentiel_programmation":"BG00\\/010300000108","n_ej":"2103105755","date_replication":"10.01.2023","n_poste_ej":6,"date_modification_ej":"10.01.2023","fournisseur_titulaire":"1001465507","fournisseur_label":"ATLAS SOUTENIR LES COMPETENCES","siret":"85129663200017","compte_code":"PCE\\/6522800000","compte_budgetaire":"Transferts aux entre","groupe_marchandise":"09.02.01","contrat_etat_region":"#","contrat_etat_region_2":"Non affect\\u00e9","localisation_interministerielle":"N53","montant":30000.0,"data_source":"REGION","annee":2022,"source_region":"32"}',
                 ],
                 "32",
                 2022,
@@ -64,7 +64,7 @@ def test_split_csv_and_import_ae_and_cp(mock_subtask):
             call().delay(
                 [
                     {
-                        "data": '{"programme":"152","domaine_fonctionnel":"0152-04-01","centre_couts":"BG00\\/GN5GDPL044","referentiel_programmation":"BG00\\/015234300101","n_ej":"2103105755","n_poste_ej":"1","n_dp":"100011552","date_base_dp":"25.12.2022","date_derniere_operation_dp":"18.01.2023","n_sf":"#","data_sf":"#","fournisseur_paye":"1001246979","fournisseur_paye_label":"AE NOT EXIST","siret":"45228173600010","compte_code":"PCE\\/6113110000","compte_budgetaire":"D\\u00e9penses de fonction","groupe_marchandise":"36.01.01","contrat_etat_region":"#","contrat_etat_region_2":"Non affect\\u00e9","localisation_interministerielle":"N5244215","montant":"807,28","data_source":"REGION"}',
+                        "data": '{"programme":"101","domaine_fonctionnel":"0101-01","centre_couts":"BG00\\/DSJCARE035","referentiel_programmation":"BG00\\/010101010113","n_ej":"#","n_poste_ej":"#","n_dp":"500043027","date_base_dp":"31.12.2022","date_derniere_operation_dp":"25.01.2023","n_sf":"#","data_sf":"#","fournisseur_paye":"1001477845","fournisseur_paye_label":"SANS AE","siret":"84442098400016","compte_code":"PCE\\/6512300000","compte_budgetaire":"Transferts aux m\\u00e9nag","groupe_marchandise":"#","contrat_etat_region":"#","contrat_etat_region_2":"Non affect\\u00e9","localisation_interministerielle":"N","montant":"28,26","data_source":"REGION"}',
                         "task": ANY,
                     },
                     {
@@ -72,7 +72,7 @@ def test_split_csv_and_import_ae_and_cp(mock_subtask):
                         "task": ANY,
                     },
                     {
-                        "data": '{"programme":"101","domaine_fonctionnel":"0101-01","centre_couts":"BG00\\/DSJCARE035","referentiel_programmation":"BG00\\/010101010113","n_ej":"#","n_poste_ej":"#","n_dp":"500043027","date_base_dp":"31.12.2022","date_derniere_operation_dp":"25.01.2023","n_sf":"#","data_sf":"#","fournisseur_paye":"1001477845","fournisseur_paye_label":"SANS AE","siret":"84442098400016","compte_code":"PCE\\/6512300000","compte_budgetaire":"Transferts aux m\\u00e9nag","groupe_marchandise":"#","contrat_etat_region":"#","contrat_etat_region_2":"Non affect\\u00e9","localisation_interministerielle":"N","montant":"28,26","data_source":"REGION"}',
+                        "data": '{"programme":"152","domaine_fonctionnel":"0152-04-01","centre_couts":"BG00\\/GN5GDPL044","referentiel_programmation":"BG00\\/015234300101","n_ej":"2103105755","n_poste_ej":"1","n_dp":"100011552","date_base_dp":"25.12.2022","date_derniere_operation_dp":"18.01.2023","n_sf":"#","data_sf":"#","fournisseur_paye":"1001246979","fournisseur_paye_label":"AE NOT EXIST","siret":"45228173600010","compte_code":"PCE\\/6113110000","compte_budgetaire":"D\\u00e9penses de fonction","groupe_marchandise":"36.01.01","contrat_etat_region":"#","contrat_etat_region_2":"Non affect\\u00e9","localisation_interministerielle":"N5244215","montant":"807,28","data_source":"REGION"}',
                         "task": ANY,
                     },
                 ],
@@ -269,6 +269,39 @@ def test_import_update_line_montant_positive_ae(database, session):
     delete_references(session)
 
 
+def test_import_lines_ae_mix_new_and_existing(database, session):
+    # WHEN - une AE déjà en base
+    data = '{"annee":2022,"montant":"1000","source_region":"35","n_ej":"ej_mix","n_poste_ej":1,"programme":"103","domaine_fonctionnel":"0103-01-01","centre_couts":"BG00\\/DREETS0035","referentiel_programmation":"BG00\\/010300000108","date_modification_ej":"10.01.2023","fournisseur_titulaire": "1001465507","fournisseur_label":"ATLAS SOUTENIR LES COMPETENCES","siret":"85129663200017","compte_code":"PCE\\/6522800000","compte_budgetaire":"Transferts aux entre","groupe_marchandise":"09.02.01","contrat_etat_region":"#","contrat_etat_region_2":"Non affect\\u00e9","localisation_interministerielle":"N53", "data_source" : "REGION"}'
+    chorus = FinancialAe(**json.loads(data))
+    add_references(chorus, session, region="35")
+    session.add(chorus)
+    session.commit()
+
+    # le lot contient une MAJ de l'AE existante et deux nouveaux postes
+    lines = []
+    for n_poste_ej, montant in [(1, "2000"), (2, "300"), (3, "-50")]:
+        line = json.loads(data)
+        line["n_poste_ej"] = n_poste_ej
+        line["montant"] = montant
+        lines.append(json.dumps(line))
+
+    # DO
+    import_lines_financial_ae.run(lines, "35", 2022, 0, [])
+
+    aes = (
+        session.execute(
+            database.select(FinancialAe).where(FinancialAe.n_ej == "ej_mix").order_by(FinancialAe.n_poste_ej)
+        )
+        .scalars()
+        .all()
+    )
+    assert [ae.n_poste_ej for ae in aes] == [1, 2, 3]
+    assert aes[0].id == chorus.id
+    assert [[m.montant for m in ae.montant_ae] for ae in aes] == [[2000], [300], [-50]]
+    assert all(ae.centre_couts == "DREETS0035" for ae in aes)
+    delete_references(session)
+
+
 def test_import_montant_negatif(database, session):
     # WHEN - ligne AE sur année n-1 avec montant > 0
     data = '{"annee":2021,"source_region":"35","montant":22500,"n_ej":"ej_negatif","n_poste_ej":6,"programme":"103","domaine_fonctionnel":"0103-01-01","centre_couts":"BG00\\/DREETS0035","referentiel_programmation":"BG00\\/010300000108","date_modification_ej":"10.01.2023","fournisseur_titulaire":"1001465507","fournisseur_label":"ATLAS SOUTENIR LES COMPETENCES","siret":"851296632000172","compte_code":"PCE\\/6522800000","compte_budgetaire":"Transferts aux entre","groupe_marchandise":"09.02.01","contrat_etat_region":"#","contrat_etat_region_2":"Non affect\\u00e9","localisation_interministerielle":"N53", "data_source" : "REGION"}'
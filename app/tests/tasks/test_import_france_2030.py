@@ -1,9 +1,13 @@
-from unittest.mock import patch, MagicMock, call, ANY
+from unittest.mock import patch, MagicMock
 
 from models.entities.financial.France2030 import France2030
 from models.entities.refs.NomenclatureFrance2030 import NomenclatureFrance2030
 from models.entities.refs.Siret import Siret
-from app.tasks.financial.import_france_2030 import import_file_france_2030, import_line_france_2030
+from app.tasks.financial.import_france_2030 import (
+    import_file_france_2030,
+    import_line_france_2030,
+    import_lines_france_2030,
+)
 from tests import TESTS_PATH, delete_references
 
 _data = TESTS_PATH / "data"
@@ -15,20 +19,12 @@ def test_import_import_file(mock_subtask: MagicMock):
     with patch("shutil.move", return_value=None):
         import_file_france_2030(_data / "france_2030" / "france_2030.csv", annee=2023)
 
-    mock_subtask.assert_has_calls(
-        [
-            call().delay(
-                '{"date_dpm":"2021-04-16","operateur":"BPI","procedure":"Contractualisation directe","nom_projet":"POLYCOR BIS","nom_beneficiaire":"CHU NANTES","siret":"26440013600471","typologie":"\\u00c9tablissements publics","regions":"Pays de la Loire","localisation_geo":44,"acteur_emergent":null,"nom_strategie":"Capacity building","code_nomenclature":"Objectif 7","nomenclature":"Produire en France au moins 20 bio-m\\u00e9dicaments, notamment contre les cancers, les maladies chroniques et d\\u00e9velopper et produire des dispositifs m\\u00e9dicaux innovants","montant_subvention":418492.0,"montant_avance_remboursable":null,"montant_aide":418492.0,"annee":2023}',
-                ANY,
-            ),
-            call().delay(
-                '{"date_dpm":"2021-04-16","operateur":"BPI","procedure":"Contractualisation directe","nom_projet":"EXT_XT","nom_beneficiaire":"LFB BIOMANUFACTURING","siret":"49927250800015","typologie":"Petites et moyennes entreprises","regions":"Occitanie","localisation_geo":30,"acteur_emergent":null,"nom_strategie":"Capacity building","code_nomenclature":"Objectif 7","nomenclature":"Produire en France au moins 20 bio-m\\u00e9dicaments, notamment contre les cancers, les maladies chroniques et d\\u00e9velopper et produire des dispositifs m\\u00e9dicaux innovants","montant_subvention":null,"montant_avance_remboursable":3489768.0,"montant_aide":3489768.0,"annee":2023}',
-                ANY,
-            ),
-            call("import_line_france_2030"),
-        ],
-        any_order=True,
-    )
+    mock_subtask.assert_called_with("import_lines_france_2030")
+    (france_2030_batch,) = mock_subtask.return_value.delay.call_args.args
+    assert [line["data"] for line in france_2030_batch] == [
+        '{"date_dpm":"2021-04-16","operateur":"BPI","procedure":"Contractualisation directe","nom_projet":"POLYCOR BIS","nom_beneficiaire":"CHU NANTES","siret":"26440013600471","typologie":"\\u00c9tablissements publics","regions":"Pays de la Loire","localisation_geo":44,"acteur_emergent":null,"nom_strategie":"Capacity building","code_nomenclature":"Objectif 7","nomenclature":"Produire en France au moins 20 bio-m\\u00e9dicaments, notamment contre les cancers, les maladies chroniques et d\\u00e9velopper et produire des dispositifs m\\u00e9dicaux innovants","montant_subvention":418492.0,"montant_avance_remboursable":null,"montant_aide":418492.0,"annee":2023}',
+        '{"date_dpm":"2021-04-16","operateur":"BPI","procedure":"Contractualisation directe","nom_projet":"EXT_XT","nom_beneficiaire":"LFB BIOMANUFACTURING","siret":"49927250800015","typologie":"Petites et moyennes entreprises","regions":"Occitanie","localisation_geo":30,"acteur_emergent":null,"nom_strategie":"Capacity building","code_nomenclature":"Objectif 7","nomenclature":"Produire en France au moins 20 bio-m\\u00e9dicaments, notamment contre les cancers, les maladies chroniques et d\\u00e9velopper et produire des dispositifs m\\u00e9dicaux innovants","montant_subvention":null,"montant_avance_remboursable":3489768.0,"montant_aide":3489768.0,"annee":2023}',
+    ]
 
 
 def test_import_ligne_france_2030(database, session):
@@ -55,3 +51,33 @@ def test_import_ligne_france_2030(database, session):
     assert data.code_nomenclature == "Objectif 7"
 
     delete_references(session)
+
+
+def test_import_lignes_france_2030(database, session):
+    # GIVEN
+    nomenclature = NomenclatureFrance2030(**{"code": "Objectif 7", "numero": 1, "mot": "test", "phrase": "test"})
+    session.add(nomenclature)
+    session.add(Siret(**{"code": "39922695000026"}))
+    session.commit()
+    data = '{"date_dpm":1631318400000,"operateur":"BPI","procedure":"Contractualisation directe","nom_projet":"%s","nom_beneficiaire":"RECIPHARM MONTS","siret":"%s","typologie":"Petites et moyennes entreprises","regions":"CVL","localisation_geo":37,"acteur_emergent":null,"nom_strategie":"Capacity building","code_nomenclature":"Objectif 7","montant_subvention":null,"montant_avance_remboursable":23372935.0,"montant_aide":23372935.0,"annee":2023}'
+    france_2030_batch = [
+        {"data": data % ("RONSARD 3", "39922695000026"), "task": ("a task id", 1)},
+        {"data": data % ("SIRET INVALIDE", "123"), "task": ("a task id", 2)},
+    ]
+
+    # DO
+    import_lines_france_2030(france_2030_batch)
+    import_lines_france_2030(france_2030_batch)  # redélivrance du message
+
+    # ASSERT
+    lines = {
+        line.nom_projet: line
+        for line in session.execute(
+            database.select(France2030).where(France2030.file_import_taskid == "a task id")
+        ).scalars()
+    }
+    assert len(lines) == 2
+    assert lines["RONSARD 3"].siret == "39922695000026"
+    assert lines["SIRET INVALIDE"].siret is None
+
+    delete_references(session)
@@ -1,12 +1,13 @@
 import json
 import pytest
-from unittest.mock import patch, call
+from unittest.mock import patch
 
 from models.entities.refs.CentreCouts import CentreCouts
 from app.tasks.import_refs_tasks import import_refs_task
-from app.tasks.refs import import_line_one_ref_default
+from app.tasks.refs import import_line_one_ref_default, import_lines_ref_default
 
 from tests import TESTS_PATH
+from tests.tasks import sent_ref_lines
 
 
 _data = TESTS_PATH / "data"
@@ -23,23 +24,16 @@ def test_import_refs_centre_cout(mock_subtask):
         usecols=[1, 2, 3, 4, 5],
     )
 
-    mock_subtask.assert_has_calls(
-        [
-            call().delay(
-                model_name="CentreCouts",
-                data='{"code":"AAIACNU075","description":"ACNUSA","label":"ACNUSA","code_postal":"75006","ville":"PARIS"}',
-            ),
-            call().delay(
-                model_name="CentreCouts",
-                data='{"code":"AAIAC00075","description":"AC","label":"AC","code_postal":"75001","ville":"PARIS"}',
-            ),
-            call().delay(
-                model_name="CentreCouts",
-                data='{"code":"3070ATE012","description":"Centre de cout mutualise","label":"PRF0ATE012","code_postal":null,"ville":null}',
-            ),
-            call("import_line_one_ref_default"),
-        ],
-        any_order=True,
+    mock_subtask.assert_any_call("import_lines_ref_default")
+    sent_lines = sent_ref_lines(mock_subtask, "CentreCouts")
+    assert (
+        '{"code":"AAIACNU075","description":"ACNUSA","label":"ACNUSA","code_postal":"75006","ville":"PARIS"}'
+        in sent_lines
+    )
+    assert '{"code":"AAIAC00075","description":"AC","label":"AC","code_postal":"75001","ville":"PARIS"}' in sent_lines
+    assert (
+        '{"code":"3070ATE012","description":"Centre de cout mutualise","label":"PRF0ATE012","code_postal":null,"ville":null}'
+        in sent_lines
     )
 
 
@@ -74,3 +68,27 @@ def test_import_new_line_centre_cout(database):
     assert r.description == "Centre de cout mutualise"
     assert r.code_postal == "75001"
     assert r.ville == "PARIS"
+
+
+def test_import_lines_centre_cout(database, session):
+    # Given
+    session.add(CentreCouts(code="00001124", label="Ancien label", ville="RENNES"))
+    session.commit()
+    lines = [
+        json.dumps({"code": "BG00/00001124", "label": "Nouveau label"}),
+        json.dumps({"code": "00001125", "label": "Premier"}),
+        json.dumps({"code": "00001125", "label": "Dernier"}),
+    ]
+    # When
+    import_lines_ref_default(model_name="CentreCouts", lines=lines)
+
+    # Then
+    rows = {
+        r.code: r
+        for r in database.session.execute(
+            database.select(CentreCouts).where(CentreCouts.code.in_(["00001124", "00001125"]))
+        ).scalars()
+    }
+    assert rows["00001124"].label == "Nouveau label"
+    assert rows["00001124"].ville == "RENNES"
+    assert rows["00001125"].label == "Dernier"
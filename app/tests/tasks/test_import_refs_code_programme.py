@@ -1,5 +1,5 @@
 import json
-from unittest.mock import patch, call
+from unittest.mock import patch
 
 from app import db
 from models.entities.refs.CodeProgramme import CodeProgramme
@@ -7,6 +7,7 @@ from models.entities.refs.Ministere import Ministere
 from app.tasks.import_refs_tasks import import_refs_task
 from app.tasks.refs import import_line_one_ref_default
 from tests import TESTS_PATH
+from tests.tasks import sent_ref_lines
 
 _data = TESTS_PATH / "data"
 
@@ -24,24 +25,17 @@ def test_import_refs_code_programme(mock_subtask):
         skiprows=8,
     )
 
-    mock_subtask.assert_has_calls(
-        [
-            call().delay(
-                model_name="CodeProgramme",
-                data='{"code_ministere":"MIN01","code":"0105","label":"Action de la France en Europe et dans le monde"}',
-            ),
-            call().delay(
-                model_name="CodeProgramme",
-                data='{"code_ministere":"MIN01","code":"0151","label":"Fran\\u00e7ais \\u00e0 l\'\\u00e9tranger et affaires consulaires"}',
-            ),
-            call().delay(
-                model_name="CodeProgramme",
-                data='{"code_ministere":"MIN01","code":"0185","label":"Diplomatie culturelle et d\'influence"}',
-            ),
-            call("import_line_one_ref_default"),
-        ],
-        any_order=True,
+    mock_subtask.assert_any_call("import_lines_ref_default")
+    sent_lines = sent_ref_lines(mock_subtask, "CodeProgramme")
+    assert (
+        '{"code_ministere":"MIN01","code":"0105","label":"Action de la France en Europe et dans le monde"}'
+        in sent_lines
     )
+    assert (
+        '{"code_ministere":"MIN01","code":"0151","label":"Fran\\u00e7ais \\u00e0 l\'\\u00e9tranger et affaires consulaires"}'
+        in sent_lines
+    )
+    assert '{"code_ministere":"MIN01","code":"0185","label":"Diplomatie culturelle et d\'influence"}' in sent_lines
 
 
 @patch("app.tasks.import_refs_tasks.subtask")
@@ -56,16 +50,9 @@ def test_import_refs_ministere(mock_subtask):
         skiprows=8,
     )
 
-    mock_subtask.assert_has_calls(
-        [
-            call().delay(
-                model_name="Ministere",
-                data='{"code":"MIN01","sigle_ministere":"MEAE","label":"Europe&Aff.\\u00c9trang\\u00e8res"}',
-            ),
-            call("import_line_one_ref_default"),
-        ],
-        any_order=True,
-    )
+    mock_subtask.assert_any_call("import_lines_ref_default")
+    sent_lines = sent_ref_lines(mock_subtask, "Ministere")
+    assert '{"code":"MIN01","sigle_ministere":"MEAE","label":"Europe&Aff.\\u00c9trang\\u00e8res"}' in sent_lines
 
 
 def test_import_insert_code_programme_line(session):
@@ -1,12 +1,13 @@
 import json
 import pytest
-from unittest.mock import patch, call
+from unittest.mock import patch
 
 from models.entities.refs.DomaineFonctionnel import DomaineFonctionnel
 from app.services.import_refs import ReferentielNotFound, MissingCodeColumns
 from app.tasks.import_refs_tasks import import_refs_task
 from app.tasks.refs import import_line_one_ref_default
 from tests import TESTS_PATH
+from tests.tasks import sent_ref_lines
 
 _data = TESTS_PATH / "data"
 
@@ -40,16 +41,10 @@ def test_import_refs_domaine_fonctionnel(mock_subtask):
         sheet_name="07 - Domaines Fonct. (DF)",
         skiprows=8,
     )
-    mock_subtask.assert_has_calls(
-        [
-            call().delay(model_name="DomaineFonctionnel", data='{"code":"0104-12-08","label":"TEST"}'),
-            call().delay(
-                model_name="DomaineFonctionnel", data='{"code":"0104-12-15","label":"Actions R\\u00e9fugi\\u00e9s"}'
-            ),
-            call("import_line_one_ref_default"),
-        ],
-        any_order=True,
-    )
+    mock_subtask.assert_any_call("import_lines_ref_default")
+    sent_lines = sent_ref_lines(mock_subtask, "DomaineFonctionnel")
+    assert '{"code":"0104-12-08","label":"TEST"}' in sent_lines
+    assert '{"code":"0104-12-15","label":"Actions R\\u00e9fugi\\u00e9s"}' in sent_lines
 
 
 def test_import_line_ref_with_attribute_error():
@@ -1,7 +1,8 @@
-from unittest.mock import patch, call
+from unittest.mock import patch
 
 from app.tasks.import_refs_tasks import import_refs_task
 from tests import TESTS_PATH
+from tests.tasks import sent_ref_lines
 
 _data = TESTS_PATH / "data"
 
@@ -18,13 +19,9 @@ def test_import_refs_groupe_marchandise_pce(mock_subtask):
         skiprows=8,
     )
 
-    mock_subtask.assert_has_calls(
-        [
-            call().delay(
-                model_name="GroupeMarchandise",
-                data='{"domaine":"Affranchissement et impression","segment":"Affranchissement","code":"01.01.01","label":"EX-AI EXP\\u00c9DITION","description":"EX-FRAIS POSTAUX YC VALIISE DIPLOMATIQUE","code_pce":"6161000000","label_pce":"FRAIS POSTAUX"}',
-            ),
-            call("import_line_one_ref_default"),
-        ],
-        any_order=True,
+    mock_subtask.assert_any_call("import_lines_ref_default")
+    sent_lines = sent_ref_lines(mock_subtask, "GroupeMarchandise")
+    assert (
+        '{"domaine":"Affranchissement et impression","segment":"Affranchissement","code":"01.01.01","label":"EX-AI EXP\\u00c9DITION","description":"EX-FRAIS POSTAUX YC VALIISE DIPLOMATIQUE","code_pce":"6161000000","label_pce":"FRAIS POSTAUX"}'
+        in sent_lines
     )
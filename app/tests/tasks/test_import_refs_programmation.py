@@ -1,11 +1,12 @@
 import json
 import pytest
-from unittest.mock import patch, call
+from unittest.mock import patch
 
 from models.entities.refs.ReferentielProgrammation import ReferentielProgrammation
 from app.tasks.import_refs_tasks import import_refs_task
 from app.tasks.refs import import_line_one_ref_default
 from tests import TESTS_PATH
+from tests.tasks import sent_ref_lines
 
 _data = TESTS_PATH / "data"
 
@@ -21,20 +22,10 @@ def test_import_refs_programme_financement(mock_subtask):
         sheet_name="08 - Activités (OS,OP,OB,ACT)",
         skiprows=8,
     )
-    mock_subtask.assert_has_calls(
-        [
-            call().delay(
-                model_name="ReferentielProgrammation",
-                data='{"code":"010101010101","label":"DOTATIONS CARPA AJ ET AUTRES INTERVENTIONS"}',
-            ),
-            call().delay(
-                model_name="ReferentielProgrammation",
-                data='{"code":"010101010106","label":"RETRIBUER AVOCATS CE CCASS MISSIONS AJ"}',
-            ),
-            call("import_line_one_ref_default"),
-        ],
-        any_order=True,
-    )
+    mock_subtask.assert_any_call("import_lines_ref_default")
+    sent_lines = sent_ref_lines(mock_subtask, "ReferentielProgrammation")
+    assert '{"code":"010101010101","label":"DOTATIONS CARPA AJ ET AUTRES INTERVENTIONS"}' in sent_lines
+    assert '{"code":"010101010106","label":"RETRIBUER AVOCATS CE CCASS MISSIONS AJ"}' in sent_lines
 
 
 def test_import_line_ref_with_attribute_error():
@@ -0,0 +1,44 @@
+import pytest
+
+from app.tasks.financial.references import _missing_codes, clear_references_cache, get_references_cache
+from models.entities.refs.CodeProgramme import CodeProgramme
+
+
+@pytest.fixture(scope="function")
+def programme_101(database):
+    clear_references_cache()
+    database.session.add(CodeProgramme(code="101"))
+    database.session.commit()
+    yield
+    database.session.execute(database.delete(CodeProgramme))
+    database.session.commit()
+    clear_references_cache()
+
+
+def _delete_programmes(database):
+    database.session.execute(database.delete(CodeProgramme))
+    database.session.commit()
+
+
+def test_missing_codes_caches_codes_found_in_database(database, programme_101):
+    assert _missing_codes(CodeProgramme, {"101", "999"}) == {"999"}
+    assert ("ref_code_programme", "101") in get_references_cache()
+    assert ("ref_code_programme", "999") not in get_references_cache()
+
+    # Le code en cache n'est plus relu en base
+    _delete_programmes(database)
+    assert _missing_codes(CodeProgramme, {"101", "999"}) == {"999"}
+
+    clear_references_cache()
+    assert _missing_codes(CodeProgramme, {"101", "999"}) == {"101", "999"}
+
+
+@pytest.mark.parametrize("config_key", ["IMPORT_REFERENCES_CACHE_SIZE", "IMPORT_REFERENCES_CACHE_TTL"])
+def test_missing_codes_without_cache(app, database, programme_101, monkeypatch, config_key):
+    monkeypatch.setattr("app.tasks.financial.references._references_cache", None)
+    monkeypatch.setitem(app.config, config_key, 0)
+    assert get_references_cache() is None
+
+    assert _missing_codes(CodeProgramme, {"101", "999"}) == {"999"}
+    _delete_programmes(database)
+    assert _missing_codes(CodeProgramme, {"101", "999"}) == {"101", "999"}
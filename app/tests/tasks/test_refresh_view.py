@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta, timezone
-from app.tasks.financial.refresh_materialized_views import maj_materialized_views
+from app.tasks.financial.refresh_materialized_views import _can_refresh_concurrently, maj_materialized_views
 from models.entities.audit.AuditRefreshMaterializedViewsEvents import AuditRefreshMaterializedViewsEvents
 from models.entities.financial.Ademe import Ademe
 from models.entities.financial.FinancialAe import FinancialAe
@@ -8,6 +8,7 @@ from models.entities.refs import Siret
 from models.value_objects.audit import RefreshMaterializedViewsEvent
 from tests.tasks.tags.test_tag_acv import add_references
 import pytest
+from sqlalchemy import text
 from . import build_ademe, build_financial_ae, build_financial_cp, build_siret
 
 
@@ -59,6 +60,7 @@ def test_refresh_no_data_updated_and_no_refresh(database, session):
     assert len(events) == 3
     tables_with_events = {e.table for e in events}
     assert "flatten_financial_lines" in tables_with_events
+    assert all(e.duree is not None and e.duree >= 0 for e in events)
 
 
 def test_refresh_no_data_updated_refresh_exist(database, session):
@@ -295,3 +297,42 @@ def test_no_refresh_view_done(database, session):
     assert len(events) == 3
     tables_with_events = {e.table for e in events}
     assert "flatten_financial_lines" in tables_with_events
+
+
+def test_can_refresh_concurrently_populated_view_with_unique_index(database, session):
+    """
+    Une vue peuplée avec un index unique (source, id) est rafraîchie en CONCURRENTLY
+    """
+    # GIVEN
+    session.execute(
+        text(
+            "CREATE MATERIALIZED VIEW test_refresh_concurrently AS "
+            "SELECT 'FINANCIAL_DATA_AE'::text AS source, g AS id FROM generate_series(1, 3) g"
+        )
+    )
+    assert _can_refresh_concurrently("test_refresh_concurrently") is False
+
+    session.execute(
+        text("CREATE UNIQUE INDEX ux_test_refresh_concurrently ON test_refresh_concurrently USING btree (source, id)")
+    )
+
+    # DO / ASSERT
+    assert _can_refresh_concurrently("test_refresh_concurrently") is True
+    session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY test_refresh_concurrently"))
+
+
+def test_can_refresh_concurrently_not_populated_view(database, session):
+    """
+    Une vue jamais peuplée ne peut pas être rafraîchie en CONCURRENTLY
+    """
+    session.execute(
+        text(
+            "CREATE MATERIALIZED VIEW test_refresh_not_populated AS "
+            "SELECT 'FINANCIAL_DATA_AE'::text AS source, 1 AS id WITH NO DATA"
+        )
+    )
+    session.execute(
+        text("CREATE UNIQUE INDEX ux_test_refresh_not_populated ON test_refresh_not_populated USING btree (source, id)")
+    )
+
+    assert _can_refresh_concurrently("test_refresh_not_populated") is False
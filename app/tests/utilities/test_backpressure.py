@@ -0,0 +1,73 @@
+from app.utilities.backpressure import QueueBackpressure
+
+
+class _FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _backpressure(fake_time, probe, **kwargs):
+    return QueueBackpressure("test", probe=probe, clock=fake_time.clock, sleep=fake_time.sleep, **kwargs)
+
+
+def test_depth_is_probed_once_per_interval():
+    fake_time = _FakeTime()
+    probes = []
+    backpressure = _backpressure(fake_time, lambda: probes.append(fake_time.now) or 0, max_queue_size=100)
+
+    for _ in range(50):
+        assert backpressure.acquire(timeout=60)
+    fake_time.now = 1.5
+    assert backpressure.acquire(timeout=60)
+
+    assert probes == [0.0, 1.5]
+    assert fake_time.sleeps == []
+
+
+def test_estimated_depth_is_verified_before_throttling():
+    fake_time = _FakeTime()
+    probes = []
+    backpressure = _backpressure(fake_time, lambda: probes.append(fake_time.now) or 0, max_queue_size=2)
+
+    for _ in range(4):
+        assert backpressure.acquire(timeout=60)
+
+    # L'estimation dépasse la taille max, la profondeur réelle est relue au lieu d'attendre
+    assert len(probes) == 2
+    assert fake_time.sleeps == []
+
+
+def test_full_queue_waits_with_growing_delay():
+    fake_time = _FakeTime()
+    depths = iter([10, 10, 10, 0])
+    backpressure = _backpressure(fake_time, lambda: next(depths), max_queue_size=5, min_delay=0.5, max_delay=10)
+
+    assert backpressure.acquire(timeout=60)
+    assert fake_time.sleeps == [0.5, 1.0, 2.0]
+
+
+def test_full_queue_times_out():
+    fake_time = _FakeTime()
+    backpressure = _backpressure(fake_time, lambda: 10, max_queue_size=5, min_delay=1, max_delay=10)
+
+    assert not backpressure.acquire(timeout=20)
+    assert sum(fake_time.sleeps) == 20
+
+
+def test_publish_rate_is_paced_by_token_bucket():
+    fake_time = _FakeTime()
+    backpressure = _backpressure(fake_time, lambda: 0, max_queue_size=1000, rate=2)
+
+    for _ in range(6):
+        assert backpressure.acquire(timeout=60)
+
+    # 2 messages en rafale puis 2 messages par seconde
+    assert fake_time.now == 2.0
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from app.utilities.external_sort import ExternalSorter
+
+
+@pytest.mark.parametrize(
+    "run_size, max_fan_in",
+    [
+        (1000, 64),  # tout en mémoire
+        (7, 64),  # plusieurs runs sur disque
+        (3, 2),  # fusion en plusieurs passes
+    ],
+)
+def test_sort_by_key_and_keep_insertion_order(tmp_path, run_size, max_fan_in):
+    sorter = ExternalSorter(str(tmp_path), run_size=run_size, max_fan_in=max_fan_in)
+    records = [(f"key_{i % 5}", [i, f"ligne {i}"]) for i in range(50)]
+    for key, value in records:
+        sorter.add(key, value)
+
+    result = list(sorter)
+
+    assert len(sorter) == 50
+    assert result == sorted(records, key=lambda r: (r[0], r[1][0]))
+    assert os.listdir(tmp_path) == [], "Les runs doivent être supprimés une fois lus"
+
+
+def test_sort_empty(tmp_path):
+    assert list(ExternalSorter(str(tmp_path))) == []
+
+
+def test_invalid_parameters(tmp_path):
+    with pytest.raises(ValueError):
+        ExternalSorter(str(tmp_path), run_size=0)
+    with pytest.raises(ValueError):
+        ExternalSorter(str(tmp_path), max_fan_in=1)
@@ -15,6 +15,10 @@ class GristConfig(BaseModel):
     """L'url de grist"""
     token_scim: str
     """Le token de l'utilisateur SCIM"""
+    append_batch_size: int = 2500
+    """Nombre maximum de lignes envoyées par appel d'ajout d'enregistrements"""
+    append_batch_max_bytes: int = 8_000_000
+    """Taille maximum (estimée) d'un appel d'ajout d'enregistrements"""
 
 
 class RemoteFilesConfig(BaseModel):
@@ -1,4 +1,6 @@
-from dataclasses import dataclass, replace
+from dataclasses import asdict, dataclass, replace
+import json
+import os
 from pathlib import Path
 from typing import Optional
 from batches.database import init_persistence_module, session_scope, session_audit_scope
@@ -8,10 +10,10 @@ init_persistence_module()
 from models.value_objects.export_api import ExportTarget  # noqa: E402
 from batches.share.schemas.ExportEnrichedFlattenFinancialLinesSchema import ExportEnrichedFlattenFinancialLinesSchema  # noqa: E402
 from batches.share.tabular_writer.factory import TabularWriterFactory  # noqa: E402
-from batches.share.tabular_writer.converter import convert_csv_to_excel, convert_csv_to_ods  # noqa: E402
 
 from services.budget.query_params import BudgetQueryParams  # noqa: E402
 from services.budget.colonnes import get_list_colonnes_tableau  # noqa: E402
+from services.budget.lignes_financieres.get_data import iter_lignes  # noqa: E402
 from models.entities.financial.query.FlattenFinancialLines import EnrichedFlattenFinancialLines  # noqa: E402
 from models.entities.audit.ExportFinancialTask import ExportFinancialTask  # noqa: E402
 from services.audits.export_financial_task import ExportFinancialTaskService  # noqa: E402
@@ -22,19 +24,47 @@ from prefect.cache_policies import NO_CACHE  # noqa: E402
 
 LIMITE_NB_LIGNES_EXPORT = 100_001
 PAGE_SIZE = 1000
+CHECKPOINT_NB_LIGNES = 10_000
 
 from batches.filesystem import get_dossier_exports_path  # noqa: E402
 
 
+class LimiteExportAtteinte(RuntimeError):
+    """Le nombre de lignes à exporter dépasse LIMITE_NB_LIGNES_EXPORT"""
+
+
+def _retry_sauf_limite_atteinte(task, task_run, state) -> bool:
+    """Une nouvelle tentative échouerait de même si la limite de lignes est atteinte, on ne retente pas."""
+    try:
+        state.result()
+    except LimiteExportAtteinte:
+        return False
+    except Exception:
+        return True
+    return True
+
+
 def _entity_to_colonnes(dict, colonnes: list[str]) -> list[str]:
     lst = [dict[col] for col in colonnes]
     return lst
 
 
-def _serialize(ligne: EnrichedFlattenFinancialLines):
-    schema = ExportEnrichedFlattenFinancialLinesSchema().enable_safe_getattr()
-    obj = schema.dump(ligne)
-    return obj
+def _serialize(lignes: list[EnrichedFlattenFinancialLines], schema: ExportEnrichedFlattenFinancialLinesSchema):
+    return schema.dump(lignes, many=True)
+
+
+@dataclass(frozen=True)
+class _Checkpoint:
+    """Point de reprise de l'export, persisté dans le répertoire d'export"""
+
+    nb_lignes: int = 0
+    """Nombre de lignes déjà exportées"""
+    cursor: Optional[str] = None
+    """Curseur qui suit la dernière ligne exportée"""
+    csv_size: Optional[int] = None
+    """Taille du CSV correspondant aux lignes exportées (export CSV uniquement)"""
+    termine: bool = False
+    """Indique que toutes les lignes ont été exportées"""
 
 
 @dataclass(frozen=True)
@@ -44,15 +74,21 @@ class _Ctx:
     """Type de fichier d'export (csv, xlsx, etc)"""
     current_export_dir: Optional[Path] = None
     """Répertoire courant d'export"""
-    needs_conversion: bool = False
-    """Indique si on doit convertir le CSV vers un autre format (True pour xlsx/ods)"""
 
     @property
-    def csv_file(self) -> Optional[Path]:
-        """Retourne le chemin du fichier CSV (toujours écrit en premier)"""
+    def streams_whole_file(self) -> bool:
+        """
+        Indique si le fichier est écrit d'une traite (xlsx/ods): il n'est complet qu'au close du writer,
+        on ne peut donc pas reprendre au milieu et l'entête est écrite avec les lignes.
+        """
+        return self.target_format in ["xlsx", "ods"]
+
+    @property
+    def checkpoint_file(self) -> Optional[Path]:
+        """Retourne le chemin du point de reprise de l'export"""
         if self.current_export_dir is None:
             return None
-        return self.current_export_dir / "export_file.csv"
+        return self.current_export_dir / "checkpoint.json"
 
     @property
     def final_export_file(self) -> Optional[Path]:
@@ -73,12 +109,8 @@ class _Ctx:
     # Metadonnées sur l'état de l'export
     nb_lignes: int = 0
     """Nombre de lignes exportées"""
-    current_page: int = 1
-    """Page courante"""
     page_size: int = PAGE_SIZE
-    """Taille de page"""
-    has_next: bool = True
-    """Indique s'il y a une page suivante"""
+    """Nombre de lignes lues et écrites par lot"""
 
     ##
     id_of_export_entity: Optional[int] = None
@@ -92,11 +124,6 @@ def initialise_export_task_in_db(ctx: _Ctx) -> _Ctx:
     assert user_email is not None
     assert flow_run_id is not None
 
-    # Déterminer si on a besoin d'une conversion après l'export CSV
-    needs_conversion = ctx.target_format in ["xlsx", "ods"]
-    if needs_conversion:
-        print(f"Export {ctx.target_format}: écriture en CSV puis conversion vers {ctx.target_format}")
-
     with session_audit_scope() as session:
         export_entity: ExportFinancialTask = ExportFinancialTaskService.initialize_and_persist_export_task_entity(
             session,
@@ -106,7 +133,7 @@ def initialise_export_task_in_db(ctx: _Ctx) -> _Ctx:
         )
         export_entity.target_format = ctx.target_format  # type: ignore
         session.commit()
-        ctx = replace(ctx, id_of_export_entity=export_entity.id, needs_conversion=needs_conversion)
+        ctx = replace(ctx, id_of_export_entity=export_entity.id)
     return ctx
 
 
@@ -136,20 +163,27 @@ def initalise_fs(ctx: _Ctx) -> _Ctx:
 
     ctx = replace(ctx, current_export_dir=current_partage_path)
 
-    ### Vide le fichier CSV s'il existe déjà
-    assert ctx.csv_file is not None
-    with ctx.csv_file.open("wb"):
+    if _load_checkpoint(ctx) is not None:
+        print("Un point de reprise existe, l'export reprendra là où il s'est arrêté")
+        return ctx
+
+    ### Vide le fichier d'export s'il existe déjà
+    assert ctx.final_export_file is not None
+    with ctx.final_export_file.open("wb"):
         pass
 
+    if ctx.streams_whole_file:
+        # L'entête est écrite par exporte_les_lignes, avec les lignes
+        return ctx
+
     ###
     assert ctx.query_params is not None
     params: BudgetQueryParams = ctx.query_params
     user_email: str = runtime.flow_run.parameters["user_email"]  # type: ignore
 
-    export_target = "csv" if ctx.needs_conversion else ctx.target_format
     writer = TabularWriterFactory.create_writer(
-        filep=str(ctx.csv_file),
-        export_target=export_target,
+        filep=str(ctx.final_export_file),
+        export_target=ctx.target_format,
         username=user_email,
     )
     colonnes = params.colonnes_list
@@ -163,79 +197,101 @@ def initalise_fs(ctx: _Ctx) -> _Ctx:
     return ctx
 
 
-@task(timeout_seconds=60, log_prints=True, cache_policy=NO_CACHE)
-def step(ctx: _Ctx) -> _Ctx:
-    print(f"Requête la page {ctx.current_page}, size: {ctx.page_size}")
-
+def _load_checkpoint(ctx: _Ctx) -> Optional[_Checkpoint]:
+    assert ctx.checkpoint_file is not None
+    if not ctx.checkpoint_file.exists():
+        return None
+    with ctx.checkpoint_file.open("r", encoding="utf-8") as f:
+        return _Checkpoint(**json.load(f))
+
+
+def _save_checkpoint(ctx: _Ctx, checkpoint: _Checkpoint):
+    assert ctx.checkpoint_file is not None
+    tmp = ctx.checkpoint_file.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(asdict(checkpoint), f)
+    os.replace(tmp, ctx.checkpoint_file)
+
+
+@task(
+    timeout_seconds=3600,
+    retries=2,
+    retry_delay_seconds=10,
+    retry_condition_fn=_retry_sauf_limite_atteinte,
+    log_prints=True,
+    cache_policy=NO_CACHE,
+)
+def exporte_les_lignes(ctx: _Ctx) -> _Ctx:
+    """
+    Exporte toutes les lignes en une passe: lecture via un curseur côté serveur, sérialisation et écriture par lot.
+    Un point de reprise est enregistré toutes les CHECKPOINT_NB_LIGNES lignes (le writer grist n'envoie ses lignes qu'à ce moment),
+    une nouvelle tentative reprend après la dernière ligne du point de reprise.
+    Au-delà de LIMITE_NB_LIGNES_EXPORT lignes, l'export échoue sans nouvelle tentative.
+    Les fichiers xlsx/ods sont écrits directement en streaming, une nouvelle tentative les réécrit depuis le début.
+    """
     assert ctx.query_params is not None
-    params: BudgetQueryParams = ctx.query_params
-    params = params.with_update({"page": ctx.current_page, "page_size": ctx.page_size})
-
-    from services.budget.lignes_financieres.get_data import get_lignes
-
-    with session_scope() as session:
-        data, has_next, grouped, builder = get_lignes(db=session, params=params)
-        data = [_serialize(ligne) for ligne in data]
-        assert grouped is False, "Un export ne devrait pas pouvoir se faire sur un grouping!"
-
-        ###
-        assert ctx.current_export_dir is not None, (
-            "Le répertoire d'export doit être initialisé avant d'écrire des données"
-        )
-
-        user_email: str = runtime.flow_run.parameters["user_email"]  # type: ignore
-
-        export_target = "csv" if ctx.needs_conversion else ctx.target_format
-        writer = TabularWriterFactory.create_writer(
-            filep=str(ctx.csv_file),
-            export_target=export_target,
-            username=user_email,
-        )
-        values = list(map(lambda e: _entity_to_colonnes(e, params.colonnes_list), data))  # type: ignore
-        writer.write_rows(values)
-        writer.close()
+    assert ctx.current_export_dir is not None, "Le répertoire d'export doit être initialisé avant d'écrire des données"
+    assert ctx.final_export_file is not None
+    export_file = ctx.final_export_file
+    export_target = ctx.target_format
+
+    checkpoint = _load_checkpoint(ctx)
+    if checkpoint is not None and checkpoint.termine:
+        print(f"Export déjà terminé, {checkpoint.nb_lignes} lignes exportées.")
+        return replace(ctx, nb_lignes=checkpoint.nb_lignes)
+    if checkpoint is None or ctx.streams_whole_file:
+        checkpoint = _Checkpoint(csv_size=export_file.stat().st_size if export_target == "csv" else None)
+    if checkpoint.nb_lignes > 0:
+        print(f"Reprise de l'export après {checkpoint.nb_lignes} lignes")
+
+    if export_target == "csv" and checkpoint.csv_size is not None:
+        # On se débarasse des lignes écrites après le dernier point de reprise
+        os.truncate(export_file, checkpoint.csv_size)
+
+    params: BudgetQueryParams = ctx.query_params.with_update({"cursor": checkpoint.cursor})
+    user_email: str = runtime.flow_run.parameters["user_email"]  # type: ignore
+    schema = ExportEnrichedFlattenFinancialLinesSchema().enable_safe_getattr()
+    writer = TabularWriterFactory.create_writer(
+        filep=str(export_file),
+        export_target=export_target,
+        username=user_email,
+    )
+    if ctx.streams_whole_file:
+        writer.write_header(params.colonnes_list)
 
-        nb_lignes = ctx.nb_lignes + len(data)
-        ctx = replace(
-            ctx,
-            has_next=has_next,
+    def _checkpoint(nb_lignes: int, cursor: Optional[str]) -> _Checkpoint:
+        writer.flush()
+        new_checkpoint = replace(
+            checkpoint,
             nb_lignes=nb_lignes,
+            cursor=cursor,
+            csv_size=export_file.stat().st_size if export_target == "csv" else None,
         )
+        _save_checkpoint(ctx, new_checkpoint)
+        return new_checkpoint
+
+    nb_lignes = checkpoint.nb_lignes
+    cursor = checkpoint.cursor
+    try:
+        with session_scope() as session:
+            for lignes, cursor in iter_lignes(db=session, params=params, batch_size=ctx.page_size):
+                data = _serialize(lignes, schema)
+                values = [_entity_to_colonnes(e, params.colonnes_list) for e in data]  # type: ignore
+                writer.write_rows(values)
+
+                nb_lignes += len(values)
+                if nb_lignes > LIMITE_NB_LIGNES_EXPORT:
+                    raise LimiteExportAtteinte(f"On limite les exports à {nb_lignes} lignes. On arrête tout.")
+
+                if nb_lignes - checkpoint.nb_lignes >= CHECKPOINT_NB_LIGNES:
+                    checkpoint = _checkpoint(nb_lignes, cursor)
+                print(f"  → {nb_lignes} lignes exportées...")
+        checkpoint = _checkpoint(nb_lignes, cursor)
+    finally:
+        writer.close()
 
-        if nb_lignes > LIMITE_NB_LIGNES_EXPORT:
-            raise RuntimeError(f"On limite les exports à {nb_lignes} lignes. On arrête tout.")
-        ###
-        return ctx
-
-
-@task(timeout_seconds=300, log_prints=True, cache_policy=NO_CACHE)
-def convert_to_final_format(ctx: _Ctx) -> _Ctx:
-    """Convertit le CSV vers le format final (Excel ou ODS) si nécessaire."""
-    if not ctx.needs_conversion:
-        print("Pas de conversion nécessaire, le fichier CSV est le format final")
-        return ctx
-
-    assert ctx.csv_file is not None, "Le CSV doit exister"
-    assert ctx.final_export_file is not None, "Le fichier final doit être défini"
-
-    csv_path = ctx.csv_file
-    target_path = ctx.final_export_file
-
-    if ctx.target_format == "xlsx":
-        print(f"Conversion CSV → Excel: {target_path}")
-        convert_csv_to_excel(csv_path, target_path, chunk_size=1000)
-    elif ctx.target_format == "ods":
-        print(f"Conversion CSV → ODS: {target_path}")
-        convert_csv_to_ods(csv_path, target_path, chunk_size=1000)
-    else:
-        raise ValueError(f"Format non supporté pour la conversion: {ctx.target_format}")
-
-    # Supprimer le CSV temporaire
-    print(f"Suppression du CSV source: {csv_path}")
-    csv_path.unlink()
-    print("✓ Conversion terminée et CSV source supprimé")
-
-    return ctx
+    _save_checkpoint(ctx, replace(checkpoint, termine=True))
+    return replace(ctx, nb_lignes=checkpoint.nb_lignes)
 
 
 @flow(log_prints=True)
@@ -245,24 +301,16 @@ def exporte_une_recherche(
     format: ExportTarget,
     filters: BudgetQueryParams,
 ):
-    page_size = PAGE_SIZE if format != "to-grist" else 100
-    print(f"Initialise l'export. On parcourt les lignes {page_size} par {page_size}.")
+    print(f"Initialise l'export. On lit les lignes {PAGE_SIZE} par {PAGE_SIZE}.")
 
-    ctx = _Ctx(target_format=format, page_size=page_size)
+    ctx = _Ctx(target_format=format, page_size=PAGE_SIZE)
     ctx = initialise_export_task_in_db(ctx)
     ctx = initialise_query_params(ctx)
     ctx = initalise_fs(ctx)
-    ctx = step(ctx)
-    while ctx.has_next:
-        ctx = replace(ctx, current_page=ctx.current_page + 1)
-        ctx = step(ctx)
+    ctx = exporte_les_lignes(ctx)
 
     print(f"Export terminé, {ctx.nb_lignes} lignes exportées.")
 
-    # Convertir vers le format final si nécessaire (xlsx/ods)
-    ctx = convert_to_final_format(ctx)
-
-    # Utiliser le chemin du fichier final
     assert ctx.final_export_file is not None
     filep = str(ctx.final_export_file)
 
@@ -271,6 +319,9 @@ def exporte_une_recherche(
         assert task_id is not None
         ExportFinancialTaskService.complete_export_task_entity(session, task_id, filep)
 
+    assert ctx.checkpoint_file is not None
+    ctx.checkpoint_file.unlink(missing_ok=True)
+
 
 if __name__ == "__main__":  # Pour le debug
     params = BudgetQueryParams.make_default()
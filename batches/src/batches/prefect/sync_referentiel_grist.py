@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any
+from itertools import chain, islice
+from typing import Any, Iterator
 from zoneinfo import ZoneInfo
 
 from batches.database import init_persistence_module, session_scope
@@ -15,7 +16,7 @@ init_persistence_module()
 from models import Base  # noqa: E402
 from models.entities.common.SyncedWithGrist import _SyncedWithGrist  # noqa: E402
 from models.entities.refs import SynchroGrist  # noqa: E402, F401 — import refs pour enregistrer tous les modèles
-from sqlalchemy import select, update  # noqa: E402
+from sqlalchemy import Column, Integer, MetaData, Table, exists, literal_column, select, update  # noqa: E402
 from sqlalchemy.dialects.postgresql import insert  # noqa: E402
 
 
@@ -70,14 +71,15 @@ def init_synchro_config_task(referentiel: str, doc_id: str, table_id: str) -> di
     }
 
 
-@task(cache_policy=NO_CACHE)
-def fetch_grist_records_task(doc_id: str, table_id: str, token: str) -> list[dict[str, Any]]:
-    """Récupère les enregistrements depuis l'API Grist."""
-    logger = get_run_logger()
+def _iter_grist_batches(doc_id: str, table_id: str, token: str, batch_size: int) -> Iterator[list[dict[str, Any]]]:
+    """Récupère les enregistrements Grist page par page et les regroupe en batches de synchronisation."""
     grist_api = make_grist_api_service(token)
-    records = grist_api.get_records_of_table(doc_id, table_id)
-    logger.info(f"[GRIST][FETCH] {len(records)} enregistrements récupérés depuis Grist")
-    return [{"id": r.id, "fields": r.fields} for r in records]
+    try:
+        records = ({"id": r.id, "fields": r.fields} for r in grist_api.iter_records_of_table(doc_id, table_id))
+        while batch := list(islice(records, batch_size)):
+            yield batch
+    finally:
+        grist_api.close()
 
 
 @task(cache_policy=NO_CACHE)
@@ -98,68 +100,63 @@ def validate_grist_data_task(records: list[dict[str, Any]], referentiel: str) ->
     logger.info(f"[GRIST][VALIDATE] Données Grist valides ({len(records)} enregistrements)")
 
 
+def _group_by_fields(batch: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    """
+    Regroupe les records par ensemble de colonnes, pour un INSERT multi-lignes par groupe.
+    Un code présent plusieurs fois n'est gardé qu'une fois (la dernière occurrence l'emporte).
+    """
+    by_code = {record["fields"].get("code"): record for record in batch}
+    groups: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+    for record in by_code.values():
+        groups.setdefault(tuple(sorted(record["fields"])), []).append(record)
+    return list(groups.values())
+
+
 @task(cache_policy=NO_CACHE)
 def sync_batch_task(
     batch: list[dict[str, Any]],
     synchro_meta: dict[str, Any],
     referentiel: str,
 ) -> dict[str, int]:
-    """UPSERT d'un batch de records Grist dans la table de référentiel."""
+    """UPSERT d'un batch de records Grist dans la table de référentiel, en une requête multi-lignes."""
     logger = get_run_logger()
     model = _get_model_by_tablename(referentiel)
     synchro_grist_id = synchro_meta["synchro_grist_id"]
     now = datetime.now(ZoneInfo("Europe/Paris"))
 
+    inserted = 0
+    updated = 0
+
     with session_scope() as session:
-        # Récupérer les codes existants pour compter inserted vs updated
-        batch_codes = [record["fields"]["code"] for record in batch if "code" in record["fields"]]
-        stmt_existing = select(model.code).where(model.code.in_(batch_codes))  # type: ignore[attr-defined]
-        existing_codes = set(session.execute(stmt_existing).scalars().all())
-
-        inserted = 0
-        updated = 0
-
-        for record in batch:
-            grist_row_id = record["id"]
-            fields = dict(record["fields"])
-
-            # Préparer les valeurs pour l'UPSERT
-            values = {
-                **fields,
-                "synchro_grist_id": synchro_grist_id,
-                "grist_row_id": grist_row_id,
-                "created_at": now,
-                "updated_at": now,
-            }
-
-            # Valeurs à mettre à jour en cas de conflit (tous les champs sauf created_at)
-            update_values = {
-                **fields,
-                "synchro_grist_id": synchro_grist_id,
-                "grist_row_id": grist_row_id,
-                "updated_at": now,
-            }
-
-            # UPSERT avec ON CONFLICT DO UPDATE sur la colonne 'code'
-            stmt = insert(model).values(**values)
+        for records in _group_by_fields(batch):
+            values = [
+                {
+                    **record["fields"],
+                    "synchro_grist_id": synchro_grist_id,
+                    "grist_row_id": record["id"],
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for record in records
+            ]
+
+            # UPSERT avec ON CONFLICT DO UPDATE sur la colonne 'code' (contrainte UNIQUE)
+            # Valeurs à mettre à jour en cas de conflit : tous les champs sauf created_at
+            stmt = insert(model).values(values)
+            update_columns = [*records[0]["fields"], "synchro_grist_id", "grist_row_id", "updated_at"]
             stmt = stmt.on_conflict_do_update(
-                index_elements=["code"],  # Colonne avec contrainte UNIQUE
-                set_=update_values,
+                index_elements=["code"],
+                set_={column: stmt.excluded[column] for column in update_columns},
             )
-            session.execute(stmt)
-
-            # Compter inserted vs updated
-            if fields.get("code") in existing_codes:
-                updated += 1
-                logger.info(
-                    f"[GRIST][SYNC] UPDATE {referentiel} (code={fields.get('code')}, grist_row_id={grist_row_id})"
-                )
-            else:
-                inserted += 1
-                logger.info(
-                    f"[GRIST][SYNC] INSERT {referentiel} (code={fields.get('code')}, grist_row_id={grist_row_id})"
-                )
-
+            # xmax = 0 : la ligne vient d'être insérée, sinon elle a été mise à jour
+            stmt = stmt.returning(literal_column("xmax = 0"))
+            for (is_insert,) in session.execute(stmt):
+                if is_insert:
+                    inserted += 1
+                else:
+                    updated += 1
+
+    logger.info(f"[GRIST][SYNC] {referentiel} : {inserted} INSERT, {updated} UPDATE")
     return {"inserted": inserted, "updated": updated}
 
 
@@ -169,28 +166,41 @@ def soft_delete_missing_task(
     synchro_meta: dict[str, Any],
     all_grist_ids: list[int],
 ) -> int:
-    """Marque is_deleted=True pour les entrées absentes de Grist."""
+    """Marque is_deleted=True pour les entrées absentes de Grist, en une requête."""
     logger = get_run_logger()
     model = _get_model_by_tablename(referentiel)
     synchro_grist_id = synchro_meta["synchro_grist_id"]
     now = datetime.now(ZoneInfo("Europe/Paris"))
-    count = 0
+
+    # Table temporaire des ids Grist, supprimée à la fin de la transaction
+    grist_ids = Table(
+        "tmp_grist_ids",
+        MetaData(),
+        Column("id", Integer, primary_key=True, autoincrement=False),
+        prefixes=["TEMPORARY"],
+        postgresql_on_commit="DROP",
+    )
+
     with session_scope() as session:
-        stmt = select(model).where(  # type: ignore[arg-type]
-            model.synchro_grist_id == synchro_grist_id,  # type: ignore[attr-defined]
-            model.grist_row_id.notin_(all_grist_ids),  # type: ignore[attr-defined]
-            model.is_deleted == False,  # noqa: E712
-        )
-        rows_to_delete = session.execute(stmt).scalars().all()
-        for row in rows_to_delete:
-            session.execute(
-                update(model)  # type: ignore[arg-type]
-                .where(model.id == row.id)  # type: ignore[attr-defined]
-                .values(is_deleted=True, updated_at=now)
+        grist_ids.create(session.connection())
+        if all_grist_ids:
+            session.execute(grist_ids.insert(), [{"id": grist_id} for grist_id in set(all_grist_ids)])
+
+        stmt = (
+            update(model)  # type: ignore[arg-type]
+            .where(
+                model.synchro_grist_id == synchro_grist_id,  # type: ignore[attr-defined]
+                model.is_deleted == False,  # noqa: E712
+                ~exists().where(grist_ids.c.id == model.grist_row_id),  # type: ignore[attr-defined]
             )
-            count += 1
-            logger.info(f"[GRIST][SYNC] SOFT DELETE {referentiel} (id={row.id})")
-    return count
+            .values(is_deleted=True, updated_at=now)
+            .returning(model.id)  # type: ignore[attr-defined]
+        )
+        deleted_ids = session.execute(stmt).scalars().all()
+
+    logger.info(f"[GRIST][SYNC] SOFT DELETE {referentiel} : {len(deleted_ids)} lignes")
+    logger.debug(f"[GRIST][SYNC] SOFT DELETE {referentiel} (ids={deleted_ids})")
+    return len(deleted_ids)
 
 
 @flow
@@ -225,31 +235,33 @@ def sync_referentiel_grist_flow(
     if not grist_doc_id or not grist_table_id:
         raise RuntimeError("grist_doc_id et grist_table_id sont requis pour récupérer les enregistrements Grist")
 
-    records = fetch_grist_records_task(grist_doc_id, grist_table_id, token)
-    validate_grist_data_task(records, referentiel)
+    # Les enregistrements sont lus page par page : seuls les ids Grist sont conservés pour le soft delete
+    batches = _iter_grist_batches(grist_doc_id, grist_table_id, token, batch_size)
+    first_batch = next(batches, [])
+    validate_grist_data_task(first_batch, referentiel)
+    batches = chain([first_batch], batches)
 
-    all_grist_ids = [r["id"] for r in records]
+    all_grist_ids: list[int] = []
 
     # Traitement des batches avec parallélisme limité pour ne pas saturer le pool DB
     # Lire la configuration si disponible (défaut 3)
     max_concurrent = get_config().max_concurrent
     total_inserted = 0
     total_updated = 0
-    all_batches = [records[i : i + batch_size] for i in range(0, len(records), batch_size)]
-    total_batches = len(all_batches)
+    nb_batches = 0
 
-    for group_start in range(0, total_batches, max_concurrent):
-        group = all_batches[group_start : group_start + max_concurrent]
-        group_num_start = group_start + 1
-        group_num_end = min(group_start + max_concurrent, total_batches)
-        logger.info(f"[GRIST] Lancement batches {group_num_start}-{group_num_end}/{total_batches}")
+    while group := list(islice(batches, max_concurrent)):
+        logger.info(f"[GRIST] Lancement batches {nb_batches + 1}-{nb_batches + len(group)}")
+        nb_batches += len(group)
 
         futures = [sync_batch_task.submit(batch, synchro_meta, referentiel) for batch in group]
+        all_grist_ids.extend(record["id"] for batch in group for record in batch)
         for f in futures:
             result = f.result()
             total_inserted += result["inserted"]
             total_updated += result["updated"]
 
+    logger.info(f"[GRIST][FETCH] {len(all_grist_ids)} enregistrements récupérés depuis Grist")
     logger.info(f"[GRIST] Batches terminés : {total_inserted} insérés, {total_updated} mis à jour")
 
     deleted_count = soft_delete_missing_task(referentiel, synchro_meta, all_grist_ids)
@@ -18,6 +18,10 @@ class TabularWriter(ABC):
     def close(self) -> None:
         pass
 
+    def flush(self) -> None:
+        """S'assure que les lignes écrites sont persistées. ie: avant un point de reprise"""
+        pass
+
 
 class StubTabularWriter(TabularWriter):
     def write_header(self, header: list[str]) -> None:
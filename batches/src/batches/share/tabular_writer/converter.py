@@ -1,15 +1,35 @@
 """Module de conversion de fichiers CSV vers d'autres formats (Excel, ODS).
 
 Ce module permet de convertir des fichiers CSV volumineux vers Excel ou ODS
-en lecture streaming pour minimiser la consommation mémoire.
+en lecture et en écriture streaming: la mémoire consommée ne dépend pas de la taille du fichier.
 """
 
 import csv
+from itertools import islice
 from pathlib import Path
-from openpyxl import Workbook
-from odf import opendocument
-from odf.table import Table, TableRow, TableCell
-from odf.text import P
+
+from batches.share.tabular_writer.abstract import TabularWriter
+from batches.share.tabular_writer.ods import OdsTabularWriter
+from batches.share.tabular_writer.xlsx import XlsxTabularWriter
+
+
+def _convert(csv_path: Path, writer: TabularWriter, chunk_size: int) -> int:
+    total_rows = 0
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        while chunk := list(islice(reader, chunk_size)):
+            writer.write_rows(chunk)
+            total_rows += len(chunk)
+            print(f"  → {total_rows} lignes converties...")
+    return total_rows
+
+
+def _check_csv(csv_path: Path):
+    if not csv_path.exists():
+        raise FileNotFoundError(f"Le fichier CSV {csv_path} n'existe pas")
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        if next(csv.reader(f), None) is None:
+            raise ValueError(f"Le fichier CSV {csv_path} est vide")
 
 
 def convert_csv_to_excel(csv_path: Path, target_path: Path, chunk_size: int = 1000) -> None:
@@ -24,41 +44,15 @@ def convert_csv_to_excel(csv_path: Path, target_path: Path, chunk_size: int = 10
         FileNotFoundError: Si le fichier CSV n'existe pas
         ValueError: Si le fichier CSV est vide
     """
-    if not csv_path.exists():
-        raise FileNotFoundError(f"Le fichier CSV {csv_path} n'existe pas")
-
+    _check_csv(csv_path)
     print(f"Conversion CSV → Excel: {csv_path} → {target_path}")
 
-    wb = Workbook()
-    ws = wb.active
+    writer = XlsxTabularWriter(str(target_path))
+    try:
+        total_rows = _convert(csv_path, writer, chunk_size)
+    finally:
+        writer.close()
 
-    total_rows = 0
-
-    with open(csv_path, "r", encoding="utf-8", newline="") as f:
-        reader = csv.reader(f)
-
-        # Traiter les lignes par chunks pour minimiser l'usage mémoire
-        chunk = []
-        for row in reader:
-            chunk.append(row)
-            total_rows += 1
-
-            if len(chunk) >= chunk_size:
-                for row_data in chunk:
-                    ws.append(row_data)
-                chunk = []
-                print(f"  → {total_rows} lignes converties...")
-
-        # Traiter les lignes restantes
-        if chunk:
-            for row_data in chunk:
-                ws.append(row_data)
-            print(f"  → {total_rows} lignes converties...")
-
-    if total_rows == 0:
-        raise ValueError(f"Le fichier CSV {csv_path} est vide")
-
-    wb.save(str(target_path))
     print(f"✓ Conversion terminée: {total_rows} lignes écrites dans {target_path}")
 
 
@@ -74,36 +68,13 @@ def convert_csv_to_ods(csv_path: Path, target_path: Path, chunk_size: int = 1000
         FileNotFoundError: Si le fichier CSV n'existe pas
         ValueError: Si le fichier CSV est vide
     """
-    if not csv_path.exists():
-        raise FileNotFoundError(f"Le fichier CSV {csv_path} n'existe pas")
-
+    _check_csv(csv_path)
     print(f"Conversion CSV → ODS: {csv_path} → {target_path}")
 
-    doc = opendocument.OpenDocumentSpreadsheet()
-    table = Table(name="Sheet1")
-
-    total_rows = 0
-
-    with open(csv_path, "r", encoding="utf-8", newline="") as f:
-        reader = csv.reader(f)
+    writer = OdsTabularWriter(str(target_path))
+    try:
+        total_rows = _convert(csv_path, writer, chunk_size)
+    finally:
+        writer.close()
 
-        # Traiter les lignes par chunks pour minimiser l'usage mémoire
-        for i, row_data in enumerate(reader):
-            row = TableRow()
-            for cell_value in row_data:
-                cell = TableCell()
-                cell.addElement(P(text=str(cell_value)))
-                row.addElement(cell)
-            table.addElement(row)
-            total_rows += 1
-
-            # Afficher la progression tous les chunk_size lignes
-            if (i + 1) % chunk_size == 0:
-                print(f"  → {total_rows} lignes converties...")
-
-    if total_rows == 0:
-        raise ValueError(f"Le fichier CSV {csv_path} est vide")
-
-    doc.spreadsheet.addElement(table)
-    doc.save(str(target_path))
     print(f"✓ Conversion terminée: {total_rows} lignes écrites dans {target_path}")
@@ -1,3 +1,5 @@
+from typing import TextIO
+
 from batches.share.tabular_writer.abstract import TabularWriter
 
 
@@ -7,18 +9,31 @@ import csv
 class CsvTabularWriter(TabularWriter):
     def __init__(self, filep: str, username: str | None = None) -> None:
         super().__init__(filep, username)
+        self._file: TextIO | None = None
+        self._writer = None
+
+    def _get_writer(self):
+        # Le fichier reste ouvert jusqu'au close, plutôt que d'être rouvert à chaque écriture
+        if self._writer is None:
+            self._file = open(self._filep, "a", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+        return self._writer
 
     def write_header(self, header: list[str]) -> None:
         print(f"CsvTabularWriter.write_header: {header}")
-        with open(self._filep, "a", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(header)
+        self._get_writer().writerow(header)
 
     def write_rows(self, rows: list) -> None:
         print(f"CsvTabularWriter.write_rows: {len(rows)} rows")
-        with open(self._filep, "a", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerows(rows)
+        self._get_writer().writerows(rows)
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
 
     def close(self) -> None:
         print("CsvTabularWriter.close")
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._writer = None
@@ -2,6 +2,8 @@ from models.value_objects.export_api import ExportTarget
 from batches.share.tabular_writer.abstract import TabularWriter
 from batches.share.tabular_writer.csv import CsvTabularWriter
 from batches.share.tabular_writer.grist import GristTabularWriter
+from batches.share.tabular_writer.ods import OdsTabularWriter
+from batches.share.tabular_writer.xlsx import XlsxTabularWriter
 
 
 class TabularWriterFactory:
@@ -11,9 +13,8 @@ class TabularWriterFactory:
             return CsvTabularWriter(filep, username)
         if export_target == "to-grist":
             return GristTabularWriter(filep, username)
-        if export_target in ["xlsx", "ods"]:
-            raise ValueError(
-                f"Les writers directs pour '{export_target}' ont été supprimés pour des raisons de performance. "
-                "Utilisez le writer CSV puis convertissez via le module converter."
-            )
+        if export_target == "xlsx":
+            return XlsxTabularWriter(filep, username)
+        if export_target == "ods":
+            return OdsTabularWriter(filep, username)
         raise NotImplementedError(f"Format non supporté: {export_target}")
@@ -1,9 +1,11 @@
 from dataclasses import dataclass, asdict
 import json
+from batches.config.current import get_config
 from batches.grist import make_grist_api_service, make_or_get_grist_database_service, make_or_get_user_scim_service
 from batches.share.tabular_writer.abstract import TabularWriter
 
 
+from gristcli.gristservices.users_grist_service import GrisApiService
 from gristcli.models import UserGrist
 
 
@@ -17,28 +19,54 @@ class _GristInfo:
     tableId: str
 
 
+def _estimate_size(record: dict) -> int:
+    """Estimation grossière de la taille JSON d'un enregistrement"""
+    return sum(len(k) + len(str(v)) + 8 for k, v in record.items())
+
+
 class GristTabularWriter(TabularWriter):
+    """
+    Writer vers un document grist.
+
+    Le contexte grist (client API, token, workspace) est résolu une seule fois pour la durée de vie du writer.
+    Les lignes sont bufferisées et ne sont envoyées qu'au `flush`, par lots bornés en nombre de lignes et en taille:
+    l'appelant flushe à chaque point de reprise, une reprise ne renvoie donc jamais des lignes déjà dans le document.
+    """
+
     def __init__(self, filep: str, username: str | None) -> None:
         super().__init__(filep, username)
         self._grist_db_service = make_or_get_grist_database_service()
         self._grist_scim_service = make_or_get_user_scim_service()
 
+        grist_config = get_config().grist
+        self._batch_size = grist_config.append_batch_size
+        self._batch_max_bytes = grist_config.append_batch_max_bytes
+
+        self._grist_context: tuple[GrisApiService, int] | None = None
+        self._grist_info: _GristInfo | None = None
+        self._buffer: list[dict] = []
+
     def _save_grist_info(self, grist_info: _GristInfo):
         with open(self._filep, "w", encoding="utf-8") as f:
             json.dump(asdict(grist_info), f, ensure_ascii=False, indent=2)
 
-    def _load_grist_info(self):
-        with open(self._filep, "r", encoding="utf-8") as f:
-            grist_info = json.load(f)
-            grist_info = _GristInfo(**grist_info)
-        return grist_info
+    def _load_grist_info(self) -> _GristInfo:
+        if self._grist_info is None:
+            with open(self._filep, "r", encoding="utf-8") as f:
+                self._grist_info = _GristInfo(**json.load(f))
+        return self._grist_info
 
     def _build_new_doc_name(self) -> str:
         now = datetime.now()
         date_formatee = now.strftime("%d/%m/%Y à %H:%M")
         return f"Export budget {date_formatee}"
 
-    def _prepare_grist_context(self):
+    def _prepare_grist_context(self) -> tuple[GrisApiService, int]:
+        if self._grist_context is None:
+            self._grist_context = self._resolve_grist_context()
+        return self._grist_context
+
+    def _resolve_grist_context(self) -> tuple[GrisApiService, int]:
         # Patch si API SCIM renvoi 500 : user_id = self._grist_db_service.search_userid_by_email(self._username)
         user = self._grist_scim_service.search_user_by_username(self._username)
         user_id = user.user_id if user else None
@@ -93,18 +121,47 @@ class GristTabularWriter(TabularWriter):
 
         grist_info = _GristInfo(docId=docId, columns=header, tableId=table_id)
         self._save_grist_info(grist_info)
+        self._grist_info = grist_info
 
     def write_rows(self, rows: list) -> None:
         super().write_rows(rows)
+        header = self._load_grist_info().columns
+
+        for row in rows:
+            self._buffer.append(dict(zip(header, row, strict=True)))
+
+    def _batches(self):
+        batch: list[dict] = []
+        batch_bytes = 0
+        for record in self._buffer:
+            size = _estimate_size(record)
+            if batch and (len(batch) >= self._batch_size or batch_bytes + size > self._batch_max_bytes):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(record)
+            batch_bytes += size
+        if batch:
+            yield batch
+
+    def flush(self) -> None:
+        """
+        Envoie les lignes bufferisées. Seul un échec au milieu d'un flush (entre deux lots)
+        peut conduire la reprise à renvoyer des lignes déjà présentes.
+        """
+        if not self._buffer:
+            return
         grist_api, _ = self._prepare_grist_context()
         grist_info = self._load_grist_info()
-        doc_id = grist_info.docId
-        header = grist_info.columns
-        table_id = grist_info.tableId
-
-        data = [dict(zip(header, row, strict=True)) for row in rows]
 
-        grist_api.append_records_to_table(doc_id, table_id, data)
+        for records in self._batches():
+            print(f"[GRIST] Envoi de {len(records)} lignes dans le doc {grist_info.docId}")
+            grist_api.append_records_to_table(grist_info.docId, grist_info.tableId, records)
+        self._buffer = []
 
     def close(self) -> None:
+        """
+        Les lignes bufferisées qui n'ont pas été flushées sont abandonnées:
+        elles suivent le dernier point de reprise et seront renvoyées par la reprise de l'export.
+        """
+        self._buffer = []
         return super().close()
@@ -0,0 +1,99 @@
+import math
+import re
+import zipfile
+from typing import IO
+from xml.sax.saxutils import escape
+
+from batches.share.tabular_writer.abstract import TabularWriter
+
+_MIMETYPE = "application/vnd.oasis.opendocument.spreadsheet"
+
+_NAMESPACES = (
+    'xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+    'xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0" '
+    'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"'
+)
+
+_CONTENT_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    f'<office:document-content {_NAMESPACES} office:version="1.2">'
+    '<office:body><office:spreadsheet><table:table table:name="Sheet1">'
+)
+_CONTENT_TAIL = "</table:table></office:spreadsheet></office:body></office:document-content>"
+
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    f'<office:document-styles {_NAMESPACES} office:version="1.2"></office:document-styles>'
+)
+
+_MANIFEST = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">'
+    f'<manifest:file-entry manifest:full-path="/" manifest:media-type="{_MIMETYPE}"/>'
+    '<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>'
+    '<manifest:file-entry manifest:full-path="styles.xml" manifest:media-type="text/xml"/>'
+    "</manifest:manifest>"
+)
+
+# Caractères interdits en XML 1.0
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _cell(value) -> str:
+    if value is None or value == "":
+        return "<table:table-cell/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        return f'<table:table-cell office:value-type="float" office:value="{value}"><text:p>{value}</text:p></table:table-cell>'
+    text = escape(_ILLEGAL_XML_CHARS.sub("", str(value)))
+    return f'<table:table-cell office:value-type="string"><text:p>{text}</text:p></table:table-cell>'
+
+
+class OdsTabularWriter(TabularWriter):
+    """
+    Writer OpenDocument (.ods) en streaming.
+
+    Le content.xml est écrit ligne à ligne directement dans l'archive zip,
+    la mémoire consommée ne dépend pas du nombre de lignes.
+    """
+
+    def __init__(self, filep: str, username: str | None = None) -> None:
+        super().__init__(filep, username)
+        self._zip: zipfile.ZipFile | None = None
+        self._content: IO[bytes] | None = None
+
+    def _get_content(self) -> IO[bytes]:
+        if self._content is None:
+            self._zip = zipfile.ZipFile(self._filep, "w", compression=zipfile.ZIP_DEFLATED)
+            # Le mimetype doit être la première entrée, non compressée
+            self._zip.writestr(zipfile.ZipInfo("mimetype"), _MIMETYPE, compress_type=zipfile.ZIP_STORED)
+            self._content = self._zip.open("content.xml", "w", force_zip64=True)
+            self._content.write(_CONTENT_HEAD.encode("utf-8"))
+        return self._content
+
+    def _write_row(self, content: IO[bytes], row: list):
+        cells = "".join(_cell(value) for value in row)
+        content.write(f"<table:table-row>{cells}</table:table-row>".encode("utf-8"))
+
+    def write_header(self, header: list[str]) -> None:
+        print(f"OdsTabularWriter.write_header: {header}")
+        self._write_row(self._get_content(), header)
+
+    def write_rows(self, rows: list) -> None:
+        print(f"OdsTabularWriter.write_rows: {len(rows)} rows")
+        content = self._get_content()
+        for row in rows:
+            self._write_row(content, row)
+
+    def close(self) -> None:
+        print("OdsTabularWriter.close")
+        if self._zip is None:
+            return
+
+        content = self._get_content()
+        content.write(_CONTENT_TAIL.encode("utf-8"))
+        content.close()
+        self._zip.writestr("styles.xml", _STYLES)
+        self._zip.writestr("META-INF/manifest.xml", _MANIFEST)
+        self._zip.close()
+        self._zip = None
+        self._content = None
@@ -0,0 +1,32 @@
+from openpyxl import Workbook
+
+from batches.share.tabular_writer.abstract import TabularWriter
+
+
+class XlsxTabularWriter(TabularWriter):
+    """
+    Writer Excel (.xlsx) en streaming.
+
+    Utilise le mode write-only d'openpyxl: chaque ligne est sérialisée dès son ajout,
+    la mémoire consommée ne dépend pas du nombre de lignes. Le fichier n'est écrit qu'au close.
+    """
+
+    def __init__(self, filep: str, username: str | None = None) -> None:
+        super().__init__(filep, username)
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet("Sheet1")
+
+    def write_header(self, header: list[str]) -> None:
+        print(f"XlsxTabularWriter.write_header: {header}")
+        self._sheet.append(header)
+
+    def write_rows(self, rows: list) -> None:
+        print(f"XlsxTabularWriter.write_rows: {len(rows)} rows")
+        for row in rows:
+            self._sheet.append(row)
+
+    def close(self) -> None:
+        print("XlsxTabularWriter.close")
+        if self._workbook is not None:
+            self._workbook.save(self._filep)
+        self._workbook = None
@@ -1,6 +1,6 @@
 """Tests unitaires pour le flow sync_referentiel_grist."""
 
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 import pytest
 from sqlalchemy import select, delete
@@ -87,6 +87,30 @@ def test_validate_grist_data_task_unknown_column():
         validate_grist_data_task(records, "ref_centre_couts")
 
 
+# ---------------------------------------------------------------------------
+# Tests _iter_grist_batches
+# ---------------------------------------------------------------------------
+
+
+def test_iter_grist_batches_streams_records():
+    """Les enregistrements Grist sont itérés et regroupés en batches, puis le client est fermé."""
+    from batches.prefect.sync_referentiel_grist import _iter_grist_batches
+    from gristcli.models import Record
+
+    grist_api = MagicMock()
+    grist_api.iter_records_of_table.return_value = iter(
+        [Record(id=i, fields={"code": f"C{i:03}"}) for i in range(1, 6)]
+    )
+
+    with patch("batches.prefect.sync_referentiel_grist.make_grist_api_service", return_value=grist_api):
+        batches = list(_iter_grist_batches("doc", "table", "token", batch_size=2))
+
+    assert [[r["id"] for r in batch] for batch in batches] == [[1, 2], [3, 4], [5]]
+    assert batches[0][0] == {"id": 1, "fields": {"code": "C001"}}
+    grist_api.iter_records_of_table.assert_called_once_with("doc", "table")
+    grist_api.close.assert_called_once()
+
+
 # ---------------------------------------------------------------------------
 # Tests init_synchro_config_task (avec DB)
 # ---------------------------------------------------------------------------
@@ -242,6 +266,40 @@ def test_sync_batch_task_update_existing_without_grist_row_id(session):
     session.commit()
 
 
+def test_sync_batch_task_mixed_batch_with_duplicated_code(session):
+    """Un batch mêlant insertions et mises à jour est traité en une passe, un code dupliqué n'est compté qu'une fois."""
+    from batches.prefect.sync_referentiel_grist import sync_batch_task
+
+    synchro = _create_synchro_grist(session)
+    existing = CentreCouts(code="C010", label="Ancien label", grist_row_id=110, synchro_grist_id=synchro.id)
+    session.add(existing)
+    session.commit()
+
+    synchro_meta = {"synchro_grist_id": synchro.id}
+    batch = [
+        {"id": 110, "fields": {"code": "C010", "label": "Nouveau label"}},
+        {"id": 111, "fields": {"code": "C011", "label": "Premier"}},
+        {"id": 112, "fields": {"code": "C011", "label": "Doublon"}},
+        {"id": 113, "fields": {"code": "C012"}},
+    ]
+
+    result = sync_batch_task(batch, synchro_meta, "ref_centre_couts")
+
+    assert result == {"inserted": 2, "updated": 1}
+    rows = {
+        row.code: row
+        for row in session.execute(select(CentreCouts).where(CentreCouts.synchro_grist_id == synchro.id)).scalars()
+    }
+    assert rows["C010"].label == "Nouveau label"
+    assert (rows["C011"].label, rows["C011"].grist_row_id) == ("Doublon", 112)
+    assert "C012" in rows
+
+    # Nettoyage
+    session.execute(delete(CentreCouts).where(CentreCouts.synchro_grist_id == synchro.id))
+    session.execute(delete(SynchroGrist).where(SynchroGrist.id == synchro.id))
+    session.commit()
+
+
 # ---------------------------------------------------------------------------
 # Tests soft_delete_missing_task (avec DB)
 # ---------------------------------------------------------------------------
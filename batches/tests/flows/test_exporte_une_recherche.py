@@ -0,0 +1,206 @@
+"""Tests des points de reprise de l'export d'une recherche."""
+
+import csv
+from contextlib import nullcontext
+from unittest.mock import MagicMock, patch
+
+import pytest
+from openpyxl import load_workbook
+
+from services.budget.query_params import BudgetQueryParams
+
+COLONNES = ["n_ej", "montant_ae"]
+NB_LIGNES = 25
+
+
+def _ligne(i: int) -> dict:
+    return {"n_ej": f"EJ{i:03d}", "montant_ae": i}
+
+
+class _FakeIterLignes:
+    """Remplace iter_lignes: parcourt NB_LIGNES lignes par lots, le curseur est l'indice de la ligne suivante.
+
+    Si `fail_after` est renseigné, le parcours échoue après ce nombre de lots.
+    """
+
+    def __init__(self, fail_after: int | None = None):
+        self.fail_after = fail_after
+        self.cursors: list[str | None] = []
+
+    def __call__(self, db, params, batch_size):
+        self.cursors.append(params.cursor)
+        start = int(params.cursor) if params.cursor is not None else 0
+        for nb_lots, debut in enumerate(range(start, NB_LIGNES, batch_size)):
+            if self.fail_after is not None and nb_lots >= self.fail_after:
+                raise RuntimeError("Perte de la connexion à la base")
+            fin = min(debut + batch_size, NB_LIGNES)
+            yield [_ligne(i) for i in range(debut, fin)], str(fin)
+
+
+@pytest.fixture
+def export_module(tmp_path):
+    from batches.prefect import exporte_une_recherche as module
+
+    runtime = MagicMock()
+    runtime.flow_run.flow_name = "exporte_une_recherche"
+    runtime.flow_run.id = "flow-run-id"
+    runtime.flow_run.parameters = {"user_email": "test@test.fr"}
+
+    with (
+        patch.object(module, "runtime", runtime),
+        patch.object(module, "get_dossier_exports_path", return_value=tmp_path),
+        patch.object(module, "session_scope", side_effect=lambda: nullcontext(MagicMock())),
+        patch.object(module, "_serialize", side_effect=lambda lignes, schema: lignes),
+        patch.object(module, "CHECKPOINT_NB_LIGNES", 4),
+    ):
+        yield module
+
+
+def _ctx(module, target_format: str):
+    params = BudgetQueryParams.make_default().with_update({"colonnes": ",".join(COLONNES)})
+    ctx = module._Ctx(target_format=target_format, query_params=params, page_size=2)
+    return module.initalise_fs.fn(ctx)
+
+
+def _export(module, ctx, iter_lignes: _FakeIterLignes):
+    with patch.object(module, "iter_lignes", iter_lignes):
+        return module.exporte_les_lignes.fn(ctx)
+
+
+def _read_csv(ctx) -> list[list[str]]:
+    with ctx.final_export_file.open("r", encoding="utf-8", newline="") as f:
+        return list(csv.reader(f))
+
+
+def _expected_rows() -> list[list[str]]:
+    return [COLONNES] + [[_ligne(i)["n_ej"], str(i)] for i in range(NB_LIGNES)]
+
+
+def test_save_and_load_checkpoint(export_module, tmp_path):
+    ctx = export_module._Ctx(current_export_dir=tmp_path)
+    assert export_module._load_checkpoint(ctx) is None
+
+    checkpoint = export_module._Checkpoint(nb_lignes=12, cursor="curseur", csv_size=345)
+    export_module._save_checkpoint(ctx, checkpoint)
+
+    assert export_module._load_checkpoint(ctx) == checkpoint
+    assert not ctx.checkpoint_file.with_suffix(".tmp").exists()
+
+
+def test_export_csv_complet(export_module):
+    ctx = _ctx(export_module, "csv")
+
+    ctx = _export(export_module, ctx, _FakeIterLignes())
+
+    assert ctx.nb_lignes == NB_LIGNES
+    assert _read_csv(ctx) == _expected_rows()
+    checkpoint = export_module._load_checkpoint(ctx)
+    assert checkpoint.termine
+    assert checkpoint.nb_lignes == NB_LIGNES
+
+
+def test_export_csv_reprend_au_dernier_point_de_reprise(export_module):
+    ctx = _ctx(export_module, "csv")
+
+    # 5 lots de 2 lignes sont écrits avant l'échec, le dernier point de reprise est à 8 lignes
+    with pytest.raises(RuntimeError):
+        _export(export_module, ctx, _FakeIterLignes(fail_after=5))
+    checkpoint = export_module._load_checkpoint(ctx)
+    assert checkpoint.nb_lignes == 8
+    assert checkpoint.cursor == "8"
+    assert not checkpoint.termine
+    assert len(_read_csv(ctx)) == 1 + 10
+
+    # Une nouvelle tentative (le fichier existant n'est pas vidé) tronque les lignes écrites après le point de reprise
+    ctx = _ctx(export_module, "csv")
+    iter_lignes = _FakeIterLignes()
+    ctx = _export(export_module, ctx, iter_lignes)
+
+    assert iter_lignes.cursors == ["8"]
+    assert ctx.nb_lignes == NB_LIGNES
+    assert _read_csv(ctx) == _expected_rows()
+
+
+def test_export_termine_ne_relit_pas_les_lignes(export_module):
+    ctx = _ctx(export_module, "csv")
+    _export(export_module, ctx, _FakeIterLignes())
+
+    iter_lignes = MagicMock(side_effect=AssertionError("Les lignes ne doivent pas être relues"))
+    ctx = _export(export_module, ctx, iter_lignes)
+
+    iter_lignes.assert_not_called()
+    assert ctx.nb_lignes == NB_LIGNES
+    assert _read_csv(ctx) == _expected_rows()
+
+
+def test_export_xlsx_reprend_depuis_le_debut(export_module):
+    ctx = _ctx(export_module, "xlsx")
+
+    with pytest.raises(RuntimeError):
+        _export(export_module, ctx, _FakeIterLignes(fail_after=5))
+    assert export_module._load_checkpoint(ctx).nb_lignes == 8
+
+    ctx = _ctx(export_module, "xlsx")
+    iter_lignes = _FakeIterLignes()
+    ctx = _export(export_module, ctx, iter_lignes)
+
+    assert iter_lignes.cursors == [None]
+    assert ctx.nb_lignes == NB_LIGNES
+    workbook = load_workbook(ctx.final_export_file)
+    rows = [list(row) for row in workbook["Sheet1"].iter_rows(values_only=True)]
+    workbook.close()
+    assert rows == [COLONNES] + [[_ligne(i)["n_ej"], i] for i in range(NB_LIGNES)]
+
+
+def test_export_grist_n_envoie_pas_les_lignes_apres_le_dernier_point_de_reprise(export_module):
+    grist_api = MagicMock()
+    grist_api.get_personnal_workspace.return_value = [MagicMock(id=1)]
+    grist_api.create_doc_on_workspace.return_value = "doc-id"
+    grist_api.new_table.return_value = "Budget"
+    scim_service = MagicMock()
+    scim_service.search_user_by_username.return_value = MagicMock(user_id=42)
+
+    with (
+        patch("batches.share.tabular_writer.grist.make_grist_api_service", return_value=grist_api),
+        patch("batches.share.tabular_writer.grist.make_or_get_grist_database_service", return_value=MagicMock()),
+        patch("batches.share.tabular_writer.grist.make_or_get_user_scim_service", return_value=scim_service),
+    ):
+        ctx = _ctx(export_module, "to-grist")
+
+        with pytest.raises(RuntimeError):
+            _export(export_module, ctx, _FakeIterLignes(fail_after=5))
+        sent = [r for c in grist_api.append_records_to_table.call_args_list for r in c.args[2]]
+        assert [r["n_ej"] for r in sent] == [_ligne(i)["n_ej"] for i in range(8)]
+
+        ctx = _ctx(export_module, "to-grist")
+        ctx = _export(export_module, ctx, _FakeIterLignes())
+
+    grist_api.create_doc_on_workspace.assert_called_once()
+    sent = [r for c in grist_api.append_records_to_table.call_args_list for r in c.args[2]]
+    assert sent == [_ligne(i) for i in range(NB_LIGNES)]
+    assert ctx.nb_lignes == NB_LIGNES
+
+
+def test_export_reessaie_apres_un_echec(export_module):
+    ctx = _ctx(export_module, "csv")
+    iter_lignes = _FakeIterLignes(fail_after=5)
+
+    with patch.object(export_module, "iter_lignes", iter_lignes):
+        ctx = export_module.exporte_les_lignes.with_options(retry_delay_seconds=0)(ctx)
+
+    assert iter_lignes.cursors == [None, "8", "16"]
+    assert _read_csv(ctx) == _expected_rows()
+
+
+def test_export_au_dela_de_la_limite_n_est_pas_reessaye(export_module):
+    ctx = _ctx(export_module, "csv")
+    iter_lignes = _FakeIterLignes()
+
+    with (
+        patch.object(export_module, "iter_lignes", iter_lignes),
+        patch.object(export_module, "LIMITE_NB_LIGNES_EXPORT", 10),
+        pytest.raises(export_module.LimiteExportAtteinte),
+    ):
+        export_module.exporte_les_lignes.with_options(retry_delay_seconds=0)(ctx)
+
+    assert iter_lignes.cursors == [None]
@@ -0,0 +1,58 @@
+import pytest
+from openpyxl import load_workbook
+
+from batches.share.tabular_writer.converter import convert_csv_to_excel, convert_csv_to_ods
+from tests.share.tabular_writer.test_ods import _read_cells
+
+CSV_CONTENT = 'n_ej,montant_ae,beneficiaire\r\nEJ1,10.5,"Dupont, Jean"\r\nEJ2,3,"ligne\nmultiple"\r\nEJ3,,é\r\n'
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_bytes(CSV_CONTENT.encode("utf-8"))
+    return path
+
+
+def test_convert_csv_to_excel(csv_path, tmp_path):
+    target = tmp_path / "export.xlsx"
+
+    convert_csv_to_excel(csv_path, target, chunk_size=2)
+
+    workbook = load_workbook(target)
+    rows = list(workbook["Sheet1"].iter_rows(values_only=True))
+    workbook.close()
+    # Les valeurs du CSV sont conservées telles quelles, en texte
+    assert rows == [
+        ("n_ej", "montant_ae", "beneficiaire"),
+        ("EJ1", "10.5", "Dupont, Jean"),
+        ("EJ2", "3", "ligne\nmultiple"),
+        ("EJ3", None, "é"),
+    ]
+
+
+def test_convert_csv_to_ods(csv_path, tmp_path):
+    target = tmp_path / "export.ods"
+
+    convert_csv_to_ods(csv_path, target, chunk_size=2)
+
+    rows = _read_cells(target)
+    assert len(rows) == 4
+    assert [text for _, _, text in rows[0]] == ["n_ej", "montant_ae", "beneficiaire"]
+    assert rows[1] == [("string", None, "EJ1"), ("string", None, "10.5"), ("string", None, "Dupont, Jean")]
+    assert rows[3] == [("string", None, "EJ3"), (None, None, ""), ("string", None, "é")]
+
+
+@pytest.mark.parametrize("convert", [convert_csv_to_excel, convert_csv_to_ods])
+def test_convert_empty_csv(convert, tmp_path):
+    csv_path = tmp_path / "empty.csv"
+    csv_path.write_text("")
+
+    with pytest.raises(ValueError):
+        convert(csv_path, tmp_path / "target")
+
+
+@pytest.mark.parametrize("convert", [convert_csv_to_excel, convert_csv_to_ods])
+def test_convert_missing_csv(convert, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        convert(tmp_path / "missing.csv", tmp_path / "target")
@@ -0,0 +1,136 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from batches.share.tabular_writer.grist import GristTabularWriter, _estimate_size
+
+HEADER = ["n_ej", "montant_ae"]
+
+
+def _rows(debut: int, fin: int) -> list[list]:
+    return [[f"EJ{i:03d}", i] for i in range(debut, fin)]
+
+
+def _records(debut: int, fin: int) -> list[dict]:
+    return [dict(zip(HEADER, row)) for row in _rows(debut, fin)]
+
+
+@pytest.fixture
+def grist_api():
+    api = MagicMock()
+    api.get_personnal_workspace.return_value = [SimpleNamespace(id=7)]
+    api.create_doc_on_workspace.return_value = "doc-id"
+    api.new_table.return_value = "Budget"
+    return api
+
+
+@pytest.fixture
+def make_grist_api_service(grist_api):
+    with patch("batches.share.tabular_writer.grist.make_grist_api_service", return_value=grist_api) as make_api:
+        yield make_api
+
+
+@pytest.fixture
+def make_writer(tmp_path, make_grist_api_service):
+    scim_service = MagicMock()
+    scim_service.search_user_by_username.return_value = SimpleNamespace(user_id=42)
+
+    def _make_writer(append_batch_size: int = 3, append_batch_max_bytes: int = 1_000_000) -> GristTabularWriter:
+        config = SimpleNamespace(
+            grist=SimpleNamespace(append_batch_size=append_batch_size, append_batch_max_bytes=append_batch_max_bytes)
+        )
+        with (
+            patch("batches.share.tabular_writer.grist.get_config", return_value=config),
+            patch("batches.share.tabular_writer.grist.make_or_get_grist_database_service", return_value=MagicMock()),
+            patch("batches.share.tabular_writer.grist.make_or_get_user_scim_service", return_value=scim_service),
+        ):
+            return GristTabularWriter(str(tmp_path / "export_file.csv"), "user@test.fr")
+
+    return _make_writer
+
+
+def _sent_batches(grist_api) -> list[list[dict]]:
+    return [c.args[2] for c in grist_api.append_records_to_table.call_args_list]
+
+
+def test_write_rows_are_only_sent_on_flush(make_writer, grist_api):
+    writer = make_writer()
+    writer.write_header(HEADER)
+
+    writer.write_rows(_rows(0, 2))
+    writer.write_rows(_rows(2, 3))
+    grist_api.append_records_to_table.assert_not_called()
+
+    writer.flush()
+
+    grist_api.append_records_to_table.assert_called_once_with("doc-id", "Budget", _records(0, 3))
+    writer.flush()
+    assert grist_api.append_records_to_table.call_count == 1
+
+
+def test_flush_batches_by_row_count(make_writer, grist_api):
+    writer = make_writer(append_batch_size=3)
+    writer.write_header(HEADER)
+
+    writer.write_rows(_rows(0, 7))
+    writer.flush()
+
+    assert _sent_batches(grist_api) == [_records(0, 3), _records(3, 6), _records(6, 7)]
+
+
+def test_flush_batches_by_payload_bytes(make_writer, grist_api):
+    record_size = _estimate_size(_records(0, 1)[0])
+    writer = make_writer(append_batch_size=100, append_batch_max_bytes=2 * record_size + 1)
+    writer.write_header(HEADER)
+
+    writer.write_rows(_rows(0, 5))
+    writer.flush()
+
+    assert _sent_batches(grist_api) == [_records(0, 2), _records(2, 4), _records(4, 5)]
+
+
+def test_flush_sends_a_record_bigger_than_the_payload_limit(make_writer, grist_api):
+    writer = make_writer(append_batch_max_bytes=1)
+    writer.write_header(HEADER)
+
+    writer.write_rows(_rows(0, 2))
+    writer.flush()
+
+    assert _sent_batches(grist_api) == [_records(0, 1), _records(1, 2)]
+
+
+def test_close_drops_rows_written_after_last_flush(make_writer, grist_api):
+    writer = make_writer()
+    writer.write_header(HEADER)
+    writer.write_rows(_rows(0, 2))
+    writer.flush()
+
+    # Échec de l'export avant le point de reprise suivant
+    writer.write_rows(_rows(2, 4))
+    writer.close()
+
+    assert _sent_batches(grist_api) == [_records(0, 2)]
+
+
+def test_grist_context_is_resolved_once(make_writer, make_grist_api_service, grist_api):
+    writer = make_writer()
+    writer.write_header(HEADER)
+    writer.write_rows(_rows(0, 2))
+    writer.flush()
+    writer.write_rows(_rows(2, 4))
+    writer.flush()
+
+    make_grist_api_service.assert_called_once()
+    grist_api.get_personnal_workspace.assert_called_once()
+
+
+def test_flush_reloads_grist_info_saved_by_header(make_writer, grist_api):
+    """Le document créé par l'entête est retrouvé par un autre writer, ie: lors d'une reprise"""
+    make_writer().write_header(HEADER)
+
+    writer = make_writer()
+    writer.write_rows(_rows(0, 1))
+    writer.flush()
+
+    grist_api.append_records_to_table.assert_called_once_with("doc-id", "Budget", _records(0, 1))
@@ -0,0 +1,89 @@
+import zipfile
+
+from odf.namespaces import OFFICENS
+from odf.opendocument import load
+from odf.table import Table, TableCell, TableRow
+
+from batches.share.tabular_writer.ods import OdsTabularWriter
+
+HEADER = ["n_ej", "montant_ae", "annee", "beneficiaire"]
+
+
+def _read_cells(filep) -> list[list[tuple[str | None, str | None, str]]]:
+    """Retourne, pour chaque ligne, les cellules sous la forme (type, valeur numérique, texte)"""
+    document = load(str(filep))
+    tables = document.spreadsheet.getElementsByType(Table)
+    assert len(tables) == 1
+    rows = []
+    for row in tables[0].getElementsByType(TableRow):
+        cells = []
+        for cell in row.getElementsByType(TableCell):
+            cells.append(
+                (
+                    cell.attributes.get((OFFICENS, "value-type")),
+                    cell.attributes.get((OFFICENS, "value")),
+                    str(cell),
+                )
+            )
+        rows.append(cells)
+    return rows
+
+
+def test_write_header_and_rows_in_batches(tmp_path):
+    filep = tmp_path / "export.ods"
+    writer = OdsTabularWriter(str(filep))
+
+    writer.write_header(HEADER)
+    writer.write_rows([["EJ1", 10.5, 2024, "Bénéficiaire 1"], ["EJ2", -3, 2024, None]])
+    writer.write_rows([["EJ3", 0, 2025, "Bénéficiaire <3> & co\x01"]])
+    writer.write_rows([])
+    writer.write_rows([["EJ4", float("nan"), 2025, ""]])
+    writer.close()
+
+    rows = _read_cells(filep)
+
+    assert len(rows) == 5
+    assert rows[0] == [("string", None, h) for h in HEADER]
+    assert rows[1] == [
+        ("string", None, "EJ1"),
+        ("float", "10.5", "10.5"),
+        ("float", "2024", "2024"),
+        ("string", None, "Bénéficiaire 1"),
+    ]
+    assert rows[2][1] == ("float", "-3", "-3")
+    assert rows[2][3] == (None, None, "")
+    assert rows[3][1] == ("float", "0", "0")
+    assert rows[3][3] == ("string", None, "Bénéficiaire <3> & co")
+    # Une valeur non finie est écrite comme texte
+    assert rows[4][1] == ("string", None, "nan")
+    assert rows[4][3] == (None, None, "")
+
+
+def test_close_produces_valid_archive(tmp_path):
+    filep = tmp_path / "export.ods"
+    writer = OdsTabularWriter(str(filep))
+
+    writer.write_header(HEADER)
+    writer.write_rows([["EJ1", 1, 2024, "B"]])
+    writer.close()
+    # Un second close est sans effet
+    writer.close()
+
+    with zipfile.ZipFile(filep) as archive:
+        assert archive.testzip() is None
+        infos = archive.infolist()
+        assert infos[0].filename == "mimetype"
+        assert infos[0].compress_type == zipfile.ZIP_STORED
+        assert archive.read("mimetype") == b"application/vnd.oasis.opendocument.spreadsheet"
+        assert {"content.xml", "styles.xml", "META-INF/manifest.xml"} <= set(archive.namelist())
+
+    assert len(_read_cells(filep)) == 2
+
+
+def test_close_without_write_creates_no_file(tmp_path):
+    filep = tmp_path / "export.ods"
+    writer = OdsTabularWriter(str(filep))
+
+    writer.close()
+
+    assert not filep.exists()
@@ -0,0 +1,47 @@
+from openpyxl import load_workbook
+
+from batches.share.tabular_writer.xlsx import XlsxTabularWriter
+
+HEADER = ["n_ej", "montant_ae", "annee", "beneficiaire"]
+
+
+def test_write_header_and_rows_in_batches(tmp_path):
+    filep = tmp_path / "export.xlsx"
+    writer = XlsxTabularWriter(str(filep))
+
+    writer.write_header(HEADER)
+    writer.write_rows([["EJ1", 10.5, 2024, "Bénéficiaire 1"], ["EJ2", -3, 2024, None]])
+    writer.write_rows([["EJ3", 0, 2025, "Bénéficiaire <3> & co"]])
+    writer.write_rows([])
+    writer.write_rows([["EJ4", 1_000_000, 2025, ""]])
+    writer.close()
+
+    workbook = load_workbook(filep)
+    assert workbook.sheetnames == ["Sheet1"]
+    rows = list(workbook["Sheet1"].iter_rows(values_only=True))
+    workbook.close()
+
+    assert len(rows) == 5
+    assert list(rows[0]) == HEADER
+    assert list(rows[1]) == ["EJ1", 10.5, 2024, "Bénéficiaire 1"]
+    assert list(rows[2]) == ["EJ2", -3, 2024, None]
+    assert list(rows[3]) == ["EJ3", 0, 2025, "Bénéficiaire <3> & co"]
+    assert rows[4][0] == "EJ4"
+    assert isinstance(rows[1][1], float)
+    assert isinstance(rows[2][1], int)
+    assert isinstance(rows[4][1], int)
+
+
+def test_close_without_rows_produces_valid_file(tmp_path):
+    filep = tmp_path / "empty.xlsx"
+    writer = XlsxTabularWriter(str(filep))
+
+    writer.write_header(HEADER)
+    writer.close()
+    # Un second close ne réécrit pas le fichier
+    writer.close()
+
+    workbook = load_workbook(filep)
+    rows = list(workbook["Sheet1"].iter_rows(values_only=True))
+    workbook.close()
+    assert rows == [tuple(HEADER)]
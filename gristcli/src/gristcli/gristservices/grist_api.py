@@ -1,29 +1,52 @@
 import json
 import logging
-from typing import List
+from datetime import datetime
+from typing import Iterator, List
 import requests
+from requests.adapters import HTTPAdapter
 
+from gristcli.gristservices.errors import ApiGristError
 from gristcli.gristservices.handlers import _handle_error_grist_api
 from gristcli.models import Record, Table, Workspace
 
+RECORDS_PAGE_SIZE = 500
+"""Number of records fetched per call. Row ids of a page are sent in the query string, keep it well under URL limits."""
+
+
+def _quote_identifier(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
 
 class GrisApiService:
-    def __init__(self, server: str, token: str = None):
+    def __init__(self, server: str, token: str = None, pool_maxsize: int = 10):
         """
         Initializes a Grist client.
 
+        The client keeps a pooled HTTP session: connections (and TLS handshakes) are reused between calls.
+
         Parameters:
             - server: Grist server URL
             - token: User's token with access to Grist SCIM services
+            - pool_maxsize: Maximum number of connections kept alive, i.e. of concurrent calls without waiting
         """
         self.server = server
         self.token = token
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def close(self):
+        """
+        Closes the connections kept alive by the client.
+        """
+        self._session.close()
 
     def set_token(self, token):
         self.token = token
 
     @_handle_error_grist_api
-    def _call(self, uri, method="GET", prefix="/api/", json_data=None, headers={}):
+    def _call(self, uri, method="GET", prefix="/api/", json_data=None, headers={}, params=None):
         """
         Makes a Grist REST API call.
         """
@@ -31,9 +54,10 @@ class GrisApiService:
         logging.debug(f"sending {method} request to {full_url}")
         data = json.dumps(json_data).encode("utf8") if json_data is not None else None
 
-        answer = requests.request(
+        answer = self._session.request(
             method,
             full_url,
+            params=params,
             data=data,
             headers={
                 "Authorization": "Bearer %s" % self.token,
@@ -157,3 +181,96 @@ class GrisApiService:
         response = self._call(f"docs/{docId}/tables/{tableId}/records")
         records = [Record(**data) for data in response["records"]]
         return records
+
+    def iter_record_pages(
+        self,
+        docId: str,
+        tableId: str,
+        page_size: int = RECORDS_PAGE_SIZE,
+        updated_since: datetime | None = None,
+        updated_at_column: str = "updatedAt",
+    ) -> Iterator[List[Record]]:
+        """
+        Iterates over the records of a table, page by page, ordered by row id.
+
+        Row ids of each page are selected through the SQL endpoint (keyset pagination on the row id),
+        then the page is fetched from the records endpoint: values are encoded as in `get_records_of_table`.
+
+        The SQL endpoint requires full read access to the document. When it is denied (403), the whole table
+        is fetched from the records endpoint in a single call, then filtered and split into pages.
+
+        Parameters:
+            - docId: The document ID
+            - tableId: The table ID
+            - page_size: Number of records per page
+            - updated_since: If given, only the records modified after this date are returned
+            - updated_at_column: Column holding the last modification date of a record, used with `updated_since`
+        """
+        last_id = 0
+        while True:
+            try:
+                ids = self._get_page_row_ids(docId, tableId, last_id, page_size, updated_since, updated_at_column)
+            except ApiGristError as e:
+                if last_id != 0 or str(e.call_error_description.code) != "403":
+                    raise
+                logging.warning(f"SQL endpoint denied on doc {docId}, fetching table {tableId} in a single call")
+                yield from self._iter_record_pages_without_sql(
+                    docId, tableId, page_size, updated_since, updated_at_column
+                )
+                return
+            if not ids:
+                return
+            response = self._call(
+                f"docs/{docId}/tables/{tableId}/records",
+                params={"filter": json.dumps({"id": ids}), "sort": "id"},
+            )
+            yield [Record(**data) for data in response["records"]]
+            if len(ids) < page_size:
+                return
+            last_id = ids[-1]
+
+    def iter_records_of_table(self, docId: str, tableId: str, **kwargs) -> Iterator[Record]:
+        """
+        Iterates over the records of a table without loading the whole table.
+
+        Accepts the same keyword arguments as `iter_record_pages`.
+        """
+        for page in self.iter_record_pages(docId, tableId, **kwargs):
+            yield from page
+
+    def _iter_record_pages_without_sql(
+        self,
+        docId: str,
+        tableId: str,
+        page_size: int,
+        updated_since: datetime | None,
+        updated_at_column: str,
+    ) -> Iterator[List[Record]]:
+        response = self._call(f"docs/{docId}/tables/{tableId}/records", params={"sort": "id"})
+        records = [Record(**data) for data in response["records"]]
+        if updated_since is not None:
+            since = updated_since.timestamp()
+            records = [r for r in records if (r.fields.get(updated_at_column) or 0) > since]
+        for start in range(0, len(records), page_size):
+            yield records[start : start + page_size]
+
+    def _get_page_row_ids(
+        self,
+        docId: str,
+        tableId: str,
+        after_id: int,
+        page_size: int,
+        updated_since: datetime | None,
+        updated_at_column: str,
+    ) -> List[int]:
+        sql = f"SELECT id FROM {_quote_identifier(tableId)} WHERE id > ?"
+        args: list = [after_id]
+        if updated_since is not None:
+            # Grist stores dates as epoch seconds
+            sql += f" AND {_quote_identifier(updated_at_column)} > ?"
+            args.append(updated_since.timestamp())
+        sql += " ORDER BY id LIMIT ?"
+        args.append(page_size)
+
+        response = self._call(f"docs/{docId}/sql", method="POST", json_data={"sql": sql, "args": args})
+        return [record["fields"]["id"] for record in response["records"]]
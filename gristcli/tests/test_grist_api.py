@@ -0,0 +1,146 @@
+import json
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from requests import HTTPError
+
+from gristcli.gristservices.errors import ApiGristError
+from gristcli.gristservices.grist_api import GrisApiService
+
+SERVER = "https://grist.test"
+RECORDS_URL = f"{SERVER}/api/docs/doc/tables/Table1/records"
+SQL_URL = f"{SERVER}/api/docs/doc/sql"
+
+
+def _response(status_code: int, payload: dict):
+    response = MagicMock(status_code=status_code, text=json.dumps(payload))
+    response.json.return_value = payload
+    if status_code >= 400:
+        response.raise_for_status.side_effect = HTTPError(response=response)
+    return response
+
+
+class _FakeGrist:
+    """Simule les endpoints SQL et records d'un document grist contenant une table `Table1`"""
+
+    def __init__(self, nb_records: int, sql_status: int = 200):
+        self.records = [
+            {"id": i, "fields": {"code": f"C{i}", "updatedAt": float(i * 100)}} for i in range(1, nb_records + 1)
+        ]
+        self.sql_status = sql_status
+        self.calls: list[tuple[str, str]] = []
+
+    def request(self, method, url, params=None, data=None, headers=None):
+        self.calls.append((method, url))
+        if url == SQL_URL:
+            return self._sql(json.loads(data))
+        if url == RECORDS_URL:
+            return self._records(params)
+        return _response(404, {"error": "not found"})
+
+    def _sql(self, body: dict):
+        if self.sql_status != 200:
+            return _response(self.sql_status, {"error": "Forbidden"})
+        args = list(body["args"])
+        after_id, limit = args.pop(0), args.pop()
+        since = args.pop() if "updatedAt" in body["sql"] else None
+        ids = [
+            r["id"] for r in self.records if r["id"] > after_id and (since is None or r["fields"]["updatedAt"] > since)
+        ]
+        return _response(200, {"records": [{"fields": {"id": i}} for i in ids[:limit]]})
+
+    def _records(self, params: dict):
+        assert params["sort"] == "id"
+        records = self.records
+        if "filter" in params:
+            ids = set(json.loads(params["filter"])["id"])
+            records = [r for r in records if r["id"] in ids]
+        return _response(200, {"records": records})
+
+
+@pytest.fixture
+def make_service():
+    def _make_service(fake: _FakeGrist) -> GrisApiService:
+        service = GrisApiService(SERVER, token="token")
+        service._session.request = fake.request
+        return service
+
+    return _make_service
+
+
+def _pages_ids(pages) -> list[list[int]]:
+    return [[r.id for r in page] for page in pages]
+
+
+def test_iter_record_pages_several_full_pages(make_service):
+    fake = _FakeGrist(nb_records=6)
+
+    pages = list(make_service(fake).iter_record_pages("doc", "Table1", page_size=3))
+
+    assert _pages_ids(pages) == [[1, 2, 3], [4, 5, 6]]
+    assert pages[0][0].fields == {"code": "C1", "updatedAt": 100.0}
+    # Une page pleine ne permet pas de savoir si c'est la dernière: un dernier appel SQL vide termine le parcours
+    assert [url for _, url in fake.calls] == [SQL_URL, RECORDS_URL, SQL_URL, RECORDS_URL, SQL_URL]
+
+
+def test_iter_record_pages_last_page_not_full(make_service):
+    fake = _FakeGrist(nb_records=7)
+
+    pages = list(make_service(fake).iter_record_pages("doc", "Table1", page_size=3))
+
+    assert _pages_ids(pages) == [[1, 2, 3], [4, 5, 6], [7]]
+    assert len(fake.calls) == 6
+
+
+def test_iter_record_pages_empty_table(make_service):
+    fake = _FakeGrist(nb_records=0)
+
+    pages = list(make_service(fake).iter_record_pages("doc", "Table1", page_size=3))
+
+    assert pages == []
+    assert fake.calls == [("POST", SQL_URL)]
+
+
+def test_iter_record_pages_updated_since(make_service):
+    fake = _FakeGrist(nb_records=7)
+    updated_since = datetime.fromtimestamp(250, tz=timezone.utc)
+
+    pages = list(make_service(fake).iter_record_pages("doc", "Table1", page_size=3, updated_since=updated_since))
+
+    assert _pages_ids(pages) == [[3, 4, 5], [6, 7]]
+
+
+def test_iter_records_of_table(make_service):
+    fake = _FakeGrist(nb_records=5)
+
+    records = list(make_service(fake).iter_records_of_table("doc", "Table1", page_size=2))
+
+    assert [r.id for r in records] == [1, 2, 3, 4, 5]
+
+
+def test_iter_record_pages_falls_back_when_sql_is_forbidden(make_service):
+    fake = _FakeGrist(nb_records=7, sql_status=403)
+
+    pages = list(make_service(fake).iter_record_pages("doc", "Table1", page_size=3))
+
+    assert _pages_ids(pages) == [[1, 2, 3], [4, 5, 6], [7]]
+    assert [url for _, url in fake.calls] == [SQL_URL, RECORDS_URL]
+
+
+def test_iter_record_pages_fallback_filters_updated_since(make_service):
+    fake = _FakeGrist(nb_records=7, sql_status=403)
+    updated_since = datetime.fromtimestamp(450, tz=timezone.utc)
+
+    pages = list(make_service(fake).iter_record_pages("doc", "Table1", page_size=2, updated_since=updated_since))
+
+    assert _pages_ids(pages) == [[5, 6], [7]]
+
+
+def test_iter_record_pages_raises_other_sql_errors(make_service):
+    fake = _FakeGrist(nb_records=7, sql_status=500)
+
+    with pytest.raises(ApiGristError) as e:
+        list(make_service(fake).iter_record_pages("doc", "Table1", page_size=3))
+
+    assert e.value.call_error_description.code == 500
@@ -8,6 +8,7 @@ from .common.Tags import Tags, TagAssociation
 from .refs import *  # noqa: F403
 
 from .audit.AuditInsertFinancialTasks import AuditInsertFinancialTasks
+from .audit.AuditApplyTagsAuto import AuditApplyTagsAuto
 from .audit.AuditRefreshMaterializedViewsEvents import (
     AuditRefreshMaterializedViewsEvents,
 )
@@ -0,0 +1,23 @@
+from datetime import datetime
+from models import _PersistenceBaseModelInstance
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer
+
+
+class AuditApplyTagsAuto(_PersistenceBaseModelInstance()):
+    """
+    Modèle pour stocker les passages de l'application automatique des tags
+    """
+
+    __tablename__ = "audit_apply_tags_auto"
+    __bind_key__ = "audit"
+    __table_args__ = {"schema": "audit"}
+
+    id: Column[int] = Column(Integer, primary_key=True, nullable=False)
+    date: Column[datetime] = Column(DateTime(timezone=True), nullable=False)
+    """Date de début du passage, sert de point de départ au passage incrémental suivant"""
+    incremental: Column[bool] = Column(Boolean, nullable=False, default=False)
+    """Le passage n'a évalué que les lignes modifiées depuis le passage précédent"""
+    nb_associations: Column[int] = Column(Integer, nullable=False, default=0)
+    """Nombre d'associations de tags créées"""
+    duree: Column[float] = Column(Float, nullable=True)
+    """Durée du passage en secondes"""
@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 from models import _PersistenceBaseModelInstance
 from models.value_objects.audit import RefreshMaterializedViewsEvent
-from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy import Column, DateTime, Float, Integer, String
 
 
 class AuditRefreshMaterializedViewsEvents(_PersistenceBaseModelInstance()):
@@ -21,14 +21,19 @@ class AuditRefreshMaterializedViewsEvents(_PersistenceBaseModelInstance()):
         nullable=False,
     )
     table = Column(String, nullable=True)
+    duree: Column[float] = Column(Float, nullable=True)
+    """Durée du rafraichissement en secondes, renseignée sur l'évènement de fin"""
 
     @staticmethod
-    def create(event: RefreshMaterializedViewsEvent, table: str) -> "AuditRefreshMaterializedViewsEvents":
+    def create(
+        event: RefreshMaterializedViewsEvent, table: str, duree: float | None = None
+    ) -> "AuditRefreshMaterializedViewsEvents":
         """Crée un row qui représente un evenement de rafraichissement de vue materialisées"""
         _evt = str(event)
 
         model = AuditRefreshMaterializedViewsEvents()
         model.event = _evt  # type: ignore
         model.table = table  # type: ignore
+        model.duree = duree  # type: ignore
 
         return model
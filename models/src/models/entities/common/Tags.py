@@ -6,11 +6,13 @@ from sqlalchemy import (
     CheckConstraint,
     Column,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
     func,
+    text,
 )
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, relationship
@@ -47,6 +49,28 @@ class TagAssociation(_Audit, _PersistenceBaseModelInstance()):
         CheckConstraint(
             "true", name="line_fks_xor"
         ),  # XXX: voir les scripts de migration our la vraie definition de contrainte
+        # Un tag n'est associé qu'une fois à une ligne, permet l'application des tags auto en ON CONFLICT DO NOTHING
+        Index(
+            "ux_tag_association_tag_financial_ae",
+            "tag_id",
+            "financial_ae",
+            unique=True,
+            postgresql_where=text("financial_ae IS NOT NULL"),
+        ),
+        Index(
+            "ux_tag_association_tag_financial_cp",
+            "tag_id",
+            "financial_cp",
+            unique=True,
+            postgresql_where=text("financial_cp IS NOT NULL"),
+        ),
+        Index(
+            "ux_tag_association_tag_ademe",
+            "tag_id",
+            "ademe",
+            unique=True,
+            postgresql_where=text("ademe IS NOT NULL"),
+        ),
     )
 
     id = Column(Integer, primary_key=True)
@@ -10,8 +10,9 @@ from collections.abc import Callable
 from contextlib import contextmanager
 import logging
 import os
+import struct
 import tempfile
-from typing import BinaryIO, ContextManager, Generator
+from typing import BinaryIO, ContextManager, Generator, Iterator
 
 import clamd
 from services.antivirus.exceptions import AntivirusError, AntivirusScanError, VirusFoundError
@@ -24,6 +25,9 @@ CustomTimeoutFn = Callable[[int], int]
 DEFAULT_STREAM_CHUNK_SIZE = 1024 * 1024
 """Taille par défaut (1 MiB) pour les copies de flux en mémoire bornée."""
 
+INSTREAM_CHUNK_SIZE = 64 * 1024
+"""Taille maximale (64 KiB) d'un segment INSTREAM envoyé à clamd."""
+
 
 def compute_antivirus_timeout(file_size: int, intitial_timeout: int, secon_per_gb: int, max_timeout: int) -> int:
     """Ajuste le timeout en fonction de la taille du fichier, borné par la configuration."""
@@ -36,6 +40,39 @@ def compute_default_av_timeout(file_size: int, max_timeout: int) -> int:
     return compute_antivirus_timeout(file_size, intitial_timeout=30, secon_per_gb=10, max_timeout=max_timeout)
 
 
+class AntivirusStream:
+    """Scan INSTREAM alimenté au fil de l'eau par l'appelant (voir AntivirusService.instream)."""
+
+    def __init__(self, service: "AntivirusService", cd: clamd.ClamdNetworkSocket, ctx_str: str) -> None:
+        self._service = service
+        self._cd = cd
+        self._ctx_str = ctx_str
+
+    def send(self, data: bytes) -> None:
+        """Envoie un bloc du fichier à clamd."""
+        with self._service._scan_errors(self._ctx_str):
+            view = memoryview(data)
+            for start in range(0, len(view), INSTREAM_CHUNK_SIZE):
+                chunk = view[start : start + INSTREAM_CHUNK_SIZE]
+                self._cd.clamd_socket.sendall(struct.pack(b"!L", len(chunk)))
+                self._cd.clamd_socket.sendall(chunk)
+
+    def verdict(self) -> None:
+        """Termine le flux et lève une exception si le fichier n'est pas sain.
+
+        Raises:
+            VirusFoundError: Le fichier contient un virus détecté.
+            AntivirusScanError: Le service antivirus est indisponible, en timeout ou en erreur.
+        """
+        with self._service._scan_errors(self._ctx_str):
+            self._cd.clamd_socket.sendall(struct.pack(b"!L", 0))
+            response = self._cd._recv_response()
+            if response == "INSTREAM size limit exceeded. ERROR":
+                raise clamd.BufferTooLongError(response)
+            _, virus_name, status = self._cd._parse_response(response)
+            self._service._check_result({"stream": (status, virus_name)}, self._ctx_str)
+
+
 class AntivirusService:
     """Interface vers le démon clamd pour le scan de fichiers uploadés."""
 
@@ -99,52 +136,97 @@ class AntivirusService:
 
         ctx_str = " | ".join(f"{k}={v}" for k, v in (context or {}).items())
 
-        try:
-            file_size = os.path.getsize(file_path)
-            if file_size > self._max_file_size_bytes:
-                logger.warning(
-                    "Fichier refusé: taille trop grande (%s > %s) [%s]",
-                    file_size,
-                    self._max_file_size_bytes,
-                    ctx_str,
-                )
-                raise AntivirusScanError(
-                    message=(
-                        "Le fichier n'a pas été accepté car sa taille "
-                        "dépasse la limite autorisée pour le contrôle antivirus"
-                    )
-                )
-
-            timeout = custom_timeout_fn(file_size) if custom_timeout_fn is not None else self._timeout
-            if custom_timeout_fn is not None:
-                logger.info("Timeout personnalisé calculé pour le scan antivirus: %s secondes", timeout)
-            logger.debug(
-                "Initialisation du socket clamd host=%s port=%s timeout=%s [%s]",
-                self._host,
-                self._port,
-                timeout,
-                ctx_str,
-            )
-            cd = clamd.ClamdNetworkSocket(host=self._host, port=self._port, timeout=timeout)
+        with self._scan_errors(ctx_str):
+            cd = self._open_clamd(os.path.getsize(file_path), ctx_str, custom_timeout_fn)
             with open(file_path, "rb") as f:
                 result = cd.instream(f)
+            self._check_result(result, ctx_str)
+
+    @contextmanager
+    def instream(
+        self,
+        file_size: int,
+        context: dict | None = None,
+        custom_timeout_fn: CustomTimeoutFn | None = None,
+    ) -> Iterator[AntivirusStream]:
+        """Ouvre un scan INSTREAM que l'appelant alimente bloc par bloc.
 
-            status, virus_name = result.get("stream", ("ERROR", None))
+        Permet de scanner un fichier pendant une lecture déjà nécessaire par ailleurs
+        (validation, hash...), sans relire le fichier.
 
-            if status == "OK":
-                logger.info("Scan antivirus OK [%s]", ctx_str)
-                return
+        Args:
+            file_size: Taille totale du fichier, pour la limite de taille et le calcul du timeout.
+            context: Contexte pour les logs (session_token, filename, uploadType, user…).
+            custom_timeout_fn: Fonction optionnelle permettant de calculer le timeout
+                à partir de la taille du fichier en octets.
+
+        Raises:
+            AntivirusScanError: Le service antivirus est indisponible ou le fichier est trop gros.
+        """
+        if custom_timeout_fn is None:
+            custom_timeout_fn = self.default_timeout_fn
 
-            if status == "FOUND":
-                logger.warning("Fichier infecté détecté: %s [%s]", virus_name, ctx_str)
-                raise VirusFoundError(virus_name=virus_name)
+        ctx_str = " | ".join(f"{k}={v}" for k, v in (context or {}).items())
 
-            # Résultat inattendu (ex: ERROR renvoyé par clamd)
-            logger.error("Résultat antivirus non conforme: status=%s [%s]", status, ctx_str)
+        with self._scan_errors(ctx_str):
+            cd = self._open_clamd(file_size, ctx_str, custom_timeout_fn)
+            cd._init_socket()
+            cd._send_command("INSTREAM")
+        try:
+            yield AntivirusStream(self, cd, ctx_str)
+        finally:
+            cd._close_socket()
+
+    def _open_clamd(
+        self, file_size: int, ctx_str: str, custom_timeout_fn: CustomTimeoutFn | None
+    ) -> clamd.ClamdNetworkSocket:
+        if file_size > self._max_file_size_bytes:
+            logger.warning(
+                "Fichier refusé: taille trop grande (%s > %s) [%s]",
+                file_size,
+                self._max_file_size_bytes,
+                ctx_str,
+            )
             raise AntivirusScanError(
-                message="Le fichier n'a pas été accepté car le contrôle antivirus a retourné un résultat non conforme"
+                message=(
+                    "Le fichier n'a pas été accepté car sa taille dépasse la limite autorisée pour le contrôle antivirus"
+                )
             )
 
+        timeout = custom_timeout_fn(file_size) if custom_timeout_fn is not None else self._timeout
+        if custom_timeout_fn is not None:
+            logger.info("Timeout personnalisé calculé pour le scan antivirus: %s secondes", timeout)
+        logger.debug(
+            "Initialisation du socket clamd host=%s port=%s timeout=%s [%s]",
+            self._host,
+            self._port,
+            timeout,
+            ctx_str,
+        )
+        return clamd.ClamdNetworkSocket(host=self._host, port=self._port, timeout=timeout)
+
+    def _check_result(self, result: dict, ctx_str: str) -> None:
+        status, virus_name = result.get("stream", ("ERROR", None))
+
+        if status == "OK":
+            logger.info("Scan antivirus OK [%s]", ctx_str)
+            return
+
+        if status == "FOUND":
+            logger.warning("Fichier infecté détecté: %s [%s]", virus_name, ctx_str)
+            raise VirusFoundError(virus_name=virus_name)
+
+        # Résultat inattendu (ex: ERROR renvoyé par clamd)
+        logger.error("Résultat antivirus non conforme: status=%s [%s]", status, ctx_str)
+        raise AntivirusScanError(
+            message="Le fichier n'a pas été accepté car le contrôle antivirus a retourné un résultat non conforme"
+        )
+
+    @contextmanager
+    def _scan_errors(self, ctx_str: str) -> Iterator[None]:
+        """Traduit les erreurs techniques du scan en AntivirusScanError (fail closed)."""
+        try:
+            yield
         except AntivirusError:
             raise
         except clamd.ConnectionError as e:
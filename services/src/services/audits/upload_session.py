@@ -49,12 +49,14 @@ pour permettre l'audit et l'analyse. Seuls les fichiers temporaires sont supprim
 ## Cycle de vie d'une session
 
 1. **Création** : Premier fichier uploadé → création du SessionState
-2. **Enregistrement** : Chaque fichier est hashé (SHA256) puis déplacé dans le dossier temporaire
+2. **Enregistrement** : Chaque fichier est hashé (SHA256, éventuellement fourni par l'appelant) puis déplacé
+   dans le dossier temporaire
 3. **Finalisation** : Quand tous les fichiers sont reçus → concaténation des CSV
 4. **Sauvegarde** : Le SessionState final est sauvegardé avec les chemins finaux
 5. **Nettoyage** : Les fichiers temporaires sont supprimés, le JSON de session est **conservé**
 """
 
+import errno
 import hashlib
 import json
 import logging
@@ -70,6 +72,73 @@ from models.value_objects.UploadType import UploadType
 
 logger = logging.getLogger(__name__)
 
+HASH_BLOCK_SIZE = 1024 * 1024
+"""Taille des blocs lus pour le calcul du hash d'un fichier"""
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+"""Taille maximale d'une copie élémentaire lors de la concaténation des fichiers"""
+
+_COPY_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP}
+"""Erreurs indiquant qu'un mode de copie n'est pas disponible pour ces fichiers (système de fichiers, noyau...)"""
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int, size: int) -> None:
+    while offset < size:
+        copied = os.copy_file_range(src_fd, dst_fd, min(size - offset, COPY_CHUNK_SIZE), offset)
+        if copied == 0:
+            # Certains systèmes de fichiers (FUSE, NFS, overlay...) s'arrêtent avant la fin du fichier
+            raise OSError(errno.EOPNOTSUPP, f"copy_file_range stopped at offset {offset} of {size}")
+        offset += copied
+
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, size: int) -> None:
+    while offset < size:
+        copied = os.sendfile(dst_fd, src_fd, offset, min(size - offset, COPY_CHUNK_SIZE))
+        if copied == 0:
+            raise OSError(errno.EOPNOTSUPP, f"sendfile stopped at offset {offset} of {size}")
+        offset += copied
+
+
+def _buffered_copy(src_fd: int, dst_fd: int, offset: int, size: int) -> None:
+    while offset < size:
+        chunk = os.pread(src_fd, min(size - offset, COPY_CHUNK_SIZE), offset)
+        if not chunk:
+            break
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(dst_fd, view) :]
+        offset += len(chunk)
+
+
+def _copy_methods() -> list[Callable[[int, int, int, int], None]]:
+    """Modes de copie par ordre de préférence : dans le noyau d'abord, copie bufferisée en dernier recours"""
+    methods = []
+    if hasattr(os, "copy_file_range"):
+        methods.append(_copy_file_range)
+    if hasattr(os, "sendfile"):
+        methods.append(_sendfile)
+    methods.append(_buffered_copy)
+    return methods
+
+
+def _copy_file_tail(src_fd: int, dst_fd: int, offset: int) -> None:
+    """Copie le fichier `src_fd` à partir de `offset` jusqu'à sa fin, à la position courante de `dst_fd`.
+
+    La mémoire utilisée ne dépend pas de la taille du fichier. Si un mode de copie n'est pas supporté
+    ou s'arrête avant la fin du fichier, le mode suivant reprend là où le précédent s'est arrêté.
+    """
+    size = os.fstat(src_fd).st_size
+    dst_start = os.lseek(dst_fd, 0, os.SEEK_CUR)
+    for copy in _copy_methods():
+        done = os.lseek(dst_fd, 0, os.SEEK_CUR) - dst_start
+        try:
+            copy(src_fd, dst_fd, offset + done, size)
+            return
+        except OSError as e:
+            if e.errno not in _COPY_UNSUPPORTED_ERRNOS:
+                raise
+            logger.debug(f"Copy with {copy.__name__} not supported ({e}), falling back")
+
 
 @dataclass
 class InitializeSessionRequest:
@@ -290,15 +359,21 @@ class UploadSession:
         file_path: str,
         upload_type: str,
         indice: int,
+        file_hash: Optional[str] = None,
     ) -> SessionState:
-        """Enregistre un fichier uploadé dans la session courante."""
+        """Enregistre un fichier uploadé dans la session courante.
+
+        Le hash SHA256 peut être fourni s'il a déjà été calculé lors de la lecture du fichier,
+        il est sinon calculé ici.
+        """
         self._ensure_lock_is_active()
 
         if self._state is None:
             raise ValueError(f"Session {self.id} is not initialized. Call initialize() before register_file().")
 
-        file_hash = self._service._calculate_file_hash(file_path)
-        logger.info(f"Calculated hash for {file_path}: {file_hash}")
+        if file_hash is None:
+            file_hash = self._service._calculate_file_hash(file_path)
+            logger.info(f"Calculated hash for {file_path}: {file_hash}")
 
         temp_folder = self._service._get_session_temp_folder(self.id)
         filename = os.path.basename(file_path)
@@ -456,7 +531,7 @@ class UploadSessionService:
         sha256_hash = hashlib.sha256()
         with open(file_path, "rb") as f:
             # Lire le fichier par blocs pour économiser la mémoire
-            for byte_block in iter(lambda: f.read(4096), b""):
+            for byte_block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
                 sha256_hash.update(byte_block)
         return sha256_hash.hexdigest()
 
@@ -466,6 +541,7 @@ class UploadSessionService:
 
         Le header est conservé uniquement du premier fichier.
         Les fichiers suivants sont ajoutés sans leur première ligne (header).
+        Les octets sont copiés tels quels par blocs bornés, sans charger les fichiers en mémoire.
 
         Args:
             files: Liste des chemins de fichiers à concaténer
@@ -482,17 +558,12 @@ class UploadSessionService:
 
         logger.info(f"Concatenating {len(sorted_files)} files to {output_path}")
 
-        with open(output_path, "w", encoding="utf-8", newline="") as outfile:
+        with open(output_path, "wb", buffering=0) as outfile:
             for i, file_path in enumerate(sorted_files):
-                with open(file_path, "r", encoding="utf-8") as infile:
-                    lines = infile.readlines()
-                    if i == 0:
-                        # Premier fichier : garder le header
-                        outfile.writelines(lines)
-                    else:
-                        # Fichiers suivants : sauter le header (première ligne)
-                        if lines:
-                            outfile.writelines(lines[1:])
+                with open(file_path, "rb") as infile:
+                    # Fichiers suivants : sauter le header (première ligne)
+                    header_size = 0 if i == 0 else len(infile.readline())
+                    _copy_file_tail(infile.fileno(), outfile.fileno(), header_size)
 
         logger.info(f"Successfully concatenated files to {output_path}")
         return str(output_path)
@@ -1,19 +1,23 @@
-from sqlalchemy.orm import Session
+from typing import Iterator
+
+from sqlalchemy.orm import Session, selectinload
+
+from models.entities.financial.query.FlattenFinancialLines import EnrichedFlattenFinancialLines as FinancialLines
 
 from services.budget.query_builder import BudgetQueryBuilder
 from services.budget.colonnes import get_list_colonnes_tableau
 from services.regions import get_request_regions, sanitize_source_region_for_bdd_request
 
 from services.budget.query_params import BudgetQueryParams
+from services.shared.keyset_cursor import KeysetCursor
 
 
-def get_lignes(
+def _make_builder(
     db: Session,
     params: BudgetQueryParams,
-    additionnal_source_region: str | None = None,
-    fn_app_layer_sanitize_region=None,
-):
-    """Retourne les lignes (ou groupings) d'une requête"""
+    additionnal_source_region: str | None,
+    fn_app_layer_sanitize_region,
+) -> BudgetQueryBuilder:
     if fn_app_layer_sanitize_region is None:
         fn_app_layer_sanitize_region = sanitize_source_region_for_bdd_request
 
@@ -69,6 +73,18 @@ def get_lignes(
             groups.append(builder.groupby_colonne.concatenate)
         builder._query = builder._query.group_by(*groups)
 
+    return builder
+
+
+def get_lignes(
+    db: Session,
+    params: BudgetQueryParams,
+    additionnal_source_region: str | None = None,
+    fn_app_layer_sanitize_region=None,
+):
+    """Retourne les lignes (ou groupings) d'une requête"""
+    builder = _make_builder(db, params, additionnal_source_region, fn_app_layer_sanitize_region)
+
     # Pagination et récupération des données
     builder = builder.paginate()
     data, has_next = builder.select_all()
@@ -76,3 +92,28 @@ def get_lignes(
     grouped = builder.groupby_colonne is not None
 
     return (data, has_next, grouped, builder)
+
+
+def iter_lignes(
+    db: Session,
+    params: BudgetQueryParams,
+    batch_size: int = 1000,
+    additionnal_source_region: str | None = None,
+    fn_app_layer_sanitize_region=None,
+) -> Iterator[tuple[list[FinancialLines], str]]:
+    """
+    Parcourt toutes les lignes d'une requête via un curseur côté serveur, par lots de `batch_size`.
+    La pagination (page, page_size) est ignorée. Si `params.cursor` est fourni, le parcours reprend après celui-ci.
+
+    Chaque lot est accompagné du curseur qui suit sa dernière ligne, permettant de reprendre le parcours.
+    """
+    builder = _make_builder(db, params, additionnal_source_region, fn_app_layer_sanitize_region)
+    if builder.groupby_colonne is not None:
+        raise ValueError("Le parcours complet n'est pas disponible pour un grouping")
+    if params.cursor is not None:
+        builder.seek_after(KeysetCursor.decode(params.cursor))
+
+    # XXX: le chargement joined des tags est incompatible avec yield_per
+    query = builder._query.options(selectinload(FinancialLines.tags)).execution_options(yield_per=batch_size)
+    for lignes in db.execute(query).scalars().partitions():
+        yield lignes, builder.cursor_after(lignes[-1])
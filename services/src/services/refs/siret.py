@@ -1,8 +1,10 @@
 import logging
-from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
 
 from api_entreprise import ApiEntreprise, ApiError
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from api_entreprise.models.donnees_etablissement import DonneesEtablissement
 from services.clients.geo.api_geo import ApiGeoClient, ApiGeoException
@@ -62,6 +64,85 @@ class UpdateRefSiretService:
                     logger.exception(f"[SERVICE][SIRET] Error sur ajout Siret {siret}")
                     raise e
 
+    def check_sirets(self, session: Session, sirets: Iterable[str | None], max_workers: int = 4):
+        """Comme :func:`check_siret` pour un lot de sirets.
+
+        Les sirets sont dédoublonnés, ceux déjà en base sont résolus en une requête.
+        Les autres sont récupérés en parallèle via l'API entreprise (`max_workers` appels simultanés au plus),
+        puis leurs communes sont vérifiées en lot.
+
+        Raises:
+            LimitHitError: Si le ratelimiter de l'API entreprise est déclenché
+        """
+        codes = sorted({str(siret) for siret in sirets if siret is not None})
+        if not codes:
+            return
+
+        existing = set(session.scalars(select(Siret.code).where(Siret.code.in_(codes))))
+        missing = [code for code in codes if code not in existing]
+        if not missing:
+            logger.debug(f"[SERVICE][SIRET] {len(codes)} sirets déjà présents en base, aucune insertion nécessaire.")
+            return
+
+        logger.info(f"[SERVICE][SIRET] Récupération de {len(missing)} sirets via l'API entreprise")
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            etablissements = list(executor.map(self._donnees_etablissement_or_none, missing))
+
+        siret_entities = []
+        for code, etablissement in zip(missing, etablissements):
+            siret_entity = Siret(code=code)
+            if etablissement is None:
+                logger.warning(
+                    f"[SERVICE][SIRET] Aucune information sur l'entreprise via API entreprise pour le siret {code}"
+                )
+            else:
+                self._map(siret_entity, etablissement)
+            siret_entities.append(siret_entity)
+
+        self.__check_communes(
+            session, {s.code_commune for s in siret_entities if s.code_commune is not None}, max_workers
+        )
+
+        try:
+            session.add_all(siret_entities)
+            session.flush()
+            logger.info(f"[SERVICE][SIRET] {len(siret_entities)} sirets ajoutés à la base.")
+        except Exception as e:
+            logger.exception("[SERVICE][SIRET] Error sur ajout des sirets")
+            raise e
+
+    def _donnees_etablissement_or_none(self, code: str) -> DonneesEtablissement | None:
+        try:
+            return self._api_entreprise.donnees_etablissement(code)
+        except ApiError as e:
+            logger.exception(
+                f"[SERVICE][SIRET] Erreur de l'api entreprise, le siret {code} ne sera pas mis à jour", exc_info=e
+            )
+            return None
+
+    def __check_communes(self, session: Session, codes: set[str], max_workers: int):
+        if not codes:
+            return
+
+        existing = set(session.scalars(select(Commune.code).where(Commune.code.in_(codes))))
+        communes = [Commune(code=code) for code in sorted(codes) if code not in existing]
+        if not communes:
+            return
+
+        logger.info("[SERVICE][SIRET][IMPORT][COMMUNE] Ajout de %s communes", len(communes))
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(communes))) as executor:
+            communes = list(executor.map(self._maj_one_commune_or_default, communes))
+
+        session.add_all(communes)
+        session.flush()
+
+    def _maj_one_commune_or_default(self, commune: Commune) -> Commune:
+        try:
+            return self._maj_one_commune(commune)
+        except Exception:
+            logger.exception(f"[SERVICE][SIRET][IMPORT][CHORUS] Error sur ajout commune {commune.code}")
+            return commune
+
     def __check_commune(self, session: Session, code):
         instance = session.query(Commune).filter_by(code=code).one_or_none()
         if not instance:
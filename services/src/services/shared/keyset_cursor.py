@@ -0,0 +1,33 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Any, Optional
+
+from models.exceptions import BadRequestError
+
+
+@dataclass(frozen=True)
+class KeysetCursor:
+    """
+    Curseur opaque de pagination par clé (keyset).
+    Porte la position de la dernière ligne renvoyée: la valeur de la colonne de tri et l'id.
+    """
+
+    sort_by: Optional[str]
+    sort_order: Optional[str]
+    value: Any
+    id: int
+
+    def encode(self) -> str:
+        raw = json.dumps([self.sort_by, self.sort_order, self.value, self.id], default=str)
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode(token: str) -> "KeysetCursor":
+        try:
+            sort_by, sort_order, value, id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+            return KeysetCursor(sort_by, sort_order, value, int(id))
+        except (ValueError, TypeError, binascii.Error) as e:
+            raise BadRequestError(code=HTTPStatus.BAD_REQUEST, api_message="Le paramètre 'cursor' est invalide.") from e
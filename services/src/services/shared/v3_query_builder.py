@@ -1,4 +1,5 @@
-from typing import Annotated, Generic, Optional, TypeVar, Union, get_args, get_origin
+from http import HTTPStatus
+from typing import Annotated, Any, Generic, Optional, TypeVar, Union, get_args, get_origin
 
 from sqlalchemy import (
     Column,
@@ -7,17 +8,21 @@ from sqlalchemy import (
     Select,
     Sequence,
     String,
+    and_,
     func,
+    literal,
     select,
     or_,
 )
 from sqlalchemy.inspection import inspect
-from sqlalchemy.orm import Session, DeclarativeBase, load_only
+from sqlalchemy.orm import Session, DeclarativeBase, load_only, undefer
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 
 import logging
 
+from models.exceptions import BadRequestError
 from models.value_objects.total import Total
+from services.shared.keyset_cursor import KeysetCursor
 from services.shared.v3_query_params import V3QueryParams
 from services.utilities.observability import summary_of_time
 
@@ -44,6 +49,10 @@ class V3QueryBuilder(Generic[T]):
         self._query = select(self._model)
         self._is_grouping = False
         """Représente si le builder qui est en train de build est une aggregation"""
+        self._seek_condition: ColumnElement[bool] | None = None
+        """Condition de pagination par clé, exclue du calcul des totaux"""
+        self.next_cursor: str | None = None
+        """Curseur de la page suivante, renseigné par select_all"""
 
         if self._params.colonnes_list is not None:
             selected_colonnes = [
@@ -112,18 +121,30 @@ class V3QueryBuilder(Generic[T]):
         assert hasattr(self._model, "id") and isinstance(self._model.id, InstrumentedAttribute)  # type: ignore
         return self._model.id  # type: ignore
 
-    def sort_by_params(self):
-        if self._params.sort_by is not None:
-            sortby_colonne = getattr(self._model, self._params.sort_by, None)
-            if isinstance(sortby_colonne, InstrumentedAttribute):
-                direction = self._params.sort_order or "asc"
+    def _get_sort_colonne(self) -> InstrumentedAttribute | None:
+        if self._params.sort_by is None:
+            return None
+        sortby_colonne = getattr(self._model, self._params.sort_by, None)
+        return sortby_colonne if isinstance(sortby_colonne, InstrumentedAttribute) else None
 
-                if isinstance(sortby_colonne.type, String):
-                    sort_expr = func.regexp_replace(sortby_colonne, r"^\s+|\s+$", "", "g")
-                else:
-                    sort_expr = sortby_colonne
+    @staticmethod
+    def _sort_expression(sortby_colonne: InstrumentedAttribute, value: Any):
+        if isinstance(sortby_colonne.type, String):
+            return func.regexp_replace(value, r"^\s+|\s+$", "", "g")
+        return value
 
-                self._query = self._query.order_by(sort_expr.asc() if direction == "asc" else sort_expr.desc())
+    def sort_by_params(self):
+        sortby_colonne = self._get_sort_colonne()
+        if sortby_colonne is not None:
+            direction = self._params.sort_order or "asc"
+            sort_expr = self._sort_expression(sortby_colonne, sortby_colonne)
+            # XXX: ordre des NULL explicite (défaut Postgres), la pagination par clé en dépend
+            self._query = self._query.order_by(
+                sort_expr.asc().nulls_last() if direction == "asc" else sort_expr.desc().nulls_first()
+            )
+            if not self._is_grouping:
+                # XXX: nécessaire au calcul du curseur de la page suivante
+                self._query = self._query.options(undefer(sortby_colonne))
         # On finit toujours par in sort by id ASC après les sort utilisateur
         if not self.is_an_aggregation:
             id_attr = self._get_model_id_colonne()
@@ -149,10 +170,78 @@ class V3QueryBuilder(Generic[T]):
 
     def paginate(self):
         self._logger.debug("paginate")
+        if self._params.cursor is not None:
+            self.seek_after(KeysetCursor.decode(self._params.cursor))
+            self._query = self._query.limit(self._params.page_size + 1)
+            return self
+
         offset = (self._params.page - 1) * self._params.page_size
         self._query = self._query.offset(offset).limit(self._params.page_size + 1)
         return self
 
+    def seek_after(self, cursor: KeysetCursor):
+        """
+        Pagination par clé: reprend après la ligne du curseur selon l'ordre de sort_by_params (tri utilisateur puis id).
+        Le coût d'une page ne dépend pas de sa profondeur, contrairement à un OFFSET.
+        """
+        if self.is_an_aggregation or self._is_grouping:
+            raise BadRequestError(
+                code=HTTPStatus.BAD_REQUEST,
+                api_message="Le paramètre 'cursor' n'est pas disponible pour une aggregation.",
+            )
+        if (cursor.sort_by, cursor.sort_order) != (self._params.sort_by, self._params.sort_order):
+            raise BadRequestError(
+                code=HTTPStatus.BAD_REQUEST,
+                api_message="Le paramètre 'cursor' ne correspond pas au tri demandé.",
+            )
+
+        after_id = self._get_model_id_colonne() > cursor.id
+        sortby_colonne = self._get_sort_colonne()
+
+        if sortby_colonne is None:
+            condition = after_id
+        else:
+            # Les NULL sont en dernier en ASC et en premier en DESC (cf. sort_by_params)
+            is_asc = (self._params.sort_order or "asc") == "asc"
+            sort_expr = self._sort_expression(sortby_colonne, sortby_colonne)
+            if cursor.value is None:
+                condition = and_(sort_expr.is_(None), after_id)
+                if not is_asc:
+                    condition = or_(condition, sort_expr.is_not(None))
+            else:
+                value = literal(self._coerce_cursor_value(sortby_colonne, cursor.value), sortby_colonne.type)
+                value = self._sort_expression(sortby_colonne, value)
+                condition = or_(
+                    sort_expr > value if is_asc else sort_expr < value,
+                    and_(sort_expr == value, after_id),
+                )
+                if is_asc:
+                    condition = or_(condition, sort_expr.is_(None))
+
+        self._seek_condition = condition
+        self._query = self._query.where(condition)
+        return self
+
+    @staticmethod
+    def _coerce_cursor_value(sortby_colonne: InstrumentedAttribute, value: Any):
+        """Les dates et décimaux sont portés sous forme de chaîne par le curseur"""
+        try:
+            python_type = sortby_colonne.type.python_type
+        except NotImplementedError:
+            return value
+        if not isinstance(value, str) or python_type is str:
+            return value
+        try:
+            return python_type.fromisoformat(value) if hasattr(python_type, "fromisoformat") else python_type(value)
+        except (ValueError, ArithmeticError) as e:
+            raise BadRequestError(code=HTTPStatus.BAD_REQUEST, api_message="Le paramètre 'cursor' est invalide.") from e
+
+    def cursor_after(self, last) -> str:
+        """Curseur désignant la position qui suit la ligne `last`"""
+        sortby_colonne = self._get_sort_colonne()
+        value = getattr(last, sortby_colonne.key) if sortby_colonne is not None else None
+        return KeysetCursor(self._params.sort_by, self._params.sort_order, value, last.id).encode()
+
     @summary_of_time()
     def get_total(self, _: str):
         model = self._model
@@ -163,7 +252,7 @@ class V3QueryBuilder(Generic[T]):
                 (func.coalesce(func.sum(model.montant_cp), 0).label("total_montant_paye")),  # type: ignore
             )
             .select_from(model)
-            .where(*self._query._where_criteria)
+            .where(*(c for c in self._query._where_criteria if c is not self._seek_condition))
             .group_by(None)
             .order_by(None)
             .limit(None)
@@ -186,7 +275,11 @@ class V3QueryBuilder(Generic[T]):
 
         count_plus_one = len(data)
         data = data[: self._params.page_size]
-        return data, self._params.page_size < count_plus_one
+        has_next = self._params.page_size < count_plus_one
+
+        if has_next and not self._is_grouping and not self.is_an_aggregation:
+            self.next_cursor = self.cursor_after(data[-1])
+        return data, has_next
 
     def select_one(self):
         return self._session.execute(self._query).unique().scalar_one_or_none()
@@ -53,6 +53,8 @@ class V3QueryParams(BaseModel, CacheableTotalQuery):
     colonnes: Optional[str] = Field(default=None)
     page: int = Field(default=1, ge=1)
     page_size: int = Field(default=100, ge=1, le=1000)
+    cursor: Optional[str] = Field(default=None)
+    """Curseur opaque de pagination par clé, remplace `page` lorsqu'il est fourni"""
     sort_by: Optional[str] = Field(default=None)
     sort_order: Optional[Literal["asc", "desc"]] = Field(default=None)
     search: Optional[str] = Field(default=None)
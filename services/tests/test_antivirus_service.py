@@ -1,5 +1,6 @@
 """Tests unitaires du service antivirus (AntivirusService)."""
 
+import struct
 from io import BytesIO
 from unittest.mock import MagicMock, patch
 
@@ -151,3 +152,62 @@ class TestAntivirusServiceScannedBinaryIO:
 
                 assert returned_binary_io.read() == initial_binary_io.read()
                 mock_scan_file.assert_called_once()
+
+
+class TestAntivirusServiceInstream:
+    """Tests du scan INSTREAM alimenté bloc par bloc."""
+
+    def _sent_payload(self, mock_cd) -> bytes:
+        return b"".join(bytes(call.args[0]) for call in mock_cd.clamd_socket.sendall.call_args_list)
+
+    def test_instream_sends_chunks_and_terminator(self, av_service):
+        with patch("clamd.ClamdNetworkSocket") as mock_clamd_cls:
+            mock_cd = MagicMock()
+            mock_cd._recv_response.return_value = "stream: OK"
+            mock_cd._parse_response.return_value = ("stream", None, "OK")
+            mock_clamd_cls.return_value = mock_cd
+
+            with av_service.instream(file_size=6) as stream:
+                stream.send(b"abc")
+                stream.send(b"def")
+                stream.verdict()
+
+            mock_cd._send_command.assert_called_once_with("INSTREAM")
+            expected = struct.pack(b"!L", 3) + b"abc" + struct.pack(b"!L", 3) + b"def" + struct.pack(b"!L", 0)
+            assert self._sent_payload(mock_cd) == expected
+            mock_cd._close_socket.assert_called_once()
+
+    def test_instream_infected_raises_virus_found_error(self, av_service):
+        with patch("clamd.ClamdNetworkSocket") as mock_clamd_cls:
+            mock_cd = MagicMock()
+            mock_cd._parse_response.return_value = ("stream", "Eicar-Signature", "FOUND")
+            mock_clamd_cls.return_value = mock_cd
+
+            with pytest.raises(VirusFoundError) as exc_info:
+                with av_service.instream(file_size=3) as stream:
+                    stream.send(b"abc")
+                    stream.verdict()
+
+            assert exc_info.value.virus_name == "Eicar-Signature"
+
+    def test_instream_connection_error_raises_scan_error(self, av_service):
+        with patch("clamd.ClamdNetworkSocket") as mock_clamd_cls:
+            mock_cd = MagicMock()
+            mock_cd.clamd_socket.sendall.side_effect = clamd.ConnectionError("reset")
+            mock_clamd_cls.return_value = mock_cd
+
+            with pytest.raises(AntivirusScanError) as exc_info:
+                with av_service.instream(file_size=3) as stream:
+                    stream.send(b"abc")
+
+            assert "indisponible" in exc_info.value.message
+
+    def test_instream_too_large_raises_scan_error(self):
+        av_service = AntivirusService(host="localhost", port=3310, timeout=5, max_file_size_bytes=10)
+
+        with patch("clamd.ClamdNetworkSocket") as mock_clamd_cls:
+            with pytest.raises(AntivirusScanError):
+                with av_service.instream(file_size=11):
+                    pass
+
+            mock_clamd_cls.assert_not_called()
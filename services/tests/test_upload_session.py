@@ -1,4 +1,6 @@
+import errno
 import multiprocessing
+import os
 import tempfile
 import time
 from pathlib import Path
@@ -9,7 +11,15 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from models.value_objects.UploadType import UploadType
-from services.audits.upload_session import MandatorySessionStateData, SessionState, UploadSessionService
+from services.audits.upload_session import (
+    MandatorySessionStateData,
+    SessionState,
+    UploadSessionService,
+    _buffered_copy,
+    _copy_file_range,
+    _copy_file_tail,
+    _sendfile,
+)
 
 
 @pytest.fixture(scope="module")
@@ -505,3 +515,87 @@ class TestUploadSessionService:
         assert state.total_received == 1
         assert len(state.received_ae_files) == 1
         assert state.received_cp_files == [None]
+
+
+class TestConcatenateCsvFiles:
+    """Tests de la concaténation des fichiers CSV d'une session."""
+
+    @pytest.fixture
+    def service(self, tmp_path):
+        return UploadSessionService(
+            sessions_folder=str(tmp_path / "sessions"),
+            final_folder=str(tmp_path / "final"),
+            db_session_factory=None,
+        )
+
+    @pytest.mark.parametrize("copy_method", [None, _sendfile, _buffered_copy], ids=["default", "sendfile", "buffered"])
+    def test_concatenate_keeps_bytes_and_first_header(self, service, tmp_path, copy_method, monkeypatch):
+        monkeypatch.setattr("services.audits.upload_session.COPY_CHUNK_SIZE", 7)
+        if copy_method is not None:
+            monkeypatch.setattr("services.audits.upload_session._copy_methods", lambda: [copy_method])
+        parts = [
+            b"col1;col2\r\nv1;\xc3\xa9\r\nv2;x\r\n",
+            b"col1;col2\r\n",
+            b"col1;col2\r\nv3;y\r\nv4;z",
+        ]
+        files = []
+        for i, content in enumerate(parts):
+            file_path = tmp_path / f"{i:03d}_part.csv"
+            file_path.write_bytes(content)
+            files.append(str(file_path))
+
+        output = service.concatenate_csv_files(list(reversed(files)), tmp_path / "final" / "out.csv")
+
+        with open(output, "rb") as f:
+            assert f.read() == b"col1;col2\r\nv1;\xc3\xa9\r\nv2;x\r\nv3;y\r\nv4;z"
+
+    def test_copy_falls_back_when_unsupported(self, tmp_path, monkeypatch):
+        def _unsupported(*args):
+            raise OSError(errno.EXDEV, "unsupported")
+
+        monkeypatch.setattr("services.audits.upload_session._copy_methods", lambda: [_unsupported, _buffered_copy])
+        src = tmp_path / "src.csv"
+        src.write_bytes(b"header\nbody\n")
+        dst = tmp_path / "dst.csv"
+
+        with open(src, "rb") as infile, open(dst, "wb", buffering=0) as outfile:
+            _copy_file_tail(infile.fileno(), outfile.fileno(), len(b"header\n"))
+
+        assert dst.read_bytes() == b"body\n"
+
+    def test_concatenate_keeps_crlf_line_endings(self, service, tmp_path):
+        """Les fins de ligne sont copiées telles quelles : CRLF n'est plus converti en LF."""
+        first = tmp_path / "001_part.csv"
+        first.write_bytes(b"col1;col2\r\nv1;a\r\n")
+        second = tmp_path / "002_part.csv"
+        second.write_bytes(b"col1;col2\r\nv2;b\r\nv3;c\n")
+
+        output = service.concatenate_csv_files([str(first), str(second)], tmp_path / "final" / "out.csv")
+
+        with open(output, "rb") as f:
+            assert f.read() == b"col1;col2\r\nv1;a\r\nv2;b\r\nv3;c\n"
+
+    @pytest.mark.skipif(not hasattr(os, "copy_file_range"), reason="os.copy_file_range indisponible")
+    @pytest.mark.parametrize("stopping_method", [_copy_file_range, _sendfile], ids=["copy_file_range", "sendfile"])
+    def test_copy_falls_back_when_stopped_before_end(self, tmp_path, monkeypatch, stopping_method):
+        """Un mode de copie qui s'arrête avant la fin du fichier ne doit pas tronquer la sortie."""
+        monkeypatch.setattr("services.audits.upload_session.COPY_CHUNK_SIZE", 4)
+        name = "copy_file_range" if stopping_method is _copy_file_range else "sendfile"
+        real = getattr(os, name)
+        calls = []
+
+        def _stops_after_first_chunk(*args):
+            calls.append(args)
+            return real(*args) if len(calls) == 1 else 0
+
+        monkeypatch.setattr(f"services.audits.upload_session.os.{name}", _stops_after_first_chunk)
+        monkeypatch.setattr("services.audits.upload_session._copy_methods", lambda: [stopping_method, _buffered_copy])
+        src = tmp_path / "src.csv"
+        src.write_bytes(b"header\nbody;1\nbody;2\n")
+        dst = tmp_path / "dst.csv"
+
+        with open(src, "rb") as infile, open(dst, "wb", buffering=0) as outfile:
+            _copy_file_tail(infile.fileno(), outfile.fileno(), len(b"header\n"))
+
+        assert len(calls) == 2
+        assert dst.read_bytes() == b"body;1\nbody;2\n"
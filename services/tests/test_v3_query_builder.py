@@ -0,0 +1,106 @@
+import datetime
+import re
+
+import pytest
+from sqlalchemy import Date, Integer, String, create_engine, event
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from models.exceptions import BadRequestError
+from services.shared.v3_query_builder import V3QueryBuilder
+from services.shared.v3_query_params import V3QueryParams
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class _Ligne(_Base):
+    __tablename__ = "ligne"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    label: Mapped[str | None] = mapped_column(String, nullable=True)
+    montant: Mapped[int] = mapped_column(Integer)
+    date: Mapped[datetime.date | None] = mapped_column(Date, nullable=True)
+
+
+@pytest.fixture(scope="module")
+def session():
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def _regexp_replace(dbapi_connection, _):
+        dbapi_connection.create_function(
+            "regexp_replace", 4, lambda value, pattern, repl, _: None if value is None else re.sub(pattern, repl, value)
+        )
+
+    _Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        labels = [" b", "a", None, "c ", "a", None, "b", "d", "a", " c"]
+        dates = [None, datetime.date(2024, 1, 3), datetime.date(2024, 1, 1), None, datetime.date(2024, 1, 2)] * 2
+        session.add_all(
+            _Ligne(id=i + 1, label=label, montant=(i * 7) % 4, date=date)
+            for i, (label, date) in enumerate(zip(labels, dates))
+        )
+        session.commit()
+        yield session
+
+
+def _all_pages(session, **params) -> list[int]:
+    ids = []
+    cursor = None
+    while True:
+        query_params = V3QueryParams(page_size=3, cursor=cursor, **params)
+        builder = V3QueryBuilder(_Ligne, session, query_params).sort_by_params().paginate()
+        data, has_next = builder.select_all()
+        ids.extend(ligne.id for ligne in data)
+        if not has_next:
+            return ids
+        cursor = builder.next_cursor
+        assert cursor is not None
+
+
+@pytest.mark.parametrize(
+    "sort",
+    [
+        {},
+        {"sort_by": "label", "sort_order": "asc"},
+        {"sort_by": "label", "sort_order": "desc"},
+        {"sort_by": "montant", "sort_order": "asc"},
+        {"sort_by": "montant", "sort_order": "desc"},
+        {"sort_by": "date", "sort_order": "asc"},
+        {"sort_by": "date", "sort_order": "desc"},
+        {"sort_by": "label", "sort_order": "asc", "colonnes": "id,montant"},
+    ],
+)
+def test_keyset_pagination_same_order_as_offset(session, sort):
+    params = V3QueryParams(page_size=100, **sort)
+    expected, _ = V3QueryBuilder(_Ligne, session, params).sort_by_params().paginate().select_all()
+
+    assert _all_pages(session, **sort) == [ligne.id for ligne in expected]
+
+
+def test_keyset_total_ignores_cursor(session):
+    builder = V3QueryBuilder(_Ligne, session, V3QueryParams(page_size=3)).sort_by_params().paginate()
+    builder.select_all()
+
+    params = V3QueryParams(page_size=3, cursor=builder.next_cursor)
+    builder = V3QueryBuilder(_Ligne, session, params).sort_by_params().paginate()
+    criteria = [c for c in builder._query._where_criteria if c is not builder._seek_condition]
+
+    assert len(builder._query._where_criteria) == 1
+    assert criteria == []
+
+
+@pytest.mark.parametrize("cursor", ["pas un curseur", "WzFd"])
+def test_keyset_invalid_cursor(session, cursor):
+    with pytest.raises(BadRequestError):
+        V3QueryBuilder(_Ligne, session, V3QueryParams(cursor=cursor)).sort_by_params().paginate()
+
+
+def test_keyset_cursor_bound_to_sort(session):
+    builder = V3QueryBuilder(_Ligne, session, V3QueryParams(page_size=3)).sort_by_params().paginate()
+    builder.select_all()
+
+    params = V3QueryParams(page_size=3, sort_by="label", sort_order="asc", cursor=builder.next_cursor)
+    with pytest.raises(BadRequestError):
+        V3QueryBuilder(_Ligne, session, params).sort_by_params().paginate()